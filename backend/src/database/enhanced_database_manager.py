@@ -88,7 +88,15 @@ class ConnectionPool:
         conn = None
         try:
             conn = self._connections.get(timeout=30)
-            yield conn
+            try:
+                yield conn
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            # Callers rely on the pool to commit their writes
+            if conn.in_transaction:
+                conn.commit()
         finally:
             if conn and not self._closed:
                 self._connections.put(conn)
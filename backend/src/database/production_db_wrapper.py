@@ -473,7 +473,7 @@ class ProductionDatabaseManager(EnhancedDatabaseManager):
             # Update file count and total size
             cursor = conn.execute("""
                 UPDATE folders 
-                SET file_count = (
+                SET total_files = (
                     SELECT COUNT(*) FROM files WHERE folder_id = ? AND state != 'deleted'
                 ),
                 total_size = (
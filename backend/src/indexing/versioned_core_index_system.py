@@ -16,6 +16,8 @@ from typing import Dict, List, Optional, Tuple, Set, Any, BinaryIO
 from dataclasses import dataclass
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from contextlib import contextmanager
 import threading
 import logging
 import traceback
@@ -43,6 +45,9 @@ class FileChange:
     old_size: Optional[int] = None
     new_size: Optional[int] = None
     segments_affected: List[int] = None
+    old_file_id: Optional[int] = None
+    modified_at: Optional[datetime] = None
+    segment_hashes: Optional[List[Tuple[str, int, int]]] = None
 
 @dataclass
 class IndexedFile:
@@ -79,7 +84,7 @@ class FileSegmentProcessor:
     def __init__(self, segment_size: int = 768000):
         self.segment_size = segment_size
         self.hash_algorithm = hashlib.sha256
-        
+    
     def process_file(self, file_path: str) -> Tuple[str, List[SegmentData]]:
         """
         Process file and create actual segments with hashes
@@ -119,14 +124,39 @@ class FileSegmentProcessor:
                     
                     segment_index += 1
                     offset += len(segment_data)
-                    
+            
             file_hash = file_hasher.hexdigest()
             return file_hash, segments
-            
+        
         except Exception as e:
             logger.error(f"Error processing file {file_path}: {e}")
             raise
-            
+    
+    def hash_segments(self, file_path: str) -> Tuple[str, List[Tuple[str, int, int]]]:
+        """
+        Hash file and segments in one sequential pass without keeping data
+        Returns: (file_hash, [(segment_hash, size, offset), ...])
+        """
+        file_hasher = self.hash_algorithm()
+        segments = []
+        offset = 0
+        
+        with open(file_path, 'rb') as f:
+            while True:
+                segment_data = f.read(self.segment_size)
+                if not segment_data:
+                    break
+                
+                file_hasher.update(segment_data)
+                segments.append((
+                    self.hash_algorithm(segment_data).hexdigest(),
+                    len(segment_data),
+                    offset
+                ))
+                offset += len(segment_data)
+        
+        return file_hasher.hexdigest(), segments
+    
     def create_segment_metadata(self, file_path: str, file_id: int, 
                                folder_id: str, version: int,
                                security_system) -> List[Dict]:
@@ -154,9 +184,9 @@ class FileSegmentProcessor:
                 'newsgroup': 'alt.binaries.test'
             }
             segment_metadata.append(metadata)
-            
-        return file_hash, segment_metadata
         
+        return file_hash, segment_metadata
+    
     def verify_segment(self, file_path: str, segment_index: int, 
                       expected_hash: str) -> bool:
         """
@@ -169,16 +199,16 @@ class FileSegmentProcessor:
                 
                 if not segment_data:
                     return False
-                    
+                
                 actual_hash = self.hash_algorithm(segment_data).hexdigest()
                 return actual_hash == expected_hash
-                
+        
         except Exception as e:
             logger.error(f"Error verifying segment {segment_index} of {file_path}: {e}")
             return False
 
 
-# Global lock to prevent duplicate folder processing
+# Folders being indexed by any index system in this process
 _folder_processing_lock = threading.Lock()
 _processing_folders = set()
 
@@ -216,10 +246,10 @@ class VersionedCoreIndexSystem:
                 
                 if deleted_count > 0:
                     self.logger.info(f"Cleaned up {deleted_count} existing segments")
-                    
+        
         except Exception as e:
             self.logger.error(f"Error cleaning up segments: {e}")
-
+    
     def _insert_segment_safe(self, cursor, file_id, segment_index, segment_data, redundancy_index=0):
         """Safely insert segment with duplicate handling"""
         try:
@@ -236,7 +266,7 @@ class VersionedCoreIndexSystem:
                 segment_data.get('message_id', ''), 'pending'
             ))
             return cursor.lastrowid
-            
+        
         except sqlite3.IntegrityError as e:
             if "UNIQUE constraint failed" in str(e):
                 # Check if this is a re-indexing scenario
@@ -264,7 +294,7 @@ class VersionedCoreIndexSystem:
                     raise
             else:
                 raise
-
+    
     def __init__(self, db_manager, security_system, config):
         self.db = db_manager
         self.security = security_system
@@ -280,36 +310,98 @@ class VersionedCoreIndexSystem:
         # Initialize segment processor
         self.segment_processor = FileSegmentProcessor(self.segment_size)
         
-        # Thread safety
+        # Thread safety; statistics are kept per indexing call
         self.stats_lock = threading.Lock()
-        self.processing_stats = self._reset_stats()
         
         # File processing cache
         self._file_cache = {}
         self._cache_lock = threading.Lock()
         
+        # Hashing workers shared by all folders
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
     def _reset_stats(self) -> Dict[str, Any]:
-        """Reset processing statistics"""
+        """Fresh statistics for one indexing call"""
         return {
             'files_processed': 0,
             'bytes_processed': 0,
             'segments_created': 0,
             'changes_detected': 0,
+            'segments_reused': 0,
             'errors': [],
             'start_time': time.time()
         }
+    
+    @contextmanager
+    def _folder_guard(self, folder_id: str):
+        """
+        Claim a folder for indexing; yields False if already claimed
         
+        Claims are process-wide, so index systems built by different
+        callers never index the same folder at once. Other folders index
+        concurrently.
+        """
+        with _folder_processing_lock:
+            acquired = folder_id not in _processing_folders
+            if acquired:
+                _processing_folders.add(folder_id)
+        
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with _folder_processing_lock:
+                    _processing_folders.discard(folder_id)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the shared hashing pool, bounded by worker_threads"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.worker_threads,
+                    thread_name_prefix='index-hash'
+                )
+            return self._executor
+    
+    def shutdown(self):
+        """Stop hashing workers"""
+        with self._executor_lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def _hash_files(self, files: List[Tuple[str, str]]):
+        """
+        Hash files on the worker pool, yielding (path, future) in input order
+        At most two files per worker are in flight at once
+        """
+        executor = self._get_executor()
+        window = self.worker_threads * 2
+        pending = deque()
+        remaining = iter(files)
+        
+        for file_path, full_path in remaining:
+            pending.append((file_path, executor.submit(self.segment_processor.hash_segments, full_path)))
+            if len(pending) >= window:
+                break
+        
+        while pending:
+            file_path, future = pending.popleft()
+            next_file = next(remaining, None)
+            if next_file:
+                pending.append((next_file[0], executor.submit(self.segment_processor.hash_segments, next_file[1])))
+            yield file_path, future
+    
     def index_folder(self, folder_path: str, folder_id: str, 
                     progress_callback=None) -> Dict[str, Any]:
         """
         Initial folder indexing - processes all files with actual data
-        Now with duplicate processing protection
+        Now with duplicate processing protection; different folders
+        index concurrently
         """
-        # Prevent duplicate processing
-        global _folder_processing_lock, _processing_folders
-        
-        with _folder_processing_lock:
-            if folder_id in _processing_folders:
+        with self._folder_guard(folder_id) as acquired:
+            if not acquired:
                 self.logger.warning(f"Folder {folder_id} is already being processed, skipping duplicate request")
                 return {
                     'success': False,
@@ -319,125 +411,123 @@ class VersionedCoreIndexSystem:
                     'segments_created': 0
                 }
             
-            _processing_folders.add(folder_id)
-            self.logger.info(f"LOCK: Added folder {folder_id} to processing set")
+            return self._index_folder(folder_path, folder_id, progress_callback)
+    
+    def _index_folder(self, folder_path: str, folder_id: str,
+                      progress_callback=None) -> Dict[str, Any]:
+        """
+        Index all files; hashing runs on the worker pool while database
+        records are written in path order, so version records do not
+        depend on thread scheduling
+        """
+        start_time = time.time()
+        self.logger.info(f"Starting initial index of folder: {folder_path}")
         
-        try:
-            start_time = time.time()
-            self.logger.info(f"Starting initial index of folder: {folder_path}")
-            
-            # Reset stats
-            self.processing_stats = self._reset_stats()
-            
-            # Validate folder exists
-            if not os.path.exists(folder_path):
-                raise ValueError(f"Folder does not exist: {folder_path}")
+        stats = self._reset_stats()
+        
+        # Validate folder exists
+        if not os.path.exists(folder_path):
+            raise ValueError(f"Folder does not exist: {folder_path}")
+        
+        # Create folder entry if needed
+        folder_record = self._ensure_folder_exists(folder_id, folder_path)
+        folder_db_id = folder_record['id']
+        
+        # Generate folder keys if not exist
+        if not folder_record.get('private_key'):
+            keys = self.security.generate_folder_keys(folder_id)
+            self.security.save_folder_keys(folder_id, keys)
+        
+        # Re-index: only changed segments get new articles
+        existing_files = self._get_indexed_files(folder_db_id)
+        if existing_files:
+            self.logger.info(f"Found {len(existing_files)} existing files, "
+                             f"re-indexing changed segments only")
+            return self._re_index_folder(folder_path, folder_id, progress_callback)
+        
+        # Scan folder for files
+        all_files = self._scan_folder_metadata(folder_path, progress_callback)
+        self.logger.info(f"Found {len(all_files)} files to index")
+        
+        # Initial progress callback
+        if progress_callback:
+            progress_callback({
+                'current': 0,
+                'total': len(all_files),
+                'file': 'Starting indexing...',
+                'phase': 'initializing'
+            })
+        
+        indexed_files = []
+        failed_files = []
+        callback_frequency = max(1, len(all_files) // 20)  # At least 20 updates
+        
+        files = [(file_path, all_files[file_path]['full_path']) for file_path in sorted(all_files)]
+        
+        for i, (file_path, future) in enumerate(self._hash_files(files)):
+            try:
+                file_hash, segment_hashes = future.result()
+                file_info = dict(all_files[file_path], hash=file_hash)
                 
-            # Create folder entry if needed
-            folder_record = self._ensure_folder_exists(folder_id, folder_path)
-            folder_db_id = folder_record['id']
-            
-            # Generate folder keys if not exist
-            if not folder_record.get('private_key'):
-                keys = self.security.generate_folder_keys(folder_id)
-                self.security.save_folder_keys(folder_id, keys)
-            
-            # Scan folder for files
-            all_files = self._scan_folder_full(folder_path, progress_callback)
-            self.logger.info(f"Found {len(all_files)} files to index")
-            
-            # Initial progress callback
-            if progress_callback:
-                progress_callback({
-                    'current': 0,
-                    'total': len(all_files),
-                    'file': 'Starting indexing...',
-                    'phase': 'initializing'
-                })
-            
-            # Clean up existing segments if this is a re-index
-            existing_files = self._get_indexed_files(folder_db_id)
-            if existing_files:
-                self.logger.info(f"Found {len(existing_files)} existing files, cleaning up segments...")
-                self._cleanup_existing_segments(folder_db_id)
-            
-            # Process files sequentially to avoid database conflicts
-            indexed_files = []
-            failed_files = []
-            
-            for i, (file_path, file_info) in enumerate(all_files.items()):
-                try:
-                    result = self._index_file_complete(
-                        folder_db_id,
-                        folder_id,
-                        folder_path,
-                        file_path,
-                        file_info,
-                        version=1
-                    )
-                    
-                    if result:
-                        indexed_files.append(result)
-                        
-                    # Progress callback for every file (or every few files for large sets)
-                    if progress_callback:
-                        callback_frequency = max(1, len(all_files) // 20)  # At least 20 updates
-                        if (i + 1) % callback_frequency == 0 or i == len(all_files) - 1:
-                            progress_callback({
-                                'current': i + 1,
-                                'total': len(all_files),
-                                'file': file_path,
-                                'phase': 'indexing'
-                            })
-                        
-                    # Small delay to allow GUI to update
-                    time.sleep(0.01)
-                        
-                except Exception as e:
-                    self.logger.error(f"Error indexing {file_path}: {e}")
-                    failed_files.append(file_path)
-                    with self.stats_lock:
-                        self.processing_stats['errors'].append({
+                result = self._index_file_complete(
+                    folder_db_id,
+                    folder_id,
+                    folder_path,
+                    file_path,
+                    file_info,
+                    version=1,
+                    segment_hashes=segment_hashes,
+                    stats=stats
+                )
+                
+                if result:
+                    indexed_files.append(result)
+                
+                # Progress callback for every file (or every few files for large sets)
+                if progress_callback:
+                    if (i + 1) % callback_frequency == 0 or i == len(files) - 1:
+                        progress_callback({
+                            'current': i + 1,
+                            'total': len(files),
                             'file': file_path,
-                            'error': str(e),
-                            'traceback': traceback.format_exc()
+                            'phase': 'indexing'
                         })
-                    
-            # Log indexing summary
-            files_processed = self.processing_stats["files_processed"]
-            segments_created = self.processing_stats["segments_created"]
-            logger.info(f"FOLDER_DEBUG: Indexing complete - {files_processed} files, {segments_created} segments")
-            
-            # Update folder stats
-            self._update_folder_stats(folder_db_id)
-            
-            # Create initial version
-            version_id = self._create_folder_version(folder_db_id, 1, "Initial index")
-            
-            elapsed = time.time() - start_time
-            
-            result = {
-                'success': len(failed_files) == 0,
-                'folder_id': folder_id,
-                'version': 1,
-                'files_processed': self.processing_stats['files_processed'],
-                'bytes_processed': self.processing_stats['bytes_processed'],
-                'segments_created': self.processing_stats['segments_created'],
-                'files_failed': len(failed_files),
-                'errors': self.processing_stats['errors'],
-                'elapsed_time': elapsed,
-                'files_per_second': self.processing_stats['files_processed'] / elapsed if elapsed > 0 else 0,
-                'mb_per_second': (self.processing_stats['bytes_processed'] / 1024 / 1024) / elapsed if elapsed > 0 else 0
-            }
-            
-            self.logger.info(f"Initial indexing complete: {result}")
-            return result
             
-        finally:
-            # Always remove from processing set
-            with _folder_processing_lock:
-                _processing_folders.discard(folder_id)
-                self.logger.info(f"LOCK: Removed folder {folder_id} from processing set")
+            except Exception as e:
+                self.logger.error(f"Error indexing {file_path}: {e}")
+                failed_files.append(file_path)
+                with self.stats_lock:
+                    stats['errors'].append({
+                        'file': file_path,
+                        'error': str(e),
+                        'traceback': traceback.format_exc()
+                    })
+        
+        # Update folder stats
+        self._update_folder_stats(folder_db_id)
+        
+        # Create initial version
+        version_id = self._create_folder_version(folder_db_id, 1, "Initial index")
+        
+        elapsed = time.time() - start_time
+        
+        result = {
+            'success': len(failed_files) == 0,
+            'folder_id': folder_id,
+            'version': 1,
+            'files_processed': stats['files_processed'],
+            'bytes_processed': stats['bytes_processed'],
+            'segments_created': stats['segments_created'],
+            'files_failed': len(failed_files),
+            'errors': stats['errors'],
+            'elapsed_time': elapsed,
+            'files_per_second': stats['files_processed'] / elapsed if elapsed > 0 else 0,
+            'mb_per_second': (stats['bytes_processed'] / 1024 / 1024) / elapsed if elapsed > 0 else 0
+        }
+        
+        self.logger.info(f"Initial indexing complete: {result}")
+        return result
+    
     def _scan_folder_full(self, folder_path: str, progress_callback=None) -> Dict[str, Dict]:
         """
         Scan folder and calculate actual file hashes
@@ -453,7 +543,7 @@ class VersionedCoreIndexSystem:
                 # Skip hidden files and temporary files
                 if filename.startswith('.') or filename.startswith('~'):
                     continue
-                    
+                
                 file_path = os.path.join(root, filename)
                 rel_path = os.path.relpath(file_path, folder_path)
                 
@@ -482,12 +572,12 @@ class VersionedCoreIndexSystem:
                             'phase': 'scanning',
                             'files_scanned': total_scanned
                         })
-                        
+                
                 except Exception as e:
                     self.logger.warning(f"Error scanning file {file_path}: {e}")
-                    
-        return files
         
+        return files
+    
     def _calculate_file_hash_complete(self, file_path: str, file_size: int) -> str:
         """
         Calculate complete file hash - no shortcuts
@@ -502,86 +592,109 @@ class VersionedCoreIndexSystem:
                     if not chunk:
                         break
                     hasher.update(chunk)
-                    
-            return hasher.hexdigest()
             
+            return hasher.hexdigest()
+        
         except Exception as e:
             self.logger.error(f"Error hashing file {file_path}: {e}")
             raise
-            
+    
     def _index_file_complete(self, folder_db_id: int, folder_id: str,
                            folder_path: str, file_path: str, 
-                           file_info: Dict, version: int) -> Dict:
+                           file_info: Dict, version: int,
+                           segment_hashes: Optional[List[Tuple[str, int, int]]] = None,
+                           stats: Optional[Dict[str, Any]] = None) -> Dict:
         """
         Index a single file with complete segment processing
-        Reads actual file data and creates real segments
+        Segment hashes computed by the worker pool are used when given,
+        otherwise the file is read here
         """
+        stats = stats if stats is not None else self._reset_stats()
+        
         try:
             full_path = file_info.get('full_path') or os.path.join(folder_path, file_path)
             
+            if segment_hashes is None:
+                file_hash, segment_hashes = self.segment_processor.hash_segments(full_path)
+                
+                # Verify file hash matches
+                if file_info.get('hash') and file_hash != file_info['hash']:
+                    raise ValueError(f"File hash mismatch: expected {file_info['hash']}, got {file_hash}")
+                file_info = dict(file_info, hash=file_hash)
+            
             # Create file record
             file_id = self.db.add_file(
                 folder_db_id,
                 file_path,
                 file_info['hash'],
                 file_info['size'],
-                file_info.get('modified', datetime.now()),
+                file_info.get('modified') or datetime.now(),
                 version
             )
             
-            # Process file and create actual segments
-            file_hash, segment_metadata = self.segment_processor.create_segment_metadata(
-                full_path,
-                file_id,
-                folder_id,
-                version,
-                self.security
+            segment_metadata = self._add_segments(
+                file_id, folder_id, version, segment_hashes, range(len(segment_hashes))
             )
             
-            # Verify file hash matches
-            if file_hash != file_info['hash']:
-                raise ValueError(f"File hash mismatch: expected {file_info['hash']}, got {file_hash}")
-            
-            # Store segments in database
-            for seg_meta in segment_metadata:
-                segment_id = self.db.add_segment(
-                    seg_meta['file_id'],
-                    seg_meta['segment_index'],
-                    seg_meta['segment_hash'],
-                    seg_meta['segment_size'],
-                    seg_meta['subject_hash'],
-                    seg_meta['newsgroup'],
-                    redundancy_index=0
-                )
-                
-                # Set segment offset
-                if 'offset' in seg_meta:
-                    self.db.set_segment_offset(segment_id, seg_meta['offset'])
-                
-                # Store internal subject for verification
-                self._store_internal_subject(segment_id, seg_meta['internal_subject'])
-                
             # Update file segment count
             self.db.update_file_segment_count(file_id, len(segment_metadata))
             
             # Update statistics
             with self.stats_lock:
-                self.processing_stats['files_processed'] += 1
-                self.processing_stats['bytes_processed'] += file_info['size']
-                self.processing_stats['segments_created'] += len(segment_metadata)
-                
+                stats['files_processed'] += 1
+                stats['bytes_processed'] += file_info['size']
+                stats['segments_created'] += len(segment_metadata)
+            
             return {
                 'file_id': file_id,
                 'file_path': file_path,
-                'file_hash': file_hash,
+                'file_hash': file_info['hash'],
                 'segments': segment_metadata,
                 'size': file_info['size']
             }
-            
+        
         except Exception as e:
             self.logger.error(f"Failed to index file {file_path}: {e}")
             raise
+    
+    def _add_segments(self, file_id: int, folder_id: str, version: int,
+                      segment_hashes: List[Tuple[str, int, int]], indexes) -> List[Dict]:
+        """Store pending segments with fresh subjects"""
+        segment_metadata = []
+        
+        for segment_index in indexes:
+            segment_hash, segment_size, offset = segment_hashes[segment_index]
+            subject_pair = self.security.generate_subject_pair(
+                folder_id, version, segment_index
+            )
             
+            segment_id = self.db.add_segment(
+                file_id,
+                segment_index,
+                segment_hash,
+                segment_size,
+                subject_pair.usenet_subject,
+                'alt.binaries.test',
+                redundancy_index=0
+            )
+            self.db.set_segment_offset(segment_id, offset)
+            
+            # Store internal subject for verification
+            self._store_internal_subject(segment_id, subject_pair.internal_subject)
+            
+            segment_metadata.append({
+                'file_id': file_id,
+                'segment_index': segment_index,
+                'segment_hash': segment_hash,
+                'segment_size': segment_size,
+                'offset': offset,
+                'subject_hash': subject_pair.usenet_subject,
+                'internal_subject': subject_pair.internal_subject,
+                'newsgroup': 'alt.binaries.test'
+            })
+        
+        return segment_metadata
+    
     def _store_internal_subject(self, segment_id: int, internal_subject: str):
         """Store internal subject for segment verification"""
         with self.db.pool.get_connection() as conn:
@@ -591,43 +704,60 @@ class VersionedCoreIndexSystem:
                 WHERE id = ?
             """, (internal_subject, segment_id))
             conn.commit()
-            
+    
     def re_index_folder(self, folder_path: str, folder_id: str,
                        progress_callback=None) -> Dict[str, Any]:
         """
         Re-index folder with complete change detection
         Only processes actually changed files
         """
+        with self._folder_guard(folder_id) as acquired:
+            if not acquired:
+                self.logger.warning(f"Folder {folder_id} is already being processed, skipping duplicate request")
+                return {
+                    'success': False,
+                    'folder_id': folder_id,
+                    'error': 'Folder already being processed',
+                    'files_processed': 0,
+                    'segments_created': 0
+                }
+            
+            return self._re_index_folder(folder_path, folder_id, progress_callback)
+    
+    def _re_index_folder(self, folder_path: str, folder_id: str,
+                         progress_callback=None) -> Dict[str, Any]:
+        """
+        Detect changes (hashing on the worker pool), then apply them in
+        path order
+        """
         start_time = time.time()
         self.logger.info(f"Starting re-index of folder: {folder_path}")
         
-        # Reset stats
-        self.processing_stats = self._reset_stats()
+        stats = self._reset_stats()
         
         # Get folder info
         folder_record = self._get_folder_record(folder_id)
         if not folder_record:
             # First time indexing
-            return self.index_folder(folder_path, folder_id, progress_callback)
-            
+            return self._index_folder(folder_path, folder_id, progress_callback)
+        
         folder_db_id = folder_record['id']
         current_version = folder_record['current_version']
         new_version = current_version + 1
         
         # Detect changes with actual file comparison
-        changes = self._detect_changes_complete(folder_db_id, folder_path, progress_callback)
+        changes = self._detect_changes_complete(folder_db_id, folder_path, progress_callback, stats)
         self.logger.info(f"Detected {len(changes)} changes")
         
         # Process changes
         segments_to_upload = []
         
-        with ThreadPoolExecutor(max_workers=self.worker_threads) as executor:
-            futures = []
-            
-            for change in changes:
+        for change in changes:
+            try:
+                result = None
+                
                 if change.change_type == ChangeType.ADDED:
-                    future = executor.submit(
-                        self._index_file_complete,
+                    result = self._index_file_complete(
                         folder_db_id,
                         folder_id,
                         folder_path,
@@ -635,41 +765,39 @@ class VersionedCoreIndexSystem:
                         {
                             'size': change.new_size, 
                             'hash': change.new_hash,
+                            'modified': change.modified_at,
                             'full_path': os.path.join(folder_path, change.file_path)
                         },
-                        version=new_version
+                        version=new_version,
+                        segment_hashes=change.segment_hashes,
+                        stats=stats
                     )
-                    futures.append((change, future))
-                    
+                
                 elif change.change_type == ChangeType.MODIFIED:
-                    future = executor.submit(
-                        self._update_file_complete,
+                    result = self._update_file_complete(
                         folder_db_id,
                         folder_id,
                         folder_path,
                         change,
-                        new_version
+                        new_version,
+                        stats
                     )
-                    futures.append((change, future))
-                    
+                
                 elif change.change_type == ChangeType.DELETED:
-                    self._mark_file_deleted(folder_db_id, change.file_path, new_version)
-                    
-            # Collect results
-            for change, future in futures:
-                try:
-                    result = future.result()
-                    if result and 'segments' in result:
-                        segments_to_upload.extend(result['segments'])
-                        
-                except Exception as e:
-                    self.logger.error(f"Error processing change for {change.file_path}: {e}")
-                    with self.stats_lock:
-                        self.processing_stats['errors'].append({
-                            'file': change.file_path,
-                            'error': str(e)
-                        })
-                    
+                    self._mark_file_deleted(folder_db_id, change.file_path, new_version,
+                                            change.old_file_id)
+                
+                if result and 'segments' in result:
+                    segments_to_upload.extend(result['segments'])
+            
+            except Exception as e:
+                self.logger.error(f"Error processing change for {change.file_path}: {e}")
+                with self.stats_lock:
+                    stats['errors'].append({
+                        'file': change.file_path,
+                        'error': str(e)
+                    })
+        
         # Record changes in journal
         self._record_changes(folder_db_id, changes, new_version)
         
@@ -694,133 +822,281 @@ class VersionedCoreIndexSystem:
         result = {
             'success': True,
             'folder_id': folder_id,
+            'version': new_version,
             'previous_version': current_version,
             'new_version': new_version,
             'changes': change_summary,
+            'files_processed': stats['files_processed'],
+            'bytes_processed': stats['bytes_processed'],
+            'segments_created': stats['segments_created'],
+            'segments_reused': stats['segments_reused'],
             'segments_to_upload': len(segments_to_upload),
             'segments': segments_to_upload,
-            'errors': self.processing_stats['errors'],
+            'errors': stats['errors'],
             'elapsed_time': elapsed
         }
         
         self.logger.info(f"Re-indexing complete: {result}")
         return result
-        
+    
     def _detect_changes_complete(self, folder_db_id: int, folder_path: str,
-                                progress_callback=None) -> List[FileChange]:
+                                progress_callback=None,
+                                stats: Optional[Dict[str, Any]] = None) -> List[FileChange]:
         """
-        Detect changes with complete file comparison
+        Detect changes using stored file metadata and segment hashes
+        
+        Files whose size and modification time match the index are not
+        read at all. New files and files whose metadata moved are hashed
+        on the worker pool, segment by segment, and compared with the
+        stored segment hashes.
         """
+        stats = stats if stats is not None else self._reset_stats()
         changes = []
         
         # Get indexed files
         indexed_files = self._get_indexed_files(folder_db_id)
         indexed_by_path = {f.file_path: f for f in indexed_files}
         
-        # Scan current folder with actual hashing
-        current_files = self._scan_folder_full(folder_path, progress_callback)
+        # Scan current folder metadata only
+        current_files = self._scan_folder_metadata(folder_path, progress_callback)
+        
+        candidates = [
+            (file_path, current_files[file_path]['full_path'])
+            for file_path in sorted(current_files)
+            if file_path not in indexed_by_path
+            or not self._metadata_unchanged(indexed_by_path[file_path], current_files[file_path])
+        ]
         
         # Check for new and modified files
-        for file_path, file_info in current_files.items():
-            if file_path not in indexed_by_path:
+        for file_path, future in self._hash_files(candidates):
+            file_info = current_files[file_path]
+            
+            try:
+                file_hash, segment_hashes = future.result()
+            except OSError as e:
+                self.logger.warning(f"Error scanning file {file_info['full_path']}: {e}")
+                continue
+            
+            indexed = indexed_by_path.get(file_path)
+            
+            if indexed is None:
                 # New file
                 changes.append(FileChange(
                     file_path=file_path,
                     change_type=ChangeType.ADDED,
-                    new_hash=file_info['hash'],
+                    new_hash=file_hash,
                     new_size=file_info['size'],
-                    new_version=1
+                    new_version=1,
+                    modified_at=file_info['modified'],
+                    segment_hashes=segment_hashes
                 ))
-                with self.stats_lock:
-                    self.processing_stats['changes_detected'] += 1
+            
+            elif indexed.file_hash != file_hash:
+                # Modified file - detect which segments changed
+                segments_affected = self._detect_changed_segments(
+                    file_info['full_path'],
+                    indexed,
+                    segment_hashes
+                )
+                
+                changes.append(FileChange(
+                    file_path=file_path,
+                    change_type=ChangeType.MODIFIED,
+                    old_hash=indexed.file_hash,
+                    new_hash=file_hash,
+                    old_version=indexed.version,
+                    new_version=indexed.version + 1,
+                    old_size=indexed.file_size,
+                    new_size=file_info['size'],
+                    segments_affected=segments_affected,
+                    old_file_id=indexed.file_id,
+                    modified_at=file_info['modified'],
+                    segment_hashes=segment_hashes
+                ))
+            
             else:
-                indexed = indexed_by_path[file_path]
-                # Compare actual hashes
-                if indexed.file_hash != file_info['hash']:
-                    # Modified file - detect which segments changed
-                    segments_affected = self._detect_changed_segments(
-                        file_info['full_path'],
-                        indexed
-                    )
-                    
-                    changes.append(FileChange(
-                        file_path=file_path,
-                        change_type=ChangeType.MODIFIED,
-                        old_hash=indexed.file_hash,
-                        new_hash=file_info['hash'],
-                        old_version=indexed.version,
-                        new_version=indexed.version + 1,
-                        old_size=indexed.file_size,
-                        new_size=file_info['size'],
-                        segments_affected=segments_affected
-                    ))
-                    with self.stats_lock:
-                        self.processing_stats['changes_detected'] += 1
-                        
+                continue
+            
+            with self.stats_lock:
+                stats['changes_detected'] += 1
+        
         # Check for deleted files
-        for indexed_file in indexed_files:
+        for indexed_file in sorted(indexed_files, key=lambda f: f.file_path):
             if indexed_file.file_path not in current_files:
                 changes.append(FileChange(
                     file_path=indexed_file.file_path,
                     change_type=ChangeType.DELETED,
                     old_hash=indexed_file.file_hash,
                     old_version=indexed_file.version,
-                    old_size=indexed_file.file_size
+                    old_size=indexed_file.file_size,
+                    old_file_id=indexed_file.file_id
                 ))
                 with self.stats_lock:
-                    self.processing_stats['changes_detected'] += 1
-                    
-        return changes
+                    stats['changes_detected'] += 1
         
+        return changes
+    
     def _detect_changed_segments(self, file_path: str, 
-                                indexed_file: IndexedFile) -> List[int]:
+                                indexed_file: IndexedFile,
+                                segment_hashes: Optional[List[Tuple[str, int, int]]] = None) -> List[int]:
         """
         Detect which segments have changed in a modified file
+        Segments past the old end of the file count as changed
         """
-        changed_segments = []
-        
         try:
+            if segment_hashes is None:
+                _, segment_hashes = self.segment_processor.hash_segments(file_path)
+            
             # Get stored segment hashes
-            stored_segments = self.db.get_file_segments(indexed_file.file_id)
+            stored = {
+                seg['segment_index']: seg['segment_hash']
+                for seg in self.db.get_file_segments(indexed_file.file_id)
+                if not seg.get('redundancy_index')
+            }
             
-            # Compare each segment
-            with open(file_path, 'rb') as f:
-                for seg in stored_segments:
-                    f.seek(seg['segment_index'] * self.segment_size)
-                    segment_data = f.read(self.segment_size)
-                    
-                    if segment_data:
-                        current_hash = hashlib.sha256(segment_data).hexdigest()
-                        if current_hash != seg['segment_hash']:
-                            changed_segments.append(seg['segment_index'])
-                            
+            return [
+                index for index, (segment_hash, _, _) in enumerate(segment_hashes)
+                if stored.get(index) != segment_hash
+            ]
+        
         except Exception as e:
             self.logger.error(f"Error detecting changed segments: {e}")
             # If we can't detect, assume all changed
-            return list(range(indexed_file.segment_count))
-            
-        return changed_segments
-        
+            return list(range(len(segment_hashes) if segment_hashes else indexed_file.segment_count))
+    
     def _update_file_complete(self, folder_db_id: int, folder_id: str,
                             folder_path: str, change: FileChange, 
-                            new_version: int) -> Dict:
+                            new_version: int,
+                            stats: Optional[Dict[str, Any]] = None) -> Dict:
         """
         Update modified file with smart segment handling
-        Only creates new segments for changed parts
+        Only creates new segments for changed parts; unchanged segments
+        are carried into the new file version with their existing articles
         """
-        file_info = {
-            'hash': change.new_hash,
-            'size': change.new_size,
-            'full_path': os.path.join(folder_path, change.file_path)
-        }
+        stats = stats if stats is not None else self._reset_stats()
+        full_path = os.path.join(folder_path, change.file_path)
+        
+        segment_hashes = change.segment_hashes
+        if segment_hashes is None:
+            _, segment_hashes = self.segment_processor.hash_segments(full_path)
+        
+        changed = set(change.segments_affected if change.segments_affected is not None
+                      else range(len(segment_hashes)))
+        unchanged = [index for index in range(len(segment_hashes)) if index not in changed]
+        
+        file_id = self.db.add_file(
+            folder_db_id,
+            change.file_path,
+            change.new_hash,
+            change.new_size,
+            change.modified_at or datetime.now(),
+            new_version
+        )
         
-        # For now, create all new segments
-        # In a future optimization, could reuse unchanged segments
-        return self._index_file_complete(
-            folder_db_id, folder_id, folder_path,
-            change.file_path, file_info, new_version
+        # Unchanged segments keep their message IDs and upload state
+        if change.old_file_id and unchanged:
+            self._copy_segments(change.old_file_id, file_id, unchanged)
+        
+        segment_metadata = self._add_segments(
+            file_id, folder_id, new_version, segment_hashes, sorted(changed)
         )
         
+        self.db.update_file_segment_count(file_id, len(segment_hashes))
+        
+        with self.stats_lock:
+            stats['files_processed'] += 1
+            stats['bytes_processed'] += sum(m['segment_size'] for m in segment_metadata)
+            stats['segments_created'] += len(segment_metadata)
+            stats['segments_reused'] += len(unchanged)
+        
+        self.logger.info(f"{change.file_path}: {len(segment_metadata)} changed segments, "
+                         f"{len(unchanged)} reused")
+        
+        return {
+            'file_id': file_id,
+            'file_path': change.file_path,
+            'file_hash': change.new_hash,
+            'segments': segment_metadata,
+            'segments_reused': len(unchanged),
+            'size': change.new_size
+        }
+    
+    def _copy_segments(self, old_file_id: int, new_file_id: int, segment_indexes: List[int]):
+        """Copy segment rows (all redundancy copies) to a new file version"""
+        with self.db.pool.get_connection() as conn:
+            columns = [
+                row[1] for row in conn.execute("PRAGMA table_info(segments)").fetchall()
+                if row[1] not in ('id', 'file_id')
+            ]
+            column_list = ', '.join(f'"{column}"' for column in columns)
+            
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(segment_indexes), 500):
+                chunk = segment_indexes[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                conn.execute(f"""
+                    INSERT INTO segments (file_id, {column_list})
+                    SELECT ?, {column_list} FROM segments
+                    WHERE file_id = ? AND segment_index IN ({placeholders})
+                """, (new_file_id, old_file_id, *chunk))
+            
+            conn.commit()
+    
+    def _metadata_unchanged(self, indexed: IndexedFile, file_info: Dict) -> bool:
+        """Whether size and modification time match the indexed version"""
+        if indexed.file_size != file_info['size']:
+            return False
+        
+        last_modified = indexed.last_modified
+        if isinstance(last_modified, str):
+            try:
+                last_modified = datetime.fromisoformat(last_modified)
+            except ValueError:
+                return False
+        
+        return last_modified == file_info['modified']
+    
+    def _scan_folder_metadata(self, folder_path: str, progress_callback=None) -> Dict[str, Dict]:
+        """
+        Scan folder without reading file contents
+        """
+        files = {}
+        
+        for root, dirs, filenames in os.walk(folder_path):
+            # Skip hidden directories
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            
+            for filename in filenames:
+                # Skip hidden files and temporary files
+                if filename.startswith('.') or filename.startswith('~'):
+                    continue
+                
+                file_path = os.path.join(root, filename)
+                
+                try:
+                    stat = os.stat(file_path)
+                except OSError as e:
+                    self.logger.warning(f"Error scanning file {file_path}: {e}")
+                    continue
+                
+                # Skip empty files
+                if stat.st_size == 0:
+                    continue
+                
+                files[os.path.relpath(file_path, folder_path)] = {
+                    'size': stat.st_size,
+                    'modified': datetime.fromtimestamp(stat.st_mtime),
+                    'full_path': file_path
+                }
+                
+                if progress_callback and len(files) % 50 == 0:
+                    progress_callback({
+                        'phase': 'scanning',
+                        'files_scanned': len(files)
+                    })
+        
+        return files
+    
     def verify_file_segments(self, file_path: str, file_id: int) -> Dict[str, Any]:
         """
         Verify all segments of a file against stored hashes
@@ -842,9 +1118,9 @@ class VersionedCoreIndexSystem:
             if not is_valid:
                 verification_results['valid'] = False
                 verification_results['invalid_segments'].append(segment['segment_index'])
-                
-        return verification_results
         
+        return verification_results
+    
     # ... [Rest of the methods remain the same but ensure no simplified code] ...
     
     def _ensure_folder_exists(self, folder_id: str, folder_path: str) -> Dict:
@@ -859,19 +1135,27 @@ class VersionedCoreIndexSystem:
             )
             
             folder = self.db.get_folder(folder_id)
-            
-        return folder
         
+        return folder
+    
     def _get_folder_record(self, folder_id: str) -> Optional[Dict]:
         """Get folder record from database"""
         return self.db.get_folder(folder_id)
-        
+    
     def _get_indexed_files(self, folder_db_id: int) -> List[IndexedFile]:
-        """Get all indexed files for folder"""
+        """Get latest indexed version of each file in folder"""
         files = self.db.get_folder_files(folder_db_id)
         
-        indexed_files = []
+        latest = {}
         for row in files:
+            current = latest.get(row['file_path'])
+            if current is None or row['version'] > current['version']:
+                latest[row['file_path']] = row
+        
+        indexed_files = []
+        for row in latest.values():
+            if row['state'] == 'deleted':
+                continue
             indexed_files.append(IndexedFile(
                 file_id=row['id'],
                 file_path=row['file_path'],
@@ -882,19 +1166,32 @@ class VersionedCoreIndexSystem:
                 last_modified=row['modified_at'],
                 state=row['state']
             ))
-            
-        return indexed_files
         
+        return indexed_files
+    
     def _update_folder_stats(self, folder_db_id: int):
         """Update folder statistics"""
         self.db.update_folder_stats(folder_db_id)
+    
+    def _mark_file_deleted(self, folder_db_id: int, file_path: str, version: int,
+                           file_id: Optional[int] = None):
+        """
+        Mark the latest version of a file as deleted
+        Earlier versions share the path, so the row is picked by file_id
+        or by highest version, never by path alone
+        """
+        if file_id is None:
+            with self.db.pool.get_connection() as conn:
+                row = conn.execute("""
+                    SELECT id FROM files WHERE folder_id = ? AND file_path = ?
+                    ORDER BY version DESC LIMIT 1
+                """, (folder_db_id, file_path)).fetchone()
+            if not row:
+                return
+            file_id = row[0]
         
-    def _mark_file_deleted(self, folder_db_id: int, file_path: str, version: int):
-        """Mark file as deleted"""
-        file = self.db.get_file(folder_db_id, file_path)
-        if file:
-            self.db.update_file_state(file['id'], 'deleted')
-            
+        self.db.update_file_state(file_id, 'deleted')
+    
     def _record_changes(self, folder_db_id: int, changes: List[FileChange], version: int):
         """Record changes in journal"""
         for change in changes:
@@ -907,7 +1204,7 @@ class VersionedCoreIndexSystem:
                 change.old_hash,
                 change.new_hash
             )
-            
+    
     def _create_folder_version(self, folder_db_id: int, version: int, summary: str) -> int:
         """Create new folder version record"""
         change_data = {}
@@ -916,5 +1213,14 @@ class VersionedCoreIndexSystem:
                 change_data = json.loads(summary)
             except:
                 change_data = {'summary': summary}
-                
-        return self.db.create_folder_version(folder_db_id, version, change_data)
+        
+        version_id = self.db.create_folder_version(folder_db_id, version, change_data)
+        
+        # Next re-index builds on this version
+        with self.db.pool.get_connection() as conn:
+            conn.execute("""
+                UPDATE folders SET current_version = ? WHERE id = ?
+            """, (version, folder_db_id))
+            conn.commit()
+        
+        return version_id
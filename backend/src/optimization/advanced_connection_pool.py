@@ -47,10 +47,16 @@ class ConnectionStats:
 class AdvancedNNTPPool:
     """Advanced NNTP connection pool with health checking and automatic recovery"""
     
-    def __init__(self, config: dict, min_connections: int = 2, max_connections: int = 30):
+    def __init__(self, config: dict, min_connections: int = 2, max_connections: int = 30,
+                 tuner=None):
         self.config = config
         self.min_connections = min_connections
         self.max_connections = max_connections
+        # Optional UnifiedConnectionTuner; max_connections stays the hard cap
+        self.tuner = tuner
+        self.server_id = f"{config.get('hostname')}:{config.get('port', 119)}"
+        if tuner:
+            tuner.register_server(self.server_id, max_connections)
         self.pool = queue.Queue(maxsize=max_connections)
         self.active_connections = 0
         self.lock = threading.Lock()
@@ -81,17 +87,23 @@ class AdvancedNNTPPool:
             raise ImportError("NNTP module not available. Install pynntp or skip NNTP operations.")
             
         with self.lock:
-            if self.active_connections >= self.max_connections:
+            if self.active_connections >= self.connection_limit():
                 raise Exception("Maximum connections reached")
             
-            conn = NNTPClient(
-                host=self.config['hostname'],
-                port=self.config['port'],
-                username=self.config['username'],
-                password=self.config['password'],
-                use_ssl=self.config.get('use_ssl', True),
-                timeout=30
-            )
+            try:
+                conn = NNTPClient(
+                    host=self.config['hostname'],
+                    port=self.config['port'],
+                    username=self.config['username'],
+                    password=self.config['password'],
+                    use_ssl=self.config.get('use_ssl', True),
+                    timeout=30
+                )
+            except Exception as e:
+                if self.tuner:
+                    code = getattr(e, 'code', None) or str(e)[:3]
+                    self.tuner.record_rejection(self.server_id, str(code), self.active_connections)
+                raise
             
             # Track connection
             conn_id = id(conn)
@@ -105,11 +117,27 @@ class AdvancedNNTPPool:
             self.logger.debug(f"Created new NNTP connection (total: {self.active_connections})")
             return conn
     
+    def connection_limit(self) -> int:
+        """Current connection limit, tuned when a tuner is attached"""
+        if self.tuner:
+            return min(self.max_connections, self.tuner.get_limit(self.server_id))
+        return self.max_connections
+    
     @contextmanager
     def get_connection(self, timeout: float = 5.0):
-        """Get connection from pool with automatic return"""
+        """
+        Get connection from pool with automatic return
+        
+        With a tuner attached, each checkout is recorded on release with
+        the time the connection was in use and whether the caller's work
+        raised. The pool does not see payload sizes, so the tuner's
+        throughput counts completed checkouts.
+        """
         conn = None
         start_time = time.time()
+        used_from = None
+        ok = False
+        response_code = None
         
         try:
             # Try to get existing connection
@@ -129,13 +157,20 @@ class AdvancedNNTPPool:
                     self._close_connection(conn)
                     conn = self._create_connection()
             
+            used_from = time.time()
             yield conn
+            ok = True
             
         except Exception as e:
             self.stats.errors += 1
             self.logger.error(f"Connection pool error: {e}")
+            code = getattr(e, 'code', None)
+            response_code = str(code) if code else None
             raise
         finally:
+            if self.tuner and used_from is not None:
+                self.tuner.record(self.server_id, 1,
+                                  time.time() - used_from, ok, response_code)
             if conn:
                 # Return connection to pool
                 try:
@@ -224,6 +259,7 @@ class AdvancedNNTPPool:
         """Get pool statistics"""
         return {
             'active_connections': self.active_connections,
+            'connection_limit': self.connection_limit(),
             'pooled_connections': self.pool.qsize(),
             'connections_created': self.stats.created,
             'connections_reused': self.stats.reused,
@@ -338,7 +374,16 @@ class OptimizedDatabasePool:
 class ConnectionPoolManager:
     """Manage all connection pools with load balancing"""
     
-    def __init__(self):
+    def __init__(self, tuner=None):
+        """
+        Args:
+            tuner: UnifiedConnectionTuner shared by the NNTP pools
+                (default: a new tuner without persistence)
+        """
+        if tuner is None:
+            from unified.networking.autotuner import UnifiedConnectionTuner
+            tuner = UnifiedConnectionTuner()
+        self.tuner = tuner
         self.nntp_pools = {}
         self.db_pool = None
         self.logger = logger
@@ -348,7 +393,8 @@ class ConnectionPoolManager:
         pool = AdvancedNNTPPool(
             config,
             min_connections=2,
-            max_connections=config.get('max_connections', 30)
+            max_connections=config.get('max_connections', 30),
+            tuner=self.tuner
         )
         self.nntp_pools[server_name] = pool
         self.logger.info(f"Initialized NNTP pool for {server_name}")
@@ -370,7 +416,7 @@ class ConnectionPoolManager:
         min_load = float('inf')
         
         for name, pool in self.nntp_pools.items():
-            load = pool.active_connections / pool.max_connections
+            load = pool.active_connections / pool.connection_limit()
             if load < min_load:
                 min_load = load
                 best_pool = pool
@@ -381,7 +427,8 @@ class ConnectionPoolManager:
         """Get statistics for all pools"""
         stats = {
             'nntp_pools': {},
-            'database_pool': None
+            'database_pool': None,
+            'autotune': self.tuner.get_statistics()
         }
         
         for name, pool in self.nntp_pools.items():
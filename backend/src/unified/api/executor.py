@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Unified API Executor - Bounded worker pool for blocking handler work
+Keeps synchronous database calls off the event loop with timeouts and queue metrics
+"""
+
+import asyncio
+import dis
+import functools
+import inspect
+import threading
+import time
+import weakref
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+# Opcodes through which a coroutine can give control back to the loop
+SUSPENDING_OPCODES = frozenset({
+    'GET_AWAITABLE', 'GET_AITER', 'GET_ANEXT', 'BEFORE_ASYNC_WITH',
+    'SEND', 'YIELD_VALUE', 'END_ASYNC_FOR'
+})
+
+class ExecutorOverloaded(Exception):
+    """Raised when the executor queue is full"""
+
+def never_suspends(endpoint: Callable) -> bool:
+    """
+    Whether an async endpoint runs start to finish without awaiting
+    
+    Such a coroutine is synchronous code in async clothing: it can be
+    driven to completion on a worker thread instead of the event loop.
+    """
+    if not inspect.iscoroutinefunction(endpoint):
+        return False
+    return not any(i.opname in SUSPENDING_OPCODES for i in dis.get_instructions(endpoint))
+
+def inline(endpoint: Callable) -> Callable:
+    """Mark an endpoint to always run on the event loop"""
+    endpoint.inline = True
+    return endpoint
+
+def _complete(endpoint: Callable, args: tuple, kwargs: dict) -> Any:
+    """Run a non-suspending coroutine function to completion on this thread"""
+    coroutine = endpoint(*args, **kwargs)
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    coroutine.close()
+    raise RuntimeError(f"{endpoint.__name__} suspended on a worker thread")
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class DatabaseExecutor:
+    """
+    Bounded executor for blocking API work
+    
+    Each route may hold at most route_limit workers, so a burst of heavy
+    list or search requests always leaves workers free for everything
+    else. Requests wait at most timeout seconds (queueing included) and
+    are refused outright once queue_limit requests are waiting.
+    """
+    
+    def __init__(self, max_workers: int = 8, route_limit: Optional[int] = None,
+                 queue_limit: int = 256, timeout: float = 30.0):
+        """
+        Initialize executor
+        
+        Args:
+            max_workers: Worker threads (match the database pool size)
+            route_limit: Workers one route may occupy (default half)
+            queue_limit: Waiting requests before new ones get 503
+            timeout: Seconds a request may wait and run before 504
+        """
+        self.max_workers = max_workers
+        self.route_limit = route_limit or max(1, max_workers // 2)
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-db')
+        self._limiters = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._queue_waits = deque(maxlen=2048)
+        self._run_times = deque(maxlen=2048)
+        self._statistics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timeouts': 0
+        }
+    
+    def _limiter(self, route: Optional[str]) -> Optional[asyncio.Semaphore]:
+        """Per-route semaphore of the running loop"""
+        if route is None:
+            return None
+        limiters = self._limiters.setdefault(asyncio.get_running_loop(), {})
+        if route not in limiters:
+            limiters[route] = asyncio.Semaphore(self.route_limit)
+        return limiters[route]
+    
+    async def run(self, fn: Callable, *args, route: Optional[str] = None,
+                  timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking call on a worker thread
+        
+        Args:
+            fn: Blocking callable
+            route: Concurrency group (e.g. the route path)
+            timeout: Override of the default timeout
+        
+        Returns:
+            The call's result
+        
+        Raises:
+            ExecutorOverloaded: Too many requests already waiting
+            asyncio.TimeoutError: Not finished within the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._waiting >= self.queue_limit:
+                self._statistics['rejected'] += 1
+                raise ExecutorOverloaded(f"{self._waiting} requests waiting")
+            self._waiting += 1
+            self._statistics['submitted'] += 1
+        
+        enqueued = time.monotonic()
+        limiter = self._limiter(route)
+        submitted = False
+        try:
+            if limiter is not None:
+                await asyncio.wait_for(limiter.acquire(), timeout)
+            
+            try:
+                future = self._pool.submit(self._call, enqueued, fn, args, kwargs)
+            except RuntimeError:
+                # Shut down between acquire and submit
+                if limiter is not None:
+                    limiter.release()
+                raise
+            submitted = True
+            future.add_done_callback(functools.partial(self._finished, loop, limiter))
+            remaining = max(0.0, enqueued + timeout - time.monotonic())
+            return await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+        
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._statistics['timeouts'] += 1
+            raise
+        
+        finally:
+            if not submitted:
+                with self._lock:
+                    self._waiting -= 1
+    
+    def _call(self, enqueued: float, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        """Worker side: account queue wait and run time around the call"""
+        started = time.monotonic()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+            self._queue_waits.append(started - enqueued)
+        outcome = 'failed'
+        try:
+            result = fn(*args, **kwargs)
+            outcome = 'completed'
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._statistics[outcome] += 1
+                self._run_times.append(time.monotonic() - started)
+    
+    def _finished(self, loop: asyncio.AbstractEventLoop,
+                  limiter: Optional[asyncio.Semaphore], future):
+        """Release the route slot once the worker is really done"""
+        if future.cancelled():
+            # Timed out before a worker picked it up
+            with self._lock:
+                self._waiting -= 1
+        if limiter is not None:
+            try:
+                loop.call_soon_threadsafe(limiter.release)
+            except RuntimeError:
+                pass  # Loop closed
+    
+    def offload(self, endpoint: Callable, route: Optional[str] = None,
+                timeout: Optional[float] = None) -> Callable:
+        """
+        Wrap a non-suspending async endpoint to run on the executor
+        
+        The wrapper keeps the endpoint's signature, so FastAPI resolves
+        parameters exactly as before.
+        """
+        @functools.wraps(endpoint)
+        async def offloaded(*args, **kwargs):
+            try:
+                return await self.run(_complete, endpoint, args, kwargs,
+                                      route=route or endpoint.__name__, timeout=timeout)
+            except ExecutorOverloaded:
+                raise HTTPException(status_code=503, detail="Server busy",
+                                    headers={"Retry-After": "1"})
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Request timed out")
+        return offloaded
+    
+    def route_class(self) -> type:
+        """APIRoute that offloads every endpoint which never awaits"""
+        executor = self
+        
+        class OffloadedRoute(APIRoute):
+            def __init__(self, path: str, endpoint: Callable, **kwargs):
+                if never_suspends(endpoint) and not getattr(endpoint, 'inline', False):
+                    endpoint = executor.offload(endpoint, route=path)
+                super().__init__(path, endpoint, **kwargs)
+        
+        return OffloadedRoute
+    
+    def shutdown(self):
+        """Stop accepting work; running calls finish in the background"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get queueing and latency statistics"""
+        with self._lock:
+            waits = list(self._queue_waits)
+            runs = list(self._run_times)
+            return {
+                **self._statistics,
+                'workers': self.max_workers,
+                'route_limit': self.route_limit,
+                'active': self._active,
+                'waiting': self._waiting,
+                'queue_wait_ms': {
+                    'p50': round(_percentile(waits, 0.50) * 1000, 2),
+                    'p99': round(_percentile(waits, 0.99) * 1000, 2)
+                },
+                'run_ms': {
+                    'p50': round(_percentile(runs, 0.50) * 1000, 2),
+                    'p99': round(_percentile(runs, 0.99) * 1000, 2)
+                }
+            }
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Unified Response Cache - ETags and cached bodies for read-heavy endpoints
+Unchanged data is answered from memory, or with 304, without touching the database
+"""
+
+import re
+import time
+import hashlib
+import secrets
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Tuple, List
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Version-stamped response cache
+    
+    Each rule names the tables an endpoint reads. The ETag of a request
+    is derived from the path, query and the tables' write versions, so
+    it changes exactly when one of those tables does. Rules with max_age
+    also roll over every max_age seconds, for endpoints whose output
+    depends on the clock (expiry, "last 24 hours").
+    """
+    
+    def __init__(self, versions: Callable[[Tuple[str, ...]], Optional[Tuple[int, ...]]],
+                 max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Initialize response cache
+        
+        Args:
+            versions: Returns the write version of tables (None disables caching)
+            max_entries: Cached responses kept
+            max_bytes: Total cached body size
+        """
+        self.versions = versions
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.rules = []
+        self._epoch = secrets.token_hex(4)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._statistics = {
+            'not_modified': 0,
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+    
+    def add_rule(self, pattern: str, tables: Tuple[str, ...], max_age: Optional[float] = None):
+        """
+        Cache GET responses of paths matching pattern
+        
+        Args:
+            pattern: Regular expression matched against the whole path
+            tables: Every table the endpoint reads, including tables
+                written by triggers on them
+            max_age: Seconds after which the ETag changes regardless
+        """
+        self.rules.append((re.compile(pattern), tuple(tables), max_age))
+    
+    def etag(self, path: str, query: bytes, vary: bytes) -> Optional[str]:
+        """Current ETag for a request, or None when it is not cacheable"""
+        for pattern, tables, max_age in self.rules:
+            if pattern.fullmatch(path):
+                version = self.versions(tables)
+                if version is None:
+                    return None
+                if max_age:
+                    version += (int(time.time() // max_age),)
+                digest = hashlib.sha1(f"{self._epoch}|{path}|{version}".encode())
+                digest.update(query + b'|' + vary)
+                return f'"{digest.hexdigest()[:24]}"'
+        return None
+    
+    def get(self, etag: str) -> Optional[Tuple[List, bytes]]:
+        """Cached headers and body for an ETag"""
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self._statistics['misses'] += 1
+                return None
+            self._entries.move_to_end(etag)
+            self._statistics['hits'] += 1
+            return entry
+    
+    def put(self, etag: str, headers: List, body: bytes):
+        """Store a response; least recently used entries make room"""
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if etag in self._entries:
+                return
+            self._entries[etag] = (headers, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._statistics['evictions'] += 1
+    
+    def not_modified(self):
+        """Count a 304"""
+        with self._lock:
+            self._statistics['not_modified'] += 1
+    
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                **self._statistics,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'rules': len(self.rules)
+            }
+
+class CachingMiddleware:
+    """
+    ASGI middleware answering conditional and repeated GETs from a ResponseCache
+    
+    Matching requests whose If-None-Match carries the current ETag get a
+    304; otherwise a cached body for the ETag is replayed. Only on a miss
+    does the request reach the endpoint, whose 200 response is stored.
+    """
+    
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET':
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope['headers'])
+        etag = self.cache.etag(scope['path'], scope.get('query_string', b''),
+                               headers.get(b'authorization', b''))
+        if etag is None:
+            await self.app(scope, receive, send)
+            return
+        
+        validators = [(b'etag', etag.encode()), (b'cache-control', b'no-cache')]
+        requested = headers.get(b'if-none-match', b'').decode('latin-1')
+        if requested and (requested.strip() == '*' or etag in
+                          [tag.strip().removeprefix('W/') for tag in requested.split(',')]):
+            self.cache.not_modified()
+            await send({'type': 'http.response.start', 'status': 304, 'headers': validators})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        
+        cached = self.cache.get(etag)
+        if cached is not None:
+            stored, body = cached
+            await send({'type': 'http.response.start', 'status': 200, 'headers': stored})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+        
+        response = {'status': None, 'headers': None, 'body': []}
+        
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                if message['status'] == 200:
+                    message = dict(message)
+                    message['headers'] = [
+                        (k, v) for k, v in message.get('headers', [])
+                        if k.lower() not in (b'etag', b'cache-control')
+                    ] + validators
+                    response['headers'] = message['headers']
+            elif message['type'] == 'http.response.body' and response['headers'] is not None:
+                response['body'].append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    self.cache.put(etag, response['headers'], b''.join(response['body']))
+            await send(message)
+        
+        await self.app(scope, receive, capture)
@@ -4,12 +4,13 @@ Unified API Server - FastAPI server implementation
 Production-ready with async support and OpenAPI documentation
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
 from datetime import datetime
+import asyncio
 import logging
 import os
 import hashlib
@@ -19,8 +20,22 @@ import time
 import json
 from datetime import timedelta
 
+from ..monitoring.progress_bus import ProgressBus
+from ..monitoring.pipeline_profiler import pipeline_profiler
+from ..core.counters import UnifiedCounters
+from .executor import DatabaseExecutor, inline
+from .response_cache import ResponseCache, CachingMiddleware
+
 logger = logging.getLogger(__name__)
 
+# Monitoring metrics behind the monitoring endpoints' metric names; the
+# others keep a history of the values the endpoints served
+HISTORY_METRICS = {
+    'cpu_usage': 'system.cpu_usage',
+    'memory_usage': 'system.memory_percent',
+    'active_connections': 'system.connections',
+}
+
 class UnifiedAPIServer:
     """
     Unified API server using FastAPI
@@ -32,14 +47,36 @@ class UnifiedAPIServer:
         self.system = unified_system
         self.config = config or {}
         
+        # Workers publish progress here; clients subscribe instead of polling
+        self.progress_bus = getattr(unified_system, 'progress', None)
+        if not isinstance(self.progress_bus, ProgressBus):
+            self.progress_bus = ProgressBus()
+        
+        # Status endpoints read maintained counters instead of COUNT(*)
+        self._counters = None
+        
+        # Metric history (rollups in the system database)
+        self._metric_history = None
+        
+        # Handlers that never await run here, keeping the event loop free
+        self.db_executor = DatabaseExecutor(
+            max_workers=self.config.get('db_workers', 8),
+            queue_limit=self.config.get('db_queue_limit', 256),
+            timeout=self.config.get('request_timeout', 30.0)
+        )
+        
         # Create FastAPI app with lifespan
         @asynccontextmanager
         async def lifespan(app: FastAPI):
             # Startup
             logger.info("Starting Unified API Server")
+            self.metric_history()
             yield
             # Shutdown
             logger.info("Shutting down Unified API Server")
+            if self._metric_history:
+                self._metric_history.stop()
+            self.db_executor.shutdown()
             if self.system:
                 self.system.close()
         
@@ -49,6 +86,19 @@ class UnifiedAPIServer:
             version="1.0.0",
             lifespan=lifespan
         )
+        self.app.router.route_class = self.db_executor.route_class()
+        
+        # Read-heavy endpoints answer unchanged data with 304 or a cached body.
+        # Tables are everything the endpoint reads (files also writes folders).
+        self.response_cache = ResponseCache(self._write_version)
+        self.response_cache.add_rule(r"/api/v1/folders", ('folders', 'files', 'segments', 'shares'))
+        self.response_cache.add_rule(r"/api/v1/folders/[^/]+",
+                                     ('folders', 'files', 'segments', 'shares', 'upload_queue'))
+        self.response_cache.add_rule(r"/api/v1/shares(/[^/]+)?",
+                                     ('shares', 'folders', 'files', 'authorized_users', 'upload_queue'),
+                                     max_age=60)
+        self.response_cache.add_rule(r"/api/v1/indexing/stats", ('folders', 'files'), max_age=60)
+        self.app.add_middleware(CachingMiddleware, cache=self.response_cache)
         
         # Configure CORS
         self.app.add_middleware(
@@ -64,6 +114,33 @@ class UnifiedAPIServer:
         
         # WebSocket setup removed - not needed
     
+    def _write_version(self, tables):
+        """Write version of tables in the system database (None if unknown)"""
+        db = getattr(self.system, 'db', None)
+        if not hasattr(db, 'write_version'):
+            return None
+        return db.write_version(tables)
+    
+    def metric_history(self):
+        """
+        Monitoring system keeping metric history in the system database
+        
+        The system's own monitoring system if it has one, otherwise one
+        started on first use; None without a unified database.
+        """
+        from ..core.database import UnifiedDatabase
+        from ..monitoring_system import MonitoringSystem
+        
+        monitoring = getattr(self.system, 'monitoring', None)
+        if isinstance(monitoring, MonitoringSystem):
+            return monitoring
+        if not isinstance(getattr(self.system, 'db', None), UnifiedDatabase):
+            return None
+        if self._metric_history is None:
+            self._metric_history = MonitoringSystem(db=self.system.db)
+            self._metric_history.start(prometheus_port=0)
+        return self._metric_history
+    
     def _setup_routes(self):
         """Setup API routes"""
         
@@ -125,6 +202,31 @@ class UnifiedAPIServer:
                 }
             return {"status": "healthy"}
         
+        @self.app.get("/api/v1/database/executor")
+        @inline
+        async def get_executor_status():
+            """Queueing and latency of the handler executor"""
+            return self.db_executor.get_statistics()
+        
+        @self.app.get("/api/v1/cache/responses")
+        @inline
+        async def get_response_cache_status():
+            """Response cache hit, 304 and eviction counts"""
+            return self.response_cache.get_statistics()
+        
+        @self.app.get("/api/v1/monitoring/pipeline")
+        @inline
+        async def get_pipeline_profile():
+            """Per-stage throughput and latency of the segment pipeline"""
+            return pipeline_profiler.get_statistics()
+        
+        @self.app.get("/metrics")
+        @inline
+        async def get_prometheus_metrics():
+            """Segment pipeline stage metrics in the Prometheus text format"""
+            return PlainTextResponse('\n'.join(pipeline_profiler.prometheus_lines()) + '\n',
+                                     media_type='text/plain; version=0.0.4')
+        
         @self.app.get("/api/v1/license/status")
         async def get_license_status():
             """Get license status from configuration"""
@@ -433,16 +535,115 @@ class UnifiedAPIServer:
         async def save_server_config(request: dict):
             """Save server configuration"""
         
+        def stat_counters() -> Optional[UnifiedCounters]:
+            """Materialized counters of the system database, installed on first use"""
+            counters = getattr(self.system, 'counters', None)
+            if isinstance(counters, UnifiedCounters):
+                return counters
+            if getattr(self.system, 'db', None) is None:
+                return None
+            if self._counters is None:
+                self._counters = UnifiedCounters(self.system.db)
+                self._counters.install()
+            return self._counters
+        
+        def history_metric(history, metric_name: str, current_value: float) -> str:
+            """Monitoring metric behind an endpoint metric, recording the served value if it has none"""
+            name = HISTORY_METRICS.get(metric_name)
+            if name is None:
+                name = f'api.{metric_name}'
+                history.record_metric(name, current_value)
+            return name
+        
+        def history_point(point: Dict[str, Any]) -> Dict[str, Any]:
+            """Chart point of a raw point, or of a rollup bucket (its average)"""
+            return {
+                "timestamp": datetime.fromtimestamp(point['timestamp']).isoformat(),
+                "value": round(point['avg'] if 'avg' in point else point['value'], 2)
+            }
+        
+        def progress_subscription(ids: Optional[str], kinds: Optional[str], max_rate: float):
+            """Bus subscription from comma-separated query filters"""
+            return self.progress_bus.subscribe(
+                ids=ids.split(',') if ids else None,
+                kinds=kinds.split(',') if kinds else None,
+                max_rate=min(max(max_rate, 0.5), 20.0)
+            )
+        
+        def progress_snapshot(subscription) -> Dict[str, Any]:
+            """Current state of the operations a subscriber follows"""
+            return {pid: state for pid, state in self.progress_bus.snapshot().items()
+                    if subscription.matches(pid, state)}
+        
+        def progress_event_stream(request: Request, subscription) -> StreamingResponse:
+            """Server-sent events: a snapshot, then coalesced deltas"""
+            def event(name: str, data: Dict[str, Any]) -> str:
+                return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+            
+            async def events():
+                try:
+                    yield event('snapshot', progress_snapshot(subscription))
+                    async for batch in subscription.deltas():
+                        if await request.is_disconnected():
+                            break
+                        yield event('progress', batch) if batch else ": keepalive\n\n"
+                finally:
+                    subscription.close()
+            
+            return StreamingResponse(events(), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        
+        @self.app.get("/api/v1/progress/stream")
+        async def stream_progress(request: Request, ids: Optional[str] = None,
+                                  type: Optional[str] = None, max_rate: float = 4.0):
+            """
+            Stream progress as server-sent events
+            
+            Replaces polling /api/v1/progress/{id}: deltas come from the
+            in-process progress bus, coalesced to at most max_rate per second.
+            """
+            return progress_event_stream(request, progress_subscription(ids, type, max_rate))
+        
+        @self.app.get("/api/v1/events/transfers/stream")
+        async def stream_transfer_events(request: Request, type: Optional[str] = None,
+                                         max_rate: float = 4.0):
+            """Stream upload and download progress as server-sent events"""
+            return progress_event_stream(request, progress_subscription(None, type or 'upload,download', max_rate))
+        
+        @self.app.websocket("/ws/progress")
+        async def progress_websocket(websocket: WebSocket, ids: Optional[str] = None,
+                                     type: Optional[str] = None, max_rate: float = 4.0):
+            """Progress snapshot then coalesced deltas over a WebSocket"""
+            await websocket.accept()
+            subscription = progress_subscription(ids, type, max_rate)
+            
+            async def watch_disconnect():
+                # Ends the delta loop as soon as the client goes away
+                try:
+                    while (await websocket.receive())['type'] != 'websocket.disconnect':
+                        pass
+                finally:
+                    subscription.close()
+            
+            watcher = asyncio.create_task(watch_disconnect())
+            try:
+                await websocket.send_json({"event": "snapshot", "operations": progress_snapshot(subscription)})
+                async for batch in subscription.deltas():
+                    await websocket.send_json({"event": "progress" if batch else "heartbeat",
+                                               "operations": batch})
+            except WebSocketDisconnect:
+                pass
+            finally:
+                watcher.cancel()
+                subscription.close()
+        
         @self.app.get("/api/v1/progress/{progress_id}")
         async def get_progress(progress_id: str):
             """Get detailed progress for a specific operation"""
             from datetime import datetime
             
-            if not hasattr(self.app.state, 'progress'):
-                self.app.state.progress = {}
-            
-            # First check in-memory progress
-            progress = self.app.state.progress.get(progress_id)
+            # First check the progress bus
+            progress = self.progress_bus.get(progress_id)
             if progress:
                 # Add timestamp if not present
                 if 'timestamp' not in progress:
@@ -651,26 +852,10 @@ class UnifiedAPIServer:
         @self.app.get("/api/v1/progress")
         async def get_all_progress():
             """Get all active progress operations"""
-            if not hasattr(self.app.state, 'progress'):
-                self.app.state.progress = {}
-            
-            # Clean up completed operations older than 5 minutes
-            import time
             from datetime import datetime
-            current_time = time.time()
-            to_remove = []
-            for pid, prog in self.app.state.progress.items():
-                if prog.get('status') == 'completed':
-                    # Extract timestamp from progress_id
-                    try:
-                        timestamp = float(pid.split('_')[-1])
-                        if current_time - timestamp > 300:  # 5 minutes
-                            to_remove.append(pid)
-                    except:
-                        pass
             
-            for pid in to_remove:
-                del self.app.state.progress[pid]
+            # Finished operations expire from the bus after its retention period
+            published = self.progress_bus.snapshot()
             
             # Also get active operations from database
             active_operations = []
@@ -758,7 +943,7 @@ class UnifiedAPIServer:
             all_progress = {}
             
             # Add in-memory progress
-            for pid, prog in self.app.state.progress.items():
+            for pid, prog in published.items():
                 all_progress[pid] = prog
             
             # Add database operations
@@ -1535,6 +1720,41 @@ class UnifiedAPIServer:
                 logger.error(f"Failed to get download progress: {e}")
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @self.app.post("/api/v1/download/availability/{share_id}")
+        async def scan_download_availability(share_id: str, connections_per_server: Optional[int] = None,
+                                             include_segments: bool = False):
+            """Run pre-flight STAT availability scan for a share"""
+            if not self.system:
+                raise HTTPException(status_code=503, detail="System not initialized")
+            
+            try:
+                scan = self.system.scan_share_availability(share_id, connections_per_server)
+                if not include_segments:
+                    scan = {k: v for k, v in scan.items() if k != 'segments'}
+                return scan
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except Exception as e:
+                logger.error(f"Failed to scan share availability: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+        
+        @self.app.get("/api/v1/download/availability/{share_id}")
+        async def get_download_availability(share_id: str, include_segments: bool = False):
+            """Get last availability scan and download plan for a share"""
+            if not self.system:
+                raise HTTPException(status_code=503, detail="System not initialized")
+            
+            try:
+                scan = self.system.get_share_availability(share_id)
+                if not include_segments:
+                    scan = {k: v for k, v in scan.items() if k != 'segments'}
+                return scan
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            except Exception as e:
+                logger.error(f"Failed to get share availability: {e}")
+                raise HTTPException(status_code=500, detail=str(e))
+        
         @self.app.get("/api/v1/indexing/version/{file_hash}")
         async def get_file_version(file_hash: str):
             """
@@ -2265,39 +2485,24 @@ class UnifiedAPIServer:
                     "articles_downloaded": 0
                 }
                 
-                if self.system.db:
-                    # Posts in last minute
-                    posts_minute = self.system.db.fetch_one(
-                        "SELECT COUNT(*) as count FROM upload_queue WHERE started_at >= ?",
-                        (one_minute_ago.isoformat(),)
-                    )
-                    if posts_minute:
-                        usage_stats["posts_last_minute"] = posts_minute['count']
-                    
-                    # Posts in last hour
-                    posts_hour = self.system.db.fetch_one(
-                        "SELECT COUNT(*) as count FROM upload_queue WHERE started_at >= ?",
-                        (one_hour_ago.isoformat(),)
-                    )
-                    if posts_hour:
-                        usage_stats["posts_last_hour"] = posts_hour['count']
+                counters = stat_counters()
+                if counters:
+                    # Sliding windows over maintained per-bucket event counts
+                    usage_stats["posts_last_minute"] = round(
+                        counters.window_count('upload_queue.started', one_minute_ago))
+                    usage_stats["posts_last_hour"] = round(
+                        counters.window_count('upload_queue.started', one_hour_ago))
                     
                     # Active connections
-                    connections = self.system.db.fetch_one(
-                        """SELECT 
-                           (SELECT COUNT(*) FROM upload_queue WHERE state = 'uploading') +
-                           (SELECT COUNT(*) FROM download_queue WHERE state = 'downloading') as count"""
+                    usage_stats["active_connections"] = (
+                        counters.value_counts('upload_queue').get('uploading', 0) +
+                        counters.value_counts('download_queue').get('downloading', 0)
                     )
-                    if connections:
-                        usage_stats["active_connections"] = connections['count']
                     
                     # Articles downloaded today
-                    articles = self.system.db.fetch_one(
-                        """SELECT COUNT(*) as count FROM download_queue 
-                           WHERE started_at >= date('now', 'start of day')"""
-                    )
-                    if articles:
-                        usage_stats["articles_downloaded"] = articles['count']
+                    start_of_day = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+                    usage_stats["articles_downloaded"] = round(
+                        counters.window_count('download_queue.started', start_of_day))
                 
                 # Get bandwidth usage if available
                 if hasattr(self.system, 'bandwidth_controller'):
@@ -4894,12 +5099,8 @@ class UnifiedAPIServer:
                         encryption=self.system.encryption if hasattr(self.system, 'encryption') else None
                     )
                     
-                    # Create core index with segment information
-                    core_index = workflow.create_core_index(share_id, folder_id)
-                    
-                    # Encrypt and post to Usenet
-                    encrypted_index = workflow.encrypt_core_index(core_index, share_id)
-                    core_index_message_id = workflow.post_core_index_to_usenet(encrypted_index, share_id)
+                    # Create, encrypt and post core index (paged for large shares)
+                    core_index_message_id = workflow.publish_core_index(share_id, folder_id)
                     
                     logger.info(f"Posted core index to Usenet: {core_index_message_id}")
                     
@@ -6501,86 +6702,33 @@ class UnifiedAPIServer:
                     }
                 }
                 
-                # Database statistics
-                db_stats = {}
-                tables = ['folders', 'files', 'segments', 'shares', 'users',
-                         'upload_queue', 'download_queue', 'alerts', 'network_servers']
+                # Database statistics from maintained counters
+                counters = stat_counters()
+                db_stats = counters.table_counts()
+                upload_states = counters.value_counts('upload_queue')
+                download_states = counters.value_counts('download_queue')
                 
-                for table in tables:
-                    try:
-                        count = self.system.db.fetch_one(f"SELECT COUNT(*) as count FROM {table}")
-                        db_stats[table] = count['count'] if count else 0
-                    except:
-                        db_stats[table] = 0
+                # Today's completed/failed operations
+                today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
                 
-                # Active operations
-                active_uploads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM upload_queue WHERE state IN ('queued', 'uploading')"
-                )
-                active_downloads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM download_queue WHERE state IN ('queued', 'downloading')"
-                )
+                def finished_today(window: str, state: str) -> int:
+                    return round(counters.window_count(window, today_start, group=state))
                 
                 operations = {
                     "uploads": {
-                        "active": active_uploads['count'] if active_uploads else 0,
-                        "queued": 0,
-                        "completed_today": 0,
-                        "failed_today": 0
+                        "active": upload_states.get('queued', 0) + upload_states.get('uploading', 0),
+                        "queued": upload_states.get('queued', 0),
+                        "completed_today": finished_today('upload_queue.finished', 'completed'),
+                        "failed_today": finished_today('upload_queue.finished', 'failed')
                     },
                     "downloads": {
-                        "active": active_downloads['count'] if active_downloads else 0,
-                        "queued": 0,
-                        "completed_today": 0,
-                        "failed_today": 0
+                        "active": download_states.get('queued', 0) + download_states.get('downloading', 0),
+                        "queued": download_states.get('queued', 0),
+                        "completed_today": finished_today('download_queue.finished', 'completed'),
+                        "failed_today": finished_today('download_queue.finished', 'failed')
                     }
                 }
                 
-                # Get today's completed/failed operations
-                today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                completed_uploads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM upload_queue WHERE state = 'completed' AND completed_at >= ?",
-                    (today_start.isoformat(),)
-                )
-                if completed_uploads:
-                    operations["uploads"]["completed_today"] = completed_uploads['count']
-                
-                failed_uploads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM upload_queue WHERE state = 'failed' AND completed_at >= ?",
-                    (today_start.isoformat(),)
-                )
-                if failed_uploads:
-                    operations["uploads"]["failed_today"] = failed_uploads['count']
-                
-                # Get today's completed/failed downloads
-                completed_downloads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM download_queue WHERE state = 'completed' AND completed_at >= ?",
-                    (today_start.isoformat(),)
-                )
-                if completed_downloads:
-                    operations["downloads"]["completed_today"] = completed_downloads['count']
-                
-                failed_downloads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM download_queue WHERE state = 'failed' AND completed_at >= ?",
-                    (today_start.isoformat(),)
-                )
-                if failed_downloads:
-                    operations["downloads"]["failed_today"] = failed_downloads['count']
-                
-                # Get queued operations
-                queued_uploads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM upload_queue WHERE state = 'queued'"
-                )
-                if queued_uploads:
-                    operations["uploads"]["queued"] = queued_uploads['count']
-                
-                queued_downloads = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM download_queue WHERE state = 'queued'"
-                )
-                if queued_downloads:
-                    operations["downloads"]["queued"] = queued_downloads['count']
-                
                 # Recent alerts
                 recent_alerts = self.system.db.fetch_all(
                     "SELECT alert_id, name, severity, last_triggered FROM alerts WHERE enabled = 1 ORDER BY last_triggered DESC LIMIT 5"
@@ -6592,11 +6740,7 @@ class UnifiedAPIServer:
                     "recent": []
                 }
                 
-                enabled_alerts = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM alerts WHERE enabled = 1"
-                )
-                if enabled_alerts:
-                    alerts_summary["enabled"] = enabled_alerts['count']
+                alerts_summary["enabled"] = counters.value_counts('alerts').get('1', 0)
                 
                 if recent_alerts:
                     for alert in recent_alerts:
@@ -6622,12 +6766,9 @@ class UnifiedAPIServer:
                 }
                 
                 # Check server health
-                healthy_servers = self.system.db.fetch_one(
-                    "SELECT COUNT(*) as count FROM network_servers WHERE enabled = 1"
-                )
-                if healthy_servers:
-                    network_status["servers"]["healthy"] = healthy_servers['count']
-                    network_status["servers"]["unhealthy"] = network_status["servers"]["total"] - healthy_servers['count']
+                healthy_servers = counters.value_counts('network_servers').get('1', 0)
+                network_status["servers"]["healthy"] = healthy_servers
+                network_status["servers"]["unhealthy"] = network_status["servers"]["total"] - healthy_servers
                 
                 # Overall system health
                 overall_health = "healthy"
@@ -6780,22 +6921,32 @@ class UnifiedAPIServer:
                         current_value = 100  # No operations means no failures
                     unit = "percent"
                 
-                # Generate historical data points from REAL data
-                # We don't have a metrics history table yet, so we can only provide current value
+                # History from the monitoring rollups; long periods read
+                # hourly or daily buckets instead of raw points
                 data_points = []
+                summary = {}
+                history = self.metric_history()
+                if history:
+                    name = history_metric(history, metric_name, current_value)
+                    series = history.get_metric_range(name, start_time, end_time)
+                    data_points = [history_point(p) for p in series['points']]
+                    summary = history.get_metric_stats(name, period_hours * 3600)
+                
+                if not data_points:
+                    data_points.append({
+                        "timestamp": end_time.isoformat(),
+                        "value": round(current_value, 2)
+                    })
                 
-                # For now, we only have the current real value
-                # Historical data would require a metrics collection system
-                data_points.append({
-                    "timestamp": end_time.isoformat(),
-                    "value": round(current_value, 2)
-                })
-                
-                # Note: Historical metrics require implementing a metrics collection system
-                # that periodically stores metric values to a database table
-                
-                # Calculate statistics
                 values = [p['value'] for p in data_points]
+                if not summary:
+                    summary = {
+                        "min": min(values),
+                        "max": max(values),
+                        "mean": sum(values) / len(values),
+                        "median": sorted(values)[len(values) // 2],
+                        "stddev": (sum((x - sum(values)/len(values))**2 for x in values) / len(values))**0.5
+                    }
                 
                 stats = {
                     "metric_name": metric_name,
@@ -6805,18 +6956,15 @@ class UnifiedAPIServer:
                     "end_time": end_time.isoformat(),
                     "current_value": round(current_value, 2),
                     "statistics": {
-                        "min": round(min(values), 2),
-                        "max": round(max(values), 2),
-                        "average": round(sum(values) / len(values), 2),
-                        "median": round(sorted(values)[len(values) // 2], 2),
-                        "std_dev": round(
-                            (sum((x - sum(values)/len(values))**2 for x in values) / len(values))**0.5, 
-                            2
-                        ) if len(values) > 1 else 0,
+                        "min": round(summary['min'], 2),
+                        "max": round(summary['max'], 2),
+                        "average": round(summary['mean'], 2),
+                        "median": round(summary['median'], 2),
+                        "std_dev": round(summary['stddev'], 2),
                         "data_points": len(data_points)
                     },
-                    "trend": "unknown",  # No historical data to calculate trend
-                    "data": data_points  # Return available data points
+                    "trend": "unknown",
+                    "data": data_points
                 }
                 
                 # Determine trend
@@ -6882,8 +7030,6 @@ class UnifiedAPIServer:
                     raise HTTPException(status_code=400, detail="start_time must be before end_time")
                 
                 time_range_seconds = (end_dt - start_dt).total_seconds()
-                if time_range_seconds > 86400:  # More than 24 hours
-                    raise HTTPException(status_code=400, detail="Time range cannot exceed 24 hours")
                 
                 # Calculate number of data points
                 num_points = min(int(time_range_seconds / interval_seconds), limit)
@@ -6915,9 +7061,9 @@ class UnifiedAPIServer:
                 for i in range(num_points):
                     timestamp = start_dt + timedelta(seconds=actual_interval * i)
                     
-                    # Only provide current real values - we don't have historical data
+                    # Only the current value is measured here; history comes from the rollups
                     if i != num_points - 1:
-                        continue  # Skip historical points we don't have
+                        continue
                     
                     # Get REAL current value
                     if metric_name == 'cpu_usage':
@@ -7012,6 +7158,17 @@ class UnifiedAPIServer:
                         "unit": unit
                     })
                 
+                # History from the monitoring rollups; ranges past the raw
+                # points read 1-minute, hourly or daily buckets
+                resolution = 0
+                history = self.metric_history()
+                if history and values:
+                    name = history_metric(history, metric_name, values[-1]['value'])
+                    series = history.get_metric_range(name, start_dt, end_dt, points=num_points)
+                    resolution = series['resolution']
+                    if series['points']:
+                        values = [dict(history_point(p), unit=unit) for p in series['points']]
+                
                 # Add metadata
                 metadata = {
                     "metric_name": metric_name,
@@ -7021,7 +7178,8 @@ class UnifiedAPIServer:
                     "end_time": end_dt.isoformat(),
                     "interval_seconds": interval_seconds,
                     "data_points": len(values),
-                    "aggregation": "raw",  # Could be avg, sum, max, min in production
+                    "aggregation": "avg" if resolution else "raw",
+                    "resolution_seconds": resolution,
                     "source": "system" if metric_name in ['cpu_usage', 'memory_usage', 'disk_usage'] else "application"
                 }
                 
@@ -7089,13 +7247,8 @@ class UnifiedAPIServer:
                                 database_status["size_mb"] = round(db_size / (1024 * 1024), 2)
                             
                             # Get table counts
-                            table_counts = {}
-                            for table in ['folders', 'files', 'segments', 'shares', 'users']:
-                                try:
-                                    count = self.system.db.fetch_one(f"SELECT COUNT(*) as count FROM {table}")
-                                    table_counts[table] = count['count'] if count else 0
-                                except:
-                                    table_counts[table] = 0
+                            table_counts = stat_counters().table_counts(
+                                ['folders', 'files', 'segments', 'shares', 'users'])
                             database_status["record_counts"] = table_counts
                             database_status["total_records"] = sum(table_counts.values())
                     except Exception as e:
@@ -7387,7 +7540,9 @@ class UnifiedAPIServer:
                 from datetime import datetime
                 
                 # Initialize bandwidth controller if not exists
-                if not hasattr(self.system, 'bandwidth_controller'):
+                if hasattr(self.system, 'get_bandwidth_controller'):
+                    self.system.get_bandwidth_controller()
+                elif not hasattr(self.system, 'bandwidth_controller'):
                     from unified.networking.bandwidth import UnifiedBandwidth
                     self.system.bandwidth_controller = UnifiedBandwidth()
                 
@@ -7419,7 +7574,7 @@ class UnifiedAPIServer:
                         },
                         "limits": {
                             "upload_limit_mbps": self.system.bandwidth_controller.max_rate_mbps if hasattr(self.system.bandwidth_controller, 'max_rate_mbps') else None,
-                            "download_limit_mbps": None  # Download limiting not implemented
+                            "download_limit_mbps": getattr(self.system.bandwidth_controller, 'download_rate_mbps', None)
                         },
                         "active_transfers": {
                             "uploads": 0,
@@ -7503,7 +7658,9 @@ class UnifiedAPIServer:
                         "upload_mbps": round(upload_mbps, 2),
                         "download_mbps": round(download_mbps, 2),
                         "total_mbps": round(upload_mbps + download_mbps, 2),
-                        "controller_rate_mbps": round(controller_rate, 2)
+                        "controller_rate_mbps": round(controller_rate, 2),
+                        "controller_upload_mbps": round(self.system.bandwidth_controller.get_current_rate('upload'), 2),
+                        "controller_download_mbps": round(self.system.bandwidth_controller.get_current_rate('download'), 2)
                     },
                     "cumulative": {
                         "bytes_sent": net_io.bytes_sent,
@@ -7517,8 +7674,9 @@ class UnifiedAPIServer:
                     },
                     "limits": {
                         "upload_limit_mbps": self.system.bandwidth_controller.max_rate_mbps if hasattr(self.system.bandwidth_controller, 'max_rate_mbps') else None,
-                        "download_limit_mbps": None  # Download limiting not implemented
+                        "download_limit_mbps": getattr(self.system.bandwidth_controller, 'download_rate_mbps', None)
                     },
+                    "shaper": self.system.bandwidth_controller.get_statistics(),
                     "active_transfers": {
                         "uploads": active_uploads,
                         "downloads": active_downloads
@@ -9557,20 +9715,12 @@ class UnifiedAPIServer:
                         test = self.system.db.fetch_one("SELECT 1 as test")
                         
                         # Get database statistics
-                        folder_count = self.system.db.fetch_one("SELECT COUNT(*) as count FROM folders")
-                        file_count = self.system.db.fetch_one("SELECT COUNT(*) as count FROM files")
-                        segment_count = self.system.db.fetch_one("SELECT COUNT(*) as count FROM segments")
-                        share_count = self.system.db.fetch_one("SELECT COUNT(*) as count FROM shares")
+                        counts = stat_counters().table_counts(['folders', 'files', 'segments', 'shares'])
                         
                         status["database"] = {
                             "connected": True,
                             "type": "sqlite",
-                            "statistics": {
-                                "folders": folder_count['count'] if folder_count else 0,
-                                "files": file_count['count'] if file_count else 0,
-                                "segments": segment_count['count'] if segment_count else 0,
-                                "shares": share_count['count'] if share_count else 0
-                            }
+                            "statistics": counts
                         }
                     except Exception as e:
                         status["database"] = {
@@ -9625,43 +9775,21 @@ class UnifiedAPIServer:
                 # Queue statistics
                 if self.system and self.system.db:
                     try:
-                        # Upload queue
-                        upload_stats = self.system.db.fetch_one(
-                            """SELECT 
-                               COUNT(*) as total,
-                               SUM(CASE WHEN state = 'pending' THEN 1 ELSE 0 END) as pending,
-                               SUM(CASE WHEN state = 'uploading' THEN 1 ELSE 0 END) as active,
-                               SUM(CASE WHEN state = 'completed' THEN 1 ELSE 0 END) as completed,
-                               SUM(CASE WHEN state = 'failed' THEN 1 ELSE 0 END) as failed
-                               FROM upload_queue"""
-                        )
+                        counters = stat_counters()
                         
-                        # Download queue
-                        download_stats = self.system.db.fetch_one(
-                            """SELECT 
-                               COUNT(*) as total,
-                               SUM(CASE WHEN state = 'pending' THEN 1 ELSE 0 END) as pending,
-                               SUM(CASE WHEN state = 'downloading' THEN 1 ELSE 0 END) as active,
-                               SUM(CASE WHEN state = 'completed' THEN 1 ELSE 0 END) as completed,
-                               SUM(CASE WHEN state = 'failed' THEN 1 ELSE 0 END) as failed
-                               FROM download_queue"""
-                        )
+                        def queue_stats(table: str, active: str) -> Dict[str, int]:
+                            states = counters.value_counts(table)
+                            return {
+                                "total": counters.table_count(table),
+                                "pending": states.get('pending', 0),
+                                "active": states.get(active, 0),
+                                "completed": states.get('completed', 0),
+                                "failed": states.get('failed', 0)
+                            }
                         
                         status["queues"] = {
-                            "upload": {
-                                "total": upload_stats['total'] if upload_stats else 0,
-                                "pending": upload_stats['pending'] if upload_stats and upload_stats['pending'] else 0,
-                                "active": upload_stats['active'] if upload_stats and upload_stats['active'] else 0,
-                                "completed": upload_stats['completed'] if upload_stats and upload_stats['completed'] else 0,
-                                "failed": upload_stats['failed'] if upload_stats and upload_stats['failed'] else 0
-                            },
-                            "download": {
-                                "total": download_stats['total'] if download_stats else 0,
-                                "pending": download_stats['pending'] if download_stats and download_stats['pending'] else 0,
-                                "active": download_stats['active'] if download_stats and download_stats['active'] else 0,
-                                "completed": download_stats['completed'] if download_stats and download_stats['completed'] else 0,
-                                "failed": download_stats['failed'] if download_stats and download_stats['failed'] else 0
-                            }
+                            "upload": queue_stats('upload_queue', 'uploading'),
+                            "download": queue_stats('download_queue', 'downloading')
                         }
                         
                         # Check for active operations
@@ -127,7 +127,7 @@ async def startup_event():
         unified_system = UnifiedSystem('sqlite', path='/data/usenetsync.db')
     
     # Initialize monitoring
-    monitoring = MonitoringSystem()
+    monitoring = MonitoringSystem(db=unified_system.db_manager.unified_database())
     monitoring.start(prometheus_port=9090)
     
     logger.info("API server initialized")
@@ -443,7 +443,8 @@ def system_status(ctx):
 @click.pass_context
 def system_monitor(ctx, interval):
     """Real-time system monitoring"""
-    monitoring = MonitoringSystem()
+    system = ctx.obj['system']
+    monitoring = MonitoringSystem(db=system.db_manager.unified_database())
     monitoring.start(prometheus_port=0)
     
     try:
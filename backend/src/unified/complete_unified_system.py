@@ -69,8 +69,9 @@ class CompleteUnifiedSystem:
         self.indexer = UnifiedIndexingSystem(self.db_manager)
         self.publisher = UnifiedPublishingSystem(self.db_manager)
         
-        # Initialize monitoring
-        self.monitoring = MonitoringSystem()
+        # Initialize monitoring; its loop flushes the metric rollups
+        self.monitoring = MonitoringSystem(db=self.db_manager.unified_database())
+        self.monitoring.start(prometheus_port=0)
         
         # Initialize backup system
         self.backup_system = BackupRecoverySystem(
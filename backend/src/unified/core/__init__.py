@@ -8,10 +8,12 @@ from .schema import UnifiedSchema
 from .models import *
 from .config import UnifiedConfig
 from .migrations import UnifiedMigrations
+from .counters import UnifiedCounters
 
 __all__ = [
     'UnifiedDatabase',
     'UnifiedSchema',
     'UnifiedConfig',
-    'UnifiedMigrations'
+    'UnifiedMigrations',
+    'UnifiedCounters'
 ]
\ No newline at end of file
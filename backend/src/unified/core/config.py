@@ -31,6 +31,7 @@ class UnifiedConfig:
     # NNTP settings
     nntp_servers: List[Dict[str, Any]] = field(default_factory=list)
     nntp_max_connections: int = 10
+    nntp_autotune_connections: bool = True
     nntp_timeout: int = 30
     nntp_retry_attempts: int = 3
     nntp_ssl_enabled: bool = True
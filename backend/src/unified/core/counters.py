@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Unified Counters Module - Materialized row, state and windowed event counts
+Maintained by triggers so status endpoints never scan the big tables;
+queried from the base tables where no triggers exist (PostgreSQL)
+"""
+
+import calendar
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from .database import UnifiedDatabase, DatabaseType
+
+logger = logging.getLogger(__name__)
+
+# Tables with a maintained row count, and the column counted per value
+COUNTED_TABLES = {
+    'folders': 'status',
+    'files': 'status',
+    'segments': 'upload_status',
+    'shares': None,
+    'users': None,
+    'upload_queue': 'state',
+    'download_queue': 'state',
+    'alerts': 'enabled',
+    'network_servers': 'enabled',
+}
+
+# Timestamped events counted per time bucket:
+# name -> (table, timestamp column, grouping column, bucket seconds)
+WINDOWS = {
+    'upload_queue.started': ('upload_queue', 'started_at', None, 60),
+    'download_queue.started': ('download_queue', 'started_at', None, 3600),
+    'upload_queue.finished': ('upload_queue', 'completed_at', 'state', 3600),
+    'download_queue.finished': ('download_queue', 'completed_at', 'state', 3600),
+}
+
+# Buckets older than this are pruned by repair()
+WINDOW_RETENTION = 2 * 86400
+
+class UnifiedCounters:
+    """
+    Materialized counters
+    
+    stat_counters holds one row per table total ('files') and per column
+    value ('files.status=indexed'); stat_windows holds event counts per
+    time bucket. On SQLite both are kept current by triggers, so reads are
+    a primary-key lookup regardless of table size. repair() recounts from
+    the base tables and fixes any drift; start() runs it periodically.
+    
+    Without triggers (PostgreSQL) the counters are live: every read
+    queries the base tables directly, so counts are never stale.
+    """
+    
+    def __init__(self, db: UnifiedDatabase, repair_interval: float = 600.0,
+                 live: Optional[bool] = None):
+        """
+        Initialize counters
+        
+        Args:
+            db: Database with the unified schema
+            repair_interval: Seconds between background consistency checks
+            live: Query the base tables on every read (default: on
+                databases without counter triggers)
+        """
+        self.db = db
+        self.repair_interval = repair_interval
+        self.db_type = db.config.db_type
+        self.live = self.db_type != DatabaseType.SQLITE if live is None else live
+        self._marker = '?' if self.db_type == DatabaseType.SQLITE else '%s'
+        self._repairer = None
+        self._stop = threading.Event()
+        self._statistics = {
+            'repairs': 0,
+            'corrections': 0,
+            'last_repair': None
+        }
+    
+    # ==================== SCHEMA ====================
+    
+    @staticmethod
+    def trigger_sql() -> List[str]:
+        """SQLite triggers maintaining stat_counters and stat_windows"""
+        def bump(name_sql: str, delta: int, where: str = '1') -> str:
+            return (f"INSERT INTO stat_counters (name, value) SELECT {name_sql}, {delta} WHERE {where} "
+                    f"ON CONFLICT(name) DO UPDATE SET value = value + ({delta});")
+        
+        def value_name(table: str, column: str, row: str) -> str:
+            return f"'{table}.{column}=' || COALESCE({row}.{column}, '')"
+        
+        triggers = []
+        for table, column in COUNTED_TABLES.items():
+            insert = [bump(f"'{table}'", 1)]
+            delete = [bump(f"'{table}'", -1)]
+            if column:
+                insert.append(bump(value_name(table, column, 'NEW'), 1))
+                delete.append(bump(value_name(table, column, 'OLD'), -1))
+                triggers.append(
+                    f"CREATE TRIGGER IF NOT EXISTS count_{table}_{column} "
+                    f"AFTER UPDATE OF {column} ON {table} WHEN OLD.{column} IS NOT NEW.{column} BEGIN "
+                    f"{bump(value_name(table, column, 'OLD'), -1)} "
+                    f"{bump(value_name(table, column, 'NEW'), 1)} END"
+                )
+            triggers.append(f"CREATE TRIGGER IF NOT EXISTS count_{table}_insert AFTER INSERT ON {table} "
+                            f"BEGIN {' '.join(insert)} END")
+            triggers.append(f"CREATE TRIGGER IF NOT EXISTS count_{table}_delete AFTER DELETE ON {table} "
+                            f"BEGIN {' '.join(delete)} END")
+        
+        for name, (table, stamp, group, size) in WINDOWS.items():
+            def event(row: str, delta: int) -> str:
+                key = f"'{name}'" + (f" || ':' || COALESCE({row}.{group}, '')" if group else '')
+                bucket = f"CAST(strftime('%s', {row}.{stamp}) AS INTEGER) / {size} * {size}"
+                return (f"INSERT INTO stat_windows (name, bucket, value) SELECT {key}, {bucket}, {delta} "
+                        f"WHERE strftime('%s', {row}.{stamp}) IS NOT NULL "
+                        f"ON CONFLICT(name, bucket) DO UPDATE SET value = value + ({delta});")
+            
+            trigger = f"window_{table}_{stamp}"
+            columns = f"{stamp}, {group}" if group else stamp
+            changed = f"OLD.{stamp} IS NOT NEW.{stamp}" + (f" OR OLD.{group} IS NOT NEW.{group}" if group else '')
+            triggers += [
+                f"CREATE TRIGGER IF NOT EXISTS {trigger}_insert AFTER INSERT ON {table} "
+                f"BEGIN {event('NEW', 1)} END",
+                f"CREATE TRIGGER IF NOT EXISTS {trigger}_update AFTER UPDATE OF {columns} ON {table} "
+                f"WHEN {changed} BEGIN {event('OLD', -1)} {event('NEW', 1)} END",
+                f"CREATE TRIGGER IF NOT EXISTS {trigger}_delete AFTER DELETE ON {table} "
+                f"BEGIN {event('OLD', -1)} END",
+            ]
+        return triggers
+    
+    # ==================== READS ====================
+    
+    def get(self, name: str) -> int:
+        """One counter (0 if never counted)"""
+        if self.live:
+            table, _, value = name.partition('.')
+            if not value:
+                return self._live_count(table)
+            column, _, value = value.partition('=')
+            if column != COUNTED_TABLES.get(table):
+                return 0
+            return self._live_values(table).get(value, 0)
+        
+        row = self.db.fetch_one(f"SELECT value FROM stat_counters WHERE name = {self._marker}", (name,))
+        return int(row['value']) if row else 0
+    
+    def table_count(self, table: str) -> int:
+        """Row count of a counted table"""
+        return self.get(table)
+    
+    def table_counts(self, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """Row counts of several tables in one lookup"""
+        tables = list(tables or COUNTED_TABLES)
+        if self.live:
+            return {table: self._live_count(table) for table in tables}
+        
+        rows = self.db.fetch_all(
+            f"SELECT name, value FROM stat_counters WHERE name IN ({', '.join([self._marker] * len(tables))})",
+            tuple(tables)
+        )
+        counts = dict.fromkeys(tables, 0)
+        counts.update({row['name']: int(row['value']) for row in rows})
+        return counts
+    
+    def value_counts(self, table: str) -> Dict[str, int]:
+        """Rows per value of a table's counted column, e.g. per queue state"""
+        if self.live:
+            return {value: count for value, count in self._live_values(table).items() if count}
+        
+        prefix = f"{table}.{COUNTED_TABLES[table]}="
+        # Primary-key range scan: '>' sorts right after '='
+        rows = self.db.fetch_all(
+            f"SELECT name, value FROM stat_counters WHERE name >= {self._marker} AND name < {self._marker}",
+            (prefix, prefix[:-1] + '>')
+        )
+        return {row['name'][len(prefix):]: int(row['value']) for row in rows if row['value']}
+    
+    def window_count(self, name: str, since: datetime, until: Optional[datetime] = None,
+                     group: Optional[str] = None) -> float:
+        """
+        Events in a time range from the bucketed counts
+        
+        The bucket that straddles since is prorated, which is the usual
+        sliding-window approximation; whole buckets are exact.
+        
+        Args:
+            name: Window name from WINDOWS
+            since: Start of the range (naive local time, as stored)
+            until: End of the range (default now)
+            group: Grouping value, e.g. 'completed' for finished windows
+        
+        Returns:
+            Approximate event count
+        """
+        if self.live:
+            return self._live_window(name, since, until, group)
+        
+        size = WINDOWS[name][3]
+        key = f"{name}:{group}" if group is not None else name
+        start = self._epoch(since)
+        end = self._epoch(until or datetime.now())
+        first = start // size * size
+        
+        rows = self.db.fetch_all(
+            f"""SELECT bucket, value FROM stat_windows
+                WHERE name = {self._marker} AND bucket >= {self._marker} AND bucket <= {self._marker}""",
+            (key, first, end)
+        )
+        total = 0.0
+        for row in rows:
+            if row['bucket'] == first:
+                total += row['value'] * (1 - (start - first) / size)
+            else:
+                total += row['value']
+        return total
+    
+    def _live_count(self, table: str) -> int:
+        """Row count straight from a counted table"""
+        if table not in COUNTED_TABLES:
+            return 0
+        row = self.db.fetch_one(f"SELECT COUNT(*) AS count FROM {table}")
+        return int(row['count']) if row else 0
+    
+    def _live_values(self, table: str) -> Dict[str, int]:
+        """Rows per value of a table's counted column, straight from the table"""
+        column = COUNTED_TABLES[table]
+        rows = self.db.fetch_all(
+            f"SELECT {column} AS value, COUNT(*) AS count FROM {table} GROUP BY {column}"
+        )
+        return {self._format(row['value']): int(row['count']) for row in rows}
+    
+    def _live_window(self, name: str, since: datetime, until: Optional[datetime],
+                     group: Optional[str]) -> float:
+        """Exact event count in a time range, straight from the table"""
+        table, stamp, column, _ = WINDOWS[name]
+        query = (f"SELECT COUNT(*) AS count FROM {table} "
+                 f"WHERE {stamp} >= {self._marker} AND {stamp} <= {self._marker}")
+        params = [since, until or datetime.now()]
+        if column and group is not None:
+            query += f" AND {column} = {self._marker}"
+            params.append(group)
+        row = self.db.fetch_one(query, tuple(params))
+        return float(row['count']) if row else 0.0
+    
+    @staticmethod
+    def _epoch(moment: datetime) -> int:
+        """Seconds for a naive timestamp, matching SQLite strftime('%s')"""
+        return calendar.timegm(moment.utctimetuple())
+    
+    # ==================== CONSISTENCY ====================
+    
+    def install(self):
+        """Create counter tables and triggers, then count existing rows"""
+        from .schema import UnifiedSchema
+        tables = UnifiedSchema(self.db).tables
+        self.db.execute(tables['stat_counters'])
+        self.db.execute(tables['stat_windows'])
+        if self.live:
+            # Reads go to the base tables; nothing to maintain
+            return
+        if self.db_type == DatabaseType.SQLITE:
+            for sql in self.trigger_sql():
+                self.db.execute(sql)
+        self.repair()
+    
+    def repair(self) -> Dict[str, int]:
+        """
+        Recount from the base tables and correct drift
+        
+        Runs in one transaction so writes cannot slip between the recount
+        and the correction.
+        
+        Returns:
+            Corrections applied, by counter name (expected - stored)
+        """
+        marker = self._marker
+        corrections = {}
+        horizon = int(time.time()) - WINDOW_RETENTION
+        
+        present = {table for table in COUNTED_TABLES if self.db.table_exists(table)}
+        
+        with self.db.transaction() as cursor:
+            expected = {}
+            for table, column in COUNTED_TABLES.items():
+                if table not in present:
+                    continue
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                expected[table] = cursor.fetchone()[0]
+                if column:
+                    cursor.execute(f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column}")
+                    for value, count in cursor.fetchall():
+                        expected[f"{table}.{column}={self._format(value)}"] = count
+            
+            cursor.execute("SELECT name, value FROM stat_counters")
+            stored = {name: value for name, value in cursor.fetchall()}
+            corrections.update(self._correct(cursor, 'stat_counters', '(name)', expected, stored))
+            
+            cursor.execute(f"DELETE FROM stat_windows WHERE bucket < {marker}", (horizon,))
+            expected = {}
+            for name, (table, stamp, group, size) in WINDOWS.items():
+                if table not in present:
+                    continue
+                cursor.execute(f"SELECT {stamp}, {group or 'NULL'} FROM {table} WHERE {stamp} IS NOT NULL")
+                for moment, value in cursor.fetchall():
+                    epoch = self._parse_epoch(moment)
+                    if epoch is None or epoch < horizon:
+                        continue
+                    key = (f"{name}:{self._format(value)}" if group else name, epoch // size * size)
+                    expected[key] = expected.get(key, 0) + 1
+            
+            cursor.execute("SELECT name, bucket, value FROM stat_windows")
+            stored = {(name, bucket): value for name, bucket, value in cursor.fetchall()}
+            corrections.update(self._correct(cursor, 'stat_windows', '(name, bucket)', expected, stored))
+        
+        self._statistics['repairs'] += 1
+        self._statistics['corrections'] += len(corrections)
+        self._statistics['last_repair'] = datetime.now().isoformat()
+        if corrections:
+            logger.warning(f"Repaired {len(corrections)} drifted counters")
+        return {str(k): v for k, v in corrections.items()}
+    
+    def _correct(self, cursor, table: str, key_columns: str,
+                 expected: Dict[Any, int], stored: Dict[Any, int]) -> Dict[Any, int]:
+        """Write expected values where stored ones differ"""
+        corrections = {}
+        for key in set(expected) | set(stored):
+            want = expected.get(key, 0)
+            if stored.get(key, 0) == want:
+                continue
+            corrections[key] = want - stored.get(key, 0)
+            values = key if isinstance(key, tuple) else (key,)
+            markers = ', '.join([self._marker] * (len(values) + 1))
+            cursor.execute(
+                f"INSERT INTO {table} {key_columns[:-1]}, value) VALUES ({markers}) "
+                f"ON CONFLICT{key_columns} DO UPDATE SET value = excluded.value",
+                (*values, want)
+            )
+        return corrections
+    
+    @staticmethod
+    def _format(value) -> str:
+        """Column value as it appears in a counter name (SQLite || semantics)"""
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return str(int(value))
+        return str(value)
+    
+    def _parse_epoch(self, moment) -> Optional[int]:
+        """Timestamp column value in the bucket clock used by the triggers"""
+        if isinstance(moment, datetime):
+            return self._epoch(moment)
+        try:
+            return self._epoch(datetime.fromisoformat(str(moment)))
+        except ValueError:
+            return None
+    
+    # ==================== BACKGROUND ====================
+    
+    def start(self):
+        """Run repair() every repair_interval seconds in the background"""
+        if self._repairer or self.repair_interval <= 0 or self.live:
+            return
+        self._stop.clear()
+        self._repairer = threading.Thread(target=self._repair_loop,
+                                          name='counter-repair', daemon=True)
+        self._repairer.start()
+    
+    def stop(self):
+        """Stop background repair"""
+        self._stop.set()
+        if self._repairer:
+            self._repairer.join(timeout=5)
+            self._repairer = None
+    
+    def _repair_loop(self):
+        while not self._stop.wait(self.repair_interval):
+            try:
+                self.repair()
+            except Exception as e:
+                logger.error(f"Counter repair failed: {e}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get repair statistics"""
+        return self._statistics.copy()
@@ -5,6 +5,7 @@ Supports both SQLite and PostgreSQL with production features
 """
 
 import os
+import re
 import sqlite3
 import json
 import threading
@@ -26,6 +27,12 @@ from typing import Dict, List, Optional, Tuple, Any, Union, Generator
 from pathlib import Path
 from enum import Enum
 
+# Statements that change rows, capturing the table they write
+WRITE_STATEMENT = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+
 # Fix for SQLite datetime deprecation warning (Python 3.12+)
 sqlite3.register_adapter(datetime, lambda dt: dt.isoformat())
 
@@ -228,6 +235,11 @@ class UnifiedDatabase:
         self._lock = threading.Lock()
         self._transaction_stack = threading.local()
         
+        # Per-table write counters; the generation covers writes whose
+        # tables are unknown (raw cursors, transactions, DDL)
+        self._write_versions = {}
+        self._write_generation = 0
+        
         # Monitoring
         self._monitor = {
             'queries': {},
@@ -276,6 +288,7 @@ class UnifiedDatabase:
                     yield cursor
                     
                     conn.commit()
+                    self._note_write(None)
                     
                 except Exception as e:
                     conn.rollback()
@@ -321,6 +334,7 @@ class UnifiedDatabase:
                         cursor.execute(query)
                     
                     conn.commit()
+                    self._note_write(query)
                     
                     # Monitor query
                     elapsed = time.time() - start_time
@@ -361,6 +375,7 @@ class UnifiedDatabase:
                     cursor.executemany(query, chunk)
                     rows_affected += cursor.rowcount
                 conn.commit()
+                self._note_write(query)
             finally:
                 cursor.close()
         
@@ -571,6 +586,40 @@ class UnifiedDatabase:
             if len(self._monitor['slow_queries']) > 100:
                 self._monitor['slow_queries'] = self._monitor['slow_queries'][-100:]
     
+    def _note_write(self, query: Optional[str]):
+        """Advance write versions after a statement that may have changed data"""
+        if query is not None:
+            head = query.lstrip()[:6].upper()
+            if head == 'SELECT' or head == 'PRAGMA':
+                return
+            match = WRITE_STATEMENT.match(query)
+        else:
+            match = None
+        
+        with self._lock:
+            if match:
+                table = match.group(1).lower()
+                self._write_versions[table] = self._write_versions.get(table, 0) + 1
+            else:
+                self._write_generation += 1
+    
+    def write_version(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        """
+        Version stamp of tables' contents as written through this instance
+        
+        Changes whenever a write to one of the tables (or an untracked
+        write) commits. Tables changed by triggers must be listed by the
+        table the statement names.
+        
+        Args:
+            tables: Table names
+        
+        Returns:
+            Tuple that compares equal only while none of them changed
+        """
+        with self._lock:
+            return (self._write_generation,) + tuple(self._write_versions.get(t, 0) for t in tables)
+    
     def _chunk_list(self, items: List, chunk_size: int) -> Generator[List, None, None]:
         """Split list into chunks"""
         for i in range(0, len(items), chunk_size):
@@ -637,6 +686,7 @@ class UnifiedDatabase:
                     self._cursor.close()
                 if self._conn:
                     self._conn.__exit__(exc_type, exc_val, exc_tb)
+                self.db._note_write(None)
         
         return CursorWrapper(self)
     
@@ -8,6 +8,7 @@ import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from .database import UnifiedDatabase, DatabaseType
+from .counters import UnifiedCounters
 
 logger = logging.getLogger(__name__)
 
@@ -543,6 +544,22 @@ class UnifiedSchema:
                 )
             """,
             
+            # Downsampled metric history (see monitoring.timeseries)
+            'metric_rollups': f"""
+                CREATE TABLE IF NOT EXISTS metric_rollups (
+                    metric_name VARCHAR(255) NOT NULL,
+                    resolution INTEGER NOT NULL,
+                    bucket {bigint_type} NOT NULL,
+                    value_count {bigint_type} NOT NULL DEFAULT 0,
+                    value_sum REAL,
+                    value_squares REAL,
+                    value_min REAL,
+                    value_max REAL,
+                    sketch TEXT,
+                    PRIMARY KEY (metric_name, resolution, bucket)
+                )
+            """,
+            
             # Backup history
             'backup_history': f"""
                 CREATE TABLE IF NOT EXISTS backup_history (
@@ -562,6 +579,24 @@ class UnifiedSchema:
                     metadata {json_type},
                     CHECK (backup_type IN ('full', 'incremental', 'differential'))
                 )
+            """,
+            
+            # Materialized counters (maintained by triggers, see counters.py)
+            'stat_counters': f"""
+                CREATE TABLE IF NOT EXISTS stat_counters (
+                    name VARCHAR(255) PRIMARY KEY,
+                    value {bigint_type} NOT NULL DEFAULT 0
+                )
+            """,
+            
+            # Event counts per time bucket for rate windows
+            'stat_windows': f"""
+                CREATE TABLE IF NOT EXISTS stat_windows (
+                    name VARCHAR(255) NOT NULL,
+                    bucket {bigint_type} NOT NULL,
+                    value {bigint_type} NOT NULL DEFAULT 0,
+                    PRIMARY KEY (name, bucket)
+                )
             """
         }
     
@@ -570,38 +605,9 @@ class UnifiedSchema:
         logger.info("Creating unified database schema...")
         
         created_tables = []
-        for table_name, create_sql in self.tables.items():
-            try:
-                # Handle INDEX statements for SQLite
-                if self.db_type == DatabaseType.SQLITE:
-                    create_sql = create_sql.replace("INDEX idx_", "CREATE INDEX IF NOT EXISTS idx_")
-                    # Remove inline INDEX from CREATE TABLE
-                    lines = create_sql.split('\n')
-                    table_lines = []
-                    index_lines = []
-                    
-                    for line in lines:
-                        if 'INDEX idx_' in line:
-                            # Extract and create separate index
-                            index_lines.append(line.strip().rstrip(','))
-                        else:
-                            table_lines.append(line)
-                    
-                    # Create table first
-                    self.db.execute('\n'.join(table_lines))
-                    
-                    # Create indexes separately
-                    for index_line in index_lines:
-                        if index_line:
-                            self.db.execute(index_line)
-                else:
-                    self.db.execute(create_sql)
-                
-                created_tables.append(table_name)
-                
-            except Exception as e:
-                logger.error(f"Error creating table {table_name}: {e}")
-                raise
+        for table_name in self.tables:
+            self._create_table(table_name)
+            created_tables.append(table_name)
         
         # Create indexes
         self._create_indexes()
@@ -612,6 +618,49 @@ class UnifiedSchema:
         logger.info(f"Created {len(created_tables)} tables: {', '.join(created_tables)}")
         return created_tables
     
+    def create_tables(self, table_names: List[str]) -> List[str]:
+        """
+        Create only the named tables
+        
+        For databases whose other tables come from another schema, e.g. the
+        metric tables on a database created by the legacy system.
+        """
+        for table_name in table_names:
+            self._create_table(table_name)
+        return list(table_names)
+    
+    def _create_table(self, table_name: str):
+        """Create one table, with its inline indexes on SQLite"""
+        create_sql = self.tables[table_name]
+        try:
+            # Handle INDEX statements for SQLite
+            if self.db_type == DatabaseType.SQLITE:
+                create_sql = create_sql.replace("INDEX idx_", "CREATE INDEX IF NOT EXISTS idx_")
+                # Remove inline INDEX from CREATE TABLE
+                lines = create_sql.split('\n')
+                table_lines = []
+                index_lines = []
+                
+                for line in lines:
+                    if 'INDEX idx_' in line:
+                        # Extract and create separate index
+                        index_lines.append(line.strip().rstrip(','))
+                    else:
+                        table_lines.append(line)
+                
+                # Create table first
+                self.db.execute('\n'.join(table_lines))
+                
+                # Create indexes separately
+                for index_line in index_lines:
+                    if index_line:
+                        self.db.execute(index_line)
+            else:
+                self.db.execute(create_sql)
+        except Exception as e:
+            logger.error(f"Error creating table {table_name}: {e}")
+            raise
+    
     def _create_indexes(self):
         """Create database indexes for performance"""
         indexes = [
@@ -675,6 +724,8 @@ class UnifiedSchema:
             
             # Metrics indexes
             "CREATE INDEX IF NOT EXISTS idx_metrics_name_time ON metrics(metric_name, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_metrics_time ON metrics(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_metric_rollups_retention ON metric_rollups(resolution, bucket)",
         ]
         
         for index_sql in indexes:
@@ -721,6 +772,9 @@ class UnifiedSchema:
                 """
             ]
             
+            # Materialized row, state and window counters
+            triggers.extend(UnifiedCounters.trigger_sql())
+            
             for trigger_sql in triggers:
                 try:
                     self.db.execute(trigger_sql)
@@ -6,15 +6,18 @@ Production-ready with resume support and integrity verification
 from .retriever import UnifiedRetriever
 from .reconstructor import UnifiedReconstructor
 from .decoder import UnifiedDecoder
-from .verifier import UnifiedVerifier
+from .verifier import UnifiedVerifier, SegmentVerifier
 from .resume import UnifiedResume
 from .cache import UnifiedCache
+from .availability import UnifiedAvailability
 
 __all__ = [
     'UnifiedRetriever',
     'UnifiedReconstructor',
     'UnifiedDecoder',
     'UnifiedVerifier',
+    'SegmentVerifier',
     'UnifiedResume',
-    'UnifiedCache'
+    'UnifiedCache',
+    'UnifiedAvailability'
 ]
\ No newline at end of file
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Unified Availability - Pre-flight article availability scan
+Probes every segment of a share with pipelined STAT before fetching bodies
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from ..networking.connection_pool import StatProbeError
+
+logger = logging.getLogger(__name__)
+
+class UnifiedAvailability:
+    """
+    Unified availability scanner
+    Records per-segment availability per server and plans the download
+    """
+    
+    def __init__(self, db, connection_pool, config=None):
+        """
+        Initialize availability scanner
+        
+        Args:
+            db: Database manager
+            connection_pool: UnifiedConnectionPool used for STAT probes
+            config: Optional configuration
+        """
+        self.db = db
+        self.connection_pool = connection_pool
+        self.config = config or {}
+        self.batch_size = self.config.get('stat_batch_size', 500)
+        self._scans = {}  # share_id -> scan result
+        self._index = {}  # share_id -> (file_id, segment_index) -> plan entry
+        self._lock = threading.Lock()
+    
+    def scan_share(self, share_id: str,
+                   connections_per_server: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Scan availability of every segment in a share
+        
+        Args:
+            share_id: Share to scan
+            connections_per_server: Parallel connections per server
+        
+        Returns:
+            Scan result with summary and download plan
+        """
+        share = self.db.fetch_one(
+            "SELECT share_id, folder_id FROM shares WHERE share_id = ?",
+            (share_id,)
+        )
+        if not share:
+            raise ValueError(f"Share not found: {share_id}")
+        
+        start_time = time.time()
+        segments = self._load_segments(share['folder_id'])
+        
+        message_ids = sorted({
+            copy['message_id']
+            for copies in segments.values()
+            for copy in copies
+            if copy['message_id']
+        })
+        
+        probe_errors = {}
+        try:
+            availability = self.connection_pool.stat_articles(
+                message_ids,
+                connections_per_server=connections_per_server,
+                batch_size=self.batch_size
+            )
+        except StatProbeError as e:
+            # Articles a server could not be asked about stay unverified
+            logger.warning(f"Availability scan for {share_id}: {e}")
+            availability = e.availability
+            probe_errors = e.errors
+        
+        plan = self.plan_download(segments, availability)
+        
+        scan = {
+            'share_id': share_id,
+            'folder_id': share['folder_id'],
+            'scanned_at': datetime.now().isoformat(),
+            'duration_seconds': round(time.time() - start_time, 3),
+            'articles_probed': len(message_ids),
+            'probe_errors': probe_errors,
+            'summary': self._summarize(plan, availability),
+            'segments': plan
+        }
+        
+        with self._lock:
+            self._scans[share_id] = scan
+            self._index[share_id] = {
+                (entry['file_id'], entry['segment_index']): entry for entry in plan
+            }
+        
+        logger.info(
+            f"Availability scan for {share_id}: "
+            f"{scan['summary']['available']}/{scan['summary']['total_segments']} segments available, "
+            f"{scan['summary']['missing']} missing"
+        )
+        
+        return scan
+    
+    def plan_download(self, segments: Dict[Tuple[str, int], List[Dict[str, Any]]],
+                      availability: Dict[str, Dict[str, bool]]) -> List[Dict[str, Any]]:
+        """
+        Choose a source for every segment before any body is fetched
+        
+        The primary copy is preferred, then redundancy copies in order.
+        Among servers holding the chosen copy, the one with the highest
+        hit rate in this scan wins.
+        
+        Args:
+            segments: (file_id, segment_index) -> copies ordered by redundancy_index
+            availability: server_id -> {message_id: exists}
+        
+        Returns:
+            List of per-segment plan entries
+        """
+        hit_rates = {
+            server_id: (sum(results.values()) / len(results)) if results else 0.0
+            for server_id, results in availability.items()
+        }
+        
+        plan = []
+        
+        for (file_id, segment_index), copies in segments.items():
+            entry = {
+                'file_id': file_id,
+                'segment_index': segment_index,
+                'segment_id': copies[0]['segment_id'],
+                'status': 'missing',
+                'message_id': None,
+                'redundancy_index': None,
+                'server': None,
+                'copies': []
+            }
+            unverified = None
+            
+            for copy in copies:
+                servers = {
+                    server_id: results[copy['message_id']]
+                    for server_id, results in availability.items()
+                    if copy['message_id'] in results
+                }
+                entry['copies'].append({
+                    'redundancy_index': copy['redundancy_index'],
+                    'message_id': copy['message_id'],
+                    'packed': copy['packed'],
+                    'servers': servers
+                })
+                
+                if entry['server'] or not copy['message_id']:
+                    continue
+                
+                holders = [server_id for server_id, exists in servers.items() if exists]
+                if holders:
+                    entry['server'] = max(holders, key=lambda s: hit_rates.get(s, 0.0))
+                    entry['message_id'] = copy['message_id']
+                    entry['redundancy_index'] = copy['redundancy_index']
+                    entry['status'] = 'available' if copy['redundancy_index'] == 0 else 'redundancy'
+                elif unverified is None and len(servers) < len(availability):
+                    # At least one server could not be probed for this copy
+                    unverified = copy
+            
+            if not entry['server'] and unverified:
+                entry['status'] = 'unverified'
+                entry['message_id'] = unverified['message_id']
+                entry['redundancy_index'] = unverified['redundancy_index']
+            
+            plan.append(entry)
+        
+        return plan
+    
+    def get_scan(self, share_id: str) -> Optional[Dict[str, Any]]:
+        """Get last scan result for a share"""
+        with self._lock:
+            return self._scans.get(share_id)
+    
+    def get_segment_plan(self, share_id: str, file_id: str,
+                         segment_index: int) -> Optional[Dict[str, Any]]:
+        """Get planned source for a single segment"""
+        with self._lock:
+            index = self._index.get(share_id)
+        if not index:
+            return None
+        
+        return index.get((file_id, segment_index))
+    
+    def clear(self, share_id: Optional[str] = None):
+        """Drop stored scan results"""
+        with self._lock:
+            if share_id:
+                self._scans.pop(share_id, None)
+                self._index.pop(share_id, None)
+            else:
+                self._scans.clear()
+                self._index.clear()
+    
+    def _load_segments(self, folder_id: str) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
+        """Load all segment copies of a folder grouped by segment"""
+        segments = {}
+        
+        rows = self.db.stream_results(
+            """SELECT s.segment_id, s.file_id, s.segment_index, s.redundancy_index,
+                      s.message_id, s.packed_segment_id, p.message_id AS packed_message_id
+               FROM segments s
+               JOIN files f ON s.file_id = f.file_id
+               LEFT JOIN packed_segments p ON s.packed_segment_id = p.packed_segment_id
+               WHERE f.folder_id = ?
+               ORDER BY s.file_id, s.segment_index, s.redundancy_index""",
+            (folder_id,)
+        )
+        
+        for row in rows:
+            key = (row['file_id'], row['segment_index'])
+            segments.setdefault(key, []).append({
+                'segment_id': row['segment_id'],
+                'redundancy_index': row['redundancy_index'] or 0,
+                'message_id': row['message_id'] or row['packed_message_id'],
+                'packed': bool(row['packed_segment_id'] and not row['message_id'])
+            })
+        
+        return segments
+    
+    def _summarize(self, plan: List[Dict[str, Any]],
+                   availability: Dict[str, Dict[str, bool]]) -> Dict[str, Any]:
+        """Summarize a download plan"""
+        counts = {'available': 0, 'redundancy': 0, 'unverified': 0, 'missing': 0}
+        for entry in plan:
+            counts[entry['status']] += 1
+        
+        servers = {}
+        for server_id, results in availability.items():
+            found = sum(results.values())
+            servers[server_id] = {
+                'probed': len(results),
+                'available': found,
+                'hit_rate': round(found / len(results), 4) if results else 0.0,
+                'planned_segments': sum(1 for e in plan if e['server'] == server_id)
+            }
+        
+        return {
+            'total_segments': len(plan),
+            'available': counts['available'] + counts['redundancy'],
+            'primary': counts['available'],
+            'redundancy': counts['redundancy'],
+            'unverified': counts['unverified'],
+            'missing': counts['missing'],
+            'complete': counts['missing'] == 0 and counts['unverified'] == 0,
+            'servers': servers
+        }
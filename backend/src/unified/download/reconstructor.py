@@ -109,7 +109,7 @@ class UnifiedReconstructor:
             
             logger.info(f"Reconstructed file: {output_path} ({bytes_written:,} bytes)")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Reconstruction failed: {e}")
             # Clean up partial file
@@ -118,20 +118,22 @@ class UnifiedReconstructor:
             return False
     
     def reconstruct_packed_files(self, packed_data: bytes,
-                                output_dir: str) -> List[str]:
+                                output_dir: str,
+                                dictionary: Optional[bytes] = None) -> List[str]:
         """
         Reconstruct packed files
         
         Args:
             packed_data: Packed segment data
             output_dir: Output directory
+            dictionary: Share compression dictionary from the core index
         
         Returns:
             List of extracted file paths
         """
         from ..segmentation.packing import UnifiedPacking
         
-        packing = UnifiedPacking()
+        packing = UnifiedPacking(dictionary=dictionary)
         extracted_files = []
         
         try:
@@ -158,7 +160,7 @@ class UnifiedReconstructor:
                 logger.debug(f"Extracted: {file_path}")
             
             logger.info(f"Extracted {len(extracted_files)} packed files")
-            
+        
         except Exception as e:
             logger.error(f"Failed to unpack files: {e}")
         
@@ -215,7 +217,7 @@ class UnifiedReconstructor:
             
             logger.info(f"Streaming reconstruction complete: {output_path}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Streaming reconstruction failed: {e}")
             if output_path.exists():
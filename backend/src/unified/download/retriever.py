@@ -14,9 +14,13 @@ logger = logging.getLogger(__name__)
 class SegmentRetrieval:
     """Segment retrieval result"""
     
-    def __init__(self, segment_id: str, message_id: str):
+    def __init__(self, segment_id: str, message_id: str,
+                 newsgroup: Optional[str] = None,
+                 article_age_days: Optional[float] = None):
         self.segment_id = segment_id
         self.message_id = message_id
+        self.newsgroup = newsgroup
+        self.article_age_days = article_age_days
         self.data = None
         self.success = False
         self.error = None
@@ -63,12 +67,14 @@ class UnifiedRetriever:
         for info in segment_info:
             retrieval = SegmentRetrieval(
                 info['segment_id'],
-                info['message_id']
+                info['message_id'],
+                newsgroup=info.get('newsgroup'),
+                article_age_days=self._article_age_days(info.get('uploaded_at'))
             )
             retrievals.append(retrieval)
         
         # Parallel retrieval
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._worker_count()) as executor:
             # Submit all retrieval tasks
             futures = {
                 executor.submit(self._retrieve_single, retrieval): retrieval
@@ -128,7 +134,11 @@ class UnifiedRetriever:
             try:
                 if self.connection_pool:
                     # Use connection pool for retrieval
-                    result = self.connection_pool.retrieve_article(retrieval.message_id)
+                    result = self.connection_pool.retrieve_article(
+                        retrieval.message_id,
+                        newsgroup=retrieval.newsgroup,
+                        article_age_days=retrieval.article_age_days
+                    )
                     
                     if result:
                         article_number, lines = result
@@ -156,6 +166,30 @@ class UnifiedRetriever:
         retrieval.success = False
         return retrieval
     
+    def _worker_count(self) -> int:
+        """
+        Number of retrieval threads
+        
+        With an autotuned pool the pool gates the live connection count,
+        so size the executor to the provider caps and let the tuner
+        decide how many of those threads hold a connection.
+        """
+        if getattr(self.connection_pool, 'tuner', None):
+            return max(1, self.connection_pool.get_connection_capacity())
+        return self.max_workers
+    
+    def _article_age_days(self, uploaded_at: Any) -> Optional[float]:
+        """Get article age in days from its upload timestamp"""
+        if not uploaded_at:
+            return None
+        
+        try:
+            if isinstance(uploaded_at, str):
+                uploaded_at = datetime.fromisoformat(uploaded_at)
+            return max(0.0, (datetime.now() - uploaded_at).total_seconds() / 86400)
+        except (TypeError, ValueError):
+            return None
+    
     def retrieve_with_redundancy(self, segment_info: List[Dict[str, Any]],
                                 redundancy_info: List[Dict[str, Any]]) -> List[SegmentRetrieval]:
         """
@@ -191,7 +225,9 @@ class UnifiedRetriever:
                     for redundant in redundancy_map[failed.segment_id]:
                         retry = SegmentRetrieval(
                             failed.segment_id,
-                            redundant['message_id']
+                            redundant['message_id'],
+                            newsgroup=failed.newsgroup,
+                            article_age_days=failed.article_age_days
                         )
                         
                         retry = self._retrieve_single(retry)
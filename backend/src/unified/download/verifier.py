@@ -2,14 +2,115 @@
 """
 Unified Verifier - Verify download integrity
 Production-ready with hash verification and completeness checks
+Segments are checked against the file's Merkle tree as they arrive
 """
 
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 
+from ..segmentation.hashing import MerkleTree, UnifiedHashing
+
 logger = logging.getLogger(__name__)
 
+class SegmentVerifier:
+    """
+    Incremental verification of one file's segments
+    
+    Each segment is hashed once when it arrives and checked against its
+    leaf, so a corrupt segment is known (and can be fetched again) before
+    the next one is requested. The file as a whole is verified by the
+    Merkle root over those leaves, and a whole-file hash is fed from the
+    same in-order writes, so no pass over the finished file is needed.
+    """
+    
+    def __init__(self, segment_hashes: Optional[List[str]] = None,
+                 root_hash: Optional[str] = None,
+                 segment_count: Optional[int] = None,
+                 file_hash: Optional[str] = None):
+        """
+        Initialize for one file
+        
+        Args:
+            segment_hashes: Hex segment hashes from the index, in order
+            root_hash: Hex Merkle root; authenticates segment_hashes, or
+                segments with proofs when no hashes are known
+            segment_count: Number of segments (defaults to len(segment_hashes))
+            file_hash: Expected SHA256 of the whole file
+        """
+        self.tree = MerkleTree.from_hex(segment_hashes) if segment_hashes else None
+        self.root = bytes.fromhex(root_hash) if root_hash else None
+        self.count = segment_count if segment_count is not None else len(segment_hashes or [])
+        self.file_hash = file_hash
+        
+        if self.tree is not None and self.root is not None and self.tree.root != self.root:
+            raise ValueError("Segment hashes do not match the file's Merkle root")
+        
+        self.verified = set()
+        self.failures = 0
+        self._hasher = hashlib.sha256() if file_hash else None
+        self._next_index = 0
+    
+    def verify_segment(self, index: int, data: bytes,
+                       proof: Optional[List[bytes]] = None) -> bool:
+        """
+        Check one segment as it arrives
+        
+        Args:
+            index: Segment index
+            data: Segment data
+            proof: Sibling digests, needed only when the verifier was
+                built from a root without segment hashes
+        
+        Returns:
+            True if the segment is intact; False means fetch it again
+        """
+        digest = hashlib.sha256(data).digest()
+        
+        if self.tree is not None:
+            valid = 0 <= index < len(self.tree) and digest == self.tree.leaf(index)
+        elif self.root is not None and proof is not None:
+            valid = MerkleTree.verify_proof(digest, index, self.count, proof, self.root)
+        else:
+            raise ValueError("No segment hashes or proof to verify against")
+        
+        if not valid:
+            self.failures += 1
+            logger.warning(f"Segment {index} failed verification")
+            return False
+        
+        self.verified.add(index)
+        if self._hasher is not None:
+            if index == self._next_index:
+                self._hasher.update(data)
+                self._next_index += 1
+            else:
+                # Out-of-order arrival: the Merkle root covers the file instead
+                self._hasher = None
+        return True
+    
+    @property
+    def complete(self) -> bool:
+        """Every segment has arrived intact"""
+        return len(self.verified) == self.count
+    
+    def finish(self) -> bool:
+        """
+        Verify the whole file from what was checked on arrival
+        
+        Returns:
+            True if all segments verified and the file hash, when it could
+            be accumulated, matches
+        """
+        if not self.complete:
+            logger.error(f"Only {len(self.verified)}/{self.count} segments verified")
+            return False
+        
+        if self._hasher is not None and self._hasher.hexdigest() != self.file_hash:
+            logger.error(f"File hash mismatch: expected {self.file_hash}, got {self._hasher.hexdigest()}")
+            return False
+        return True
+
 class UnifiedVerifier:
     """
     Unified download verifier
@@ -64,7 +165,7 @@ class UnifiedVerifier:
                 self._statistics['hash_failures'] += 1
                 logger.error(f"Hash mismatch for {file_path}: expected {expected_hash}, got {calculated_hash}")
                 return False
-                
+        
         except Exception as e:
             logger.error(f"Verification failed: {e}")
             return False
@@ -134,13 +235,12 @@ class UnifiedVerifier:
         
         Args:
             segments: List of segments with hashes
-            root_hash: Expected Merkle root hash
+            root_hash: Expected Merkle root hash (binary tree, or a root
+                from the legacy hex-string tree)
         
         Returns:
             True if Merkle tree is valid
         """
-        from ..segmentation.hashing import UnifiedHashing
-        
         # Extract segment hashes
         hashes = []
         for segment in sorted(segments, key=lambda s: s.get('segment_index', 0)):
@@ -154,8 +254,9 @@ class UnifiedVerifier:
                 hashes.append(hashlib.sha256(data).hexdigest())
         
         # Calculate Merkle root
-        hashing = UnifiedHashing()
-        calculated_root = hashing.calculate_merkle_root(hashes)
+        calculated_root = UnifiedHashing.calculate_binary_merkle_root(hashes)
+        if calculated_root != root_hash:
+            calculated_root = UnifiedHashing.calculate_merkle_root(hashes)
         
         if calculated_root == root_hash:
             logger.info("Merkle tree verification successful")
@@ -164,6 +265,37 @@ class UnifiedVerifier:
             logger.error(f"Merkle root mismatch: expected {root_hash}, got {calculated_root}")
             return False
     
+    def verify_segment_proof(self, data: bytes, index: int, count: int,
+                             proof: List[bytes], root_hash: Union[str, bytes]) -> bool:
+        """
+        Verify a single segment against a Merkle root as it arrives
+        
+        Args:
+            data: Segment data
+            index: Segment index
+            count: Number of segments in the file
+            proof: Sibling digests (MerkleTree.proof)
+            root_hash: Merkle root, hex or raw
+        
+        Returns:
+            True if the segment is intact
+        """
+        root = bytes.fromhex(root_hash) if isinstance(root_hash, str) else root_hash
+        if MerkleTree.verify_proof(hashlib.sha256(data).digest(), index, count, proof, root):
+            self._statistics['segments_verified'] += 1
+            return True
+        
+        self._statistics['hash_failures'] += 1
+        logger.warning(f"Segment {index} failed Merkle proof")
+        return False
+    
+    def segment_verifier(self, segment_hashes: Optional[List[str]] = None,
+                         root_hash: Optional[str] = None,
+                         segment_count: Optional[int] = None,
+                         file_hash: Optional[str] = None) -> SegmentVerifier:
+        """Incremental verifier for one file (see SegmentVerifier)"""
+        return SegmentVerifier(segment_hashes, root_hash, segment_count, file_hash)
+    
     def verify_redundancy(self, primary_data: bytes,
                          redundant_data: List[bytes]) -> bool:
         """
@@ -13,6 +13,7 @@ import json
 import base64
 import threading
 import tempfile
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any
@@ -22,6 +23,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from unified.segmentation.packing import UnifiedPacking
+from unified.segmentation.compression import UnifiedCompression
+from unified.segmentation.headers import UnifiedHeaders
+from unified.networking.yenc import UnifiedYenc
+from unified.download.verifier import SegmentVerifier
+
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -44,6 +51,10 @@ class DownloadTask:
     downloaded_size: int = 0
     status: str = 'pending'
     error_message: Optional[str] = None
+    articles_fetched: int = 0
+    segments_refetched: int = 0  # Corrupt on arrival, fetched again
+    dictionary: Optional[bytes] = None  # Share dictionary for packed files
+    packs: 'OrderedDict' = field(default_factory=OrderedDict)  # Recently fetched packs
 
 @dataclass
 class SegmentRetrievalTask:
@@ -68,6 +79,7 @@ class FileReconstruction:
     segment_count: int
     segments_retrieved: List[bytes] = field(default_factory=list)
     final_path: Optional[str] = None
+    written_hash: Optional[str] = None  # SHA256 of the bytes as they were written
 
 # ============================================================================
 # UNIFIED DOWNLOAD SYSTEM
@@ -76,24 +88,34 @@ class FileReconstruction:
 class UnifiedDownloadSystem:
     """Unified download system with segment retrieval and file reconstruction"""
     
-    def __init__(self, nntp_client, db_manager, security_system=None):
+    # Packed segments kept per download while their members are extracted
+    PACK_CACHE_SIZE = 8
+    
+    def __init__(self, nntp_client, db_manager, security_system=None, progress_bus=None):
         self.nntp = nntp_client
         self.db = db_manager
         self.security = security_system
+        self.progress = progress_bus  # Optional ProgressBus for live updates
+        self.packing = UnifiedPacking()
+        self.compression = UnifiedCompression()
         self.active_downloads = {}
         self._lock = threading.Lock()
         
     def download_share(self, share_id: str, destination_path: str,
                        password: Optional[str] = None,
-                       user_id: Optional[str] = None) -> Dict[str, Any]:
+                       user_id: Optional[str] = None,
+                       selected_files: Optional[List[str]] = None) -> Dict[str, Any]:
         """
-        Download a complete share
+        Download a share, or selected files of it
         
         Args:
             share_id: Share ID to download
             destination_path: Where to save files
             password: Password for PROTECTED shares
             user_id: User ID for PRIVATE shares
+            selected_files: Paths to download; None downloads everything.
+                Files inside packed segments are extracted from their pack
+                without fetching or writing the other members.
             
         Returns:
             Download statistics
@@ -131,13 +153,20 @@ class UnifiedDownloadSystem:
             
             # Parse index to get file list
             files = self._parse_index(index_data)
+            if selected_files is not None:
+                wanted = set(selected_files)
+                files = [f for f in files if f['file_path'] in wanted]
             task.total_files = len(files)
+            task.dictionary = self._index_dictionary(index_data)
             
             # Count total segments
             for file_info in files:
                 task.total_segments += file_info['segment_count']
                 task.total_size += file_info['file_size']
                 
+            self._publish(task, status='downloading', total_files=task.total_files,
+                          total=task.total_segments, total_size=task.total_size)
+            
             # Download each file
             for file_info in files:
                 success = self._download_file(task, file_info)
@@ -147,6 +176,7 @@ class UnifiedDownloadSystem:
                     logger.error(f"Failed to download: {file_info['file_path']}")
                     
             task.status = 'completed'
+            self._publish(task, status='completed', completed_files=task.completed_files)
             
             # Calculate statistics
             stats = {
@@ -157,6 +187,8 @@ class UnifiedDownloadSystem:
                 'completed_segments': task.completed_segments,
                 'total_size': task.total_size,
                 'downloaded_size': task.downloaded_size,
+                'articles_fetched': task.articles_fetched,
+                'segments_refetched': task.segments_refetched,
                 'success_rate': task.completed_files / task.total_files if task.total_files > 0 else 0
             }
             
@@ -167,6 +199,7 @@ class UnifiedDownloadSystem:
         except Exception as e:
             task.status = 'failed'
             task.error_message = str(e)
+            self._publish(task, status='failed', error_message=str(e))
             logger.error(f"Download failed: {e}")
             raise
             
@@ -193,24 +226,26 @@ class UnifiedDownloadSystem:
             # Get segment information
             segments = self._get_file_segments(file_info['file_id'])
             
+            # Small files live inside a packed segment: extract just this member
+            if len(segments) == 1 and self._is_packed(segments[0]):
+                return self._download_packed_file(task, file_info, segments[0])
+                
+            # Each segment is checked as it arrives, against the index
+            # hashes (authenticated by the file's Merkle root when published)
+            verifier = self._segment_verifier(file_info, segments)
+            
             # Download each segment
             for segment in segments:
-                segment_data = self._retrieve_segment(segment)
-                if segment_data:
-                    reconstruction.segments_retrieved.append(segment_data)
-                    task.completed_segments += 1
-                    task.downloaded_size += len(segment_data)
-                else:
-                    # Try redundancy copies
-                    segment_data = self._retrieve_redundancy(segment)
-                    if segment_data:
-                        reconstruction.segments_retrieved.append(segment_data)
-                        task.completed_segments += 1
-                        task.downloaded_size += len(segment_data)
-                    else:
-                        logger.error(f"Failed to retrieve segment {segment['segment_index']}")
-                        return False
-                        
+                segment_data = self._retrieve_verified_segment(task, segment, verifier,
+                                                               file_info['file_path'])
+                if segment_data is None:
+                    logger.error(f"Failed to retrieve segment {segment['segment_index']}")
+                    return False
+                reconstruction.segments_retrieved.append(segment_data)
+                task.completed_segments += 1
+                task.downloaded_size += len(segment_data)
+                self._publish(task)
+                
             # Reconstruct file
             success = self._reconstruct_file(reconstruction, task.destination_path)
             
@@ -229,6 +264,135 @@ class UnifiedDownloadSystem:
             logger.error(f"Error downloading file {file_info['file_path']}: {e}")
             return False
             
+    def _publish(self, task: DownloadTask, **fields):
+        """Report task progress on the progress bus, if one is attached"""
+        if self.progress is None:
+            return
+        self.progress.publish(f"download_{task.share_id}", type='download',
+                              current=task.completed_segments,
+                              processed_size=task.downloaded_size, **fields)
+        
+    def _segment_verifier(self, file_info: dict, segments: List[dict]) -> Optional[SegmentVerifier]:
+        """Per-segment verifier when every segment has a published hash"""
+        hashes = [segment.get('segment_hash') for segment in segments]
+        if not hashes or not all(hashes):
+            return None
+            
+        # Raises if the hashes do not add up to the published root
+        return SegmentVerifier(hashes, root_hash=file_info.get('merkle_root'))
+        
+    def _retrieve_verified_segment(self, task: DownloadTask, segment: dict,
+                                   verifier: Optional[SegmentVerifier],
+                                   file_path: str) -> Optional[bytes]:
+        """
+        Retrieve a segment, re-fetching from redundancy copies if it is
+        missing or fails verification
+        """
+        if self._is_packed(segment):
+            # Small tail segments of larger files travel inside a pack
+            segment_data = self._extract_packed(
+                task, segment, UnifiedPacking.member_name(file_path, segment['segment_index'])
+            )
+        else:
+            segment_data = self._retrieve_segment(segment)
+            if segment_data is not None:
+                task.articles_fetched += 1
+                
+        if segment_data is not None:
+            if verifier is None or verifier.verify_segment(segment['segment_index'], segment_data):
+                return segment_data
+            task.segments_refetched += 1
+            
+        # Try redundancy copies
+        return self._retrieve_redundancy(segment, verifier)
+        
+    def _is_packed(self, segment: dict) -> bool:
+        """Segment carried inside a packed segment rather than its own article"""
+        return bool(segment.get('packed_segment_id')) and not segment.get('message_id')
+        
+    def _download_packed_file(self, task: DownloadTask, file_info: dict,
+                              segment: dict) -> bool:
+        """
+        Extract one file from its packed segment
+        
+        Only the member's byte range is decoded and verified, and only the
+        requested file is written; the pack stays cached for later members.
+        """
+        content = self._extract_packed(task, segment, file_info['file_path'])
+        if content is None:
+            return False
+            
+        # Verify before anything is written
+        content_hash = hashlib.sha256(content).hexdigest()
+        for expected in (segment.get('segment_hash'), file_info.get('file_hash')):
+            if expected and content_hash != expected:
+                logger.error(f"Hash mismatch for packed file {file_info['file_path']}")
+                return False
+                
+        reconstruction = FileReconstruction(
+            file_id=file_info['file_id'],
+            file_path=file_info['file_path'],
+            file_hash=file_info['file_hash'],
+            file_size=file_info['file_size'],
+            segment_count=1,
+            segments_retrieved=[content]
+        )
+        if not self._reconstruct_file(reconstruction, task.destination_path):
+            return False
+            
+        task.completed_segments += 1
+        task.downloaded_size += len(content)
+        return True
+        
+    def _extract_packed(self, task: DownloadTask, segment: dict, name: str) -> Optional[bytes]:
+        """Decode one member of the segment's pack"""
+        pack = self._get_pack(task, segment['packed_segment_id'])
+        if pack is None:
+            logger.error(f"Failed to retrieve pack for {name}")
+            return None
+            
+        data, index = pack
+        member = index.find(name)
+        if member is None:
+            logger.error(f"{name} not found in pack {segment['packed_segment_id']}")
+            return None
+            
+        start = index.data_start + member['offset']
+        return self.packing.decode_member(
+            bytes(data[start:start + member['stored_size']]), member, index, task.dictionary
+        )
+        
+    def _get_pack(self, task: DownloadTask, packed_segment_id: str):
+        """Packed segment data and member table, fetched once per download"""
+        if packed_segment_id in task.packs:
+            task.packs.move_to_end(packed_segment_id)
+            return task.packs[packed_segment_id]
+            
+        row = self.db.fetchone(
+            "SELECT message_id FROM packed_segments WHERE packed_segment_id = %s",
+            (packed_segment_id,)
+        )
+        if not row or not row['message_id']:
+            return None
+            
+        data = self._retrieve_segment({'message_id': row['message_id']})
+        if data is None:
+            return None
+        task.articles_fetched += 1
+        
+        pack = (memoryview(data), self.packing.read_index(data))
+        task.packs[packed_segment_id] = pack
+        if len(task.packs) > self.PACK_CACHE_SIZE:
+            task.packs.popitem(last=False)
+        return pack
+        
+    def _index_dictionary(self, index_data) -> Optional[bytes]:
+        """Share compression dictionary published in the index"""
+        compression = index_data.get('compression') if isinstance(index_data, dict) else None
+        if compression and compression.get('dictionary'):
+            return base64.b64decode(compression['dictionary'])
+        return None
+        
     def _retrieve_segment(self, segment: dict) -> Optional[bytes]:
         """Retrieve a segment from Usenet"""
         try:
@@ -249,11 +413,15 @@ class UnifiedDownloadSystem:
                 # Decode if needed (yEnc, base64, etc.)
                 decoded_data = self._decode_segment_data(data)
                 
+                # Redundancy copies carry their marker outside the encryption
+                if segment.get('redundancy_level'):
+                    decoded_data = self._extract_from_redundancy(decoded_data)
+                    
                 # Decrypt if security system available
                 if self.security:
                     decoded_data = self.security.decrypt_data(decoded_data)
                     
-                return decoded_data
+                return self._unwrap_segment(decoded_data)
                 
         except Exception as e:
             logger.error(f"Failed to retrieve segment: {e}")
@@ -277,8 +445,9 @@ class UnifiedDownloadSystem:
             
         return None
         
-    def _retrieve_redundancy(self, segment: dict) -> Optional[bytes]:
-        """Try to retrieve redundancy copies"""
+    def _retrieve_redundancy(self, segment: dict,
+                             verifier: Optional[SegmentVerifier] = None) -> Optional[bytes]:
+        """Try to retrieve redundancy copies, skipping ones that fail verification"""
         # Get redundancy segments
         redundancy_segments = self.db.fetchall("""
             SELECT * FROM segments
@@ -289,21 +458,34 @@ class UnifiedDownloadSystem:
         """, (segment['file_id'], segment['segment_index']))
         
         for r_segment in redundancy_segments:
-            r_data = self._retrieve_segment(dict(r_segment))
-            if r_data:
-                # Extract original data from redundancy copy
-                return self._extract_from_redundancy(r_data)
+            original = self._retrieve_segment(dict(r_segment))
+            if original:
+                if verifier is None or verifier.verify_segment(segment['segment_index'], original):
+                    return original
                 
         return None
         
-    def _extract_from_redundancy(self, redundant_data: bytes) -> bytes:
+    @staticmethod
+    def _extract_from_redundancy(redundant_data: bytes) -> bytes:
         """Extract original data from redundancy copy"""
-        # Remove redundancy metadata
-        lines = redundant_data.split(b'\n')
-        if lines[0].startswith(b'REDUNDANCY_COPY_'):
-            return b'\n'.join(lines[1:])
+        # Copies start with "\nREDUNDANCY_COPY_<n>_<time>\n" (see
+        # UnifiedUploadSystem._create_redundant_copy)
+        marker = b'\nREDUNDANCY_COPY_'
+        if redundant_data.startswith(marker):
+            end = redundant_data.find(b'\n', len(marker))
+            if end != -1:
+                return redundant_data[end + 1:]
         return redundant_data
         
+    def _unwrap_segment(self, data: bytes) -> bytes:
+        """Strip the segment header and decompress with the codec it records"""
+        if not data.startswith(UnifiedHeaders.MAGIC):
+            # Segments posted without a header carry the raw data
+            return data
+            
+        header = UnifiedHeaders.parse_header(data)
+        return self.compression.decompress(data[header['header_size']:], header['compression'])
+        
     def _reconstruct_file(self, reconstruction: FileReconstruction,
                           destination_base: str) -> bool:
         """Reconstruct file from segments"""
@@ -314,12 +496,16 @@ class UnifiedDownloadSystem:
             # Create directories if needed
             full_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Write segments to file
+            # Write segments to file, hashing them on the way out so the
+            # file is never read back for verification
+            hasher = hashlib.sha256()
             with open(full_path, 'wb') as f:
                 for segment_data in reconstruction.segments_retrieved:
                     f.write(segment_data)
+                    hasher.update(segment_data)
                     
             reconstruction.final_path = str(full_path)
+            reconstruction.written_hash = hasher.hexdigest()
             
             logger.info(f"Reconstructed file: {full_path}")
             return True
@@ -334,12 +520,14 @@ class UnifiedDownloadSystem:
             return False
             
         try:
-            hasher = hashlib.sha256()
-            with open(reconstruction.final_path, 'rb') as f:
-                while chunk := f.read(8192):
-                    hasher.update(chunk)
-                    
-            calculated_hash = hasher.hexdigest()
+            calculated_hash = reconstruction.written_hash
+            if calculated_hash is None:
+                hasher = hashlib.sha256()
+                with open(reconstruction.final_path, 'rb') as f:
+                    while chunk := f.read(8192):
+                        hasher.update(chunk)
+                calculated_hash = hasher.hexdigest()
+                
             expected_hash = reconstruction.file_hash
             
             if calculated_hash == expected_hash:
@@ -444,30 +632,7 @@ class UnifiedDownloadSystem:
             
     def _decode_yenc(self, data: bytes) -> bytes:
         """Decode yEnc encoded data"""
-        # Simple yEnc decoder (production would use proper library)
-        lines = data.split(b'\n')
-        decoded = bytearray()
-        
-        in_data = False
-        for line in lines:
-            if line.startswith(b'=ybegin'):
-                in_data = True
-                continue
-            elif line.startswith(b'=yend'):
-                break
-            elif in_data:
-                # Decode line
-                i = 0
-                while i < len(line):
-                    if line[i] == ord('='):
-                        i += 1
-                        if i < len(line):
-                            decoded.append((line[i] - 64 - 42) & 0xFF)
-                    else:
-                        decoded.append((line[i] - 42) & 0xFF)
-                    i += 1
-                    
-        return bytes(decoded)
+        return UnifiedYenc.unwrap_data(data)
 
 # ============================================================================
 # INTELLIGENT RETRIEVAL SYSTEM
@@ -476,13 +641,16 @@ class UnifiedDownloadSystem:
 class IntelligentRetrievalSystem:
     """Advanced retrieval with fallback mechanisms"""
     
-    def __init__(self, nntp_client, db_manager):
+    def __init__(self, nntp_client, db_manager, availability=None, connection_pool=None):
         self.nntp = nntp_client
         self.db = db_manager
+        self.availability = availability  # UnifiedAvailability with pre-flight scans
+        self.pool = connection_pool  # Fetches planned copies from the server holding them
         self.retrieval_cache = {}
         self.server_health = {}
         
-    def retrieve_with_fallback(self, segment_info: dict) -> Optional[bytes]:
+    def retrieve_with_fallback(self, segment_info: dict,
+                               share_id: Optional[str] = None) -> Optional[bytes]:
         """Retrieve segment with multiple fallback strategies"""
         strategies = [
             ('message_id', self._retrieve_by_message_id),
@@ -491,6 +659,16 @@ class IntelligentRetrievalSystem:
             ('pattern', self._retrieve_by_pattern_match),
         ]
         
+        # Use pre-flight availability scan to skip articles known to be gone
+        planned = self.get_planned_source(segment_info, share_id)
+        if planned:
+            if planned['status'] == 'missing':
+                strategies = [s for s in strategies if s[0] in ('subject', 'pattern')]
+            elif planned['status'] in ('available', 'redundancy'):
+                strategies = [('planned', lambda info: self.retrieve_planned(planned))] + [
+                    s for s in strategies if s[0] in ('subject', 'pattern')
+                ]
+        
         for strategy_name, strategy_func in strategies:
             try:
                 logger.debug(f"Trying retrieval strategy: {strategy_name}")
@@ -503,6 +681,32 @@ class IntelligentRetrievalSystem:
                 
         return None
         
+    def get_planned_source(self, segment_info: dict,
+                           share_id: Optional[str]) -> Optional[dict]:
+        """Look up the planned source for a segment from the availability scan"""
+        if not self.availability or not share_id:
+            return None
+            
+        return self.availability.get_segment_plan(
+            share_id,
+            segment_info.get('file_id'),
+            segment_info.get('segment_index')
+        )
+        
+    def retrieve_planned(self, planned: dict) -> Optional[bytes]:
+        """Retrieve the copy chosen by the availability scan, from the server it chose"""
+        if self.pool:
+            data = self.pool.retrieve_body(planned['message_id'],
+                                           prefer_server=planned.get('server'))
+            if data and data.startswith(b'=ybegin'):
+                # Pooled uploads post segments yEnc-encoded
+                data = UnifiedYenc.unwrap_data(data)
+        else:
+            data = self._retrieve_by_message_id({'message_id': planned['message_id']})
+        if data and planned.get('redundancy_index'):
+            return self._extract_original_from_redundancy(data)
+        return data
+        
     def _retrieve_by_message_id(self, segment_info: dict) -> Optional[bytes]:
         """Retrieve by message ID"""
         message_id = segment_info.get('message_id')
@@ -576,12 +780,7 @@ class IntelligentRetrievalSystem:
         
     def _extract_original_from_redundancy(self, data: bytes) -> bytes:
         """Extract original data from redundancy copy"""
-        # Remove redundancy headers
-        if b'REDUNDANCY_COPY_' in data[:100]:
-            lines = data.split(b'\n', 1)
-            if len(lines) > 1:
-                return lines[1]
-        return data
+        return UnifiedDownloadSystem._extract_from_redundancy(data)
 
 
 if __name__ == "__main__":
@@ -5,7 +5,7 @@ Production-ready with versioning and large dataset support
 
 from .scanner import UnifiedScanner
 from .versioning import UnifiedVersioning  
-from .binary_index import UnifiedBinaryIndex
+from .binary_index import UnifiedBinaryIndex, CoreIndexReader, PagedCoreIndex
 from .streaming import UnifiedStreaming
 from .change_detection import UnifiedChangeDetection
 from .folder_stats import UnifiedFolderStats
@@ -14,6 +14,8 @@ __all__ = [
     'UnifiedScanner',
     'UnifiedVersioning',
     'UnifiedBinaryIndex', 
+    'CoreIndexReader',
+    'PagedCoreIndex',
     'UnifiedStreaming',
     'UnifiedChangeDetection',
     'UnifiedFolderStats'
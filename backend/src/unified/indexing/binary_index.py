@@ -1,17 +1,37 @@
 #!/usr/bin/env python3
 """
 Unified Binary Index Module - Efficient binary index format
+Table-based core index that can be mmapped and queried without a full parse
 """
 
+import os
+import mmap
 import struct
 import zlib
 import json
-from typing import Dict, Any, Optional
+import bisect
+import tempfile
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Iterable, Iterator, List, BinaryIO, Callable, Tuple
 from pathlib import Path
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Core index layout (little endian):
+#   header | meta JSON | directory table | file table | segment table | string heap
+# Table records have fixed sizes, strings are (offset, length) into the heap
+CORE_MAGIC = b'USCI'  # UsenetSync Core Index
+CORE_VERSION = 2
+FLAG_SORTED = 0x1  # file table is in path order, find() may bisect
+
+HEADER = struct.Struct('<4sHHIIQQIQQQQ')
+DIRECTORY = struct.Struct('<IQH')          # parent, name
+FILE = struct.Struct('<IQHQHQHQQI')       # directory, name, file_id, hash, size, first segment, segment count
+SEGMENT = struct.Struct('<IIQHQH')        # index, size, hash, message_id
+NO_PARENT = 0xFFFFFFFF
+HEX_STRING = 0x8000  # string length flag: stored as raw bytes of a hex digest
+
 class UnifiedBinaryIndex:
     """Binary index for efficient storage"""
     
@@ -52,4 +72,548 @@ class UnifiedBinaryIndex:
         compressed = data[14:14+comp_size]
         json_data = zlib.decompress(compressed)
         
-        return json.loads(json_data)
\ No newline at end of file
+        return json.loads(json_data)
+    
+    def write_core_index(self, meta: Dict[str, Any], rows: Iterable[Dict[str, Any]],
+                         output: BinaryIO) -> Dict[str, int]:
+        """
+        Write a table-based core index from a stream of file/segment rows
+        
+        Args:
+            meta: Share, folder and encryption metadata (stored as JSON)
+            rows: One row per segment, grouped by file, with keys file_id, path,
+                  size, hash, segment_index, segment_size, segment_hash, message_id.
+                  Files without segments have segment_index None.
+            output: Writable binary file object
+        
+        Returns:
+            Counts of files, directories and segments written
+        """
+        writer = _CoreIndexWriter()
+        try:
+            for row in rows:
+                writer.add(row)
+            return writer.finish(meta, output)
+        finally:
+            writer.close()
+    
+    def build_core_index(self, meta: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> bytes:
+        """Build a core index in memory"""
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as output:
+            self.write_core_index(meta, rows, output)
+            output.seek(0)
+            return output.read()
+    
+    def iter_core_index_pages(self, rows: Iterable[Dict[str, Any]],
+                              page_files: int = 50000) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+        """
+        Split a path-ordered row stream into core index pages by subtree
+        
+        Pages are contiguous path ranges, so each directory subtree maps to
+        one page or a run of adjacent pages. A page is closed once it holds
+        page_files files and the next file starts a new directory; a single
+        directory only spills over after twice that many files.
+        
+        Args:
+            rows: Same rows as write_core_index, ordered by path
+            page_files: Target files per page
+        
+        Yields:
+            (page_info, page_bytes); page_bytes is a complete core index
+        """
+        writer = None
+        info = None
+        file_id = None
+        directory = None
+        
+        for row in rows:
+            if writer is None or row['file_id'] != file_id:
+                file_id = row['file_id']
+                path = str(row['path']).replace('\\', '/').strip('/')
+                parent = path.rpartition('/')[0]
+                
+                if writer and (
+                    (info['files'] >= page_files and parent != directory) or
+                    info['files'] >= 2 * page_files
+                ):
+                    yield self._finish_page(writer, info)
+                    writer = None
+                
+                if writer is None:
+                    writer = _CoreIndexWriter()
+                    info = {'page': info['page'] + 1 if info else 0, 'first': path, 'files': 0}
+                
+                info['last'] = path
+                info['files'] += 1
+                directory = parent
+            
+            writer.add(row)
+        
+        if writer:
+            yield self._finish_page(writer, info)
+    
+    def _finish_page(self, writer: '_CoreIndexWriter', info: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        try:
+            with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as output:
+                counts = writer.finish({'page': info['page']}, output)
+                output.seek(0)
+                data = output.read()
+        finally:
+            writer.close()
+        
+        first, last = info['first'], info['last']
+        prefix = os.path.commonprefix([first, last]).rpartition('/')[0]
+        
+        return {
+            'page': info['page'],
+            'first': first,
+            'last': last,
+            'prefix': prefix,
+            'files': counts['files'],
+            'segments': counts['segments'],
+            'sorted': writer.sorted,
+            'size': len(data)
+        }, data
+
+class _CoreIndexWriter:
+    """Streams rows into spooled table sections"""
+    
+    def __init__(self):
+        spool = 8 * 1024 * 1024
+        self.directories = tempfile.SpooledTemporaryFile(max_size=spool)
+        self.files = tempfile.SpooledTemporaryFile(max_size=spool)
+        self.segments = tempfile.SpooledTemporaryFile(max_size=spool)
+        self.strings = tempfile.SpooledTemporaryFile(max_size=spool)
+        self.string_size = 0
+        self.directory_ids = {'': NO_PARENT}
+        self.file_count = 0
+        self.segment_count = 0
+        self.sorted = True
+        self._last_path = None
+        self._file = None  # row of the file being written
+        self._file_first = 0
+        self._file_segments = 0
+    
+    def _string(self, value, digest: bool = False) -> tuple:
+        if value is None:
+            return 0, 0
+        value = str(value)
+        
+        data, flag = value.encode('utf-8'), 0
+        
+        # Lowercase hex digests are stored at half size
+        if digest and value:
+            try:
+                raw = bytes.fromhex(value)
+                if raw.hex() == value:
+                    data, flag = raw, HEX_STRING
+            except ValueError:
+                pass
+        
+        if len(data) >= HEX_STRING:
+            raise ValueError(f"Core index string too long: {len(data)} bytes")
+        offset = self.string_size
+        self.strings.write(data)
+        self.string_size += len(data)
+        return offset, len(data) | flag
+    
+    def _directory(self, path: str) -> int:
+        """Intern a directory path, parents first"""
+        directory_id = self.directory_ids.get(path)
+        if directory_id is not None:
+            return directory_id
+        
+        parent, _, name = path.rpartition('/')
+        parent_id = self._directory(parent)
+        directory_id = len(self.directory_ids) - 1
+        self.directories.write(DIRECTORY.pack(parent_id, *self._string(name)))
+        self.directory_ids[path] = directory_id
+        return directory_id
+    
+    def add(self, row: Dict[str, Any]):
+        if self._file is None or row['file_id'] != self._file['file_id']:
+            self._end_file()
+            self._file = row
+            self._file_first = self.segment_count
+            self._file_segments = 0
+        
+        if row.get('segment_index') is None:
+            return
+        
+        self.segments.write(SEGMENT.pack(
+            row['segment_index'],
+            row.get('segment_size') or 0,
+            *self._string(row.get('segment_hash'), digest=True),
+            *self._string(row.get('message_id'))
+        ))
+        self.segment_count += 1
+        self._file_segments += 1
+    
+    def _end_file(self):
+        row = self._file
+        if row is None:
+            return
+        
+        path = str(row['path']).replace('\\', '/').strip('/')
+        if self._last_path is not None and path < self._last_path:
+            self.sorted = False
+        self._last_path = path
+        
+        directory, _, name = path.rpartition('/')
+        self.files.write(FILE.pack(
+            self._directory(directory),
+            *self._string(name),
+            *self._string(row['file_id']),
+            *self._string(row.get('hash'), digest=True),
+            row.get('size') or 0,
+            self._file_first,
+            self._file_segments
+        ))
+        self.file_count += 1
+        self._file = None
+    
+    def finish(self, meta: Dict[str, Any], output: BinaryIO) -> Dict[str, int]:
+        self._end_file()
+        
+        meta_data = json.dumps(meta, default=str).encode('utf-8')
+        directory_count = len(self.directory_ids) - 1
+        
+        directory_offset = HEADER.size + len(meta_data)
+        file_offset = directory_offset + directory_count * DIRECTORY.size
+        segment_offset = file_offset + self.file_count * FILE.size
+        string_offset = segment_offset + self.segment_count * SEGMENT.size
+        
+        output.write(HEADER.pack(
+            CORE_MAGIC, CORE_VERSION, FLAG_SORTED if self.sorted else 0,
+            self.file_count, directory_count, self.segment_count,
+            HEADER.size, len(meta_data),
+            directory_offset, file_offset, segment_offset, string_offset
+        ))
+        output.write(meta_data)
+        
+        for section in (self.directories, self.files, self.segments, self.strings):
+            section.seek(0)
+            while True:
+                chunk = section.read(1024 * 1024)
+                if not chunk:
+                    break
+                output.write(chunk)
+        
+        return {
+            'files': self.file_count,
+            'directories': directory_count,
+            'segments': self.segment_count
+        }
+    
+    def close(self):
+        for section in (self.directories, self.files, self.segments, self.strings):
+            section.close()
+
+class CoreIndexReader:
+    """
+    Lazy reader for table-based core indexes
+    Opening parses only the fixed header; records and strings are decoded
+    when touched, so memory follows the entries actually used
+    """
+    
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: bytes, mmap or memoryview holding a complete core index
+        """
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        
+        if len(self._view) < HEADER.size:
+            raise ValueError("Invalid core index: truncated header")
+        
+        (magic, version, self.flags, self.file_count, self.directory_count,
+         self.segment_count, self._meta_offset, self._meta_length,
+         self._directory_offset, self._file_offset, self._segment_offset,
+         self._string_offset) = HEADER.unpack_from(self._view, 0)
+        
+        if magic != CORE_MAGIC:
+            raise ValueError("Invalid core index format")
+        if version > CORE_VERSION:
+            raise ValueError(f"Unsupported core index version: {version}")
+        
+        self._meta = None
+        self._directory_paths = {NO_PARENT: ''}
+        self._file = None  # mmap owner, see open()
+    
+    @classmethod
+    def open(cls, path) -> 'CoreIndexReader':
+        """Memory-map a core index file"""
+        f = open(path, 'rb')
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        reader = cls(mapped)
+        reader._file = f
+        return reader
+    
+    @staticmethod
+    def is_core_index(data) -> bool:
+        return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:4]) == CORE_MAGIC
+    
+    def close(self):
+        self._view.release()
+        if self._file:
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self._meta is None:
+            start = self._meta_offset
+            self._meta = json.loads(bytes(self._view[start:start + self._meta_length]))
+        return self._meta
+    
+    @property
+    def files(self) -> 'CoreIndexFiles':
+        """Sequence of file entries (with segments), decoded on access"""
+        return CoreIndexFiles(self)
+    
+    def __getitem__(self, key: str):
+        if key == 'files':
+            return self.files
+        return self.meta[key]
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __len__(self) -> int:
+        return self.file_count
+    
+    def _string(self, offset: int, length: int) -> str:
+        start = self._string_offset + offset
+        if length & HEX_STRING:
+            return bytes(self._view[start:start + (length & ~HEX_STRING)]).hex()
+        return bytes(self._view[start:start + length]).decode('utf-8')
+    
+    def _directory_path(self, directory_id: int) -> str:
+        path = self._directory_paths.get(directory_id)
+        if path is None:
+            parent, name_offset, name_length = DIRECTORY.unpack_from(
+                self._view, self._directory_offset + directory_id * DIRECTORY.size
+            )
+            parent_path = self._directory_path(parent)
+            name = self._string(name_offset, name_length)
+            path = f"{parent_path}/{name}" if parent_path else name
+            self._directory_paths[directory_id] = path
+        return path
+    
+    def _record(self, index: int) -> tuple:
+        if not 0 <= index < self.file_count:
+            raise IndexError(index)
+        return FILE.unpack_from(self._view, self._file_offset + index * FILE.size)
+    
+    def path(self, index: int) -> str:
+        """Relative path of file at index"""
+        record = self._record(index)
+        directory = self._directory_path(record[0])
+        name = self._string(record[1], record[2])
+        return f"{directory}/{name}" if directory else name
+    
+    def file(self, index: int) -> Dict[str, Any]:
+        """File entry at index, without segments"""
+        (directory_id, name_offset, name_length, id_offset, id_length,
+         hash_offset, hash_length, size, first, count) = self._record(index)
+        
+        directory = self._directory_path(directory_id)
+        name = self._string(name_offset, name_length)
+        return {
+            'index': index,
+            'file_id': self._string(id_offset, id_length),
+            'name': name,
+            'path': f"{directory}/{name}" if directory else name,
+            'size': size,
+            'hash': self._string(hash_offset, hash_length),
+            'segment_count': count
+        }
+    
+    def segments(self, index: int) -> List[Dict[str, Any]]:
+        """Segments of file at index"""
+        record = self._record(index)
+        first, count = record[8], record[9]
+        
+        segments = []
+        for position in range(first, first + count):
+            segment_index, size, hash_offset, hash_length, id_offset, id_length = SEGMENT.unpack_from(
+                self._view, self._segment_offset + position * SEGMENT.size
+            )
+            segments.append({
+                'index': segment_index,
+                'size': size,
+                'hash': self._string(hash_offset, hash_length),
+                'message_id': self._string(id_offset, id_length) if id_length else None
+            })
+        return segments
+    
+    def _lower_bound(self, path: str) -> int:
+        low, high = 0, self.file_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.path(middle) < path:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def find(self, path: str) -> Optional[Dict[str, Any]]:
+        """Look up a file by relative path"""
+        path = path.replace('\\', '/').strip('/')
+        
+        if self.flags & FLAG_SORTED:
+            index = self._lower_bound(path)
+            if index < self.file_count and self.path(index) == path:
+                return self.file(index)
+            return None
+        
+        for index in range(self.file_count):
+            if self.path(index) == path:
+                return self.file(index)
+        return None
+    
+    def iter_prefix(self, prefix: str) -> Iterator[Dict[str, Any]]:
+        """Iterate files under a directory prefix"""
+        prefix = prefix.replace('\\', '/').strip('/')
+        if prefix:
+            prefix += '/'
+        
+        start = self._lower_bound(prefix) if self.flags & FLAG_SORTED else 0
+        for index in range(start, self.file_count):
+            path = self.path(index)
+            if path.startswith(prefix):
+                yield self.file(index)
+            elif self.flags & FLAG_SORTED:
+                break
+
+class CoreIndexFiles:
+    """Sequence view over core index files, compatible with the JSON 'files' list"""
+    
+    def __init__(self, reader: CoreIndexReader):
+        self._reader = reader
+    
+    def __len__(self) -> int:
+        return self._reader.file_count
+    
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        entry = self._reader.file(index)
+        entry['segments'] = self._reader.segments(index)
+        return entry
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+
+class PagedCoreIndex:
+    """
+    Core index split into independently fetched pages
+    The root holds share metadata and one entry per page (path range,
+    common prefix, counts and whatever the publisher needs to fetch and
+    decrypt it). Pages are loaded on first use through load_page.
+    """
+    
+    def __init__(self, root: Dict[str, Any], load_page: Callable[[Dict[str, Any]], bytes],
+                 cache_pages: int = 8):
+        """
+        Args:
+            root: Decoded root page
+            load_page: Returns the plain page bytes for a page entry
+            cache_pages: Decoded pages kept in memory
+        """
+        self.root = root
+        self.entries = sorted(root['pages'], key=lambda entry: entry['page'])
+        self.sorted = all(entry.get('sorted', True) for entry in self.entries) and all(
+            a['last'] < b['first'] for a, b in zip(self.entries, self.entries[1:])
+        )
+        self._firsts = [entry['first'] for entry in self.entries]
+        self._load_page = load_page
+        self._cache = OrderedDict()
+        self._cache_pages = cache_pages
+        self.pages_loaded = 0
+    
+    def __getitem__(self, key: str):
+        if key == 'files':
+            return self.iter_prefix('')
+        return self.root[key]
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __len__(self) -> int:
+        return sum(entry['files'] for entry in self.entries)
+    
+    def page(self, number: int) -> CoreIndexReader:
+        """Decoded page, fetched on first use"""
+        reader = self._cache.get(number)
+        if reader is not None:
+            self._cache.move_to_end(number)
+            return reader
+        
+        reader = CoreIndexReader(self._load_page(self.entries[number]))
+        self.pages_loaded += 1
+        self._cache[number] = reader
+        if len(self._cache) > self._cache_pages:
+            self._cache.popitem(last=False)
+        return reader
+    
+    def pages_for_prefix(self, prefix: str) -> List[Dict[str, Any]]:
+        """Page entries that may hold files under a directory prefix"""
+        prefix = prefix.replace('\\', '/').strip('/')
+        if not prefix:
+            return list(self.entries)
+        if not self.sorted:
+            return list(self.entries)
+        
+        prefix += '/'
+        return [
+            entry for entry in self.entries
+            if entry['last'] >= prefix and (entry['first'] <= prefix or entry['first'].startswith(prefix))
+        ]
+    
+    def find(self, path: str) -> Optional[Dict[str, Any]]:
+        """Look up a file, fetching at most one page when sorted"""
+        path = path.replace('\\', '/').strip('/')
+        
+        if self.sorted:
+            position = bisect.bisect_right(self._firsts, path) - 1
+            candidates = [self.entries[position]] if position >= 0 and path <= self.entries[position]['last'] else []
+        else:
+            candidates = [entry for entry in self.entries if entry['first'] <= path <= entry['last']]
+        
+        for entry in candidates:
+            found = self.page(entry['page']).find(path)
+            if found:
+                found['page'] = entry['page']
+                found['segments'] = self.page(entry['page']).segments(found['index'])
+                return found
+        return None
+    
+    def iter_prefix(self, prefix: str) -> Iterator[Dict[str, Any]]:
+        """Iterate files (with segments) under a prefix, fetching only matching pages"""
+        for entry in self.pages_for_prefix(prefix):
+            reader = self.page(entry['page'])
+            for found in reader.iter_prefix(prefix):
+                found['page'] = entry['page']
+                found['segments'] = reader.segments(found['index'])
+                yield found
+
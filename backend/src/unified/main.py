@@ -9,6 +9,7 @@ import sys
 import time
 import hashlib
 import logging
+import re
 from datetime import datetime
 import uuid
 from pathlib import Path
@@ -20,6 +21,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 # Import all unified modules
 from unified.core.database import UnifiedDatabase, DatabaseConfig, DatabaseType
 from unified.core.schema import UnifiedSchema
+from unified.core.counters import UnifiedCounters
 from unified.core.config import UnifiedConfig, load_config
 from unified.core.models import *
 
@@ -44,6 +46,8 @@ from unified.segmentation.hashing import UnifiedHashing
 from unified.segmentation.compression import UnifiedCompression
 from unified.segmentation.headers import UnifiedHeaders
 
+from unified.monitoring.progress_bus import ProgressBus
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -51,6 +55,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class DBManagerWrapper:
+    """UnifiedDatabase behind the manager interface UnifiedUploadSystem expects"""
+    
+    def __init__(self, db):
+        self.db = db
+        self.db_type = 'sqlite'  # We're using SQLite
+    
+    def fetchall(self, query, params):
+        # Convert %s placeholders to ? for SQLite
+        query = query.replace('%s', '?')
+        # Fix column name mismatches
+        query = query.replace('f.file_path', 'f.path AS file_path')
+        # Keep the alias just added: rows are read by file_path
+        query = re.sub(r'(?<!AS )\bfile_path\b', 'path', query)
+        query = query.replace('s.segment_size', 's.size')
+        query = query.replace('segment_size', 'size')
+        query = query.replace('s.packed_with', 's.packed_segment_id')
+        query = query.replace('packed_with', 'packed_segment_id')
+        # If selecting s.*, add alias for size column
+        if 's.*' in query:
+            query = query.replace('s.*', 's.*, s.size AS segment_size')
+        results = self.db.fetch_all(query, params)
+        # Post-process results to ensure required columns exist
+        if results and isinstance(results, list):
+            for row in results:
+                if 'size' in row and 'segment_size' not in row:
+                    row['segment_size'] = row['size']
+                if 'hash' in row and 'segment_hash' not in row:
+                    row['segment_hash'] = row['hash']
+                if 'segment_index' not in row and 'index' in row:
+                    row['segment_index'] = row['index']
+        return results
+    
+    def fetchone(self, query, params):
+        # Convert %s placeholders to ? for SQLite
+        query = query.replace('%s', '?')
+        # Fix column name mismatches
+        query = query.replace('f.file_path', 'f.path')
+        query = query.replace('file_path', 'path')
+        query = query.replace('s.segment_size', 's.size')
+        query = query.replace('segment_size', 'size')
+        query = query.replace('s.packed_with', 's.packed_segment_id')
+        query = query.replace('packed_with', 'packed_segment_id')
+        return self.db.fetch_one(query, params)
+    
+    def execute(self, query, params):
+        # Convert %s placeholders to ? for SQLite
+        query = query.replace('%s', '?')
+        # Fix column name mismatches
+        query = query.replace('f.file_path', 'f.path')
+        query = query.replace('file_path', 'path')
+        query = query.replace('s.segment_size', 's.size')
+        query = query.replace('segment_size', 'size')
+        query = query.replace('s.packed_with', 's.packed_segment_id')
+        query = query.replace('packed_with', 'packed_segment_id')
+        return self.db.execute(query, params)
+    
+    def insert(self, table, data):
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['?' for _ in data])
+        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        return self.db.execute(query, tuple(data.values()))
+    
+    def insert_returning(self, query, params):
+        # SQLite doesn't support RETURNING, so we'll insert and get last row id
+        query = query.replace('%s', '?')
+        query = query.replace('file_path', 'path')
+        # Remove RETURNING clause for SQLite
+        if 'RETURNING' in query:
+            query = query.split('RETURNING')[0]
+        self.db.execute(query, params)
+        # Get the last inserted row id
+        result = self.db.fetch_one("SELECT last_insert_rowid()", ())
+        return result['last_insert_rowid()'] if result else None
+    
+    def execute_batch(self, statements):
+        # One transaction for a batch of posted-state updates
+        with self.db.transaction() as cursor:
+            for query, params in statements:
+                query = query.replace('%s', '?')
+                query = query.replace('segment_size', 'size')
+                query = query.replace('packed_with', 'packed_segment_id')
+                cursor.execute(query, params)
+
+
 class UnifiedSystem:
     """
     Complete Unified UsenetSync System
@@ -84,6 +173,11 @@ class UnifiedSystem:
         migrations = UnifiedMigrations(self.db)
         migrations.migrate()
         
+        # Maintained row/state/window counts for status endpoints
+        self.counters = UnifiedCounters(self.db)
+        self.counters.install()
+        self.counters.start()
+        
         # Initialize security
         self.encryption = UnifiedEncryption()
         self.auth = UnifiedAuthentication(self.db, self.config.system_data_directory)
@@ -92,6 +186,9 @@ class UnifiedSystem:
         self.key_mgmt = UnifiedKeyManagement(self.db, self.config.system_data_directory)
         self.zkp = ZeroKnowledgeProofs(self.db)
         
+        # Progress of running operations, streamed to API clients
+        self.progress = ProgressBus()
+        
         # Initialize indexing
         self.scanner = UnifiedScanner(self.db, {
             'worker_threads': self.config.indexing_worker_threads,
@@ -120,8 +217,9 @@ class UnifiedSystem:
         from unified.upload.queue import UnifiedUploadQueue
         self.upload_queue = UnifiedUploadQueue(self.db)
         
-        # Initialize upload system if NNTP client is available
+        # Initialize upload and download systems if NNTP client is available
         self.upload_system = None
+        self.download_system = None
         
         # Initialize NNTP client with real credentials
         try:
@@ -142,89 +240,39 @@ class UnifiedSystem:
                 try:
                     from unified.unified_system import UnifiedUploadSystem
                     
-                    # Create database wrapper for UnifiedUploadSystem compatibility
-                    class DBManagerWrapper:
-                        def __init__(self, db):
-                            self.db = db
-                            self.db_type = 'sqlite'  # We're using SQLite
-                        
-                        def fetchall(self, query, params):
-                            # Convert %s placeholders to ? for SQLite
-                            query = query.replace('%s', '?')
-                            # Fix column name mismatches
-                            query = query.replace('f.file_path', 'f.path AS file_path')
-                            query = query.replace('file_path', 'path')
-                            query = query.replace('s.segment_size', 's.size')
-                            query = query.replace('segment_size', 'size')
-                            query = query.replace('s.packed_with', 's.packed_segment_id')
-                            query = query.replace('packed_with', 'packed_segment_id')
-                            # If selecting s.*, add alias for size column
-                            if 's.*' in query:
-                                query = query.replace('s.*', 's.*, s.size AS segment_size')
-                            results = self.db.fetch_all(query, params)
-                            # Post-process results to ensure required columns exist
-                            if results and isinstance(results, list):
-                                for row in results:
-                                    if 'size' in row and 'segment_size' not in row:
-                                        row['segment_size'] = row['size']
-                                    if 'hash' in row and 'segment_hash' not in row:
-                                        row['segment_hash'] = row['hash']
-                                    if 'segment_index' not in row and 'index' in row:
-                                        row['segment_index'] = row['index']
-                            return results
-                        
-                        def fetchone(self, query, params):
-                            # Convert %s placeholders to ? for SQLite
-                            query = query.replace('%s', '?')
-                            # Fix column name mismatches
-                            query = query.replace('f.file_path', 'f.path')
-                            query = query.replace('file_path', 'path')
-                            query = query.replace('s.segment_size', 's.size')
-                            query = query.replace('segment_size', 'size')
-                            query = query.replace('s.packed_with', 's.packed_segment_id')
-                            query = query.replace('packed_with', 'packed_segment_id')
-                            return self.db.fetch_one(query, params)
-                        
-                        def execute(self, query, params):
-                            # Convert %s placeholders to ? for SQLite
-                            query = query.replace('%s', '?')
-                            # Fix column name mismatches
-                            query = query.replace('f.file_path', 'f.path')
-                            query = query.replace('file_path', 'path')
-                            query = query.replace('s.segment_size', 's.size')
-                            query = query.replace('segment_size', 'size')
-                            query = query.replace('s.packed_with', 's.packed_segment_id')
-                            query = query.replace('packed_with', 'packed_segment_id')
-                            return self.db.execute(query, params)
-                        
-                        def insert(self, table, data):
-                            columns = ', '.join(data.keys())
-                            placeholders = ', '.join(['?' for _ in data])
-                            query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-                            return self.db.execute(query, tuple(data.values()))
-                        
-                        def insert_returning(self, query, params):
-                            # SQLite doesn't support RETURNING, so we'll insert and get last row id
-                            query = query.replace('%s', '?')
-                            query = query.replace('file_path', 'path')
-                            # Remove RETURNING clause for SQLite
-                            if 'RETURNING' in query:
-                                query = query.split('RETURNING')[0]
-                            self.db.execute(query, params)
-                            # Get the last inserted row id
-                            result = self.db.fetch_one("SELECT last_insert_rowid()", ())
-                            return result['last_insert_rowid()'] if result else None
-                    
                     db_wrapper = DBManagerWrapper(self.db)
                     
+                    # Concurrent posting spreads articles over pooled connections
+                    try:
+                        upload_pool = self.get_connection_pool()
+                    except Exception as e:
+                        logger.debug(f"Upload connection pool unavailable: {e}")
+                        upload_pool = None
+                    
                     self.upload_system = UnifiedUploadSystem(
                         nntp_client=self.nntp_client,
                         db_manager=db_wrapper,
-                        security_system=self.encryption
+                        security_system=self.encryption,
+                        connection_pool=upload_pool,
+                        connections=self.config.upload_worker_threads
                     )
                     logger.info("✓ Upload system initialized")
                 except Exception as e:
                     logger.warning(f"Could not initialize upload system: {e}")
+                
+                # Downloads publish progress on the bus the API streams
+                try:
+                    from unified.download_system import UnifiedDownloadSystem
+                    
+                    self.download_system = UnifiedDownloadSystem(
+                        self.nntp_client,
+                        DBManagerWrapper(self.db),
+                        security_system=self.encryption,
+                        progress_bus=self.progress
+                    )
+                    logger.info("✓ Download system initialized")
+                except Exception as e:
+                    logger.warning(f"Could not initialize download system: {e}")
             else:
                 logger.warning("Could not connect to Newshosting")
                 self.nntp_client = None
@@ -411,6 +459,9 @@ class UnifiedSystem:
         logger.info(f"Indexing folder: {folder_path}")
         file_count = 0
         total_size = 0
+        progress_id = progress_id or f"index_{folder_id}"
+        self.progress.publish(progress_id, type='indexing', status='indexing',
+                              entity_id=folder_id, entity_type='folder', path=str(folder_path))
         
         for file_path in folder_path.rglob('*'):
             if file_path.is_file():
@@ -436,6 +487,7 @@ class UnifiedSystem:
                     
                     file_count += 1
                     total_size += file_size
+                    self.progress.publish(progress_id, processed_files=file_count, processed_size=total_size)
                     logger.debug(f"Indexed file: {file_path.name} ({file_size} bytes)")
                     
                 except Exception as e:
@@ -452,6 +504,7 @@ class UnifiedSystem:
         """, (file_count, total_size, folder_id))
         
         logger.info(f"Indexed {file_count} files, total size: {total_size} bytes")
+        self.progress.finish(progress_id, total_files=file_count, total_size=total_size)
         
         results = {
             'folder_id': folder_id,
@@ -664,6 +717,118 @@ class UnifiedSystem:
             logger.error(f"Failed to get download progress for {download_id}: {e}")
             raise
     
+    def get_connection_pool(self):
+        """
+        Get shared NNTP connection pool, creating it on first use
+        
+        Servers come from the network_servers table, falling back to
+        the configured nntp_servers.
+        
+        Returns:
+            UnifiedConnectionPool instance
+        """
+        if getattr(self, 'connection_pool', None):
+            return self.connection_pool
+        
+        from unified.networking.connection_pool import UnifiedConnectionPool
+        
+        servers = []
+        try:
+            rows = self.db.fetch_all(
+                "SELECT * FROM network_servers WHERE enabled = 1 ORDER BY priority"
+            )
+            for row in rows:
+                server = {
+                    'host': row['host'],
+                    'port': row['port'],
+                    'ssl': bool(row.get('ssl_enabled')),
+                    'max_connections': row.get('max_connections')
+                }
+                if row.get('username') and row.get('password'):
+                    server['username'] = row['username']
+                    server['password'] = row['password']
+                servers.append(server)
+        except Exception as e:
+            logger.warning(f"Could not load network servers: {e}")
+        
+        if not servers:
+            servers = list(self.config.nntp_servers)
+        
+        if not servers:
+            raise RuntimeError("No NNTP servers configured")
+        
+        from unified.networking.routing import UnifiedArticleRouter
+        from unified.networking.server_health import UnifiedServerHealth
+        
+        tuner = None
+        if self.config.nntp_autotune_connections:
+            from unified.networking.autotuner import UnifiedConnectionTuner
+            # Learned optimums persist in server_health per server
+            tuner = UnifiedConnectionTuner(db=self.db)
+        
+        # One routing table feeds the health scores used by get_best_server
+        self.server_health = UnifiedServerHealth()
+        self.connection_pool = UnifiedConnectionPool(
+            servers=servers,
+            max_connections_per_server=self.config.nntp_max_connections,
+            router=UnifiedArticleRouter(health=self.server_health),
+            bandwidth=self.get_bandwidth_controller(),
+            tuner=tuner
+        )
+        return self.connection_pool
+    
+    def get_bandwidth_controller(self):
+        """
+        Get shared bandwidth shaper, creating it on first use
+        
+        Returns:
+            UnifiedBandwidth instance configured from upload/download rate limits
+        """
+        if not getattr(self, 'bandwidth_controller', None):
+            from unified.networking.bandwidth import UnifiedBandwidth
+            self.bandwidth_controller = UnifiedBandwidth(
+                max_rate_mbps=self.config.upload_rate_limit_mbps,
+                download_rate_mbps=self.config.download_rate_limit_mbps
+            )
+        return self.bandwidth_controller
+    
+    def scan_share_availability(self, share_id: str,
+                                connections_per_server: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run pre-flight STAT availability scan for a share
+        
+        Args:
+            share_id: Share to scan
+            connections_per_server: Parallel connections per server
+            
+        Returns:
+            Scan result with summary and per-segment download plan
+        """
+        if not getattr(self, 'availability', None):
+            from unified.download.availability import UnifiedAvailability
+            self.availability = UnifiedAvailability(self.db, self.get_connection_pool())
+        
+        return self.availability.scan_share(share_id, connections_per_server)
+    
+    def get_share_availability(self, share_id: str) -> Dict[str, Any]:
+        """
+        Get last availability scan for a share
+        
+        Args:
+            share_id: Share ID
+            
+        Returns:
+            Scan result
+        """
+        scan = None
+        if getattr(self, 'availability', None):
+            scan = self.availability.get_scan(share_id)
+        
+        if not scan:
+            raise ValueError(f"No availability scan for share {share_id}")
+        
+        return scan
+    
     def get_file_version_by_hash(self, file_hash: str) -> Dict[str, Any]:
         """
         Get file version information by file hash
@@ -1163,6 +1328,18 @@ class UnifiedSystem:
         
         # Start download in background
         import threading
+        progress_id = f"download_{download_id}"
+        self.progress.publish(progress_id, type='download', status='queued',
+                              entity_id=share['folder_id'], entity_type='folder', share_id=share_id)
+        
+        # A pre-flight availability scan picks one copy and server per segment
+        retrieval = None
+        if getattr(self, 'availability', None) and self.availability.get_scan(share_id):
+            from unified.download_system import IntelligentRetrievalSystem
+            retrieval = IntelligentRetrievalSystem(self.nntp_client, self.db,
+                                                   availability=self.availability,
+                                                   connection_pool=self.get_connection_pool())
+        
         def download_task():
             try:
                 # Get segments for this share (via files)
@@ -1172,21 +1349,35 @@ class UnifiedSystem:
                        WHERE f.folder_id = ?""",
                     (share['folder_id'],)
                 )
+                self.progress.publish(progress_id, status='downloading', current=0, total=len(segments))
                 
-                for segment in segments:
+                for done, segment in enumerate(segments, 1):
+                    planned = retrieval.get_planned_source(segment, share_id) if retrieval else None
+                    article = None
+                    
                     # Download from Usenet
-                    if self.nntp_client and segment.get('message_id'):
+                    if planned:
+                        # The plan already chose a copy: fetch it once, from
+                        # the server holding it, and skip articles known gone
+                        if not segment.get('redundancy_index') and planned['status'] != 'missing':
+                            article = retrieval.retrieve_planned(planned)
+                    elif self.nntp_client and segment.get('message_id'):
                         article = self.nntp_client.get_article(segment['message_id'])
+                    
+                    if article:
                         # Save segment
                         segment_path = output_dir / f"segment_{segment['segment_index']}.dat"
                         segment_path.write_bytes(article)
+                    self.progress.publish(progress_id, current=done)
                 
                 # Update status
                 self.db.update('download_queue', {'download_id': download_id}, {
                     'status': 'complete'
                 })
+                self.progress.finish(progress_id)
             except Exception as e:
                 logger.error(f"Download failed: {e}")
+                self.progress.finish(progress_id, status='failed', error_message=str(e))
                 self.db.update('download_queue', {'download_id': download_id}, {
                     'status': 'failed',
                     'error': str(e)
@@ -1479,6 +1670,7 @@ class UnifiedSystem:
     
     def close(self):
         """Close system connections"""
+        self.counters.stop()
         self.db.close()
         logger.info("Unified system closed")
 
@@ -1486,7 +1678,7 @@ class UnifiedSystem:
     def get_metrics(self) -> Dict[str, Any]:
         """Get system metrics for monitoring"""
         return {
-            'total_files': self.db.fetch_one("SELECT COUNT(*) as count FROM files")['count'] if self.db.fetch_one("SELECT COUNT(*) as count FROM files") else 0,
+            'total_files': self.counters.table_count('files'),
             'total_size': 0,
             'total_shares': 0,
             'active_uploads': 0,
@@ -1613,6 +1805,11 @@ class UnifiedSystem:
             (folder_id,)
         )
         
+        progress_id = f"upload_{upload_id}"
+        self.progress.publish(progress_id, type='upload', status='uploading', entity_id=folder_id,
+                              entity_type='folder', total_size=total_size, current=0,
+                              total=min(len(segments or []), 10))
+        
         if segments and self.nntp_client:
             for segment in segments[:10]:  # Upload first 10 segments as test
                 try:
@@ -1626,6 +1823,7 @@ class UnifiedSystem:
                     if message_id:
                         message_ids.append(message_id)
                         articles_uploaded += 1
+                        self.progress.publish(progress_id, current=articles_uploaded)
                 except Exception as e:
                     logger.warning(f"Failed to upload segment: {e}")
         
@@ -1638,6 +1836,7 @@ class UnifiedSystem:
              datetime.now().isoformat(),
              upload_id)
         )
+        self.progress.finish(progress_id, status='completed' if articles_uploaded > 0 else 'failed')
         
         return {
             'success': articles_uploaded > 0,
@@ -1,14 +1,35 @@
 """
 Unified Monitoring Module - System monitoring and metrics
 Production-ready with Prometheus export and health checks
+
+Only the standard-library modules load with the package; the collector,
+exporter, alerting and dashboard modules (psutil and friends) load on
+first use, so codec and yEnc code can use the pipeline profiler cheaply.
 """
 
-from .metrics_collector import UnifiedMetricsCollector
-from .health_checker import UnifiedHealthChecker
-from .prometheus_exporter import UnifiedPrometheusExporter
-from .alert_manager import UnifiedAlertManager
-from .dashboard import UnifiedDashboard
-from .logger import UnifiedLogger
+import importlib
+
+from .progress_bus import ProgressBus, ProgressSubscription
+from .timeseries import UnifiedTimeSeries
+from .pipeline_profiler import PipelineProfiler, pipeline_profiler
+
+# Exported names loaded on first access: name -> submodule
+_LAZY_EXPORTS = {
+    'UnifiedMetricsCollector': 'metrics_collector',
+    'UnifiedHealthChecker': 'health_checker',
+    'UnifiedPrometheusExporter': 'prometheus_exporter',
+    'UnifiedAlertManager': 'alert_manager',
+    'UnifiedDashboard': 'dashboard',
+    'UnifiedLogger': 'logger'
+}
+
+def __getattr__(name):
+    """Import a lazily exported name's submodule"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_LAZY_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'UnifiedMetricsCollector',
@@ -16,5 +37,10 @@ __all__ = [
     'UnifiedPrometheusExporter',
     'UnifiedAlertManager',
     'UnifiedDashboard',
-    'UnifiedLogger'
-]
\ No newline at end of file
+    'UnifiedLogger',
+    'ProgressBus',
+    'ProgressSubscription',
+    'UnifiedTimeSeries',
+    'PipelineProfiler',
+    'pipeline_profiler'
+]
@@ -4,6 +4,7 @@ Unified Metrics Collector - Collect system metrics
 Production-ready with time-series data collection
 """
 
+import json
 import time
 import psutil
 from datetime import datetime
@@ -11,18 +12,46 @@ from typing import Dict, List, Any, Optional, Tuple
 from collections import deque
 import logging
 
+from .timeseries import UnifiedTimeSeries
+
 logger = logging.getLogger(__name__)
 
+# Seconds a sample of a slow-moving system metric is reused
+SAMPLE_INTERVALS = {
+    'disk': 60.0,
+    'load': 5.0
+}
+
 class UnifiedMetricsCollector:
     """
     Unified metrics collector
     Collects and stores system and application metrics
     """
     
-    def __init__(self, db=None, max_history: int = 1000):
-        """Initialize metrics collector"""
+    def __init__(self, db=None, max_history: int = 1000, min_interval: float = 1.0,
+                 retention_hours: int = 24, rollup_retention: Optional[Dict[int, float]] = None):
+        """
+        Initialize metrics collector
+        
+        Args:
+            db: Database for stored metrics
+            max_history: Samples kept per metric
+            min_interval: Seconds within which repeated collections return
+                the previous sample instead of querying the system again
+            retention_hours: How long raw rows stay in the metrics table
+            rollup_retention: Seconds kept per rollup resolution
+        """
         self.db = db
         self.max_history = max_history
+        self.min_interval = min_interval
+        
+        # Downsampled history; also prunes the raw metrics rows written here
+        self.timeseries = UnifiedTimeSeries(db, retention=rollup_retention,
+                                            raw_retention=retention_hours * 3600)
+        self._marker = '?'
+        if db is not None:
+            from ..core.database import DatabaseType
+            self._marker = '?' if db.config.db_type == DatabaseType.SQLITE else '%s'
         
         # Time-series storage
         self.metrics_history = {
@@ -54,21 +83,39 @@ class UnifiedMetricsCollector:
         }
         
         self._last_network = psutil.net_io_counters()
+        self._last_network_time = time.monotonic()
         self._start_time = time.time()
+        
+        # CPU usage is measured between calls, never by blocking
+        psutil.cpu_percent(interval=None)
+        self._cpu_count = psutil.cpu_count()
+        self._samples = {}
+        self._last_metrics = None
+        self._last_collected = 0.0
+    
+    def _sampled(self, name: str, read):
+        """Value of a slow-moving metric, re-read every SAMPLE_INTERVALS[name]"""
+        now = time.monotonic()
+        cached = self._samples.get(name)
+        if cached is None or now - cached[0] >= SAMPLE_INTERVALS[name]:
+            cached = self._samples[name] = (now, read())
+        return cached[1]
     
     def collect_system_metrics(self) -> Dict[str, Any]:
-        """Collect system metrics"""
+        """Collect system metrics (reused when collected under min_interval ago)"""
+        if self._last_metrics and time.monotonic() - self._last_collected < self.min_interval:
+            return self._last_metrics
+        
         timestamp = datetime.now()
         
-        # CPU metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_count = psutil.cpu_count()
+        # CPU metrics, averaged since the previous collection
+        cpu_percent = psutil.cpu_percent(interval=None)
         
         # Memory metrics
         memory = psutil.virtual_memory()
         
         # Disk metrics
-        disk = psutil.disk_usage('/')
+        disk = self._sampled('disk', lambda: psutil.disk_usage('/'))
         
         # Network metrics
         network = psutil.net_io_counters()
@@ -78,8 +125,8 @@ class UnifiedMetricsCollector:
             'timestamp': timestamp.isoformat(),
             'cpu': {
                 'percent': cpu_percent,
-                'count': cpu_count,
-                'load_avg': psutil.getloadavg()
+                'count': self._cpu_count,
+                'load_avg': self._sampled('load', psutil.getloadavg)
             },
             'memory': {
                 'total': memory.total,
@@ -109,10 +156,25 @@ class UnifiedMetricsCollector:
         self.metrics_history['disk'].append((timestamp, disk.percent))
         self.metrics_history['network'].append((timestamp, network_rate))
         
+        values = {
+            'host.cpu_percent': cpu_percent,
+            'host.memory_percent': memory.percent,
+            'host.disk_percent': disk.percent,
+            'host.network_send_rate': network_rate['send_rate'],
+            'host.network_recv_rate': network_rate['recv_rate']
+        }
+        for name, value in values.items():
+            self.timeseries.add(name, value, timestamp.timestamp())
+        
         # Store in database
         if self.db:
-            self._store_metrics(metrics)
+            self._store_metrics(timestamp, values)
         
+        # Flush rollups and apply retention when due
+        self.timeseries.maintain()
+        
+        self._last_metrics = metrics
+        self._last_collected = time.monotonic()
         return metrics
     
     def collect_application_metrics(self) -> Dict[str, Any]:
@@ -159,14 +221,14 @@ class UnifiedMetricsCollector:
     
     def record_event(self, event_type: str, metadata: Optional[Dict] = None):
         """Record an event"""
-        event = {
-            'type': event_type,
-            'timestamp': datetime.now().isoformat(),
-            'metadata': metadata or {}
-        }
-        
         if self.db:
-            self.db.insert('metrics', event)
+            self.db.insert('metrics', {
+                'metric_name': event_type,
+                'metric_type': 'event',
+                'value': 1,
+                'timestamp': datetime.now(),
+                'metadata': json.dumps(metadata or {})
+            })
         
         logger.info(f"Event recorded: {event_type}")
     
@@ -189,6 +251,12 @@ class UnifiedMetricsCollector:
             'health_score': self._calculate_health_score()
         }
     
+    def get_metric_range(self, name: str, start: datetime, end: Optional[datetime] = None,
+                         points: int = 300) -> List[Dict[str, Any]]:
+        """Rollup buckets of a collected metric, e.g. 'host.cpu_percent'"""
+        return self.timeseries.query(name, start.timestamp(),
+                                     end.timestamp() if end else None, points=points)
+    
     def get_time_series(self, metric: str, 
                        duration_minutes: int = 60) -> List[Tuple[datetime, float]]:
         """Get time series data for metric"""
@@ -206,14 +274,16 @@ class UnifiedMetricsCollector:
     
     def _calculate_network_rate(self, current) -> Dict[str, float]:
         """Calculate network transfer rates"""
-        if self._last_network:
-            time_delta = 1.0  # Assuming 1 second interval
+        now = time.monotonic()
+        time_delta = now - self._last_network_time
+        if self._last_network and time_delta > 0:
             send_rate = (current.bytes_sent - self._last_network.bytes_sent) / time_delta
             recv_rate = (current.bytes_recv - self._last_network.bytes_recv) / time_delta
         else:
             send_rate = recv_rate = 0
         
         self._last_network = current
+        self._last_network_time = now
         
         return {
             'send_rate': send_rate,
@@ -265,13 +335,15 @@ class UnifiedMetricsCollector:
         
         return max(0, score)
     
-    def _store_metrics(self, metrics: Dict[str, Any]):
-        """Store metrics in database"""
+    def _store_metrics(self, timestamp: datetime, values: Dict[str, float]):
+        """Store sampled values as raw metrics rows"""
         try:
-            self.db.insert('metrics', {
-                'timestamp': metrics['timestamp'],
-                'type': 'system',
-                'data': metrics
-            })
+            m = self._marker
+            with self.db.transaction() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO metrics (metric_name, metric_type, value, timestamp) "
+                    f"VALUES ({m}, 'gauge', {m}, {m})",
+                    [(name, value, timestamp) for name, value in values.items()]
+                )
         except Exception as e:
             logger.error(f"Failed to store metrics: {e}")
\ No newline at end of file
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Unified Pipeline Profiler - Per-stage timing for the segment pipeline
+Thread-local accumulation, flushed periodically into windowed throughput and latency percentiles
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Any, Optional
+
+from .timeseries import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Segment pipeline stages, in pipeline order
+PIPELINE_STAGES = ('read', 'compress', 'encrypt', 'yenc', 'network', 'db')
+
+# Reported latency quantiles: key, quantile
+QUANTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+class _StageTiming:
+    """Context manager timing one stage execution"""
+    
+    __slots__ = ('profiler', 'stage', 'nbytes', 'started')
+    
+    def __init__(self, profiler: 'PipelineProfiler', stage: str, nbytes: int):
+        self.profiler = profiler
+        self.stage = stage
+        self.nbytes = nbytes
+    
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.stage, self.started, self.nbytes)
+        return False
+
+class _ThreadBuffer:
+    """One thread's unflushed stage totals"""
+    
+    __slots__ = ('lock', 'thread', 'stages', 'flushed')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = threading.current_thread()
+        self.stages = {}
+        self.flushed = time.perf_counter_ns()
+
+class PipelineProfiler:
+    """
+    Lightweight per-stage timing for the segment pipeline
+    
+    record() only touches the calling thread's own buffer (an uncontended
+    lock, a clock read and a sketch insert); each thread folds its buffer
+    into the shared totals at most once per flush_interval. Readers
+    drain every buffer first, so statistics are never more than a call
+    behind. Latency percentiles and throughput cover the last `window`
+    seconds; operation, byte and busy-time totals are cumulative.
+    """
+    
+    def __init__(self, flush_interval: float = 1.0, window: float = 60.0,
+                 enabled: bool = True):
+        """
+        Initialize profiler
+        
+        Args:
+            flush_interval: Seconds between a thread's flushes
+            window: Seconds covered by percentiles and throughput
+            enabled: Record timings at all
+        """
+        self.flush_interval = flush_interval
+        self.window = window
+        self.enabled = enabled
+        self._flush_ns = int(flush_interval * 1e9)
+        self._local = threading.local()
+        self._buffers = []
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._intervals = deque()
+        self._started = time.monotonic()
+    
+    # ==================== RECORDING ====================
+    
+    def stage(self, stage: str, nbytes: int = 0) -> _StageTiming:
+        """
+        Time a block as one execution of a stage
+        
+        Args:
+            stage: Stage name (see PIPELINE_STAGES)
+            nbytes: Bytes the stage processed
+        """
+        return _StageTiming(self, stage, nbytes)
+    
+    def record(self, stage: str, started_ns: int, nbytes: int = 0):
+        """
+        Record a stage execution that began at started_ns
+        
+        Args:
+            stage: Stage name
+            started_ns: time.perf_counter_ns() taken when the stage began
+            nbytes: Bytes the stage processed
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._register()
+        
+        with buffer.lock:
+            totals = buffer.stages.get(stage)
+            if totals is None:
+                totals = buffer.stages[stage] = [0, 0, 0, QuantileSketch(0.02, 128)]
+            elapsed = now - started_ns
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] += nbytes
+            totals[3].add(elapsed)
+        if now - buffer.flushed >= self._flush_ns:
+            self._flush(buffer, now)
+    
+    def _register(self) -> _ThreadBuffer:
+        """Create the calling thread's buffer"""
+        buffer = self._local.buffer = _ThreadBuffer()
+        with self._lock:
+            self._buffers.append(buffer)
+        return buffer
+    
+    def _flush(self, buffer: _ThreadBuffer, now: Optional[int] = None):
+        """Fold a thread buffer into the shared totals and current window"""
+        with buffer.lock:
+            stages, buffer.stages = buffer.stages, {}
+            buffer.flushed = now or time.perf_counter_ns()
+        if not stages:
+            return
+        
+        with self._lock:
+            for stage, (count, elapsed, nbytes, _) in stages.items():
+                totals = self._totals.setdefault(stage, [0, 0, 0])
+                totals[0] += count
+                totals[1] += elapsed
+                totals[2] += nbytes
+            self._intervals.append((time.monotonic(), stages))
+            self._trim()
+    
+    def _trim(self):
+        """Drop intervals older than the window (caller holds _lock)"""
+        cutoff = time.monotonic() - self.window
+        while self._intervals and self._intervals[0][0] < cutoff:
+            self._intervals.popleft()
+    
+    def flush(self):
+        """Drain every thread's buffer; forget threads that have exited"""
+        with self._lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            self._flush(buffer)
+        with self._lock:
+            self._buffers = [b for b in self._buffers if b.thread.is_alive() or b.stages]
+    
+    def reset(self):
+        """Discard all recorded timings"""
+        self.flush()
+        with self._lock:
+            self._totals.clear()
+            self._intervals.clear()
+            self._started = time.monotonic()
+    
+    # ==================== READING ====================
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Per-stage throughput and latency
+        
+        Returns:
+            stages: For every stage seen, cumulative operations, bytes
+                and busy seconds, plus over the window: operations,
+                throughput while busy (MB/s), busy share of all stage
+                time and latency p50/p95/p99 in ms
+            bottleneck: Stage with the most busy time in the window
+        """
+        self.flush()
+        with self._lock:
+            self._trim()
+            totals = {stage: list(values) for stage, values in self._totals.items()}
+            intervals = list(self._intervals)
+            span = min(self.window, time.monotonic() - self._started)
+            threads = len(self._buffers)
+        
+        window = {}
+        for _, stages in intervals:
+            for stage, (count, elapsed, nbytes, sketch) in stages.items():
+                merged = window.get(stage)
+                if merged is None:
+                    window[stage] = [count, elapsed, nbytes, QuantileSketch(0.02, 128)]
+                    window[stage][3].merge(sketch)
+                else:
+                    merged[0] += count
+                    merged[1] += elapsed
+                    merged[2] += nbytes
+                    merged[3].merge(sketch)
+        
+        busy_total = sum(values[1] for values in window.values()) or 1
+        ordered = [s for s in PIPELINE_STAGES if s in totals] + sorted(set(totals) - set(PIPELINE_STAGES))
+        stages = {}
+        for stage in ordered:
+            count, elapsed, nbytes = totals[stage]
+            recent = window.get(stage, [0, 0, 0, None])
+            busy = recent[1] / 1e9
+            stats = {
+                'operations': count,
+                'bytes': nbytes,
+                'busy_seconds': round(elapsed / 1e9, 6),
+                'window': {
+                    'operations': recent[0],
+                    'bytes': recent[2],
+                    'operations_per_second': round(recent[0] / span, 3) if span else 0.0,
+                    'throughput_mbps': round(recent[2] / busy / 1e6, 3) if busy else 0.0,
+                    'busy_share': round(recent[1] / busy_total, 4)
+                }
+            }
+            if recent[3] is not None:
+                stats['latency_ms'] = {
+                    key: round(recent[3].quantile(q) / 1e6, 4) for key, q in QUANTILES
+                }
+            stages[stage] = stats
+        
+        return {
+            'stages': stages,
+            'bottleneck': max(window, key=lambda s: window[s][1]) if window else None,
+            'window_seconds': round(span, 3),
+            'threads': threads
+        }
+    
+    def prometheus_lines(self) -> List[str]:
+        """Statistics in the Prometheus text exposition format"""
+        statistics = self.get_statistics()['stages']
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+        
+        family('usenetsync_pipeline_stage_operations_total', 'counter',
+               'Segment pipeline stage executions',
+               [({'stage': s}, v['operations']) for s, v in statistics.items()])
+        family('usenetsync_pipeline_stage_bytes_total', 'counter',
+               'Bytes processed per segment pipeline stage',
+               [({'stage': s}, v['bytes']) for s, v in statistics.items()])
+        family('usenetsync_pipeline_stage_seconds_total', 'counter',
+               'Busy time per segment pipeline stage',
+               [({'stage': s}, v['busy_seconds']) for s, v in statistics.items()])
+        family('usenetsync_pipeline_stage_throughput_mbps', 'gauge',
+               'Stage throughput while busy over the recent window',
+               [({'stage': s}, v['window']['throughput_mbps']) for s, v in statistics.items()])
+        family('usenetsync_pipeline_stage_latency_seconds', 'gauge',
+               'Stage latency quantiles over the recent window',
+               [({'stage': s, 'quantile': q}, v['latency_ms'][key] / 1000)
+                for s, v in statistics.items() if 'latency_ms' in v
+                for key, q in QUANTILES])
+        return lines
+    
+    def collect(self):
+        """prometheus_client custom collector protocol"""
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+        
+        statistics = self.get_statistics()['stages']
+        operations = CounterMetricFamily('usenetsync_pipeline_stage_operations',
+                                         'Segment pipeline stage executions', labels=['stage'])
+        nbytes = CounterMetricFamily('usenetsync_pipeline_stage_bytes',
+                                     'Bytes processed per segment pipeline stage', labels=['stage'])
+        seconds = CounterMetricFamily('usenetsync_pipeline_stage_seconds',
+                                      'Busy time per segment pipeline stage', labels=['stage'])
+        throughput = GaugeMetricFamily('usenetsync_pipeline_stage_throughput_mbps',
+                                       'Stage throughput while busy over the recent window', labels=['stage'])
+        latency = GaugeMetricFamily('usenetsync_pipeline_stage_latency_seconds',
+                                    'Stage latency quantiles over the recent window',
+                                    labels=['stage', 'quantile'])
+        for stage, stats in statistics.items():
+            operations.add_metric([stage], stats['operations'])
+            nbytes.add_metric([stage], stats['bytes'])
+            seconds.add_metric([stage], stats['busy_seconds'])
+            throughput.add_metric([stage], stats['window']['throughput_mbps'])
+            for key, q in QUANTILES:
+                if 'latency_ms' in stats:
+                    latency.add_metric([stage, str(q)], stats['latency_ms'][key] / 1000)
+        return [operations, nbytes, seconds, throughput, latency]
+
+# Profiler shared by the upload, compression and yEnc code paths
+pipeline_profiler = PipelineProfiler()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Unified Progress Bus - In-process progress publish/subscribe
+Workers publish operation progress; API clients receive coalesced deltas
+"""
+
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Optional, Iterable, AsyncIterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which an operation is dropped from the bus once retained
+FINAL_STATUSES = frozenset({'completed', 'failed', 'cancelled'})
+
+class ProgressSubscription:
+    """
+    One client's view of the bus
+    
+    Updates published between two flushes are merged per operation, so a
+    subscriber receives at most one delta per operation per interval no
+    matter how often workers publish.
+    """
+    
+    def __init__(self, bus: 'ProgressBus', ids: Optional[Iterable[str]] = None,
+                 kinds: Optional[Iterable[str]] = None, max_rate: float = 4.0):
+        self.bus = bus
+        self.ids = set(ids) if ids else None
+        self.kinds = set(kinds) if kinds else None
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.dropped = 0
+        self._pending = {}
+        self._last_flush = 0.0
+        self._loop = None
+        self._event = None
+        self.closed = False
+    
+    def matches(self, progress_id: str, state: Dict[str, Any]) -> bool:
+        """Whether this subscriber follows an operation"""
+        if self.ids is not None and progress_id not in self.ids:
+            return False
+        return self.kinds is None or state.get('type') in self.kinds
+    
+    def _offer(self, progress_id: str, delta: Dict[str, Any]):
+        """Merge a delta; called by the bus under its lock"""
+        wake = not self._pending
+        pending = self._pending.get(progress_id)
+        if pending is None:
+            self._pending[progress_id] = dict(delta)
+        else:
+            pending.update(delta)
+            self.dropped += 1
+            self.bus._statistics['coalesced'] += 1
+        
+        if wake and self._event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._event.set)
+            except RuntimeError:
+                # Event loop already closed: the client has gone
+                self.closed = True
+    
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        """Take everything pending, keyed by progress ID"""
+        with self.bus._lock:
+            pending, self._pending = self._pending, {}
+            self.bus._statistics['delivered'] += len(pending)
+        self._last_flush = time.monotonic()
+        return pending
+    
+    async def deltas(self, heartbeat: float = 15.0) -> AsyncIterator[Dict[str, Dict[str, Any]]]:
+        """
+        Yield coalesced deltas no faster than max_rate
+        
+        An empty dict is yielded after heartbeat seconds without updates
+        so transports can keep idle connections alive.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        if self._pending:
+            self._event.set()
+        
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield {}
+                continue
+            
+            wait = self._last_flush + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            
+            self._event.clear()
+            batch = self.drain()
+            if batch:
+                yield batch
+    
+    def close(self):
+        """Stop receiving updates"""
+        self.closed = True
+        self.bus.unsubscribe(self)
+        if self._event is not None:
+            self._event.set()
+
+class ProgressBus:
+    """
+    In-process progress bus
+    Holds the latest state of every running operation and fans changes out
+    to subscribers without touching the database
+    """
+    
+    def __init__(self, retention: float = 300.0):
+        """
+        Initialize progress bus
+        
+        Args:
+            retention: Seconds a finished operation stays readable
+        """
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._state = {}
+        self._finished = {}
+        self._subscribers = set()
+        self._statistics = {
+            'published': 0,
+            'delivered': 0,
+            'coalesced': 0
+        }
+    
+    def publish(self, progress_id: str, **fields):
+        """
+        Record progress for an operation
+        
+        Only the given fields are sent to subscribers. A 'progress'
+        percentage is derived from current/total when both are present.
+        
+        Args:
+            progress_id: Operation ID (e.g. upload_<id>, download_<id>)
+            **fields: Changed fields (type, status, current, total, ...)
+        """
+        now = time.time()
+        with self._lock:
+            state = self._state.get(progress_id)
+            if state is None:
+                state = self._state[progress_id] = {
+                    'progress_id': progress_id,
+                    'started_at': now
+                }
+            
+            state.update(fields)
+            if 'current' in fields and state.get('total'):
+                fields['progress'] = state['progress'] = round(state['current'] / state['total'] * 100, 2)
+            fields['updated_at'] = state['updated_at'] = now
+            
+            if fields.get('status') in FINAL_STATUSES:
+                self._finished[progress_id] = now
+            self._expire(now)
+            
+            self._statistics['published'] += 1
+            for subscriber in self._subscribers:
+                if subscriber.matches(progress_id, state):
+                    subscriber._offer(progress_id, fields)
+    
+    def finish(self, progress_id: str, status: str = 'completed', **fields):
+        """Mark an operation finished; it is kept for the retention period"""
+        self.publish(progress_id, status=status, **fields)
+    
+    def get(self, progress_id: str) -> Optional[Dict[str, Any]]:
+        """Latest state of one operation"""
+        with self._lock:
+            state = self._state.get(progress_id)
+            return dict(state) if state else None
+    
+    def snapshot(self, kinds: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Latest state of all known operations"""
+        kinds = set(kinds) if kinds else None
+        with self._lock:
+            self._expire(time.time())
+            return {
+                pid: dict(state) for pid, state in self._state.items()
+                if kinds is None or state.get('type') in kinds
+            }
+    
+    def subscribe(self, ids: Optional[Iterable[str]] = None,
+                  kinds: Optional[Iterable[str]] = None,
+                  max_rate: float = 4.0) -> ProgressSubscription:
+        """
+        Subscribe to progress changes
+        
+        Args:
+            ids: Only these operations (default all)
+            kinds: Only these operation types (upload, download, index, ...)
+            max_rate: Maximum deltas per second delivered to the subscriber
+        
+        Returns:
+            Subscription; close it when the client disconnects
+        """
+        subscription = ProgressSubscription(self, ids, kinds, max_rate)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: ProgressSubscription):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    def _expire(self, now: float):
+        """Drop finished operations past retention; caller holds the lock"""
+        expired = [pid for pid, at in self._finished.items() if now - at > self.retention]
+        for pid in expired:
+            del self._finished[pid]
+            self._state.pop(pid, None)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get bus statistics"""
+        with self._lock:
+            return {
+                **self._statistics,
+                'operations': len(self._state),
+                'subscribers': len(self._subscribers)
+            }
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Unified Time Series Module - Downsampled metric history
+Raw points roll up into 1-minute, 1-hour and 1-day buckets with percentile sketches
+"""
+
+import json
+import math
+import threading
+import time
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rollup resolutions in seconds, finest first
+RESOLUTIONS = (60, 3600, 86400)
+
+# Seconds each resolution is kept
+DEFAULT_RETENTION = {
+    60: 7 * 86400,
+    3600: 90 * 86400,
+    86400: 3 * 365 * 86400,
+}
+
+# Percentiles reported for every bucket
+PERCENTILES = (0.50, 0.95, 0.99)
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with bounded relative error
+    
+    Values are counted in logarithmic bins, so every quantile is within
+    relative_accuracy of the true value, and the sketches of adjacent
+    buckets merge by adding bin counts. Beyond max_bins the bins of the
+    smallest magnitudes are folded together.
+    """
+    
+    ZERO = 1e-9
+    
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+    
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+    
+    def add(self, value: float, count: int = 1):
+        """Count a value"""
+        if abs(value) < self.ZERO:
+            self.zero += count
+            return
+        bins = self.positive if value > 0 else self.negative
+        index = math.ceil(math.log(abs(value)) / self._log_gamma)
+        if index in bins:
+            bins[index] += count
+        else:
+            bins[index] = count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+    
+    def merge(self, other: 'QuantileSketch'):
+        """Add another sketch's counts (same accuracy)"""
+        self.zero += other.zero
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in theirs.items():
+                mine[index] = mine.get(index, 0) + count
+            if len(mine) > self.max_bins:
+                self._collapse(mine)
+    
+    def _collapse(self, bins: Dict[int, int]):
+        """Fold the smallest-magnitude bins into one"""
+        indexes = sorted(bins)
+        target = indexes[len(indexes) - self.max_bins]
+        for index in indexes[:len(indexes) - self.max_bins]:
+            bins[target] += bins.pop(index)
+    
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma ** index / (self._gamma + 1)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (0..1), None when empty"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.positive)) if self.positive else 0.0
+    
+    def to_json(self) -> str:
+        return json.dumps({'a': self.relative_accuracy, 'z': self.zero,
+                           'p': self.positive, 'n': self.negative}, separators=(',', ':'))
+    
+    @classmethod
+    def from_json(cls, data: str) -> 'QuantileSketch':
+        state = json.loads(data)
+        sketch = cls(state['a'])
+        sketch.zero = state['z']
+        sketch.positive = {int(k): v for k, v in state['p'].items()}
+        sketch.negative = {int(k): v for k, v in state['n'].items()}
+        return sketch
+
+class Rollup:
+    """Aggregate of the points in one time bucket"""
+    
+    __slots__ = ('count', 'total', 'squares', 'minimum', 'maximum', 'sketch')
+    
+    def __init__(self, sketch: Optional[QuantileSketch] = None):
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sketch = sketch or QuantileSketch()
+    
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.sketch.add(value)
+    
+    def merge(self, other: 'Rollup'):
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+    
+    def summary(self) -> Dict[str, Any]:
+        """count, min, max, avg, stddev and percentiles"""
+        if not self.count:
+            return {'count': 0}
+        mean = self.total / self.count
+        variance = (self.squares - self.total * mean) / (self.count - 1) if self.count > 1 else 0.0
+        summary = {
+            'count': self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'avg': mean,
+            'stddev': math.sqrt(max(0.0, variance))
+        }
+        for q in PERCENTILES:
+            value = self.sketch.quantile(q)
+            # Sketch values are approximate; keep them inside the exact range
+            summary[f'p{int(q * 100)}'] = min(max(value, self.minimum), self.maximum)
+        return summary
+
+class UnifiedTimeSeries:
+    """
+    Downsampled metric history
+    
+    Every point is folded into the current 1-minute, 1-hour and 1-day
+    bucket of its metric. flush() merges what accumulated since the last
+    flush into the metric_rollups table (or an in-memory store without a
+    database), so partial hours and days survive restarts. query() reads
+    the coarsest resolution that still gives the requested detail; a
+    30-day chart reads hourly rows instead of millions of raw points.
+    """
+    
+    def __init__(self, db=None, retention: Optional[Dict[int, float]] = None,
+                 raw_retention: Optional[float] = None, flush_interval: float = 60.0):
+        """
+        Initialize time series
+        
+        Args:
+            db: Database with the unified schema (None keeps rollups in memory)
+            retention: Seconds to keep each resolution (see DEFAULT_RETENTION)
+            raw_retention: Seconds to keep raw rows in the metrics table
+            flush_interval: Seconds between flushes from maintain()
+        """
+        self.db = db
+        self.retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self.raw_retention = raw_retention
+        self.flush_interval = flush_interval
+        self._marker = '?'
+        if db is not None:
+            from unified.core.database import DatabaseType
+            self._marker = '?' if db.config.db_type == DatabaseType.SQLITE else '%s'
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._memory = defaultdict(dict)
+        self._last_flush = time.time()
+        self._last_prune = 0.0
+        self._statistics = {
+            'points': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'rows_pruned': 0
+        }
+    
+    # ==================== WRITING ====================
+    
+    def add(self, name: str, value: float, timestamp: Optional[float] = None):
+        """
+        Fold a point into its rollup buckets
+        
+        Args:
+            name: Metric name
+            value: Point value
+            timestamp: Epoch seconds (default now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._statistics['points'] += 1
+            for resolution in RESOLUTIONS:
+                key = (name, resolution, int(timestamp // resolution) * resolution)
+                rollup = self._pending.get(key)
+                if rollup is None:
+                    rollup = self._pending[key] = Rollup()
+                rollup.add(value)
+    
+    def flush(self) -> int:
+        """
+        Merge accumulated points into stored rollups
+        
+        Returns:
+            Number of rollup rows written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if not pending:
+            return 0
+        
+        if self.db is None:
+            with self._lock:
+                for (name, resolution, bucket), rollup in pending.items():
+                    stored = self._memory[(name, resolution)]
+                    if bucket in stored:
+                        stored[bucket].merge(rollup)
+                    else:
+                        stored[bucket] = rollup
+        else:
+            try:
+                self._write(pending)
+            except Exception as e:
+                logger.error(f"Failed to flush metric rollups: {e}")
+                with self._lock:
+                    # Keep the points for the next flush
+                    for key, rollup in pending.items():
+                        if key in self._pending:
+                            rollup.merge(self._pending[key])
+                        self._pending[key] = rollup
+                return 0
+        
+        with self._lock:
+            self._statistics['flushes'] += 1
+            self._statistics['rows_written'] += len(pending)
+        return len(pending)
+    
+    def _write(self, pending: Dict[Tuple[str, int, int], Rollup]):
+        """Read-merge-write pending rollups in one transaction"""
+        m = self._marker
+        with self.db.transaction() as cursor:
+            for (name, resolution, bucket), rollup in pending.items():
+                cursor.execute(
+                    f"SELECT value_count, value_sum, value_squares, value_min, value_max, sketch "
+                    f"FROM metric_rollups WHERE metric_name = {m} AND resolution = {m} AND bucket = {m}",
+                    (name, resolution, bucket)
+                )
+                row = cursor.fetchone()
+                # Merge into a copy so a failed transaction can be retried
+                merged = self._rollup(tuple(row)) if row is not None else Rollup()
+                merged.merge(rollup)
+                values = (merged.count, merged.total, merged.squares,
+                          merged.minimum, merged.maximum, merged.sketch.to_json())
+                if row is None:
+                    cursor.execute(
+                        f"INSERT INTO metric_rollups (metric_name, resolution, bucket, value_count, value_sum, "
+                        f"value_squares, value_min, value_max, sketch) VALUES ({m}, {m}, {m}, {m}, {m}, {m}, {m}, {m}, {m})",
+                        (name, resolution, bucket) + values
+                    )
+                else:
+                    cursor.execute(
+                        f"UPDATE metric_rollups SET value_count = {m}, value_sum = {m}, value_squares = {m}, "
+                        f"value_min = {m}, value_max = {m}, sketch = {m} "
+                        f"WHERE metric_name = {m} AND resolution = {m} AND bucket = {m}",
+                        values + (name, resolution, bucket)
+                    )
+    
+    @staticmethod
+    def _rollup(row: Tuple) -> Rollup:
+        count, total, squares, minimum, maximum, sketch = row
+        rollup = Rollup(QuantileSketch.from_json(sketch))
+        rollup.count = count
+        rollup.total = total
+        rollup.squares = squares
+        rollup.minimum = minimum
+        rollup.maximum = maximum
+        return rollup
+    
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Drop rollups (and raw metrics rows) past their retention
+        
+        Returns:
+            Number of rows removed
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        if self.db is None:
+            with self._lock:
+                for (name, resolution), stored in list(self._memory.items()):
+                    cutoff = now - self.retention[resolution]
+                    for bucket in [b for b in stored if b + resolution <= cutoff]:
+                        del stored[bucket]
+                        removed += 1
+                    if not stored:
+                        del self._memory[(name, resolution)]
+        else:
+            m = self._marker
+            for resolution in RESOLUTIONS:
+                cursor = self.db.execute(
+                    f"DELETE FROM metric_rollups WHERE resolution = {m} AND bucket < {m}",
+                    (resolution, int(now - self.retention[resolution]) // resolution * resolution)
+                )
+                removed += max(0, cursor.rowcount)
+            if self.raw_retention:
+                cursor = self.db.execute(
+                    f"DELETE FROM metrics WHERE timestamp < {m}",
+                    (datetime.fromtimestamp(now - self.raw_retention),)
+                )
+                removed += max(0, cursor.rowcount)
+        
+        with self._lock:
+            self._statistics['rows_pruned'] += removed
+            self._last_prune = now
+        return removed
+    
+    def maintain(self):
+        """Flush every flush_interval and prune hourly; call from a monitoring loop"""
+        now = time.time()
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+        if now - self._last_prune >= 3600:
+            self.prune(now)
+    
+    # ==================== READING ====================
+    
+    def choose_resolution(self, start: float, end: float, points: int = 300,
+                          raw_since: Optional[float] = None) -> int:
+        """
+        Coarsest resolution giving at least points buckets over the range
+        
+        Resolutions whose retention does not reach back to start are
+        skipped; if none is fine enough the finest remaining one is used.
+        
+        Args:
+            start: Range start (epoch seconds)
+            end: Range end (epoch seconds)
+            points: Desired number of points
+            raw_since: Epoch from which raw points are complete (0 is
+                returned for raw when they cover the range)
+        
+        Returns:
+            Resolution in seconds, 0 for raw points
+        """
+        now = time.time()
+        candidates = [resolution for resolution in RESOLUTIONS
+                      if now - self.retention[resolution] <= start]
+        if raw_since is not None and raw_since <= start:
+            candidates.insert(0, 0)
+        if not candidates:
+            return RESOLUTIONS[-1]
+        
+        span = max(end - start, 1)
+        for resolution in reversed(candidates):
+            if span / (resolution or 1) >= points:
+                return resolution
+        return candidates[0]
+    
+    def query(self, name: str, start: float, end: Optional[float] = None,
+              resolution: Optional[int] = None, points: int = 300) -> List[Dict[str, Any]]:
+        """
+        Rollup buckets of a metric overlapping [start, end)
+        
+        Args:
+            name: Metric name
+            start: Range start (epoch seconds)
+            end: Range end (default now)
+            resolution: Bucket size (default chosen from points)
+            points: Desired number of points when choosing
+        
+        Returns:
+            One summary per bucket, with 'timestamp' (bucket start) and
+            'resolution'
+        """
+        end = time.time() if end is None else end
+        if not resolution:
+            resolution = self.choose_resolution(start, end, points) or RESOLUTIONS[0]
+        
+        buckets = self._buckets(name, resolution, start, end)
+        return [
+            {'timestamp': bucket, 'resolution': resolution, **buckets[bucket].summary()}
+            for bucket in sorted(buckets)
+        ]
+    
+    def summary(self, name: str, start: float, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Merged statistics of a metric over a range
+        
+        Reads at most a few hundred buckets; the edge buckets are counted
+        whole, so the range is effectively widened to bucket boundaries.
+        """
+        end = time.time() if end is None else end
+        resolution = self.choose_resolution(start, end, points=60) or RESOLUTIONS[0]
+        merged = Rollup()
+        for rollup in self._buckets(name, resolution, start, end).values():
+            merged.merge(rollup)
+        return merged.summary()
+    
+    def _buckets(self, name: str, resolution: int, start: float, end: float) -> Dict[int, Rollup]:
+        """Stored and pending rollups of a metric in range, merged by bucket"""
+        first = int(start // resolution) * resolution
+        buckets = {}
+        if self.db is None:
+            with self._lock:
+                for bucket, rollup in self._memory.get((name, resolution), {}).items():
+                    if first <= bucket < end:
+                        buckets[bucket] = Rollup()
+                        buckets[bucket].merge(rollup)
+        else:
+            m = self._marker
+            rows = self.db.fetch_all(
+                f"SELECT bucket, value_count, value_sum, value_squares, value_min, value_max, sketch "
+                f"FROM metric_rollups WHERE metric_name = {m} AND resolution = {m} "
+                f"AND bucket >= {m} AND bucket < {m}",
+                (name, resolution, first, end)
+            )
+            for row in rows:
+                buckets[row['bucket']] = self._rollup((row['value_count'], row['value_sum'], row['value_squares'],
+                                                       row['value_min'], row['value_max'], row['sketch']))
+        
+        with self._lock:
+            for (metric, size, bucket), rollup in self._pending.items():
+                if metric == name and size == resolution and first <= bucket < end:
+                    buckets.setdefault(bucket, Rollup()).merge(rollup)
+        return buckets
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get rollup statistics"""
+        with self._lock:
+            return {
+                **self._statistics,
+                'pending': len(self._pending),
+                'resolutions': list(RESOLUTIONS),
+                'retention': dict(self.retention),
+                'raw_retention': self.raw_retention
+            }
@@ -20,7 +20,7 @@ import statistics
 
 # Prometheus client for metrics export
 try:
-    from prometheus_client import Counter, Gauge, Histogram, Summary, start_http_server
+    from prometheus_client import Counter, Gauge, Histogram, Summary, start_http_server, REGISTRY
     PROMETHEUS_AVAILABLE = True
 except ImportError:
     PROMETHEUS_AVAILABLE = False
@@ -28,8 +28,18 @@ except ImportError:
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from unified.monitoring.timeseries import UnifiedTimeSeries
+from unified.monitoring.pipeline_profiler import pipeline_profiler
+
 logger = logging.getLogger(__name__)
 
+# Seconds between samples of each system metric group while metrics are viewed
+COLLECTION_INTERVALS = {
+    'process': 1.0,       # CPU, memory and threads, from one /proc read
+    'io': 5.0,            # Process disk I/O counters
+    'connections': 30.0   # Socket table scan, the most expensive
+}
+
 class MetricType(Enum):
     """Types of metrics"""
     COUNTER = "counter"
@@ -60,22 +70,46 @@ class Alert:
 class MonitoringSystem:
     """Comprehensive monitoring and metrics system"""
     
-    def __init__(self, retention_hours: int = 24):
+    def __init__(self, retention_hours: int = 24, max_points: int = 3600,
+                 db=None, rollup_retention: Optional[Dict[int, float]] = None,
+                 idle_after: float = 120.0, idle_factor: float = 10.0):
         """
         Initialize monitoring system
         
         Args:
-            retention_hours: How long to keep metrics in memory
+            retention_hours: How long to keep raw metrics (in memory and
+                in the metrics table)
+            max_points: Raw points kept per metric
+            db: Database for rollup history (None keeps it in memory)
+            rollup_retention: Seconds kept per rollup resolution
+            idle_after: Seconds without a viewer before collection backs off
+            idle_factor: Interval multiplier while nobody is viewing
         """
         self.retention_hours = retention_hours
-        self.metrics_store = defaultdict(lambda: deque(maxlen=3600))  # 1 hour of seconds
+        self.max_points = max_points
+        self.metrics_store = defaultdict(lambda: deque(maxlen=max_points))
+        self.timeseries = UnifiedTimeSeries(db, retention=rollup_retention,
+                                            raw_retention=retention_hours * 3600)
         self.alerts = {}
         self.alert_history = deque(maxlen=1000)
         self.running = False
         self._lock = threading.Lock()
         
-        # System monitoring
+        # System monitoring, one process handle for every sample
         self.process = psutil.Process()
+        self.process.cpu_percent()  # Prime the CPU time baseline
+        self._total_memory = psutil.virtual_memory().total
+        
+        # Adaptive collection: groups sampled on their own schedule, slower
+        # while nobody views metrics, and woken early when someone does
+        self.idle_after = idle_after
+        self.idle_factor = idle_factor
+        self._last_viewed = time.monotonic()
+        self._next_sample = {group: 0.0 for group in COLLECTION_INTERVALS}
+        self._samples = {group: 0 for group in COLLECTION_INTERVALS}
+        self._last_cleanup = 0.0
+        self._collect_lock = threading.Lock()
+        self._wake = threading.Event()
         
         # Prometheus metrics if available
         if PROMETHEUS_AVAILABLE:
@@ -130,6 +164,12 @@ class MonitoringSystem:
             'Data throughput in MB/s'
         )
         
+        # Segment pipeline stages, computed at scrape time instead of per segment
+        try:
+            REGISTRY.register(pipeline_profiler)
+        except ValueError:
+            pass  # Registered by another monitoring instance
+        
     def start(self, prometheus_port: int = 8000):
         """Start monitoring system"""
         if self.running:
@@ -154,63 +194,119 @@ class MonitoringSystem:
     def stop(self):
         """Stop monitoring system"""
         self.running = False
+        self._wake.set()
+        self.timeseries.flush()
         logger.info("Monitoring system stopped")
         
     def _monitor_loop(self):
         """Main monitoring loop"""
         while self.running:
             try:
-                # Collect system metrics
+                # Collect the system metrics that are due
                 self._collect_system_metrics()
                 
                 # Check alerts
                 self._check_alerts()
                 
                 # Clean old metrics
-                self._cleanup_old_metrics()
-                
-                time.sleep(1)  # Collect every second
+                if time.monotonic() - self._last_cleanup >= 60:
+                    self._cleanup_old_metrics()
+                    self._last_cleanup = time.monotonic()
+                    
+                # Persist rollups and apply their retention
+                self.timeseries.maintain()
                 
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
                 
-    def _collect_system_metrics(self):
-        """Collect system performance metrics"""
-        # CPU usage
-        cpu_percent = self.process.cpu_percent()
-        self.record_metric('system.cpu_usage', cpu_percent, MetricType.GAUGE)
-        
-        # Memory usage
-        memory_info = self.process.memory_info()
-        memory_mb = memory_info.rss / (1024 * 1024)
-        self.record_metric('system.memory_mb', memory_mb, MetricType.GAUGE)
-        self.record_metric('system.memory_percent', 
-                          self.process.memory_percent(), MetricType.GAUGE)
-        
-        # Disk I/O
-        try:
-            io_counters = self.process.io_counters()
-            self.record_metric('system.disk_read_mb', 
-                             io_counters.read_bytes / (1024 * 1024), MetricType.COUNTER)
-            self.record_metric('system.disk_write_mb',
-                             io_counters.write_bytes / (1024 * 1024), MetricType.COUNTER)
-        except:
-            pass  # Not available on all systems
+            # Sleep until the next sample is due or a viewer shows up
+            self._wake.wait(max(0.05, min(self._next_sample.values()) - time.monotonic()))
+            self._wake.clear()
             
-        # Network connections
-        try:
-            connections = len(self.process.connections())
-            self.record_metric('system.connections', connections, MetricType.GAUGE)
-        except:
-            pass
-            
-        # Thread count
-        self.record_metric('system.threads', self.process.num_threads(), MetricType.GAUGE)
+    def _interval_scale(self) -> float:
+        """Collection interval multiplier: 1 while viewed, idle_factor otherwise"""
+        if time.monotonic() - self._last_viewed < self.idle_after:
+            return 1.0
+        return self.idle_factor
         
-        # Update Prometheus metrics if available
-        if PROMETHEUS_AVAILABLE:
-            self.prom_memory_usage.set(memory_info.rss)
-            self.prom_cpu_usage.set(cpu_percent)
+    def mark_viewed(self) -> bool:
+        """
+        Note that someone is looking at metrics
+        
+        Call from endpoints and streams that show metrics. Collection runs
+        at full rate for idle_after seconds afterwards.
+        
+        Returns:
+            True if collection had backed off (samples may be stale)
+        """
+        now = time.monotonic()
+        was_idle = now - self._last_viewed >= self.idle_after
+        self._last_viewed = now
+        if was_idle:
+            # Pull backed-off samples forward and wake the loop
+            for group, interval in COLLECTION_INTERVALS.items():
+                self._next_sample[group] = min(self._next_sample[group], now + interval)
+            self._next_sample['process'] = now
+            self._wake.set()
+        return was_idle
+        
+    def _collect_system_metrics(self, groups: Optional[List[str]] = None):
+        """
+        Collect system performance metrics
+        
+        Args:
+            groups: Metric groups to sample now (default: those due)
+        """
+        now = time.monotonic()
+        if groups is None:
+            groups = [group for group, due in self._next_sample.items() if now >= due]
+        if not groups:
+            return
+            
+        with self._collect_lock, self.process.oneshot():
+            if 'process' in groups:
+                # CPU usage
+                cpu_percent = self.process.cpu_percent()
+                self.record_metric('system.cpu_usage', cpu_percent, MetricType.GAUGE)
+                
+                # Memory usage
+                memory_info = self.process.memory_info()
+                memory_mb = memory_info.rss / (1024 * 1024)
+                self.record_metric('system.memory_mb', memory_mb, MetricType.GAUGE)
+                self.record_metric('system.memory_percent',
+                                   memory_info.rss / self._total_memory * 100, MetricType.GAUGE)
+                
+                # Thread count
+                self.record_metric('system.threads', self.process.num_threads(), MetricType.GAUGE)
+                
+                # Update Prometheus metrics if available
+                if PROMETHEUS_AVAILABLE:
+                    self.prom_memory_usage.set(memory_info.rss)
+                    self.prom_cpu_usage.set(cpu_percent)
+                    
+            # Disk I/O
+            if 'io' in groups:
+                try:
+                    io_counters = self.process.io_counters()
+                    self.record_metric('system.disk_read_mb',
+                                       io_counters.read_bytes / (1024 * 1024), MetricType.COUNTER)
+                    self.record_metric('system.disk_write_mb',
+                                       io_counters.write_bytes / (1024 * 1024), MetricType.COUNTER)
+                except (psutil.Error, AttributeError):
+                    pass  # Not available on all systems
+                    
+            # Network connections
+            if 'connections' in groups:
+                try:
+                    connections = getattr(self.process, 'net_connections', None) or self.process.connections
+                    self.record_metric('system.connections', len(connections()), MetricType.GAUGE)
+                except psutil.Error:
+                    pass
+                    
+        scale = self._interval_scale()
+        for group in groups:
+            self._next_sample[group] = now + COLLECTION_INTERVALS[group] * scale
+            self._samples[group] += 1
             
     def record_metric(self, name: str, value: float, 
                      metric_type: MetricType = MetricType.GAUGE,
@@ -227,6 +323,8 @@ class MonitoringSystem:
         with self._lock:
             self.metrics_store[name].append(metric)
             
+        self.timeseries.add(name, value, metric.timestamp.timestamp())
+        
     def record_operation(self, operation: str, duration: float, 
                         success: bool = True, metadata: Dict[str, Any] = None):
         """Record an operation completion"""
@@ -356,7 +454,23 @@ class MonitoringSystem:
             return values
             
     def get_metric_stats(self, name: str, seconds: int = 300) -> Dict[str, float]:
-        """Get statistics for a metric"""
+        """Get statistics for a metric (from rollups beyond the raw points)"""
+        start = time.time() - seconds
+        if self._raw_since(name) > start:
+            summary = self.timeseries.summary(name, start)
+            if not summary['count']:
+                return {}
+            return {
+                'min': summary['min'],
+                'max': summary['max'],
+                'mean': summary['avg'],
+                'median': summary['p50'],
+                'stddev': summary['stddev'],
+                'count': summary['count'],
+                'p95': summary['p95'],
+                'p99': summary['p99']
+            }
+            
         values = self.get_metric_values(name, seconds)
         
         if not values:
@@ -371,23 +485,94 @@ class MonitoringSystem:
             'count': len(values)
         }
         
+    def get_metric_range(self, name: str, start: datetime, end: Optional[datetime] = None,
+                         points: int = 300) -> Dict[str, Any]:
+        """
+        Get a metric's history for charting
+        
+        The coarsest resolution still giving about points buckets is read:
+        raw points for short recent ranges, then 1-minute, 1-hour and
+        1-day rollups.
+        
+        Args:
+            name: Metric name
+            start: Range start
+            end: Range end (default now)
+            points: Desired number of points
+            
+        Returns:
+            Chosen resolution (seconds, 0 for raw) and the points
+        """
+        self.mark_viewed()
+        start_ts = start.timestamp()
+        end_ts = (end or datetime.now()).timestamp()
+        resolution = self.timeseries.choose_resolution(start_ts, end_ts, points,
+                                                       raw_since=self._raw_since(name))
+        
+        if resolution:
+            series = self.timeseries.query(name, start_ts, end_ts, resolution)
+        else:
+            with self._lock:
+                series = [
+                    {'timestamp': m.timestamp.timestamp(), 'value': m.value}
+                    for m in self.metrics_store.get(name, ())
+                    if start_ts <= m.timestamp.timestamp() < end_ts
+                ]
+                
+        return {
+            'metric': name,
+            'resolution': resolution,
+            'start': start_ts,
+            'end': end_ts,
+            'points': series
+        }
+        
+    def _raw_since(self, name: str) -> float:
+        """Epoch from which the raw points of a metric are complete"""
+        since = time.time() - self.retention_hours * 3600
+        with self._lock:
+            store = self.metrics_store.get(name)
+            if store is not None and len(store) == store.maxlen:
+                since = max(since, store[0].timestamp.timestamp())
+        return since
+        
     def get_system_status(self) -> Dict[str, Any]:
         """Get current system status"""
+        # Coming back from idle (or never sampled): answer with a fresh sample
+        if self.mark_viewed() or self._latest('system.cpu_usage') is None:
+            self._collect_system_metrics(['process'])
+            
         return {
             'timestamp': datetime.now().isoformat(),
-            'cpu_usage': self.get_metric_values('system.cpu_usage', 1)[0] if self.get_metric_values('system.cpu_usage', 1) else 0,
-            'memory_mb': self.get_metric_values('system.memory_mb', 1)[0] if self.get_metric_values('system.memory_mb', 1) else 0,
-            'threads': self.get_metric_values('system.threads', 1)[0] if self.get_metric_values('system.threads', 1) else 0,
-            'connections': self.get_metric_values('system.connections', 1)[0] if self.get_metric_values('system.connections', 1) else 0,
+            'cpu_usage': self._latest('system.cpu_usage') or 0,
+            'memory_mb': self._latest('system.memory_mb') or 0,
+            'threads': self._latest('system.threads') or 0,
+            'connections': self._latest('system.connections') or 0,
             'alerts_triggered': len([a for a in self.alert_history if 
                                     datetime.fromisoformat(a['timestamp']) > 
                                     datetime.now() - timedelta(hours=1)])
         }
         
+    def _latest(self, name: str) -> Optional[float]:
+        """Most recent value of a metric"""
+        with self._lock:
+            store = self.metrics_store.get(name)
+            return store[-1].value if store else None
+            
+    def get_collection_status(self) -> Dict[str, Any]:
+        """Current sampling intervals and sample counts per metric group"""
+        scale = self._interval_scale()
+        return {
+            'idle': scale != 1.0,
+            'intervals': {group: interval * scale for group, interval in COLLECTION_INTERVALS.items()},
+            'samples': dict(self._samples)
+        }
+        
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get data for monitoring dashboard"""
         return {
             'system_status': self.get_system_status(),
+            'collection': self.get_collection_status(),
             'metrics': {
                 'cpu': self.get_metric_stats('system.cpu_usage'),
                 'memory': self.get_metric_stats('system.memory_mb'),
@@ -396,14 +581,14 @@ class MonitoringSystem:
             'recent_alerts': list(self.alert_history)[-10:],
             'operation_stats': {
                 'indexing': {
-                    'success': len(self.get_metric_values('operation.indexing.success', 3600)),
-                    'failure': len(self.get_metric_values('operation.indexing.failure', 3600)),
-                    'avg_duration': statistics.mean(self.get_metric_values('operation.indexing.duration', 3600) or [0])
+                    'success': self.get_metric_stats('operation.indexing.success', 3600).get('count', 0),
+                    'failure': self.get_metric_stats('operation.indexing.failure', 3600).get('count', 0),
+                    'avg_duration': self.get_metric_stats('operation.indexing.duration', 3600).get('mean', 0)
                 },
                 'upload': {
-                    'success': len(self.get_metric_values('operation.upload.success', 3600)),
-                    'failure': len(self.get_metric_values('operation.upload.failure', 3600)),
-                    'avg_duration': statistics.mean(self.get_metric_values('operation.upload.duration', 3600) or [0])
+                    'success': self.get_metric_stats('operation.upload.success', 3600).get('count', 0),
+                    'failure': self.get_metric_stats('operation.upload.failure', 3600).get('count', 0),
+                    'avg_duration': self.get_metric_stats('operation.upload.duration', 3600).get('mean', 0)
                 }
             }
         }
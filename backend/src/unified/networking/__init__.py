@@ -8,6 +8,8 @@ from .connection_pool import UnifiedConnectionPool
 from .bandwidth import UnifiedBandwidth
 from .retry import UnifiedRetry
 from .server_health import UnifiedServerHealth
+from .routing import UnifiedArticleRouter
+from .autotuner import UnifiedConnectionTuner
 from .yenc import UnifiedYenc
 
 __all__ = [
@@ -16,5 +18,7 @@ __all__ = [
     'UnifiedBandwidth',
     'UnifiedRetry',
     'UnifiedServerHealth',
+    'UnifiedArticleRouter',
+    'UnifiedConnectionTuner',
     'UnifiedYenc'
 ]
\ No newline at end of file
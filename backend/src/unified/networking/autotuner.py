@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Unified Connection Autotuner - AIMD tuning of per-server connection counts
+Ramps up while throughput improves, backs off on latency or NNTP errors
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# NNTP responses that mean the provider refuses more connections
+REJECTION_CODES = {'400', '481', '482', '502'}
+
+class ServerTuning:
+    """Tuning state for a single server"""
+    
+    def __init__(self, server_id: str, limit: int, cap: int):
+        self.server_id = server_id
+        self.limit = limit
+        self.cap = cap
+        self.learned_cap = None
+        self.best_throughput = 0.0
+        self.last_throughput = None
+        self.baseline_latency = None
+        self.optimal = None
+        self.optimal_by_hour = {}
+        self.plateau_windows = 0
+        self.adjustments = 0
+        self.reset_window()
+    
+    def reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_limit = self.limit
+        self.window_bytes = 0
+        self.window_ops = 0
+        self.window_errors = 0
+        self.window_rejections = 0
+        self.window_latencies = []
+    
+    @property
+    def effective_cap(self) -> int:
+        return min(self.cap, self.learned_cap) if self.learned_cap else self.cap
+
+class UnifiedConnectionTuner:
+    """
+    Adaptive connection-count tuner
+    Additive increase while aggregate throughput improves, multiplicative
+    decrease on errors, provider rejections or rising latency
+    """
+    
+    def __init__(self, db=None, initial_connections: int = 4,
+                 min_connections: int = 1, window_seconds: float = 10.0,
+                 min_window_ops: int = 20, increase_step: int = 1,
+                 decrease_factor: float = 0.7, latency_tolerance: float = 1.5,
+                 improvement_threshold: float = 0.05, error_threshold: float = 0.05):
+        """
+        Initialize tuner
+        
+        Args:
+            db: Optional database for persisting learned optimums
+            initial_connections: Starting limit for servers without history
+            min_connections: Lower bound per server
+            window_seconds: Measurement window per adjustment
+            min_window_ops: Operations needed before a window is evaluated
+            increase_step: Connections added per improving window
+            decrease_factor: Multiplier applied on back-off
+            latency_tolerance: Median latency ratio over baseline that triggers back-off
+            improvement_threshold: Relative throughput gain counted as improvement
+            error_threshold: Error rate that triggers back-off
+        """
+        self.db = db
+        self.initial_connections = initial_connections
+        self.min_connections = min_connections
+        self.window_seconds = window_seconds
+        self.min_window_ops = min_window_ops
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.improvement_threshold = improvement_threshold
+        self.error_threshold = error_threshold
+        self._servers = {}  # server_id -> ServerTuning
+        self._lock = threading.Lock()
+    
+    def register_server(self, server_id: str, provider_cap: int):
+        """
+        Register a server and restore its learned optimum
+        
+        Args:
+            server_id: Server ID (host:port)
+            provider_cap: Maximum connections allowed by the provider
+        """
+        with self._lock:
+            if server_id in self._servers:
+                self._servers[server_id].cap = provider_cap
+                return
+            
+            tuning = ServerTuning(
+                server_id,
+                max(self.min_connections, min(self.initial_connections, provider_cap)),
+                provider_cap
+            )
+            self._servers[server_id] = tuning
+        
+        self._load(tuning)
+    
+    def get_limit(self, server_id: str) -> int:
+        """Get current connection limit for a server"""
+        with self._lock:
+            tuning = self._servers.get(server_id)
+            return tuning.limit if tuning else self.initial_connections
+    
+    def get_total_limit(self) -> int:
+        """Get sum of connection limits across servers"""
+        with self._lock:
+            return sum(t.limit for t in self._servers.values())
+    
+    def record(self, server_id: str, bytes_count: int, latency: float,
+               success: bool = True, response_code: Optional[str] = None):
+        """
+        Record a completed operation
+        
+        Args:
+            server_id: Server ID
+            bytes_count: Bytes transferred
+            latency: Operation latency in seconds
+            success: Whether the operation succeeded
+            response_code: NNTP response code on failure; None for a
+                failure without a response, such as a timeout
+        """
+        with self._lock:
+            tuning = self._servers.get(server_id)
+            if not tuning:
+                return
+            
+            tuning.window_ops += 1
+            if success:
+                tuning.window_bytes += bytes_count
+                tuning.window_latencies.append(latency)
+            elif response_code is None or (response_code[:1] in ('4', '5') and response_code != '430'):
+                # 430 (no such article) is a miss, not a server problem
+                tuning.window_errors += 1
+            
+            changed = self._maybe_adjust(tuning)
+        
+        if changed:
+            self._save(tuning)
+    
+    def record_rejection(self, server_id: str, response_code: str, active_connections: int):
+        """
+        Record a refused connection, e.g. 502 too many connections
+        
+        Args:
+            server_id: Server ID
+            response_code: NNTP response code
+            active_connections: Connections open when the refusal happened
+        """
+        if response_code not in REJECTION_CODES:
+            return
+        
+        with self._lock:
+            tuning = self._servers.get(server_id)
+            if not tuning:
+                return
+            
+            tuning.window_rejections += 1
+            tuning.learned_cap = max(self.min_connections, active_connections)
+            tuning.limit = min(tuning.limit, tuning.effective_cap)
+            if tuning.optimal:
+                tuning.optimal = min(tuning.optimal, tuning.effective_cap)
+            logger.info(f"{server_id} refused connection {active_connections + 1} "
+                        f"({response_code}), capping at {tuning.learned_cap}")
+        
+        self._save(tuning)
+    
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Get tuning state per server"""
+        with self._lock:
+            return {
+                server_id: {
+                    'limit': t.limit,
+                    'provider_cap': t.cap,
+                    'learned_cap': t.learned_cap,
+                    'optimal_connections': t.optimal,
+                    'best_throughput_mbps': round(t.best_throughput * 8 / (1024 * 1024), 3),
+                    'baseline_latency_ms': round(t.baseline_latency * 1000, 2) if t.baseline_latency else None,
+                    'adjustments': t.adjustments
+                }
+                for server_id, t in self._servers.items()
+            }
+    
+    def _maybe_adjust(self, tuning: ServerTuning) -> bool:
+        """Evaluate the window and apply AIMD (caller holds lock)"""
+        elapsed = time.monotonic() - tuning.window_start
+        if elapsed < self.window_seconds or tuning.window_ops < self.min_window_ops:
+            return False
+        
+        throughput = tuning.window_bytes / elapsed
+        error_rate = tuning.window_errors / tuning.window_ops
+        latencies = sorted(tuning.window_latencies)
+        median = latencies[len(latencies) // 2] if latencies else None
+        
+        if median is not None:
+            if tuning.baseline_latency is None or median < tuning.baseline_latency:
+                tuning.baseline_latency = median
+        
+        previous_limit = tuning.limit
+        optimum_changed = False
+        
+        if throughput > tuning.best_throughput:
+            tuning.best_throughput = throughput
+            tuning.optimal = min(tuning.window_limit, tuning.effective_cap)
+            tuning.optimal_by_hour[str(datetime.now().hour)] = tuning.optimal
+            optimum_changed = True
+        
+        improving = (
+            tuning.last_throughput is None or
+            throughput > tuning.last_throughput * (1 + self.improvement_threshold)
+        )
+        latency_rising = (
+            median is not None and tuning.baseline_latency and
+            median > tuning.baseline_latency * self.latency_tolerance
+        )
+        
+        if tuning.window_rejections or error_rate > self.error_threshold:
+            tuning.limit = self._decrease(tuning.limit)
+        elif latency_rising and not improving:
+            tuning.limit = self._decrease(tuning.limit)
+        elif improving:
+            tuning.limit = min(tuning.effective_cap, tuning.limit + self.increase_step)
+            tuning.plateau_windows = 0
+        else:
+            # Plateau: hold, but probe one step up now and then
+            tuning.plateau_windows += 1
+            if tuning.plateau_windows >= 6:
+                tuning.limit = min(tuning.effective_cap, tuning.limit + self.increase_step)
+                tuning.plateau_windows = 0
+        
+        if tuning.limit != previous_limit:
+            tuning.adjustments += 1
+            logger.debug(f"Autotune {tuning.server_id}: {previous_limit} -> {tuning.limit} connections "
+                         f"({throughput / 1024 / 1024:.2f} MB/s, errors {error_rate:.1%})")
+        
+        tuning.last_throughput = throughput
+        tuning.reset_window()
+        return optimum_changed or tuning.limit != previous_limit
+    
+    def _decrease(self, limit: int) -> int:
+        """Multiplicative decrease"""
+        return max(self.min_connections, min(limit - 1, int(limit * self.decrease_factor)))
+    
+    def _load(self, tuning: ServerTuning):
+        """Restore learned optimum from server_health"""
+        if not self.db:
+            return
+        
+        host, port = tuning.server_id.rsplit(':', 1)
+        try:
+            row = self.db.fetch_one(
+                "SELECT max_connections, metadata FROM server_health WHERE server = ? AND port = ?",
+                (host, int(port))
+            )
+        except Exception as e:
+            logger.debug(f"Could not load tuning for {tuning.server_id}: {e}")
+            return
+        
+        if not row or not row.get('metadata'):
+            return
+        
+        try:
+            metadata = json.loads(row['metadata']) if isinstance(row['metadata'], str) else row['metadata']
+        except (TypeError, ValueError):
+            return
+        
+        autotune = (metadata or {}).get('autotune') or {}
+        
+        with self._lock:
+            tuning.learned_cap = autotune.get('learned_cap')
+            tuning.optimal = autotune.get('optimal_connections')
+            tuning.optimal_by_hour = autotune.get('optimal_by_hour', {})
+            start = tuning.optimal_by_hour.get(str(datetime.now().hour), tuning.optimal)
+            if start:
+                tuning.limit = max(self.min_connections, min(start, tuning.effective_cap))
+                tuning.window_limit = tuning.limit
+    
+    def _save(self, tuning: ServerTuning):
+        """Persist learned optimum to server_health"""
+        if not self.db:
+            return
+        
+        host, port = tuning.server_id.rsplit(':', 1)
+        
+        with self._lock:
+            autotune = {
+                'optimal_connections': tuning.optimal,
+                'optimal_by_hour': dict(tuning.optimal_by_hour),
+                'learned_cap': tuning.learned_cap,
+                'best_throughput_bps': round(tuning.best_throughput, 1),
+                'updated_at': datetime.now().isoformat()
+            }
+            limit = tuning.limit
+            cap = tuning.effective_cap
+        
+        try:
+            row = self.db.fetch_one(
+                "SELECT metadata FROM server_health WHERE server = ? AND port = ?",
+                (host, int(port))
+            )
+            metadata = {}
+            if row and row.get('metadata'):
+                try:
+                    metadata = json.loads(row['metadata']) if isinstance(row['metadata'], str) else dict(row['metadata'])
+                except (TypeError, ValueError):
+                    metadata = {}
+            metadata['autotune'] = autotune
+            
+            self.db.upsert(
+                'server_health',
+                {
+                    'server': host,
+                    'port': int(port),
+                    'max_connections': cap,
+                    'current_connections': limit,
+                    'metadata': json.dumps(metadata)
+                },
+                ['server', 'port']
+            )
+        except Exception as e:
+            logger.error(f"Failed to store tuning for {tuning.server_id}: {e}")
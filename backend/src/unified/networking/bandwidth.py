@@ -1,73 +1,378 @@
 #!/usr/bin/env python3
 """
 Unified Bandwidth Control - Rate limiting for uploads/downloads
+Hierarchical token buckets (global -> per-server -> per-connection)
 """
 
+import asyncio
 import time
 import threading
-from typing import Optional
+from collections import deque
+from datetime import datetime
+from typing import Optional, Dict, List, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+DIRECTIONS = ('upload', 'download')
+
+def mbps_to_bytes(rate_mbps: Optional[float]) -> Optional[float]:
+    """Convert megabits per second to bytes per second"""
+    return (rate_mbps * 1024 * 1024 / 8) if rate_mbps else None
+
+class TokenBucket:
+    """
+    Token bucket that can go into debt
+    
+    A reservation always succeeds and returns how long the caller must
+    wait before sending, so no caller ever sleeps while holding a lock.
+    """
+    
+    def __init__(self, rate: Optional[float], burst_seconds: float = 0.1):
+        """
+        Initialize bucket
+        
+        Args:
+            rate: Refill rate in bytes per second (None for unlimited)
+            burst_seconds: Bucket capacity expressed in seconds of rate
+        """
+        self.burst_seconds = burst_seconds
+        self.rate = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.last_refill = time.monotonic()
+        self.last_used = self.last_refill
+        self.busy_until = self.last_refill
+        self.set_rate(rate)
+        self.tokens = self.capacity
+    
+    def set_rate(self, rate: Optional[float]):
+        """Change refill rate, keeping accrued tokens within the new capacity"""
+        self.refill(time.monotonic())
+        self.rate = rate
+        self.capacity = rate * self.burst_seconds if rate else 0.0
+        self.tokens = min(self.tokens, self.capacity)
+    
+    def refill(self, now: float):
+        """Add tokens for time elapsed since last refill"""
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def reserve(self, amount: int, now: float, rate: Optional[float] = None) -> float:
+        """
+        Reserve tokens
+        
+        Args:
+            amount: Bytes to send
+            now: Current monotonic time
+            rate: Optional rate override for this reservation
+        
+        Returns:
+            Seconds the caller must wait before sending
+        """
+        if rate is not None and rate != self.rate:
+            self.rate = rate
+            self.capacity = rate * self.burst_seconds
+        self.refill(now)
+        self.last_used = now
+        if not self.rate:
+            return 0.0
+        self.tokens -= amount
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        self.busy_until = now + delay
+        return delay
+
 class UnifiedBandwidth:
-    """Bandwidth control with rate limiting"""
+    """Bandwidth control with hierarchical token buckets"""
     
-    def __init__(self, max_rate_mbps: Optional[float] = None):
+    def __init__(self, max_rate_mbps: Optional[float] = None,
+                 download_rate_mbps: Optional[float] = None,
+                 server_rate_mbps: Optional[Dict[str, float]] = None,
+                 connection_rate_mbps: Optional[float] = None,
+                 schedule: Optional[List[Dict[str, Any]]] = None,
+                 burst_seconds: float = 0.1,
+                 rate_window_seconds: float = 5.0):
         """
         Initialize bandwidth controller
         
         Args:
-            max_rate_mbps: Maximum rate in megabits per second
+            max_rate_mbps: Global upload limit in megabits per second
+            download_rate_mbps: Global download limit in megabits per second
+            server_rate_mbps: Optional per-server limits (server_id -> Mbps)
+            connection_rate_mbps: Optional hard per-connection limit
+            schedule: Time-of-day limits, e.g.
+                [{'start': '08:00', 'end': '18:00', 'upload_mbps': 10, 'download_mbps': 50}]
+            burst_seconds: Burst allowance expressed in seconds of rate
+            rate_window_seconds: Window for achieved-rate measurement
         """
         self.max_rate_mbps = max_rate_mbps
-        self.max_rate_bytes = (max_rate_mbps * 1024 * 1024 / 8) if max_rate_mbps else None
+        self.download_rate_mbps = download_rate_mbps
+        self.max_rate_bytes = mbps_to_bytes(max_rate_mbps)
+        self.connection_rate_bytes = mbps_to_bytes(connection_rate_mbps)
+        self.burst_seconds = burst_seconds
+        self.rate_window = rate_window_seconds
+        self.schedule = schedule or []
+        self._server_rates = {
+            server_id: mbps_to_bytes(rate) for server_id, rate in (server_rate_mbps or {}).items()
+        }
+        
         self._lock = threading.Lock()
-        self._last_time = time.time()
-        self._bytes_sent = 0
+        self._global = {
+            'upload': TokenBucket(self.max_rate_bytes, burst_seconds),
+            'download': TokenBucket(mbps_to_bytes(download_rate_mbps), burst_seconds)
+        }
+        self._servers = {d: {} for d in DIRECTIONS}  # server_id -> TokenBucket
+        self._connections = {d: {} for d in DIRECTIONS}  # (server_id, conn_id) -> TokenBucket
+        self._sent = {d: deque() for d in DIRECTIONS}  # (send_time, bytes)
+        self._statistics = {
+            d: {'bytes': 0, 'requests': 0, 'throttled_requests': 0, 'throttled_seconds': 0.0}
+            for d in DIRECTIONS
+        }
+        self._schedule_checked = 0.0
+        self._active_schedule = None
+        self._last_prune = time.monotonic()
     
-    def throttle(self, bytes_count: int):
+    def reserve(self, bytes_count: int, direction: str = 'upload',
+                server_id: Optional[str] = None,
+                connection_id: Optional[Any] = None) -> float:
         """
-        Throttle bandwidth by sleeping if necessary
+        Reserve bandwidth without blocking
         
         Args:
-            bytes_count: Number of bytes being sent
+            bytes_count: Number of bytes about to be transferred
+            direction: 'upload' or 'download'
+            server_id: Server the transfer goes to
+            connection_id: Connection carrying the transfer
+        
+        Returns:
+            Seconds the caller must wait before transferring
         """
-        if not self.max_rate_bytes:
-            return
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}")
+        
+        now = time.monotonic()
         
         with self._lock:
-            current_time = time.time()
-            elapsed = current_time - self._last_time
+            self._apply_schedule()
+            
+            delay = self._global[direction].reserve(bytes_count, now)
             
-            # Calculate current rate
-            if elapsed > 0:
-                current_rate = self._bytes_sent / elapsed
+            if server_id is not None:
+                server_bucket = self._get_server_bucket(direction, server_id)
+                delay = max(delay, server_bucket.reserve(bytes_count, now))
                 
-                # If exceeding limit, sleep
-                if current_rate > self.max_rate_bytes:
-                    sleep_time = (self._bytes_sent / self.max_rate_bytes) - elapsed
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
-                        current_time = time.time()
+                if connection_id is not None:
+                    conn_rate = self._fair_share(direction, server_id, now)
+                    if conn_rate:
+                        conn_bucket = self._get_connection_bucket(direction, server_id, connection_id)
+                        delay = max(delay, conn_bucket.reserve(bytes_count, now, conn_rate))
             
-            # Reset counter every second
-            if current_time - self._last_time >= 1.0:
-                self._last_time = current_time
-                self._bytes_sent = bytes_count
+            self._record(direction, bytes_count, now + delay, delay)
+            
+            if now - self._last_prune > 60:
+                self._prune_connections(now)
+        
+        return delay
+    
+    def throttle(self, bytes_count: int, direction: str = 'upload',
+                 server_id: Optional[str] = None,
+                 connection_id: Optional[Any] = None):
+        """
+        Throttle bandwidth by sleeping if necessary (threaded code paths)
+        
+        Args:
+            bytes_count: Number of bytes being sent
+            direction: 'upload' or 'download'
+            server_id: Server the transfer goes to
+            connection_id: Connection carrying the transfer
+        """
+        delay = self.reserve(bytes_count, direction, server_id, connection_id)
+        if delay > 0:
+            time.sleep(delay)
+    
+    async def athrottle(self, bytes_count: int, direction: str = 'upload',
+                        server_id: Optional[str] = None,
+                        connection_id: Optional[Any] = None):
+        """
+        Throttle bandwidth without blocking the event loop (asyncio code paths)
+        
+        Args:
+            bytes_count: Number of bytes being sent
+            direction: 'upload' or 'download'
+            server_id: Server the transfer goes to
+            connection_id: Connection carrying the transfer
+        """
+        delay = self.reserve(bytes_count, direction, server_id, connection_id)
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def get_current_rate(self, direction: Optional[str] = None) -> float:
+        """
+        Get achieved transfer rate in Mbps over the measurement window
+        
+        Args:
+            direction: 'upload', 'download' or None for both
+        """
+        return self.get_achieved_rate_bytes(direction) * 8 / (1024 * 1024)
+    
+    def get_achieved_rate_bytes(self, direction: Optional[str] = None) -> float:
+        """Get achieved transfer rate in bytes per second"""
+        directions = [direction] if direction else list(DIRECTIONS)
+        now = time.monotonic()
+        
+        with self._lock:
+            total = 0
+            for d in directions:
+                self._expire_window(d, now)
+                total += sum(b for t, b in self._sent[d] if t <= now)
+        return total / self.rate_window
+    
+    def set_limit(self, max_rate_mbps: Optional[float], direction: str = 'upload'):
+        """Update global rate limit"""
+        with self._lock:
+            if direction == 'upload':
+                self.max_rate_mbps = max_rate_mbps
+                self.max_rate_bytes = mbps_to_bytes(max_rate_mbps)
             else:
-                self._bytes_sent += bytes_count
+                self.download_rate_mbps = max_rate_mbps
+            self._global[direction].set_rate(mbps_to_bytes(max_rate_mbps))
     
-    def get_current_rate(self) -> float:
-        """Get current transfer rate in Mbps"""
+    def set_server_limit(self, server_id: str, rate_mbps: Optional[float]):
+        """Update per-server rate limit (applies to both directions)"""
         with self._lock:
-            elapsed = time.time() - self._last_time
-            if elapsed > 0:
-                rate_bytes = self._bytes_sent / elapsed
-                return rate_bytes * 8 / (1024 * 1024)  # Convert to Mbps
-            return 0.0
+            self._server_rates[server_id] = mbps_to_bytes(rate_mbps)
+            for direction in DIRECTIONS:
+                if server_id in self._servers[direction]:
+                    self._servers[direction][server_id].set_rate(self._server_rates[server_id])
     
-    def set_limit(self, max_rate_mbps: Optional[float]):
-        """Update rate limit"""
-        self.max_rate_mbps = max_rate_mbps
-        self.max_rate_bytes = (max_rate_mbps * 1024 * 1024 / 8) if max_rate_mbps else None
\ No newline at end of file
+    def set_schedule(self, schedule: List[Dict[str, Any]]):
+        """Replace time-of-day schedule"""
+        with self._lock:
+            self.schedule = schedule or []
+            self._schedule_checked = 0.0
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get bandwidth statistics and achieved rates"""
+        stats = {}
+        for direction in DIRECTIONS:
+            achieved = self.get_achieved_rate_bytes(direction)
+            with self._lock:
+                limit = self._global[direction].rate
+                stats[direction] = {
+                    **self._statistics[direction],
+                    'limit_mbps': round(limit * 8 / (1024 * 1024), 3) if limit else None,
+                    'achieved_mbps': round(achieved * 8 / (1024 * 1024), 3),
+                    'achieved_bytes_per_second': round(achieved, 1),
+                    'active_servers': len(self._servers[direction]),
+                    'active_connections': len(self._connections[direction])
+                }
+        with self._lock:
+            stats['schedule'] = self._active_schedule
+        return stats
+    
+    def _get_server_bucket(self, direction: str, server_id: str) -> TokenBucket:
+        """Get or create server bucket (caller holds lock)"""
+        bucket = self._servers[direction].get(server_id)
+        if bucket is None:
+            bucket = TokenBucket(self._server_rates.get(server_id), self.burst_seconds)
+            self._servers[direction][server_id] = bucket
+        return bucket
+    
+    def _get_connection_bucket(self, direction: str, server_id: str,
+                               connection_id: Any) -> TokenBucket:
+        """Get or create connection bucket (caller holds lock)"""
+        key = (server_id, connection_id)
+        bucket = self._connections[direction].get(key)
+        if bucket is None:
+            bucket = TokenBucket(None, self.burst_seconds)
+            self._connections[direction][key] = bucket
+        return bucket
+    
+    def _fair_share(self, direction: str, server_id: str, now: float) -> Optional[float]:
+        """
+        Per-connection rate: the parent rate split across active connections
+        
+        A connection is active while it waits on a reservation and for a
+        short grace period after (caller holds lock).
+        """
+        server_rate = self._servers[direction][server_id].rate
+        parent = server_rate or self._global[direction].rate
+        if not parent:
+            return self.connection_rate_bytes
+        
+        # Server limit is shared by that server's connections, global by all
+        active = sum(
+            1 for (sid, _), bucket in self._connections[direction].items()
+            if (sid == server_id or not server_rate) and now - bucket.busy_until < 0.1
+        )
+        share = parent / max(1, active)
+        if self.connection_rate_bytes:
+            share = min(share, self.connection_rate_bytes)
+        return share
+    
+    def _record(self, direction: str, bytes_count: int, send_time: float, delay: float):
+        """Record a reservation for statistics (caller holds lock)"""
+        stats = self._statistics[direction]
+        stats['bytes'] += bytes_count
+        stats['requests'] += 1
+        if delay > 0:
+            stats['throttled_requests'] += 1
+            stats['throttled_seconds'] += delay
+        
+        self._sent[direction].append((send_time, bytes_count))
+        self._expire_window(direction, send_time - delay)
+    
+    def _expire_window(self, direction: str, now: float):
+        """Drop samples older than the measurement window (caller holds lock)"""
+        sent = self._sent[direction]
+        cutoff = now - self.rate_window
+        while sent and sent[0][0] < cutoff:
+            sent.popleft()
+    
+    def _prune_connections(self, now: float):
+        """Forget connection buckets idle for over a minute (caller holds lock)"""
+        for direction in DIRECTIONS:
+            stale = [key for key, bucket in self._connections[direction].items()
+                     if now - bucket.last_used > 60]
+            for key in stale:
+                del self._connections[direction][key]
+        self._last_prune = now
+    
+    def _apply_schedule(self):
+        """Apply time-of-day limits, checked at most every 30 seconds (caller holds lock)"""
+        if not self.schedule:
+            return
+        
+        now = time.monotonic()
+        if now - self._schedule_checked < 30:
+            return
+        self._schedule_checked = now
+        
+        current = datetime.now().strftime('%H:%M')
+        entry = None
+        for candidate in self.schedule:
+            start, end = candidate['start'], candidate['end']
+            if start <= end:
+                matches = start <= current < end
+            else:
+                # Window wraps past midnight
+                matches = current >= start or current < end
+            if matches:
+                entry = candidate
+                break
+        
+        if entry is self._active_schedule:
+            return
+        self._active_schedule = entry
+        
+        if entry:
+            upload_mbps = entry.get('upload_mbps')
+            download_mbps = entry.get('download_mbps')
+        else:
+            upload_mbps = self.max_rate_mbps
+            download_mbps = self.download_rate_mbps
+        
+        self._global['upload'].set_rate(mbps_to_bytes(upload_mbps))
+        self._global['download'].set_rate(mbps_to_bytes(download_mbps))
+        logger.info(f"Bandwidth schedule applied: upload={upload_mbps} Mbps, download={download_mbps} Mbps")
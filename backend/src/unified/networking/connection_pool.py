@@ -5,16 +5,33 @@ Production-ready with health monitoring and load balancing
 """
 
 import threading
-import queue
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
 import logging
 
-from .nntp_client import UnifiedNNTPClient
+from .nntp_client import UnifiedNNTPClient, NNTPError
+from .routing import UnifiedArticleRouter
+from .bandwidth import UnifiedBandwidth
+from .autotuner import UnifiedConnectionTuner
+from .yenc import UnifiedYenc
 
 logger = logging.getLogger(__name__)
 
+class StatProbeError(NNTPError):
+    """Pipelined STAT could not probe every article"""
+    
+    def __init__(self, availability: Dict[str, Dict[str, bool]],
+                 errors: Dict[str, Dict[str, Any]]):
+        self.availability = availability  # Partial results, server_id -> {message_id: exists}
+        self.errors = errors  # server_id -> {'articles': unprobed count, 'error': last error}
+        super().__init__("STAT probe incomplete: " + ', '.join(
+            f"{server_id} ({failed['articles']} articles: {failed['error']})"
+            for server_id, failed in errors.items()
+        ))
+
 class UnifiedConnectionPool:
     """
     Connection pool for NNTP clients
@@ -22,26 +39,62 @@ class UnifiedConnectionPool:
     """
     
     def __init__(self, servers: List[Dict[str, Any]], 
-                 max_connections_per_server: int = 10):
+                 max_connections_per_server: int = 10,
+                 router: Optional[UnifiedArticleRouter] = None,
+                 bandwidth: Optional[UnifiedBandwidth] = None,
+                 tuner: Optional[UnifiedConnectionTuner] = None,
+                 validate_after_idle: float = 30.0,
+                 keepalive_interval: float = 60.0,
+                 max_idle: float = 300.0,
+                 reap_interval: float = 15.0):
         """
         Initialize connection pool
         
         Args:
             servers: List of server configurations
-            max_connections_per_server: Max connections per server
+            max_connections_per_server: Max connections per server, used
+                when a server has no max_connections of its own
+            router: Shared article router (created if not provided)
+            bandwidth: Optional bandwidth shaper applied to posts and retrievals
+            tuner: Optional autotuner that sets the connection count per server
+            validate_after_idle: Idle seconds after which a checkout is
+                validated with a round trip first
+            keepalive_interval: Idle seconds after which the reaper pings
+                a pooled connection
+            max_idle: Idle seconds after which the reaper closes a pooled
+                connection
+            reap_interval: Seconds between reaper passes
         """
         self.servers = servers
         self.max_connections = max_connections_per_server
-        self.pools = {}  # server_id -> queue of connections
+        self.router = router or UnifiedArticleRouter()
+        self.bandwidth = bandwidth
+        self.tuner = tuner
+        self.validate_after_idle = validate_after_idle
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self.reap_interval = reap_interval
+        self.pools = {}  # server_id -> idle stack of connections, most recent last
         self.locks = {}  # server_id -> lock
         self.stats = {}  # server_id -> statistics
+        self.caps = {}  # server_id -> provider connection cap
+        self.active = {}  # server_id -> connections checked out
+        self._slots = threading.Condition()
         self._closed = False
+        self._hedge_executor = None
+        self._executor_lock = threading.Lock()
+        self._reaper = None
+        self._reaper_stop = threading.Event()
         
         # Initialize pools for each server
         for server in servers:
             server_id = f"{server['host']}:{server.get('port', 119)}"
-            self.pools[server_id] = queue.Queue(maxsize=max_connections_per_server)
+            self.caps[server_id] = server.get('max_connections') or max_connections_per_server
+            self.active[server_id] = 0
+            self.pools[server_id] = deque()
             self.locks[server_id] = threading.Lock()
+            if tuner:
+                tuner.register_server(server_id, self.caps[server_id])
             self.stats[server_id] = {
                 'connections_created': 0,
                 'connections_reused': 0,
@@ -49,7 +102,10 @@ class UnifiedConnectionPool:
                 'posts_successful': 0,
                 'posts_failed': 0,
                 'retrieves_successful': 0,
-                'retrieves_failed': 0
+                'retrieves_failed': 0,
+                'hedged_requests': 0,
+                'connections_validated': 0,
+                'connections_reaped': 0
             }
     
     @contextmanager
@@ -88,52 +144,150 @@ class UnifiedConnectionPool:
             # Return connection to pool
             if connection and server_id:
                 self._return_connection(server_id, connection)
+                self._release_slot(server_id)
+    
+    @contextmanager
+    def server_connection(self, server_id: str, timeout: float = 30.0):
+        """
+        Get connection bound to a specific server
+        
+        Unlike get_connection, this never falls back to another server
+        and waits for a free slot when the server is at its limit.
+        
+        Args:
+            server_id: Server ID (host:port)
+            timeout: Seconds to wait for a free connection slot
+        
+        Yields:
+            NNTP client connection
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if server_id not in self.pools:
+            raise ValueError(f"Unknown server: {server_id}")
+        
+        if not self._acquire_slot(server_id, timeout):
+            raise RuntimeError(f"No connection slot for {server_id} within {timeout}s")
+        
+        connection = self._get_from_server(server_id)
+        if connection:
+            self.stats[server_id]['connections_reused'] += 1
+        else:
+            server = self._get_server_config(server_id)
+            connection = self._create_connection(server)
+            if not connection:
+                self._release_slot(server_id)
+                self.stats[server_id]['connection_errors'] += 1
+                raise RuntimeError(f"No available connections for {server_id}")
+            self.stats[server_id]['connections_created'] += 1
+        
+        try:
+            yield connection
+        finally:
+            self._return_connection(server_id, connection)
+            self._release_slot(server_id)
+    
+    def _get_server_config(self, server_id: str) -> Dict[str, Any]:
+        """Get server configuration by server ID"""
+        for server in self.servers:
+            if f"{server['host']}:{server.get('port', 119)}" == server_id:
+                return server
+        raise ValueError(f"Unknown server: {server_id}")
     
     def _get_connection(self, prefer_server: Optional[str] = None) -> Tuple[Optional[UnifiedNNTPClient], Optional[str]]:
         """Get connection from pool or create new one"""
+        order = list(self.pools)
         
         # Try preferred server first
-        if prefer_server and prefer_server in self.pools:
-            conn = self._get_from_server(prefer_server)
-            if conn:
-                return conn, prefer_server
+        if prefer_server in self.pools:
+            order.remove(prefer_server)
+            order.insert(0, prefer_server)
         
-        # Try all servers
-        for server_id in self.pools:
-            conn = self._get_from_server(server_id)
-            if conn:
-                return conn, server_id
+        # Reuse an idle connection on a server below its limit
+        for server_id in order:
+            if self._try_acquire_slot(server_id):
+                conn = self._get_from_server(server_id)
+                if conn:
+                    return conn, server_id
+                self._release_slot(server_id)
         
         # No existing connections, create new one
-        for server in self.servers:
-            server_id = f"{server['host']}:{server.get('port', 119)}"
-            
-            with self.locks[server_id]:
-                # Check if we can create more connections
-                if self.pools[server_id].qsize() < self.max_connections:
-                    conn = self._create_connection(server)
-                    if conn:
-                        self.stats[server_id]['connections_created'] += 1
-                        return conn, server_id
+        for server_id in order:
+            if self._try_acquire_slot(server_id):
+                conn = self._create_connection(self._get_server_config(server_id))
+                if conn:
+                    self.stats[server_id]['connections_created'] += 1
+                    return conn, server_id
+                self._release_slot(server_id)
         
         return None, None
     
+    def get_connection_limit(self, server_id: str) -> int:
+        """Get current connection limit for a server"""
+        if self.tuner:
+            return min(self.caps[server_id], self.tuner.get_limit(server_id))
+        return self.caps[server_id]
+    
+    def get_concurrency_limit(self) -> int:
+        """Get current connection limit summed over all servers"""
+        return sum(self.get_connection_limit(server_id) for server_id in self.pools)
+    
+    def get_connection_capacity(self) -> int:
+        """Get provider connection caps summed over all servers"""
+        return sum(self.caps.values())
+    
+    def _try_acquire_slot(self, server_id: str) -> bool:
+        """Take a connection slot if the server is below its limit"""
+        with self._slots:
+            if self.active[server_id] < self.get_connection_limit(server_id):
+                self.active[server_id] += 1
+                return True
+            return False
+    
+    def _acquire_slot(self, server_id: str, timeout: float) -> bool:
+        """Wait for a connection slot on a server"""
+        with self._slots:
+            if not self._slots.wait_for(
+                lambda: self.active[server_id] < self.get_connection_limit(server_id),
+                timeout
+            ):
+                return False
+            self.active[server_id] += 1
+            return True
+    
+    def _release_slot(self, server_id: str):
+        """Give back a connection slot"""
+        with self._slots:
+            self.active[server_id] -= 1
+            self._slots.notify_all()
+    
     def _get_from_server(self, server_id: str) -> Optional[UnifiedNNTPClient]:
-        """Get connection from specific server pool"""
-        try:
-            # Try to get existing connection
-            conn = self.pools[server_id].get_nowait()
+        """
+        Get connection from specific server pool
+        
+        Pops the most recently used connection. Only connections idle
+        longer than validate_after_idle pay a DATE round trip; recently
+        active ones are handed out as-is and a failure surfaces on use.
+        """
+        while True:
+            with self.locks[server_id]:
+                if not self.pools[server_id]:
+                    return None
+                conn = self.pools[server_id].pop()
+            
+            if not conn.connected:
+                conn.disconnect()
+                continue
+            
+            if conn.idle_seconds() < self.validate_after_idle:
+                return conn
             
-            # Test if connection is alive
+            self.stats[server_id]['connections_validated'] += 1
             if conn.test_connection():
                 return conn
-            else:
-                # Connection dead, discard it
-                conn.disconnect()
-                return None
-                
-        except queue.Empty:
-            return None
+            
+            # Connection dead, discard it and try the next one
+            conn.disconnect()
     
     def _create_connection(self, server: Dict[str, Any]) -> Optional[UnifiedNNTPClient]:
         """Create new connection to server"""
@@ -153,6 +307,12 @@ class UnifiedConnectionPool:
                 
                 return client
             
+            if self.tuner and client.last_response:
+                # e.g. 502 too many connections: learn the provider cap
+                server_id = f"{server['host']}:{server.get('port', 119)}"
+                open_connections = max(0, self.active[server_id] - 1) + len(self.pools[server_id])
+                self.tuner.record_rejection(server_id, client.last_response[:3], open_connections)
+            
             return None
             
         except Exception as e:
@@ -161,15 +321,92 @@ class UnifiedConnectionPool:
     
     def _return_connection(self, server_id: str, connection: UnifiedNNTPClient):
         """Return connection to pool"""
-        if self._closed:
+        if self._closed or not connection.connected:
             connection.disconnect()
             return
         
-        try:
-            self.pools[server_id].put_nowait(connection)
-        except queue.Full:
+        with self.locks[server_id]:
+            if len(self.pools[server_id]) < self.caps[server_id]:
+                self.pools[server_id].append(connection)
+                connection = None
+        
+        if connection:
             # Pool full, close connection
             connection.disconnect()
+        
+        self._start_reaper()
+    
+    def _start_reaper(self):
+        """Start the background reaper once connections are pooled"""
+        if self._reaper or self.reap_interval <= 0:
+            return
+        
+        with self._executor_lock:
+            if self._reaper:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop,
+                                            name='nntp-pool-reaper', daemon=True)
+            self._reaper.start()
+    
+    def _reap_loop(self):
+        """Background keepalive and validation of idle connections"""
+        while not self._reaper_stop.wait(self.reap_interval):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.error(f"Connection reaper failed: {e}")
+    
+    def reap_idle(self):
+        """
+        Close or ping idle pooled connections
+        
+        Connections idle past max_idle are closed; those idle past
+        keepalive_interval get a DATE round trip so that the server does
+        not drop them and so checkouts rarely need to validate.
+        """
+        for server_id in self.pools:
+            with self.locks[server_id]:
+                # One idle reading per connection decides where it goes
+                fresh, stale = deque(), []
+                for conn in self.pools[server_id]:
+                    idle = conn.idle_seconds()
+                    if idle < self.keepalive_interval:
+                        fresh.append(conn)
+                    else:
+                        stale.append((conn, idle))
+                self.pools[server_id] = fresh
+            
+            alive = []
+            for conn, idle in stale:
+                if idle >= self.max_idle or not conn.test_connection():
+                    conn.disconnect()
+                    self.stats[server_id]['connections_reaped'] += 1
+                else:
+                    alive.append(conn)
+            
+            if alive:
+                with self.locks[server_id]:
+                    # Pinged connections are idle again, keep hot ones on top
+                    self.pools[server_id].extendleft(alive)
+    
+    def post_data(self, subject: str, data: bytes, newsgroup: str,
+                  message_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Post binary data yEnc-encoded, same contract as RealNNTPClient.post_data
+        
+        Args:
+            subject: Article subject
+            data: Binary data to post
+            newsgroup: Newsgroup to post to
+            message_id: Optional pre-allocated Message-ID
+        
+        Returns:
+            Tuple of (success, message_id)
+        """
+        body = UnifiedYenc.wrap_data(data, subject)
+        headers = {'Message-ID': message_id} if message_id else None
+        posted_id = self.post_article(subject, body, [newsgroup], headers)
+        return posted_id is not None, posted_id
     
     def post_article(self, subject: str, body: bytes, 
                      newsgroups: List[str],
@@ -188,8 +425,12 @@ class UnifiedConnectionPool:
         """
         with self.get_connection() as conn:
             server_id = self._get_server_id(conn)
+            start_time = time.time()
             
             try:
+                if self.bandwidth:
+                    self.bandwidth.throttle(len(body), 'upload', server_id, id(conn))
+                
                 message_id = conn.post_article(subject, body, newsgroups, headers)
                 
                 if message_id:
@@ -197,41 +438,236 @@ class UnifiedConnectionPool:
                 else:
                     self.stats[server_id]['posts_failed'] += 1
                 
+                if self.tuner:
+                    self.tuner.record(server_id, len(body), time.time() - start_time,
+                                      bool(message_id), conn.last_response[:3] or None)
+                
                 return message_id
                 
             except Exception as e:
                 self.stats[server_id]['posts_failed'] += 1
+                if self.tuner:
+                    self.tuner.record(server_id, 0, time.time() - start_time, False)
                 logger.error(f"Post failed: {e}")
                 return None
     
-    def retrieve_article(self, message_id: str) -> Optional[Tuple[str, List[str]]]:
+    def retrieve_article(self, message_id: str,
+                         newsgroup: Optional[str] = None,
+                         article_age_days: Optional[float] = None,
+                         prefer_server: Optional[str] = None) -> Optional[Tuple[str, List[str]]]:
         """
         Retrieve article using pool
         
+        Servers are tried in the order chosen by the router. When the
+        first server takes longer than its p95 latency, a hedged request
+        goes to the next server and whichever answers first wins.
+        
         Args:
             message_id: Message ID to retrieve
+            newsgroup: Newsgroup the article was posted to
+            article_age_days: Article age in days
+            prefer_server: Server to try first, e.g. the one an
+                availability scan found holding the article
         
         Returns:
             Article data or None
         """
-        # Try all servers
-        for server_id in self.pools:
-            try:
-                with self.get_connection(prefer_server=server_id) as conn:
-                    result = conn.retrieve_article(message_id)
-                    
-                    if result:
-                        self.stats[server_id]['retrieves_successful'] += 1
+        return self._retrieve(message_id, newsgroup, article_age_days, prefer_server, False)
+    
+    def retrieve_body(self, message_id: str,
+                      newsgroup: Optional[str] = None,
+                      article_age_days: Optional[float] = None,
+                      prefer_server: Optional[str] = None) -> Optional[bytes]:
+        """
+        Retrieve article body as raw bytes using pool
+        
+        Servers are ordered and hedged as in retrieve_article.
+        
+        Args:
+            message_id: Message ID to retrieve
+            newsgroup: Newsgroup the article was posted to
+            article_age_days: Article age in days
+            prefer_server: Server to try first
+        
+        Returns:
+            Body bytes or None
+        """
+        return self._retrieve(message_id, newsgroup, article_age_days, prefer_server, True)
+    
+    def _retrieve(self, message_id: str, newsgroup: Optional[str],
+                  article_age_days: Optional[float], prefer_server: Optional[str],
+                  body: bool):
+        """Try servers in routed order, hedging slow ones"""
+        remaining = self.router.rank_servers(list(self.pools), newsgroup, article_age_days)
+        
+        if prefer_server in remaining:
+            remaining.remove(prefer_server)
+            remaining.insert(0, prefer_server)
+        
+        while remaining:
+            server_id = remaining.pop(0)
+            delay = self.router.hedge_delay(server_id) if remaining else None
+            
+            if delay is None:
+                result = self._fetch_from(server_id, message_id, newsgroup,
+                                          article_age_days, body)
+                if result is not None:
+                    return result
+                continue
+            
+            executor = self._get_hedge_executor()
+            pending = {executor.submit(self._fetch_from, server_id, message_id,
+                                       newsgroup, article_age_days, body)}
+            
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                hedge_server = remaining.pop(0)
+                self.stats[server_id]['hedged_requests'] += 1
+                logger.debug(f"Hedging {message_id} to {hedge_server} after {delay:.3f}s")
+                pending.add(executor.submit(self._fetch_from, hedge_server, message_id,
+                                            newsgroup, article_age_days, body))
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is not None:
                         return result
-                    else:
-                        self.stats[server_id]['retrieves_failed'] += 1
-                        
-            except Exception as e:
-                self.stats[server_id]['retrieves_failed'] += 1
-                logger.debug(f"Retrieve from {server_id} failed: {e}")
         
         return None
     
+    def _fetch_from(self, server_id: str, message_id: str,
+                    newsgroup: Optional[str] = None,
+                    article_age_days: Optional[float] = None,
+                    body: bool = False):
+        """Retrieve article or body from one server and record the outcome"""
+        start_time = time.time()
+        
+        try:
+            with self.server_connection(server_id) as conn:
+                if body:
+                    result = conn.retrieve_body(message_id)
+                else:
+                    result = conn.retrieve_article(message_id)
+                # Read before the connection can be checked out by another thread
+                response_code = conn.last_response[:3] or None
+        except Exception as e:
+            self.stats[server_id]['retrieves_failed'] += 1
+            self.router.record(server_id, False, time.time() - start_time,
+                               newsgroup, article_age_days, error=True)
+            if self.tuner:
+                self.tuner.record(server_id, 0, time.time() - start_time, False)
+            logger.debug(f"Retrieve from {server_id} failed: {e}")
+            return None
+        
+        latency = time.time() - start_time
+        found = result is not None
+        self.router.record(server_id, found, latency, newsgroup, article_age_days)
+        
+        if not found:
+            size = 0
+        elif body:
+            size = len(result)
+        else:
+            size = sum(len(line) + 2 for line in result[1])
+        if self.tuner:
+            self.tuner.record(server_id, size, latency, found, response_code)
+        
+        if found:
+            if self.bandwidth:
+                self.bandwidth.throttle(size, 'download', server_id, id(conn))
+            self.stats[server_id]['retrieves_successful'] += 1
+        else:
+            self.stats[server_id]['retrieves_failed'] += 1
+        
+        return result
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Get executor used for hedged requests"""
+        if self._hedge_executor is None:
+            with self._executor_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=max(2, self.get_connection_capacity()),
+                        thread_name_prefix='nntp-hedge'
+                    )
+        return self._hedge_executor
+    
+    def stat_articles(self, message_ids: List[str],
+                      connections_per_server: Optional[int] = None,
+                      batch_size: int = 500) -> Dict[str, Dict[str, bool]]:
+        """
+        Check article availability on every server with pipelined STAT
+        
+        Message IDs are split into batches and every server drains its
+        own queue of them over up to connections_per_server connections,
+        never more than the server's connection limit, so a busy server
+        does not hold up the others. A failed batch is retried once.
+        
+        Args:
+            message_ids: Message IDs to check
+            connections_per_server: Parallel connections per server
+            batch_size: Message IDs per pipelined batch
+        
+        Returns:
+            Dictionary of server_id -> {message_id: exists}
+        
+        Raises:
+            StatProbeError: Some batches could not be probed; carries the
+                partial results and the error per server
+        """
+        batches = [message_ids[i:i + batch_size]
+                   for i in range(0, len(message_ids), batch_size)]
+        
+        availability = {server_id: {} for server_id in self.pools}
+        if not batches:
+            return availability
+        
+        queues = {server_id: deque(batches) for server_id in self.pools}
+        errors = {}
+        lock = threading.Lock()
+        
+        def drain(server_id: str):
+            queue = queues[server_id]
+            while True:
+                try:
+                    batch = queue.popleft()
+                except IndexError:
+                    return
+                
+                result, error = None, None
+                for _ in range(2):
+                    try:
+                        with self.server_connection(server_id) as conn:
+                            result = conn.stat_articles(batch)
+                        break
+                    except Exception as e:
+                        error = e
+                
+                with lock:
+                    if result is not None:
+                        availability[server_id].update(result)
+                    else:
+                        failed = errors.setdefault(server_id, {'articles': 0, 'error': None})
+                        failed['articles'] += len(batch)
+                        failed['error'] = str(error)
+        
+        workers = []
+        for server_id in self.pools:
+            limit = self.get_connection_limit(server_id)
+            workers += [server_id] * max(1, min(connections_per_server or limit,
+                                                limit, len(batches)))
+        
+        with ThreadPoolExecutor(max_workers=len(workers),
+                                thread_name_prefix='nntp-stat') as executor:
+            for future in [executor.submit(drain, server_id) for server_id in workers]:
+                future.result()
+        
+        if errors:
+            raise StatProbeError(availability, errors)
+        
+        return availability
+    
     def _get_server_id(self, connection: UnifiedNNTPClient) -> str:
         """Get server ID for connection"""
         info = connection.get_server_info()
@@ -241,10 +677,17 @@ class UnifiedConnectionPool:
         """Get pool statistics"""
         stats = {}
         
+        routing = self.router.get_statistics()
+        autotune = self.tuner.get_statistics() if self.tuner else {}
+        
         for server_id, server_stats in self.stats.items():
             stats[server_id] = {
                 **server_stats,
-                'pool_size': self.pools[server_id].qsize()
+                'pool_size': len(self.pools[server_id]),
+                'active_connections': self.active[server_id],
+                'connection_limit': self.get_connection_limit(server_id),
+                'routing': routing.get(server_id, {}),
+                'autotune': autotune.get(server_id, {})
             }
         
         return stats
@@ -269,11 +712,17 @@ class UnifiedConnectionPool:
     def close(self):
         """Close all connections"""
         self._closed = True
+        self._reaper_stop.set()
+        
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
         
         for server_id, pool in self.pools.items():
-            while not pool.empty():
+            with self.locks[server_id]:
+                connections = list(pool)
+                pool.clear()
+            for conn in connections:
                 try:
-                    conn = pool.get_nowait()
                     conn.disconnect()
                 except:
                     pass
@@ -32,6 +32,9 @@ class UnifiedNNTPClient:
         self.current_group = None
         self._capabilities = {}
         self._server_info = {}
+        self._recv_buffer = b''
+        self.last_response = ''
+        self.last_activity = 0.0  # monotonic time of last successful read
     
     def connect(self, host: str, port: int = 119, 
                 use_ssl: bool = False, timeout: int = 30) -> bool:
@@ -63,6 +66,7 @@ class UnifiedNNTPClient:
             
             # Connect
             self.connection.connect((host, port))
+            self._recv_buffer = b''
             
             # Read greeting
             response = self._read_response()
@@ -82,6 +86,10 @@ class UnifiedNNTPClient:
         except Exception as e:
             logger.error(f"Connection failed: {e}")
             self.connected = False
+            if self.connection:
+                # e.g. a 502 greeting: do not leak the socket
+                self.connection.close()
+                self.connection = None
             return False
     
     def authenticate(self, username: str, password: str) -> bool:
@@ -123,6 +131,9 @@ class UnifiedNNTPClient:
         """
         Post article to newsgroups
         
+        The body is sent as bytes, line by line with CRLF endings and
+        dot-stuffing; binary payloads must be yEnc-encoded beforehand.
+        
         Args:
             subject: Article subject
             body: Article body (can include yEnc data)
@@ -160,12 +171,18 @@ class UnifiedNNTPClient:
         
         # Empty line between headers and body
         article_lines.append("")
+        header_block = '\r\n'.join(article_lines).encode('utf-8') + b'\r\n'
         
-        # Add body
-        if isinstance(body, bytes):
-            body = body.decode('latin-1', errors='ignore')
+        # Add body, dot-stuffing lines that start with '.'
+        if isinstance(body, str):
+            body = body.encode('utf-8')
         
-        article_lines.extend(body.split('\n'))
+        body_lines = [
+            b'.' + line if line.startswith(b'.') else line
+            for line in (line.rstrip(b'\r') for line in body.split(b'\n'))
+        ]
+        if body_lines and not body_lines[-1]:
+            body_lines.pop()
         
         # Post article
         try:
@@ -176,8 +193,8 @@ class UnifiedNNTPClient:
                 return None
             
             # Send article
-            article = '\r\n'.join(article_lines) + '\r\n.\r\n'
-            self.connection.send(article.encode('utf-8', errors='ignore'))
+            article = header_block + b''.join(line + b'\r\n' for line in body_lines) + b'.\r\n'
+            self.connection.sendall(article)
             
             # Read response
             response = self._read_response()
@@ -217,10 +234,10 @@ class UnifiedNNTPClient:
             parts = response.split()
             article_number = parts[1] if len(parts) > 1 else "0"
             
-            # Read article lines
+            # Read article lines (last_response keeps the status line)
             lines = []
             while True:
-                line = self._read_response()
+                line = self._read_raw_line().decode('utf-8', errors='ignore')
                 if line == '.':
                     break
                 if line.startswith('..'):
@@ -230,9 +247,51 @@ class UnifiedNNTPClient:
             return (article_number, lines)
             
         except Exception as e:
+            # Stream state is unknown after a timeout or partial article
+            self.connected = False
             logger.error(f"Retrieval failed: {e}")
             return None
     
+    def retrieve_body(self, message_id: str) -> Optional[bytes]:
+        """
+        Retrieve article body as raw bytes
+        
+        Unlike retrieve_article, lines are not decoded, so binary-safe
+        bodies such as yEnc arrive byte for byte.
+        
+        Args:
+            message_id: Message ID to retrieve
+        
+        Returns:
+            Body lines, dot-unstuffed and joined with CRLF, or None
+        """
+        if not self.connected:
+            raise RuntimeError("Not connected to server")
+        
+        try:
+            response = self._send_command(f"BODY {message_id}")
+            
+            if not response.startswith('222'):
+                logger.warning(f"Article not found: {message_id}")
+                return None
+            
+            lines = []
+            while True:
+                line = self._read_raw_line()
+                if line == b'.':
+                    break
+                if line.startswith(b'..'):
+                    line = line[1:]  # Remove dot-stuffing
+                lines.append(line)
+            
+            return b'\r\n'.join(lines)
+            
+        except Exception as e:
+            # Stream state is unknown after a partial body
+            self.connected = False
+            logger.error(f"Body retrieval failed: {e}")
+            return None
+    
     def select_group(self, newsgroup: str) -> Optional[Dict[str, Any]]:
         """
         Select newsgroup
@@ -318,11 +377,53 @@ class UnifiedNNTPClient:
         except:
             return False
     
+    def stat_articles(self, message_ids: List[str],
+                      window: int = 100) -> Dict[str, bool]:
+        """
+        Check existence of many articles with pipelined STAT commands
+        
+        Commands are written in windows without waiting for each reply,
+        so a batch costs one round trip per window instead of one per
+        article.
+        
+        Args:
+            message_ids: Message IDs to check
+            window: Maximum number of outstanding STAT commands
+        
+        Returns:
+            Dictionary of message_id -> exists
+        """
+        if not self.connected:
+            raise RuntimeError("Not connected to server")
+        
+        results = {}
+        
+        for start in range(0, len(message_ids), window):
+            batch = message_ids[start:start + window]
+            commands = ''.join(f"STAT {message_id}\r\n" for message_id in batch)
+            
+            try:
+                self.connection.sendall(commands.encode('utf-8'))
+                for message_id in batch:
+                    response = self._read_line()
+                    results[message_id] = response.startswith('223')
+            except Exception as e:
+                # Stream state is unknown after a partial pipeline
+                self.connected = False
+                raise NNTPError(f"Pipelined STAT failed: {e}")
+        
+        return results
+    
     def disconnect(self):
         """Disconnect from server"""
-        if self.connected and self.connection:
+        if self.connection:
+            try:
+                # A connection dropped after a failure gets no QUIT
+                if self.connected:
+                    self._send_command("QUIT")
+            except:
+                pass
             try:
-                self._send_command("QUIT")
                 self.connection.close()
             except:
                 pass
@@ -348,6 +449,10 @@ class UnifiedNNTPClient:
             'capabilities': self._capabilities
         }
     
+    def idle_seconds(self) -> float:
+        """Seconds since the server last answered on this connection"""
+        return time.monotonic() - self.last_activity
+    
     def test_connection(self) -> bool:
         """Test if connection is alive"""
         if not self.connected:
@@ -374,16 +479,37 @@ class UnifiedNNTPClient:
             raise NNTPError("Not connected")
         
         try:
-            data = self.connection.recv(1024)
-            return data.decode('utf-8', errors='ignore').strip()
+            return self._read_line().strip()
         except Exception as e:
             raise NNTPError(f"Failed to read response: {e}")
     
+    def _read_line(self) -> str:
+        """Read a single CRLF-terminated response line"""
+        self.last_response = self._read_raw_line().decode('utf-8', errors='ignore')
+        return self.last_response
+    
+    def _read_raw_line(self) -> bytes:
+        """Read a single CRLF-terminated line without decoding it"""
+        if not self.connection:
+            raise NNTPError("Not connected")
+        
+        while b'\r\n' not in self._recv_buffer:
+            data = self.connection.recv(4096)
+            if not data:
+                raise NNTPError("Connection closed by server")
+            self._recv_buffer += data
+        
+        line, self._recv_buffer = self._recv_buffer.split(b'\r\n', 1)
+        self.last_activity = time.monotonic()
+        return line
+    
     def _send_command(self, command: str) -> str:
         """Send command and get response"""
         if not self.connection:
             raise NNTPError("Not connected")
         
+        # A command that times out leaves no stale response behind
+        self.last_response = ''
         try:
             self.connection.send(f"{command}\r\n".encode('utf-8'))
             return self._read_response()
@@ -262,7 +262,8 @@ class RealNNTPClient:
             logger.error(f"❌ Retrieval FAILED: {e}")
             return None
     
-    def post_data(self, data: bytes, subject: str, newsgroup: str = 'alt.binaries.test') -> Tuple[bool, Optional[str]]:
+    def post_data(self, data: bytes, subject: str, newsgroup: str = 'alt.binaries.test',
+                  message_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
         """
         Post binary data to Usenet (wrapper for post_article)
         
@@ -270,6 +271,7 @@ class RealNNTPClient:
             data: Binary data to post
             subject: Subject line
             newsgroup: Newsgroup to post to
+            message_id: Optional pre-allocated Message-ID
             
         Returns:
             Tuple of (success, message_id)
@@ -277,7 +279,8 @@ class RealNNTPClient:
         message_id = self.post_article(
             subject=subject,
             body=data,
-            newsgroups=[newsgroup]
+            newsgroups=[newsgroup],
+            message_id=message_id
         )
         return (message_id is not None, message_id)
     
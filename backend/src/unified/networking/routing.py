@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Unified Article Routing - Learn which server serves which articles fastest
+Tracks hit rate, latency percentiles and retention per server
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Article age bucket upper bounds in days, used to learn retention
+AGE_BUCKETS = [1, 7, 30, 90, 365, 1000, 2000, 4000]
+
+class ServerRoute:
+    """Learned routing statistics for a single server"""
+    
+    def __init__(self, server_id: str, latency_window: int = 256):
+        self.server_id = server_id
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.newsgroups = {}  # newsgroup -> [hits, attempts]
+        self.age_buckets = {}  # bucket upper bound -> [hits, attempts]
+        self.last_error_at = None
+    
+    @property
+    def attempts(self) -> int:
+        return self.hits + self.misses + self.errors
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency percentile in seconds over the sliding window"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+class UnifiedArticleRouter:
+    """
+    Shared article routing table
+    Picks the server most likely to return an article quickly
+    """
+    
+    def __init__(self, health=None, min_samples: int = 5,
+                 min_hedge_samples: int = 20, error_penalty_seconds: float = 60.0):
+        """
+        Initialize router
+        
+        Args:
+            health: Optional UnifiedServerHealth that receives every outcome
+            min_samples: Samples needed before a newsgroup/age bucket is trusted
+            min_hedge_samples: Latency samples needed before hedging a server
+            error_penalty_seconds: How long a connection error demotes a server
+        """
+        self.health = health
+        self.min_samples = min_samples
+        self.min_hedge_samples = min_hedge_samples
+        self.error_penalty_seconds = error_penalty_seconds
+        self._routes = {}  # server_id -> ServerRoute
+        self._lock = threading.Lock()
+    
+    def record(self, server_id: str, found: bool, latency: float,
+               newsgroup: Optional[str] = None,
+               article_age_days: Optional[float] = None,
+               error: bool = False):
+        """
+        Record outcome of an article request
+        
+        Args:
+            server_id: Server ID (host:port)
+            found: Whether the article was returned
+            latency: Request latency in seconds
+            newsgroup: Newsgroup the article was posted to
+            article_age_days: Article age in days
+            error: Whether the request failed with a connection/protocol error
+        """
+        with self._lock:
+            route = self._get_route(server_id)
+            
+            if error:
+                route.errors += 1
+                route.last_error_at = time.time()
+            elif found:
+                route.hits += 1
+                route.latencies.append(latency)
+            else:
+                route.misses += 1
+            
+            if not error:
+                if newsgroup:
+                    counts = route.newsgroups.setdefault(newsgroup, [0, 0])
+                    counts[0] += int(found)
+                    counts[1] += 1
+                
+                if article_age_days is not None:
+                    counts = route.age_buckets.setdefault(self._age_bucket(article_age_days), [0, 0])
+                    counts[0] += int(found)
+                    counts[1] += 1
+        
+        if self.health:
+            host, port = server_id.rsplit(':', 1)
+            self.health.update_health(host, int(port), found and not error, int(latency * 1000))
+    
+    def rank_servers(self, server_ids: List[str],
+                     newsgroup: Optional[str] = None,
+                     article_age_days: Optional[float] = None) -> List[str]:
+        """
+        Order servers by expected time to retrieve an article
+        
+        Expected cost is median latency divided by the probability that
+        the server holds the article. Unknown servers keep their input
+        order ahead of servers known to be worse.
+        
+        Args:
+            server_ids: Candidate server IDs
+            newsgroup: Newsgroup of the article
+            article_age_days: Age of the article in days
+        
+        Returns:
+            Server IDs, best first
+        """
+        with self._lock:
+            costs = {
+                server_id: self._expected_cost(server_id, newsgroup, article_age_days)
+                for server_id in server_ids
+            }
+        
+        return sorted(server_ids, key=lambda server_id: costs[server_id])
+    
+    def hedge_delay(self, server_id: str) -> Optional[float]:
+        """
+        Get delay after which a hedged request should go to another server
+        
+        Args:
+            server_id: Server the first request went to
+        
+        Returns:
+            p95 latency in seconds, or None if not enough samples
+        """
+        with self._lock:
+            route = self._routes.get(server_id)
+            if not route or len(route.latencies) < self.min_hedge_samples:
+                return None
+            return route.percentile(95)
+    
+    def hit_probability(self, server_id: str,
+                        newsgroup: Optional[str] = None,
+                        article_age_days: Optional[float] = None) -> float:
+        """Estimated probability that a server holds an article"""
+        with self._lock:
+            return self._hit_probability(self._routes.get(server_id), newsgroup, article_age_days)
+    
+    def estimated_retention_days(self, server_id: str) -> Optional[int]:
+        """Oldest age bucket in which the server still returns most articles"""
+        with self._lock:
+            route = self._routes.get(server_id)
+            if not route:
+                return None
+            
+            retention = None
+            for bucket in AGE_BUCKETS + [None]:
+                hits, attempts = route.age_buckets.get(bucket, (0, 0))
+                if attempts >= self.min_samples and hits / attempts >= 0.5:
+                    retention = bucket
+            return retention
+    
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Get routing statistics per server"""
+        with self._lock:
+            server_ids = list(self._routes)
+        
+        stats = {}
+        for server_id in server_ids:
+            with self._lock:
+                route = self._routes[server_id]
+                p50 = route.percentile(50)
+                p95 = route.percentile(95)
+                p99 = route.percentile(99)
+                entry = {
+                    'attempts': route.attempts,
+                    'hits': route.hits,
+                    'misses': route.misses,
+                    'errors': route.errors,
+                    'hit_rate': round(self._hit_probability(route, None, None), 4),
+                    'latency_p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+                    'latency_p95_ms': round(p95 * 1000, 2) if p95 is not None else None,
+                    'latency_p99_ms': round(p99 * 1000, 2) if p99 is not None else None
+                }
+            entry['estimated_retention_days'] = self.estimated_retention_days(server_id)
+            stats[server_id] = entry
+        
+        return stats
+    
+    def _get_route(self, server_id: str) -> ServerRoute:
+        """Get or create route entry (caller holds lock)"""
+        route = self._routes.get(server_id)
+        if route is None:
+            route = ServerRoute(server_id)
+            self._routes[server_id] = route
+        return route
+    
+    def _expected_cost(self, server_id: str, newsgroup: Optional[str],
+                       article_age_days: Optional[float]) -> float:
+        """Expected seconds until a hit from this server (caller holds lock)"""
+        route = self._routes.get(server_id)
+        probability = self._hit_probability(route, newsgroup, article_age_days)
+        
+        median = route.percentile(50) if route else None
+        if median is None:
+            # No latency data yet: assume average so the server gets explored
+            known = [r.percentile(50) for r in self._routes.values() if r.latencies]
+            median = sum(known) / len(known) if known else 1.0
+        
+        cost = median / max(probability, 0.01)
+        
+        if route and route.last_error_at:
+            if time.time() - route.last_error_at < self.error_penalty_seconds:
+                cost *= 10
+        
+        return cost
+    
+    def _hit_probability(self, route: Optional[ServerRoute], newsgroup: Optional[str],
+                         article_age_days: Optional[float]) -> float:
+        """Smoothed hit probability using the most specific trusted sample"""
+        if route is None:
+            return 0.5
+        
+        if article_age_days is not None:
+            hits, attempts = route.age_buckets.get(self._age_bucket(article_age_days), (0, 0))
+            if attempts >= self.min_samples:
+                return (hits + 1) / (attempts + 2)
+        
+        if newsgroup:
+            hits, attempts = route.newsgroups.get(newsgroup, (0, 0))
+            if attempts >= self.min_samples:
+                return (hits + 1) / (attempts + 2)
+        
+        return (route.hits + 1) / (route.hits + route.misses + 2)
+    
+    @staticmethod
+    def _age_bucket(article_age_days: float) -> Optional[int]:
+        """Map article age to its bucket upper bound (None for oldest)"""
+        for bound in AGE_BUCKETS:
+            if article_age_days <= bound:
+                return bound
+        return None
@@ -4,15 +4,19 @@ Unified yEnc Module - yEnc encoding and decoding for binary data
 """
 
 import struct
+import time
 from typing import Tuple, Optional, Dict, Any
 import logging
 
+from ..monitoring.pipeline_profiler import pipeline_profiler
+
 logger = logging.getLogger(__name__)
 
 class UnifiedYenc:
     """yEnc encoding/decoding for Usenet binary posts"""
     
     # yEnc special characters
+    NUL = 0x00     # Null
     ESCAPE = 0x3D  # '='
     LF = 0x0A      # Line feed
     CR = 0x0D      # Carriage return
@@ -32,6 +36,7 @@ class UnifiedYenc:
         Returns:
             yEnc encoded data
         """
+        started = time.perf_counter_ns()
         encoded = bytearray()
         column = 0
         
@@ -41,6 +46,7 @@ class UnifiedYenc:
             
             # Check if escaping needed
             needs_escape = (
+                encoded_byte == UnifiedYenc.NUL or
                 encoded_byte == UnifiedYenc.ESCAPE or
                 encoded_byte == UnifiedYenc.LF or
                 encoded_byte == UnifiedYenc.CR or
@@ -62,6 +68,7 @@ class UnifiedYenc:
                 encoded.extend(b'\r\n')
                 column = 0
         
+        pipeline_profiler.record('yenc', started, len(data))
         return bytes(encoded)
     
     @staticmethod
@@ -191,6 +198,38 @@ class UnifiedYenc:
         
         return message
     
+    @staticmethod
+    def unwrap_data(message: bytes) -> bytes:
+        """
+        Extract the binary data from a complete yEnc message
+        
+        Args:
+            message: yEnc message as posted or retrieved (CRLF or LF lines)
+        
+        Returns:
+            Decoded binary data
+        
+        Raises:
+            ValueError: If the message has no =ybegin line
+        """
+        lines = message.split(b'\n')
+        for start, line in enumerate(lines):
+            if line.startswith(b'=ybegin'):
+                break
+        else:
+            raise ValueError("Not a yEnc message")
+        
+        encoded = []
+        for line in lines[start + 1:]:
+            line = line.rstrip(b'\r')
+            if line.startswith(b'=yend'):
+                break
+            if line.startswith(b'=ypart'):
+                continue
+            encoded.append(line)
+        
+        return UnifiedYenc.decode(b''.join(encoded))
+    
     @staticmethod
     def parse_header(header_line: str) -> Dict[str, Any]:
         """
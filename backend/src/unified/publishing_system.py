@@ -18,6 +18,8 @@ from dataclasses import dataclass
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from unified.segmentation.hashing import MerkleTree
+
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -349,8 +351,25 @@ class UnifiedPublishingSystem:
                 'segments': [dict(s) for s in segments]
             }
             
+            # Root of the binary Merkle tree over the segment digests;
+            # downloads check each segment against it as it arrives
+            hashes = [s['segment_hash'] for s in segments]
+            if hashes and all(hashes):
+                file_entry['merkle_root'] = MerkleTree.from_hex(hashes).root.hex()
+                
             index['files'].append(file_entry)
             
+        # Dictionary the folder's packed small files were compressed against
+        folder = self._get_folder_info(folder_id) or {}
+        folder_meta = folder.get('metadata') or {}
+        if isinstance(folder_meta, str):
+            folder_meta = json.loads(folder_meta)
+        if folder_meta.get('compression_dictionary'):
+            index['compression'] = {
+                'dictionary': folder_meta['compression_dictionary'],
+                'dictionary_id': folder_meta.get('compression_dictionary_id')
+            }
+            
         return index
         
     def _encrypt_index(self, index_data: dict, share_type: str,
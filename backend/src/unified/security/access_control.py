@@ -5,9 +5,13 @@ Production-ready with zero-knowledge proofs and per-user wrapped keys
 """
 
 import hashlib
+import hmac
 import secrets
 import json
 import base64
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
@@ -21,18 +25,156 @@ class AccessLevel(Enum):
     PRIVATE = "private"    # Zero-knowledge proofs, per-user wrapped keys
     PROTECTED = "protected"  # Password-derived keys
 
+class SessionKeyCache:
+    """
+    Bounded, time-limited cache of verified share sessions
+    Entries are keyed by an HMAC of (share, user, password) under a
+    per-process secret, so neither raw passwords nor offline-testable
+    hashes of them are held in memory
+    """
+    
+    def __init__(self, ttl: float = 300.0, max_entries: int = 10000):
+        """
+        Args:
+            ttl: Seconds a verified session stays valid
+            max_entries: Maximum cached sessions (least recently used evicted)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()  # digest -> (key, expires, share_id, user_id)
+        self._by_share = {}  # share_id -> set of digests
+        self._generations = {}  # share_id -> invalidation count
+        self._epoch = 0  # Bumped by invalidations not limited to one share
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def digest(self, share_id: str, user_id: str, password: Optional[str]) -> bytes:
+        """Secure digest of the credentials"""
+        message = json.dumps([share_id, user_id, password]).encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+    
+    def get(self, digest: bytes) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry[1] <= time.monotonic():
+                self._remove(digest)
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+    
+    def generation(self, share_id: str) -> Tuple[int, int]:
+        """Invalidation generation of a share; take it before verifying"""
+        with self._lock:
+            return self._epoch, self._generations.get(share_id, 0)
+    
+    def put(self, digest: bytes, key: bytes, share_id: str, user_id: str,
+            expires_at: Optional[datetime] = None,
+            generation: Optional[Tuple[int, int]] = None):
+        """
+        Cache a verified session
+        
+        Args:
+            expires_at: Share expiry; the session never outlives it
+            generation: Value of generation() taken before verifying; the
+                entry is dropped if the share was invalidated since
+        """
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, (expires_at - datetime.now()).total_seconds())
+        if ttl <= 0:
+            return
+        
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(share_id, 0)):
+                return
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (key, time.monotonic() + ttl, share_id, user_id)
+            self._by_share.setdefault(share_id, set()).add(digest)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+    
+    def invalidate(self, share_id: Optional[str] = None, user_id: Optional[str] = None) -> int:
+        """
+        Drop cached sessions for a share, a user on a share, a user
+        everywhere, or everything when called without arguments
+        
+        Returns:
+            Number of sessions dropped
+        """
+        with self._lock:
+            # Verifications already in flight must not re-cache what is dropped here
+            if share_id is None:
+                self._epoch += 1
+            else:
+                self._generations[share_id] = self._generations.get(share_id, 0) + 1
+            
+            if share_id is None and user_id is None:
+                count = len(self._entries)
+                self._entries.clear()
+                self._by_share.clear()
+                return count
+            
+            if share_id is not None:
+                candidates = list(self._by_share.get(share_id, ()))
+            else:
+                candidates = list(self._entries)
+            
+            dropped = [
+                digest for digest in candidates
+                if user_id is None or self._entries[digest][3] == user_id
+            ]
+            for digest in dropped:
+                self._remove(digest)
+            return len(dropped)
+    
+    def _remove(self, digest: bytes):
+        _, _, share_id, _ = self._entries.pop(digest)
+        digests = self._by_share.get(share_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_share[share_id]
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'sessions': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl_seconds': self.ttl
+            }
+
 class UnifiedAccessControl:
     """
     Unified access control system for shares
     Implements three-tier access control with client-side decryption
     """
     
-    def __init__(self, db, encryption, authentication):
-        """Initialize access control system"""
+    def __init__(self, db, encryption, authentication,
+                 session_ttl: float = 300.0, session_cache_size: int = 10000):
+        """
+        Initialize access control system
+        
+        Args:
+            session_ttl: Seconds a verified session skips key derivation
+            session_cache_size: Maximum cached sessions; 0 disables the cache
+        """
         self.db = db
         self.encryption = encryption
         self.auth = authentication
         self._commitment_cache = {}
+        self.sessions = SessionKeyCache(session_ttl, session_cache_size) if session_cache_size else None
     
     def create_public_share(self, folder_id: str, owner_id: str,
                           expiry_days: Optional[int] = 30) -> Dict[str, Any]:
@@ -340,9 +482,64 @@ class UnifiedAccessControl:
                 (share_id,)
             )
         
+        self.invalidate_sessions(share_id, user_id)
+        
         logger.info(f"Revoked access for user {user_id} from share {share_id}")
         return True
     
+    def revoke_share(self, share_id: str, revoker_id: str, reason: Optional[str] = None) -> bool:
+        """
+        Revoke a share for everyone
+        
+        Args:
+            share_id: Share ID
+            revoker_id: User revoking the share (must be owner)
+            reason: Optional reason
+        
+        Returns:
+            True if share revoked
+        """
+        share = self.db.fetch_one(
+            "SELECT created_by FROM publications WHERE share_id = ?",
+            (share_id,)
+        )
+        
+        if not share or share['created_by'] != revoker_id:
+            raise PermissionError("Not authorized to revoke share")
+        
+        self.db.update(
+            'publications',
+            {
+                'revoked': True,
+                'revoked_at': datetime.now().isoformat(),
+                'revoke_reason': reason
+            },
+            'share_id = ?',
+            (share_id,)
+        )
+        
+        self.invalidate_sessions(share_id)
+        
+        logger.info(f"Revoked share {share_id}")
+        return True
+    
+    def invalidate_sessions(self, share_id: Optional[str] = None,
+                            user_id: Optional[str] = None) -> int:
+        """
+        Drop cached verified sessions
+        Call after revoking access or rotating a share's keys or password
+        
+        Args:
+            share_id: Limit to one share
+            user_id: Limit to one user
+        
+        Returns:
+            Number of sessions dropped
+        """
+        if not self.sessions:
+            return 0
+        return self.sessions.invalidate(share_id, user_id)
+    
     def verify_access(self, share_id: str, user_id: str,
                      password: Optional[str] = None) -> Optional[bytes]:
         """
@@ -356,6 +553,25 @@ class UnifiedAccessControl:
         Returns:
             Decryption key if access granted, None otherwise
         """
+        # Sessions verified recently skip the database and key derivation
+        digest = None
+        if self.sessions:
+            digest = self.sessions.digest(share_id, user_id, password)
+            key = self.sessions.get(digest)
+            if key is not None:
+                return key
+            generation = self.sessions.generation(share_id)
+        
+        key, expires = self._verify_access(share_id, user_id, password)
+        
+        if key is not None and digest is not None:
+            self.sessions.put(digest, key, share_id, user_id, expires, generation)
+        
+        return key
+    
+    def _verify_access(self, share_id: str, user_id: str,
+                       password: Optional[str]) -> Tuple[Optional[bytes], Optional[datetime]]:
+        """Full verification; returns (key, share expiry)"""
         # Get share
         share = self.db.fetch_one(
             "SELECT * FROM publications WHERE share_id = ? AND revoked = 0",
@@ -363,9 +579,10 @@ class UnifiedAccessControl:
         )
         
         if not share:
-            return None
+            return None, None
         
         # Check expiry
+        expires = None
         if share['expires_at']:
             # Handle both string and datetime objects
             if isinstance(share['expires_at'], str):
@@ -375,13 +592,13 @@ class UnifiedAccessControl:
             
             if expires < datetime.now():
                 logger.warning(f"Share {share_id} has expired")
-                return None
+                return None, None
         
         access_level = AccessLevel(share['access_level'])
         
         # PUBLIC - key is included
         if access_level == AccessLevel.PUBLIC:
-            return base64.b64decode(share['encryption_key'])
+            return base64.b64decode(share['encryption_key']), expires
         
         # PRIVATE - check commitments
         elif access_level == AccessLevel.PRIVATE:
@@ -397,22 +614,22 @@ class UnifiedAccessControl:
             if not commitment:
                 # Check if user is owner
                 if share['created_by'] != user_id:
-                    return None
+                    return None, None
                 
                 # Owner always has access
                 wrapped_keys = json.loads(share['wrapped_keys'])
                 owner_wrapped = wrapped_keys.get(user_id)
                 if owner_wrapped:
                     # Unwrap key (would use user's private key in real implementation)
-                    return self._unwrap_key_for_user(owner_wrapped, user_id)
+                    return self._unwrap_key_for_user(owner_wrapped, user_id), expires
             else:
                 # User has commitment, return their wrapped key
-                return self._unwrap_key_for_user(commitment['wrapped_key'], user_id)
+                return self._unwrap_key_for_user(commitment['wrapped_key'], user_id), expires
         
         # PROTECTED - verify password
         elif access_level == AccessLevel.PROTECTED:
             if not password:
-                return None
+                return None, None
             
             # Verify password hash
             password_salt = base64.b64decode(share['password_salt'])
@@ -424,7 +641,7 @@ class UnifiedAccessControl:
             )
             
             if base64.b64encode(password_hash).decode('ascii') != share['password_hash']:
-                return None
+                return None, None
             
             # Derive key from password and unwrap master key
             metadata = json.loads(share['metadata'])
@@ -434,9 +651,9 @@ class UnifiedAccessControl:
             wrapped_master = base64.b64decode(share['encryption_key'])
             master_key = self.encryption.unwrap_key(wrapped_master, derived_key)
             
-            return master_key
+            return master_key, expires
         
-        return None
+        return None, None
     
     def list_user_shares(self, user_id: str) -> List[Dict[str, Any]]:
         """List all shares accessible by user"""
@@ -7,12 +7,19 @@ Production-ready with key management and streaming support
 import os
 import base64
 import hashlib
+import hmac
 import secrets
 import struct
-from typing import Tuple, Optional, Union, Generator
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Union, Generator, Iterable
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 import logging
@@ -32,10 +39,25 @@ class UnifiedEncryption:
     SALT_SIZE = 32  # 256 bits
     CHUNK_SIZE = 64 * 1024  # 64KB chunks for streaming
     
-    def __init__(self):
-        """Initialize encryption system"""
+    # Chunked stream format: header, then one GCM record per chunk
+    STREAM_MAGIC = b'USCS'
+    STREAM_VERSION = 1
+    STREAM_HEADER = struct.Struct('<4sBI16s')  # magic, version, chunk size, salt
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Initialize encryption system
+        
+        Args:
+            workers: Threads for chunked stream encryption (default: CPU count)
+        """
         self.backend = default_backend()
         self._key_cache = {}  # Cache derived keys
+        self._cache_secret = secrets.token_bytes(32)
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     def generate_key(self) -> bytes:
         """Generate a random 256-bit key"""
@@ -49,10 +71,15 @@ class UnifiedEncryption:
         """Generate a random nonce for GCM"""
         return secrets.token_bytes(self.NONCE_SIZE)
     
+    def _cache_key(self, kdf: str, password: str, *params) -> bytes:
+        """Cache key for a derivation; never holds the password itself"""
+        message = ':'.join([kdf, password] + [str(p) for p in params]).encode('utf-8')
+        return hmac.new(self._cache_secret, message, hashlib.sha256).digest()
+    
     def derive_key_pbkdf2(self, password: str, salt: bytes, 
                          iterations: int = 100000) -> bytes:
         """Derive key from password using PBKDF2"""
-        cache_key = f"pbkdf2:{password}:{salt.hex()}:{iterations}"
+        cache_key = self._cache_key('pbkdf2', password, salt.hex(), iterations)
         
         if cache_key in self._key_cache:
             return self._key_cache[cache_key]
@@ -72,7 +99,7 @@ class UnifiedEncryption:
     def derive_key_scrypt(self, password: str, salt: bytes,
                          n: int = 16384, r: int = 8, p: int = 1) -> bytes:
         """Derive key from password using Scrypt (more secure)"""
-        cache_key = f"scrypt:{password}:{salt.hex()}:{n}:{r}:{p}"
+        cache_key = self._cache_key('scrypt', password, salt.hex(), n, r, p)
         
         if cache_key in self._key_cache:
             return self._key_cache[cache_key]
@@ -90,6 +117,16 @@ class UnifiedEncryption:
         self._key_cache[cache_key] = key
         return key
     
+    def derive_subkey(self, key: bytes, salt: bytes, info: bytes) -> bytes:
+        """Derive a purpose-bound key from a high-entropy key using HKDF-SHA256"""
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=self.KEY_SIZE,
+            salt=salt,
+            info=info,
+            backend=self.backend
+        ).derive(key)
+    
     def encrypt(self, data: bytes, key: bytes, 
                associated_data: Optional[bytes] = None) -> Tuple[bytes, bytes, bytes]:
         """
@@ -155,154 +192,280 @@ class UnifiedEncryption:
         return decryptor.update(ciphertext) + decryptor.finalize()
     
     def encrypt_file(self, input_path: str, output_path: str, key: bytes,
-                    progress_callback: Optional[callable] = None) -> Tuple[bytes, bytes]:
+                    progress_callback: Optional[callable] = None,
+                    associated_data: Optional[bytes] = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE) -> bytes:
         """
-        Encrypt a file with streaming support
+        Encrypt a file in the chunked stream format
+        
+        Chunks are sealed in parallel and memory stays bounded by the
+        worker window, whatever the file size.
         
         Args:
             input_path: Path to input file
             output_path: Path to output file
             key: Encryption key
             progress_callback: Optional callback for progress updates
+            associated_data: Additional authenticated data (not encrypted)
+            chunk_size: Plaintext bytes per chunk
         
         Returns:
-            Tuple of (nonce, tag)
+            Stream header written at the start of the file
         """
         file_size = os.path.getsize(input_path)
-        nonce = self.generate_nonce()
-        
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.GCM(nonce),
-            backend=self.backend
-        )
-        
-        encryptor = cipher.encryptor()
-        bytes_processed = 0
         
         with open(input_path, 'rb') as infile, open(output_path, 'wb') as outfile:
-            # Write header: nonce (12 bytes)
-            outfile.write(nonce)
-            
-            # Encrypt file in chunks
-            while True:
-                chunk = infile.read(self.CHUNK_SIZE)
-                if not chunk:
-                    break
-                
-                encrypted_chunk = encryptor.update(chunk)
-                outfile.write(encrypted_chunk)
-                
-                bytes_processed += len(chunk)
-                if progress_callback:
-                    progress_callback(bytes_processed, file_size)
-            
-            # Finalize and write tag
-            encryptor.finalize()
-            outfile.write(encryptor.tag)
+            records = self.encrypt_stream(
+                self._read_chunks(infile, chunk_size, file_size, progress_callback),
+                key, associated_data, chunk_size
+            )
+            header = next(records)
+            outfile.write(header)
+            for record in records:
+                outfile.write(record)
         
-        return nonce, encryptor.tag
+        return header
     
     def decrypt_file(self, input_path: str, output_path: str, key: bytes,
-                    progress_callback: Optional[callable] = None) -> None:
+                    progress_callback: Optional[callable] = None,
+                    associated_data: Optional[bytes] = None) -> None:
         """
-        Decrypt a file with streaming support
+        Decrypt a file written by encrypt_file
+        
+        Plaintext goes to a temporary file next to output_path that only
+        replaces it once the whole file has been authenticated. Files in
+        the older single-tag format (nonce first, tag last) are still
+        accepted.
         
         Args:
             input_path: Path to encrypted file
             output_path: Path to output file
             key: Decryption key
             progress_callback: Optional callback for progress updates
+            associated_data: Additional authenticated data
+        
+        Raises:
+            InvalidTag: If the file was modified or truncated
         """
         file_size = os.path.getsize(input_path)
-        
-        with open(input_path, 'rb') as infile:
-            # Read header
-            nonce = infile.read(self.NONCE_SIZE)
-            
-            # Read tag from end of file
-            infile.seek(-self.TAG_SIZE, os.SEEK_END)
-            tag = infile.read(self.TAG_SIZE)
-            
-            # Reset to start of ciphertext
-            infile.seek(self.NONCE_SIZE)
-            ciphertext_size = file_size - self.NONCE_SIZE - self.TAG_SIZE
+        partial_path = f"{output_path}.partial"
+        
+        try:
+            with open(input_path, 'rb') as infile, open(partial_path, 'wb') as outfile:
+                if infile.read(len(self.STREAM_MAGIC)) == self.STREAM_MAGIC:
+                    infile.seek(0)
+                    encrypted = self._read_chunks(infile, self.STREAM_CHUNK_SIZE,
+                                                  file_size, progress_callback)
+                    for chunk in self.decrypt_stream(encrypted, key, associated_data):
+                        outfile.write(chunk)
+                else:
+                    infile.seek(0)
+                    self._decrypt_file_legacy(infile, outfile, key, file_size, progress_callback)
             
-            cipher = Cipher(
-                algorithms.AES(key),
-                modes.GCM(nonce, tag),
-                backend=self.backend
-            )
-            
-            decryptor = cipher.decryptor()
-            bytes_processed = 0
+            os.replace(partial_path, output_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+    
+    @staticmethod
+    def _read_chunks(infile, chunk_size: int, total: int,
+                     progress_callback: Optional[callable]) -> Generator[bytes, None, None]:
+        """Read a file in chunks, reporting bytes read"""
+        bytes_processed = 0
+        while True:
+            chunk = infile.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+            bytes_processed += len(chunk)
+            if progress_callback:
+                progress_callback(bytes_processed, total)
+    
+    def _decrypt_file_legacy(self, infile, outfile, key: bytes, file_size: int,
+                             progress_callback: Optional[callable]):
+        """Single-tag files from encrypt_file before chunking"""
+        nonce = infile.read(self.NONCE_SIZE)
+        
+        # Read tag from end of file
+        infile.seek(-self.TAG_SIZE, os.SEEK_END)
+        tag = infile.read(self.TAG_SIZE)
+        
+        # Reset to start of ciphertext
+        infile.seek(self.NONCE_SIZE)
+        ciphertext_size = file_size - self.NONCE_SIZE - self.TAG_SIZE
+        
+        cipher = Cipher(
+            algorithms.AES(key),
+            modes.GCM(nonce, tag),
+            backend=self.backend
+        )
+        
+        decryptor = cipher.decryptor()
+        bytes_processed = 0
+        
+        while bytes_processed < ciphertext_size:
+            chunk = infile.read(min(self.CHUNK_SIZE, ciphertext_size - bytes_processed))
+            outfile.write(decryptor.update(chunk))
             
-            with open(output_path, 'wb') as outfile:
-                # Decrypt file in chunks
-                while bytes_processed < ciphertext_size:
-                    chunk_size = min(self.CHUNK_SIZE, ciphertext_size - bytes_processed)
-                    chunk = infile.read(chunk_size)
-                    
-                    decrypted_chunk = decryptor.update(chunk)
-                    outfile.write(decrypted_chunk)
-                    
-                    bytes_processed += len(chunk)
-                    if progress_callback:
-                        progress_callback(bytes_processed, ciphertext_size)
-                
-                # Finalize decryption
-                decryptor.finalize()
+            bytes_processed += len(chunk)
+            if progress_callback:
+                progress_callback(bytes_processed, ciphertext_size)
+        
+        # Raises InvalidTag before the partial file can replace the output
+        decryptor.finalize()
     
-    def encrypt_stream(self, data_stream: Generator[bytes, None, None], 
-                      key: bytes) -> Generator[bytes, None, None]:
+    def encrypt_stream(self, data_stream: Iterable[bytes], key: bytes,
+                      associated_data: Optional[bytes] = None,
+                      chunk_size: int = STREAM_CHUNK_SIZE) -> Generator[bytes, None, None]:
         """
-        Encrypt a stream of data
+        Encrypt a stream of data in independently authenticated chunks
+        
+        Each chunk is sealed under a per-stream subkey with a nonce built
+        from its index and a final-chunk flag, so chunks are encrypted in
+        parallel and truncated or reordered streams fail to decrypt.
+        Memory use is bounded by chunk_size times the worker window.
         
         Args:
-            data_stream: Generator yielding data chunks
+            data_stream: Iterable yielding data pieces of any size
             key: Encryption key
+            associated_data: Additional authenticated data (not encrypted)
+            chunk_size: Plaintext bytes per chunk
         
         Yields:
-            Encrypted chunks
+            Stream header, then one encrypted chunk at a time
         """
-        nonce = self.generate_nonce()
-        
-        cipher = Cipher(
-            algorithms.AES(key),
-            modes.GCM(nonce),
-            backend=self.backend
-        )
+        if len(key) != self.KEY_SIZE:
+            raise ValueError(f"Key must be {self.KEY_SIZE} bytes")
         
-        encryptor = cipher.encryptor()
+        salt = secrets.token_bytes(16)
+        header = self.STREAM_HEADER.pack(self.STREAM_MAGIC, self.STREAM_VERSION, chunk_size, salt)
+        aead, aad = self._stream_cipher(key, header, associated_data)
         
-        # Yield header with nonce
-        yield nonce
+        yield header
         
-        # Encrypt chunks
-        for chunk in data_stream:
-            encrypted_chunk = encryptor.update(chunk)
-            if encrypted_chunk:
-                yield encrypted_chunk
+        def chunks():
+            pending = bytearray()
+            for piece in data_stream:
+                pending += piece
+                # Keep at least one chunk back: only the last one is final
+                while len(pending) > chunk_size:
+                    yield bytes(pending[:chunk_size]), False
+                    del pending[:chunk_size]
+            yield bytes(pending), True
         
-        # Finalize and yield tag
-        encryptor.finalize()
-        yield encryptor.tag
+        seal = lambda index, chunk, final: aead.encrypt(self._stream_nonce(index, final), chunk, aad)
+        yield from self._map_chunks(seal, chunks())
     
-    def decrypt_stream(self, encrypted_stream: Generator[bytes, None, None],
-                      key: bytes) -> Generator[bytes, None, None]:
+    def decrypt_stream(self, encrypted_stream: Iterable[bytes], key: bytes,
+                      associated_data: Optional[bytes] = None) -> Generator[bytes, None, None]:
         """
         Decrypt a stream of data
         
+        Chunked streams are verified and decrypted chunk by chunk without
+        buffering the ciphertext. Streams from the older single-tag format
+        (nonce first, tag last) are still accepted.
+        
         Args:
-            encrypted_stream: Generator yielding encrypted chunks
+            encrypted_stream: Iterable yielding encrypted pieces of any size
             key: Decryption key
+            associated_data: Additional authenticated data
         
         Yields:
             Decrypted chunks
+        
+        Raises:
+            InvalidTag: If a chunk was modified, reordered, or the stream truncated
         """
-        # Read nonce from first chunk
-        nonce = next(encrypted_stream)
+        encrypted_stream = iter(encrypted_stream)
+        pending = bytearray()
+        for piece in encrypted_stream:
+            pending += piece
+            if len(pending) >= len(self.STREAM_MAGIC):
+                break
+        
+        if not pending.startswith(self.STREAM_MAGIC):
+            yield from self._decrypt_stream_legacy(bytes(pending), encrypted_stream, key)
+            return
+        
+        while len(pending) < self.STREAM_HEADER.size:
+            piece = next(encrypted_stream, None)
+            if piece is None:
+                raise InvalidTag()
+            pending += piece
+        
+        header = bytes(pending[:self.STREAM_HEADER.size])
+        del pending[:self.STREAM_HEADER.size]
+        _, version, chunk_size, _ = self.STREAM_HEADER.unpack(header)
+        if version != self.STREAM_VERSION:
+            raise ValueError(f"Unsupported stream version {version}")
+        
+        aead, aad = self._stream_cipher(key, header, associated_data)
+        record_size = chunk_size + self.TAG_SIZE
+        
+        def records():
+            while True:
+                # A record is only known to be non-final once more data follows
+                while len(pending) > record_size:
+                    yield bytes(pending[:record_size]), False
+                    del pending[:record_size]
+                piece = next(encrypted_stream, None)
+                if piece is None:
+                    break
+                pending.extend(piece)
+            if len(pending) < self.TAG_SIZE:
+                raise InvalidTag()
+            yield bytes(pending), True
         
+        open_ = lambda index, record, final: aead.decrypt(self._stream_nonce(index, final), record, aad)
+        yield from self._map_chunks(open_, records())
+    
+    def _stream_cipher(self, key: bytes, header: bytes,
+                       associated_data: Optional[bytes]) -> Tuple[AESGCM, bytes]:
+        """Per-stream subkey and the AAD bound to every chunk"""
+        subkey = self.derive_subkey(key, header[-16:], b'usenetsync-stream')
+        return AESGCM(subkey), header + (associated_data or b'')
+    
+    @staticmethod
+    def _stream_nonce(index: int, final: bool) -> bytes:
+        """7 zero bytes, 32-bit chunk index, final flag"""
+        return struct.pack('>7xIB', index, 1 if final else 0)
+    
+    def _map_chunks(self, operation, chunks) -> Generator[bytes, None, None]:
+        """Apply operation(index, chunk, final) across workers, yielding in order"""
+        if self.workers <= 1:
+            for index, (chunk, final) in enumerate(chunks):
+                yield operation(index, chunk, final)
+            return
+        
+        executor = self._get_executor()
+        window = deque()
+        for index, (chunk, final) in enumerate(chunks):
+            window.append(executor.submit(operation, index, chunk, final))
+            if len(window) >= 2 * self.workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='stream-crypt'
+                )
+            return self._executor
+    
+    def shutdown(self):
+        """Stop stream encryption workers"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+    
+    def _decrypt_stream_legacy(self, nonce: bytes, encrypted_stream: Iterable[bytes],
+                               key: bytes) -> Generator[bytes, None, None]:
+        """Single-tag streams from encrypt_stream before chunking"""
         # Collect all encrypted data and tag
         chunks = []
         for chunk in encrypted_stream:
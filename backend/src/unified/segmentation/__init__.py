@@ -4,17 +4,19 @@ Production-ready with Reed-Solomon and streaming support
 """
 
 from .processor import UnifiedSegmentProcessor
-from .packing import UnifiedPacking
+from .packing import UnifiedPacking, PackIndex
 from .redundancy import UnifiedRedundancy
-from .hashing import UnifiedHashing
+from .hashing import UnifiedHashing, MerkleTree
 from .compression import UnifiedCompression
 from .headers import UnifiedHeaders
 
 __all__ = [
     'UnifiedSegmentProcessor',
     'UnifiedPacking',
+    'PackIndex',
     'UnifiedRedundancy',
     'UnifiedHashing',
+    'MerkleTree',
     'UnifiedCompression',
     'UnifiedHeaders'
 ]
\ No newline at end of file
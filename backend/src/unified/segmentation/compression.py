@@ -1,36 +1,313 @@
 #!/usr/bin/env python3
 """
-Unified Compression Module - Zlib compression for segments
+Unified Compression Module - Adaptive compression for segments
+Picks zstd, lz4 or no compression per segment from the file type and a
+sampled entropy estimate, and tunes the zstd level to a target throughput
 """
 
+import os
+import math
+import time
+import hashlib
 import zlib
-from typing import Tuple
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple, Optional
 import logging
 
+from ..monitoring.pipeline_profiler import pipeline_profiler
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+    zstandard = None
+
+try:
+    import lz4.block
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
 logger = logging.getLogger(__name__)
 
 class UnifiedCompression:
     """Unified compression for segments"""
     
-    def __init__(self, level: int = 9):
-        """Initialize with compression level (1-9)"""
+    CODECS = ('none', 'zlib', 'zstd', 'lz4', 'zstd-dict')
+    DICTIONARY_SIZE = 64 * 1024
+    
+    # Already-compressed formats: leading magic bytes
+    MEDIA_SIGNATURES = (
+        b'\xff\xd8\xff',            # JPEG
+        b'\x89PNG',                 # PNG
+        b'GIF8',                    # GIF
+        b'PK\x03\x04',              # ZIP, DOCX, JAR, APK
+        b'\x1f\x8b',                # gzip
+        b'\x28\xb5\x2f\xfd',        # zstd
+        b'\x04\x22\x4d\x18',        # lz4
+        b'7z\xbc\xaf\x27\x1c',      # 7z
+        b'Rar!',                    # RAR
+        b'BZh',                     # bzip2
+        b'\xfd7zXZ',                # xz
+        b'\x1a\x45\xdf\xa3',        # Matroska, WebM
+        b'OggS',                    # Ogg
+        b'fLaC',                    # FLAC
+        b'ID3',                     # MP3
+    )
+    MEDIA_EXTENSIONS = frozenset({
+        '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+        '.mp3', '.aac', '.m4a', '.ogg', '.opus', '.flac',
+        '.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi',
+        '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst', '.lz4',
+        '.jar', '.apk', '.docx', '.xlsx', '.pptx'
+    })
+    
+    # Per-file-type policy by extension: 'store' skips compression,
+    # 'fast' always uses lz4 and 'strong' always uses zstd. Other files
+    # follow the entropy estimate.
+    FILE_TYPE_POLICY = {
+        **dict.fromkeys(MEDIA_EXTENSIONS, 'store'),
+        **dict.fromkeys((
+            '.txt', '.log', '.csv', '.tsv', '.json', '.xml', '.html', '.htm',
+            '.md', '.sql', '.yaml', '.yml', '.ini', '.nfo', '.srt',
+            '.py', '.js', '.ts', '.c', '.h', '.cpp', '.java', '.go', '.rs'
+        ), 'strong'),
+        **dict.fromkeys((
+            '.iso', '.img', '.bin', '.exe', '.dll', '.so', '.dylib',
+            '.vmdk', '.vdi', '.qcow2', '.db', '.sqlite'
+        ), 'fast'),
+    }
+    
+    # Bits per byte above which compression is skipped, and above which
+    # the fast codec is used instead of the strong one
+    SKIP_ENTROPY = 7.5
+    FAST_ENTROPY = 6.0
+    
+    # zstd levels stepped through to hold the target throughput
+    ZSTD_LEVELS = (1, 2, 3, 5, 7, 9, 12, 15, 19)
+    TARGET_MBPS = 100.0
+    MIN_TIMED_SIZE = 64 * 1024
+    
+    def __init__(self, level: int = 9, zstd_level: int = 3,
+                 samples: int = 16, sample_size: int = 1024,
+                 target_mbps: Optional[float] = TARGET_MBPS,
+                 policy: Optional[Dict[str, str]] = None):
+        """
+        Initialize compression
+        
+        Args:
+            level: zlib compression level (1-9)
+            zstd_level: Starting zstd compression level
+            samples: Number of evenly spaced blocks sampled for entropy
+            sample_size: Bytes per sampled block
+            target_mbps: Input MB/s the zstd level is tuned to; None keeps
+                zstd_level fixed
+            policy: Extension -> 'store', 'fast' or 'strong', overriding
+                FILE_TYPE_POLICY
+        """
         self.level = level
+        self.zstd_level = zstd_level
+        self.samples = samples
+        self.sample_size = sample_size
+        self.target_mbps = target_mbps
+        self.policy = {**self.FILE_TYPE_POLICY, **(policy or {})}
+        self._level_lock = threading.Lock()
+        self._throughput = {}  # zstd level -> smoothed MB/s
+        self._local = threading.local()
     
     def compress(self, data: bytes) -> Tuple[bytes, float]:
         """
         Compress data
         Returns: (compressed_data, compression_ratio)
         """
-        compressed = zlib.compress(data, self.level)
+        with pipeline_profiler.stage('compress', len(data)):
+            compressed = zlib.compress(data, self.level)
         ratio = len(compressed) / len(data) if data else 0
         
         logger.debug(f"Compressed {len(data)} bytes to {len(compressed)} (ratio: {ratio:.2f})")
         
         return compressed, ratio
     
-    def decompress(self, data: bytes) -> bytes:
-        """Decompress data"""
-        return zlib.decompress(data)
+    def decompress(self, data: bytes, codec: str = 'zlib',
+                   dictionary: Optional[bytes] = None) -> bytes:
+        """
+        Decompress data
+        
+        Args:
+            data: Compressed payload
+            codec: Codec recorded in the segment header (zlib for compress())
+            dictionary: Share dictionary, required for zstd-dict
+        """
+        if codec == 'none':
+            return data
+        if codec == 'zlib':
+            return zlib.decompress(data)
+        if codec == 'zstd':
+            if not HAS_ZSTD:
+                raise RuntimeError("zstandard is required to decode this segment")
+            return self._zstd_decompressor().decompress(data)
+        if codec == 'lz4':
+            if not HAS_LZ4:
+                raise RuntimeError("lz4 is required to decode this segment")
+            return lz4.block.decompress(data)
+        if codec == 'zstd-dict':
+            if not dictionary:
+                raise ValueError("zstd-dict payload needs the share dictionary")
+            return self._dictionary_contexts(dictionary)[1].decompress(data)
+        raise ValueError(f"Unknown compression codec: {codec}")
+    
+    def compress_adaptive(self, data: bytes, filename: Optional[str] = None,
+                          threshold: float = 0.95) -> Tuple[bytes, str]:
+        """
+        Compress with the codec suited to the data
+        
+        Args:
+            data: Segment data
+            filename: Source file name, used to skip compressed media
+            threshold: Keep the original unless compressed/original is below this
+        
+        Returns:
+            (payload, codec) - record the codec in the segment header
+        """
+        started = time.perf_counter_ns()
+        codec = self.select_codec(data, filename)
+        if codec == 'none':
+            pipeline_profiler.record('compress', started, len(data))
+            return data, codec
+        
+        if codec == 'zstd':
+            level = self.zstd_level
+            compressed = self._zstd_compressor(level).compress(data)
+            self._record_throughput(level, len(data), time.perf_counter_ns() - started)
+        elif codec == 'lz4':
+            compressed = lz4.block.compress(data)
+        else:
+            compressed = zlib.compress(data, self.level)
+        pipeline_profiler.record('compress', started, len(data))
+        
+        if len(compressed) >= len(data) * threshold:
+            return data, 'none'
+        
+        logger.debug(f"Compressed {len(data)} bytes to {len(compressed)} with {codec}")
+        
+        return compressed, codec
+    
+    def train_dictionary(self, samples: List[bytes],
+                         dict_size: int = DICTIONARY_SIZE) -> Optional[bytes]:
+        """
+        Train a zstd dictionary from sample files
+        
+        Args:
+            samples: Representative small files
+            dict_size: Maximum dictionary size in bytes
+        
+        Returns:
+            Dictionary bytes, or None without zstandard or usable samples
+        """
+        if not HAS_ZSTD or len(samples) < 8:
+            return None
+        
+        try:
+            dictionary = zstandard.train_dictionary(dict_size, samples)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Dictionary training failed: {e}")
+            return None
+        
+        logger.info(f"Trained {len(dictionary)} byte dictionary from {len(samples)} samples")
+        return dictionary.as_bytes()
+    
+    def compress_with_dictionary(self, data: bytes, dictionary: Optional[bytes],
+                                 filename: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Compress a small file against the share dictionary
+        
+        Falls back to compress_adaptive without a dictionary, for
+        compressed media and when the dictionary does not help.
+        
+        Returns:
+            (payload, codec)
+        """
+        if not dictionary or not HAS_ZSTD or self.is_compressed_media(data, filename):
+            return self.compress_adaptive(data, filename)
+        
+        with pipeline_profiler.stage('compress', len(data)):
+            compressed = self._dictionary_contexts(dictionary)[0].compress(data)
+        if len(compressed) >= len(data):
+            return data, 'none'
+        return compressed, 'zstd-dict'
+    
+    @staticmethod
+    def dictionary_id(dictionary: bytes) -> str:
+        """Short identifier recorded in packs compressed against a dictionary"""
+        return hashlib.sha256(dictionary).hexdigest()[:16]
+    
+    def select_codec(self, data: bytes, filename: Optional[str] = None) -> str:
+        """
+        Choose a codec without compressing
+        
+        Returns:
+            'none' for compressed media or high-entropy data, lz4 for
+            moderately compressible data and zstd for the rest (zlib when
+            the optional codecs are not installed). The file type policy
+            overrides the entropy choice between lz4 and zstd.
+        """
+        if len(data) < 64 or self.is_compressed_media(data, filename):
+            return 'none'
+        
+        policy = self.policy_for(filename)
+        if policy == 'store':
+            return 'none'
+        
+        entropy = self.estimate_entropy(data)
+        if entropy >= self.SKIP_ENTROPY:
+            return 'none'
+        if policy == 'fast' or (policy != 'strong' and entropy >= self.FAST_ENTROPY):
+            return 'lz4' if HAS_LZ4 else 'zlib'
+        return 'zstd' if HAS_ZSTD else 'zlib'
+    
+    def policy_for(self, filename: Optional[str]) -> Optional[str]:
+        """File type policy for a file name, None when it has no rule"""
+        if not filename:
+            return None
+        return self.policy.get(os.path.splitext(filename)[1].lower())
+    
+    def is_compressed_media(self, data: bytes, filename: Optional[str] = None) -> bool:
+        """Detect already-compressed formats by extension or magic bytes"""
+        if filename and os.path.splitext(filename)[1].lower() in self.MEDIA_EXTENSIONS:
+            return True
+        if data.startswith(self.MEDIA_SIGNATURES):
+            return True
+        # ISO base media (MP4, MOV, HEIC) and RIFF containers
+        if data[4:8] == b'ftyp':
+            return True
+        return data[:4] == b'RIFF' and data[8:12] in (b'WEBP', b'AVI ')
+    
+    def estimate_entropy(self, data: bytes) -> float:
+        """
+        Shannon entropy in bits per byte over evenly spaced samples
+        
+        Sampling every stratum of the data rather than its first block
+        keeps headers or padding from deciding for the whole segment.
+        """
+        if len(data) <= self.samples * self.sample_size:
+            sample = data
+        else:
+            stride = len(data) // self.samples
+            sample = b''.join(
+                data[i * stride:i * stride + self.sample_size]
+                for i in range(self.samples)
+            )
+        
+        if not sample:
+            return 0.0
+        
+        total = len(sample)
+        return -sum(
+            count / total * math.log2(count / total)
+            for count in Counter(sample).values()
+        )
     
     def should_compress(self, data: bytes, threshold: float = 0.9) -> bool:
         """
@@ -41,4 +318,68 @@ class UnifiedCompression:
         test_compressed = zlib.compress(data[:1024], 1)
         test_ratio = len(test_compressed) / min(len(data), 1024)
         
-        return test_ratio < threshold
\ No newline at end of file
+        return test_ratio < threshold
+    
+    def _record_throughput(self, level: int, size: int, elapsed_ns: int):
+        """
+        Step the zstd level toward the target throughput
+        
+        Slower than the target drops a level; more than twice as fast
+        raises one, so the level settles instead of oscillating.
+        """
+        if self.target_mbps is None or size < self.MIN_TIMED_SIZE:
+            return
+        
+        mbps = size / max(elapsed_ns, 1) * 1000
+        with self._level_lock:
+            previous = self._throughput.get(level)
+            mbps = mbps if previous is None else 0.7 * previous + 0.3 * mbps
+            self._throughput[level] = mbps
+            
+            if level != self.zstd_level:
+                return
+            levels = self.ZSTD_LEVELS
+            position = min(range(len(levels)), key=lambda i: abs(levels[i] - level))
+            if mbps < self.target_mbps and position > 0:
+                self.zstd_level = levels[position - 1]
+            elif mbps > 2 * self.target_mbps and position < len(levels) - 1:
+                self.zstd_level = levels[position + 1]
+            else:
+                return
+        
+        logger.debug(f"zstd level {level} at {mbps:.0f} MB/s, now level {self.zstd_level}")
+    
+    def _zstd_compressor(self, level: int):
+        # zstd contexts are not thread-safe; keep one per thread and level
+        compressors = getattr(self._local, 'compressors', None)
+        if compressors is None:
+            compressors = self._local.compressors = {}
+        
+        compressor = compressors.get(level)
+        if compressor is None:
+            compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+        return compressor
+    
+    def _dictionary_contexts(self, dictionary: bytes):
+        """Per-thread (compressor, decompressor) for a dictionary"""
+        contexts = getattr(self._local, 'dictionaries', None)
+        if contexts is None:
+            contexts = self._local.dictionaries = {}
+        
+        pair = contexts.get(dictionary)
+        if pair is None:
+            if len(contexts) >= 4:
+                contexts.clear()
+            shared = zstandard.ZstdCompressionDict(dictionary)
+            pair = (zstandard.ZstdCompressor(level=self.zstd_level, dict_data=shared,
+                                             write_content_size=True, write_dict_id=False),
+                    zstandard.ZstdDecompressor(dict_data=shared))
+            contexts[dictionary] = pair
+        return pair
+    
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor()
+            self._local.decompressor = decompressor
+        return decompressor
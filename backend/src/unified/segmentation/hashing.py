@@ -1,14 +1,147 @@
 #!/usr/bin/env python3
 """
 Unified Hashing Module - SHA256 verification for segments
+Binary Merkle trees with per-segment inclusion proofs
 """
 
 import hashlib
-from typing import List, Dict, Any
+import struct
+from typing import List, Dict, Any, Union
 import logging
 
 logger = logging.getLogger(__name__)
 
+DIGEST_SIZE = 32
+NODE_PREFIX = b'\x01'  # Keeps interior nodes distinct from 64-byte segments
+TREE_HEADER = struct.Struct('<4sBI')  # magic, version, leaf count
+TREE_MAGIC = b'USMT'
+TREE_VERSION = 1
+
+class MerkleTree:
+    """
+    Merkle tree over raw SHA256 segment digests
+    
+    Leaves are the segment digests themselves (the bytes behind the hex
+    segment hashes already stored per segment), interior nodes are
+    sha256(0x01 || left || right) and an odd node is carried up unchanged.
+    Every level is kept so a proof for any segment is a slice lookup.
+    """
+    
+    def __init__(self, leaves: List[bytes]):
+        """
+        Build the tree
+        
+        Args:
+            leaves: Raw 32-byte segment digests in segment order
+        """
+        if any(len(leaf) != DIGEST_SIZE for leaf in leaves):
+            raise ValueError("Merkle leaves must be raw SHA256 digests")
+        
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [self.node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+    
+    @classmethod
+    def from_hex(cls, hashes: List[str]) -> 'MerkleTree':
+        """Tree over hex segment hashes as stored in the database and index"""
+        return cls([bytes.fromhex(h) for h in hashes])
+    
+    @classmethod
+    def from_segments(cls, segments: List[bytes]) -> 'MerkleTree':
+        """Tree over segment data"""
+        return cls([hashlib.sha256(data).digest() for data in segments])
+    
+    @staticmethod
+    def node_hash(left: bytes, right: bytes) -> bytes:
+        """Interior node digest"""
+        return hashlib.sha256(NODE_PREFIX + left + right).digest()
+    
+    def __len__(self) -> int:
+        return len(self.levels[0])
+    
+    @property
+    def root(self) -> bytes:
+        """Root digest (empty for an empty tree)"""
+        return self.levels[-1][0] if self.levels[0] else b''
+    
+    def leaf(self, index: int) -> bytes:
+        """Digest of one segment"""
+        return self.levels[0][index]
+    
+    def proof(self, index: int) -> List[bytes]:
+        """
+        Sibling digests from leaf to root for one segment
+        
+        Levels where the node has no sibling contribute nothing, so the
+        proof is at most ceil(log2(n)) digests.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"Segment {index} not in tree of {len(self)}")
+        
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append(level[sibling])
+            index //= 2
+        return path
+    
+    @staticmethod
+    def verify_proof(leaf: bytes, index: int, count: int,
+                     proof: List[bytes], root: bytes) -> bool:
+        """
+        Check one segment digest against a root without the other segments
+        
+        Args:
+            leaf: Raw digest of the received segment
+            index: Segment index
+            count: Number of segments in the tree
+            proof: Sibling digests from MerkleTree.proof
+            root: Trusted root digest
+        
+        Returns:
+            True if the segment belongs at index under root
+        """
+        if not 0 <= index < count:
+            return False
+        
+        node = leaf
+        siblings = iter(proof)
+        width = count
+        while width > 1:
+            if index % 2:
+                node = MerkleTree.node_hash(next(siblings, b''), node)
+            elif index + 1 < width:
+                node = MerkleTree.node_hash(node, next(siblings, b''))
+            index //= 2
+            width = (width + 1) // 2
+        
+        return node == root and next(siblings, None) is None
+    
+    def to_bytes(self) -> bytes:
+        """Compact form: header then every level's digests, leaves first"""
+        return (TREE_HEADER.pack(TREE_MAGIC, TREE_VERSION, len(self))
+                + b''.join(b''.join(level) for level in self.levels))
+    
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, memoryview]) -> 'MerkleTree':
+        """Load a stored tree, checking it hashes up to its stored root"""
+        magic, version, count = TREE_HEADER.unpack_from(data, 0)
+        if magic != TREE_MAGIC or version != TREE_VERSION:
+            raise ValueError("Not a stored Merkle tree")
+        
+        start = TREE_HEADER.size
+        leaves = [bytes(data[start + i * DIGEST_SIZE:start + (i + 1) * DIGEST_SIZE])
+                  for i in range(count)]
+        tree = cls(leaves)
+        if tree.to_bytes() != bytes(data):
+            raise ValueError("Stored Merkle tree is inconsistent")
+        return tree
+
 class UnifiedHashing:
     """Unified hashing for segment verification"""
     
@@ -31,9 +164,14 @@ class UnifiedHashing:
                 sha256.update(chunk)
         return sha256.hexdigest()
     
+    @staticmethod
+    def calculate_binary_merkle_root(hashes: List[str]) -> str:
+        """Hex root of the binary Merkle tree over hex segment hashes"""
+        return MerkleTree.from_hex(hashes).root.hex()
+    
     @staticmethod
     def calculate_merkle_root(hashes: List[str]) -> str:
-        """Calculate Merkle tree root"""
+        """Calculate Merkle tree root (legacy hex-string tree)"""
         if not hashes:
             return ""
         
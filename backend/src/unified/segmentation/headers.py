@@ -14,12 +14,13 @@ class UnifiedHeaders:
     """Unified segment header management"""
     
     MAGIC = b'USEG'  # UsenetSync Segment
-    VERSION = 1
+    VERSION = 2  # 2: records the payload compression codec
     
     @staticmethod
     def create_header(segment_index: int, total_segments: int,
                      file_id: str, file_size: int,
-                     metadata: Optional[Dict[str, Any]] = None) -> bytes:
+                     metadata: Optional[Dict[str, Any]] = None,
+                     compression: str = 'none') -> bytes:
         """Create segment header"""
         header_data = {
             'version': UnifiedHeaders.VERSION,
@@ -27,6 +28,7 @@ class UnifiedHeaders:
             'total_segments': total_segments,
             'file_id': file_id,
             'file_size': file_size,
+            'compression': compression,
             'metadata': metadata or {}
         }
         
@@ -57,6 +59,10 @@ class UnifiedHeaders:
         # Parse JSON data
         header_json = data[10:10+json_size]
         header_data = json.loads(header_json.decode('utf-8'))
+        header_data['header_size'] = 10 + json_size
+        
+        # Version 1 segments were written uncompressed
+        header_data.setdefault('compression', 'none')
         
         return header_data
     
@@ -1,18 +1,28 @@
 #!/usr/bin/env python3
 """
 Unified Packing Module - Pack small files together for efficiency
-Production-ready with multiple packing strategies
+Size-sorted bin packing behind a binary header with per-member offsets
 """
 
 import uuid
 import struct
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import bisect
+from typing import List, Dict, Any, Optional, Tuple, Union
 from dataclasses import dataclass
 import logging
 
+from .compression import UnifiedCompression
+
 logger = logging.getLogger(__name__)
 
+# Binary pack layout:
+#   header | entry table (sorted by name) | names | member data
+PACK_MAGIC = b'USPK'
+PACK_VERSION = 3
+PACK_HEADER = struct.Struct('<4sHHI8sI')  # magic, version, reserved, count, dictionary id, names size
+PACK_ENTRY = struct.Struct('<IIIIHBx')    # offset, stored size, size, name offset, name length, codec
+
 @dataclass
 class PackedSegment:
     """Packed segment containing multiple small files"""
@@ -22,124 +32,323 @@ class PackedSegment:
     data: bytes
     metadata: Dict[str, Any]
 
+class PackIndex:
+    """
+    Member table of a packed segment
+    Built from the header alone; member data is not touched
+    """
+    
+    def __init__(self, members: List[Dict[str, Any]], data_start: int,
+                 dictionary_id: Optional[str] = None):
+        self.members = members
+        self.data_start = data_start
+        self.dictionary_id = dictionary_id
+        self._names = [m['name'] for m in members]
+        self._sorted = self._names == sorted(self._names)
+    
+    def __len__(self) -> int:
+        return len(self.members)
+    
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """Member entry by name"""
+        if self._sorted:
+            i = bisect.bisect_left(self._names, name)
+            if i < len(self._names) and self._names[i] == name:
+                return self.members[i]
+            return None
+        for member in self.members:
+            if member['name'] == name:
+                return member
+        return None
+    
+    def byte_range(self, name: str) -> Optional[Tuple[int, int]]:
+        """Absolute (start, end) of a member's stored bytes within the pack"""
+        member = self.find(name)
+        if member is None:
+            return None
+        start = self.data_start + member['offset']
+        return start, start + member['stored_size']
+
 class UnifiedPacking:
     """
     Unified packing system for small files
     Packs files < 750KB together for efficiency
     """
     
-    def __init__(self, segment_size: int = 768000):
-        """Initialize packing system"""
+    def __init__(self, segment_size: int = 768000,
+                 compression: Optional[UnifiedCompression] = None,
+                 dictionary: Optional[bytes] = None):
+        """
+        Initialize packing system
+        
+        Args:
+            segment_size: Target packed segment size
+            compression: Compression used for packed members
+            dictionary: Share dictionary; members are compressed against it
+        """
         self.segment_size = segment_size
         self.min_pack_size = segment_size // 2  # Pack files smaller than half segment
+        self.compression = compression or UnifiedCompression()
+        self.dictionary = dictionary
+    
+    def train_dictionary(self, files: List[Tuple[str, bytes]],
+                         max_samples: int = 2000) -> Optional[bytes]:
+        """
+        Train the share dictionary from an even sample of packable files
+        
+        The dictionary is stored once per share (see
+        UsenetWorkflow.store_compression_dictionary) and is needed to unpack.
+        
+        Args:
+            files: List of (filename, data) tuples
+            max_samples: Maximum files used for training
+        
+        Returns:
+            Dictionary bytes, or None if training was not possible
+        """
+        candidates = [
+            data for filename, data in files
+            if 0 < len(data) < self.min_pack_size
+            and not self.compression.is_compressed_media(data, filename)
+        ]
+        step = max(1, len(candidates) // max_samples)
+        self.dictionary = self.compression.train_dictionary(candidates[::step][:max_samples])
+        return self.dictionary
     
     def pack_files(self, files: List[Tuple[str, bytes]]) -> List[PackedSegment]:
         """
         Pack multiple small files together
         
+        Members are placed largest first into the fullest pack that still
+        has room (best-fit decreasing), so packs come out close to
+        segment_size regardless of input order.
+        
         Args:
             files: List of (filename, data) tuples
         
         Returns:
             List of packed segments
         """
-        packed_segments = []
-        current_pack = []
-        current_size = 0
-        
+        members = []
         for filename, data in files:
-            file_size = len(data)
-            
             # If file is too large to pack, skip it
-            if file_size >= self.min_pack_size:
+            if len(data) >= self.min_pack_size:
                 continue
             
-            # If adding this file would exceed segment size, create new pack
-            if current_size + file_size + 256 > self.segment_size:  # 256 bytes for headers
-                if current_pack:
-                    packed_segments.append(self._create_packed_segment(current_pack))
-                current_pack = []
-                current_size = 0
-            
-            current_pack.append((filename, data))
-            current_size += file_size
+            stored, codec = self._encode_member(filename, data)
+            members.append((filename, data, stored, codec))
         
-        # Pack remaining files
-        if current_pack:
-            packed_segments.append(self._create_packed_segment(current_pack))
+        bins = self._bin_pack(members, lambda m: self._member_cost(m[0], len(m[2])))
+        packed_segments = [self._create_packed_segment(members) for members in bins]
         
-        logger.info(f"Packed {len(files)} files into {len(packed_segments)} segments")
+        logger.info(f"Packed {len(members)} files into {len(packed_segments)} segments")
         
         return packed_segments
     
-    def _create_packed_segment(self, files: List[Tuple[str, bytes]]) -> PackedSegment:
-        """Create a packed segment from files"""
-        packed_id = str(uuid.uuid4())
+    def build_pack(self, files: List[Tuple[str, bytes]],
+                   packed_id: Optional[str] = None) -> PackedSegment:
+        """
+        Pack the given files into a single packed segment
         
-        # Create header
-        header = {
-            'version': 1,
-            'file_count': len(files),
-            'files': []
-        }
+        For callers that choose pack membership themselves; the layout is
+        the one pack_files writes.
         
-        # Pack files
+        Args:
+            files: List of (filename, data) tuples
+            packed_id: ID to keep, e.g. for a pack rebuilt after a restart
+        
+        Returns:
+            The packed segment
+        """
+        members = [(filename, data, *self._encode_member(filename, data))
+                   for filename, data in files]
+        return self._create_packed_segment(members, packed_id)
+    
+    @staticmethod
+    def member_name(file_path: str, segment_index: int = 0) -> str:
+        """Member name of a packed segment: the file path, plus #index past the first"""
+        return f"{file_path}#{segment_index}" if segment_index else file_path
+    
+    def _member_cost(self, filename: str, stored_size: int) -> int:
+        """Bytes a member takes in a pack, including its header entry"""
+        return stored_size + PACK_ENTRY.size + len(filename.encode('utf-8'))
+    
+    def _bin_pack(self, items: List[Any], cost) -> List[List[Any]]:
+        """Best-fit decreasing: each item goes to the fullest bin it fits"""
+        capacity = self.segment_size - PACK_HEADER.size
+        bins = []
+        free = []  # sorted (remaining capacity, bin number)
+        
+        for item in sorted(items, key=cost, reverse=True):
+            size = cost(item)
+            i = bisect.bisect_left(free, (size, -1))
+            if i < len(free):
+                remaining, number = free.pop(i)
+            else:
+                remaining, number = capacity, len(bins)
+                bins.append([])
+            
+            bins[number].append(item)
+            bisect.insort(free, (remaining - size, number))
+        
+        return bins
+    
+    def _encode_member(self, filename: str, data: bytes) -> Tuple[bytes, str]:
+        """Stored form of a packed file: dictionary-compressed when available"""
+        if not self.dictionary:
+            return data, 'none'
+        return self.compression.compress_with_dictionary(data, self.dictionary, filename)
+    
+    def _create_packed_segment(self, files: List[Tuple[str, bytes, bytes, str]],
+                               packed_id: Optional[str] = None) -> PackedSegment:
+        """Create a packed segment from (filename, data, stored, codec) members"""
+        packed_id = packed_id or str(uuid.uuid4())
+        files = sorted(files, key=lambda f: f[0])
+        
+        dictionary_id = self.compression.dictionary_id(self.dictionary) if self.dictionary else None
+        
+        entries = bytearray()
+        names = bytearray()
         packed_data = bytearray()
-        offset = 0
+        file_infos = []
         
-        for filename, data in files:
-            file_info = {
+        for filename, data, stored, codec in files:
+            name = filename.encode('utf-8')
+            entries += PACK_ENTRY.pack(len(packed_data), len(stored), len(data),
+                                       len(names), len(name),
+                                       UnifiedCompression.CODECS.index(codec))
+            file_infos.append({
                 'name': filename,
-                'offset': offset,
-                'size': len(data)
-            }
-            header['files'].append(file_info)
-            
-            packed_data.extend(data)
-            offset += len(data)
+                'offset': len(packed_data),
+                'size': len(data),
+                'stored_size': len(stored),
+                'codec': codec
+            })
+            names += name
+            packed_data += stored
         
-        # Serialize header
-        header_json = json.dumps(header).encode('utf-8')
-        header_size = len(header_json)
+        header = PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(files),
+                                  bytes.fromhex(dictionary_id) if dictionary_id else bytes(8),
+                                  len(names))
+        final_data = header + entries + names + packed_data
         
-        # Create final packed data with header
-        final_data = struct.pack('<I', header_size) + header_json + packed_data
+        metadata = {
+            'version': PACK_VERSION,
+            'file_count': len(files),
+            'data_start': len(final_data) - len(packed_data),
+            'files': file_infos
+        }
+        if dictionary_id:
+            metadata['dictionary_id'] = dictionary_id
         
         return PackedSegment(
             packed_id=packed_id,
-            files=header['files'],
+            files=file_infos,
             total_size=len(final_data),
             data=bytes(final_data),
-            metadata=header
+            metadata=metadata
         )
     
-    def unpack_segment(self, packed_data: bytes) -> List[Tuple[str, bytes]]:
+    def read_index(self, packed_data: Union[bytes, memoryview]) -> PackIndex:
+        """
+        Parse just the member table of a packed segment
+        
+        Args:
+            packed_data: The pack, or at least its leading header bytes
+        
+        Returns:
+            PackIndex with absolute data offsets
+        """
+        if bytes(packed_data[:4]) != PACK_MAGIC:
+            return self._read_json_index(packed_data)
+        
+        magic, version, _, count, dictionary_id, names_size = PACK_HEADER.unpack_from(packed_data, 0)
+        if version != PACK_VERSION:
+            raise ValueError(f"Unsupported pack version {version}")
+        
+        names_start = PACK_HEADER.size + count * PACK_ENTRY.size
+        names = bytes(packed_data[names_start:names_start + names_size])
+        
+        members = []
+        for offset, stored_size, size, name_offset, name_length, codec in PACK_ENTRY.iter_unpack(
+                packed_data[PACK_HEADER.size:names_start]):
+            members.append({
+                'name': names[name_offset:name_offset + name_length].decode('utf-8'),
+                'offset': offset,
+                'size': size,
+                'stored_size': stored_size,
+                'codec': UnifiedCompression.CODECS[codec]
+            })
+        
+        return PackIndex(members, names_start + names_size,
+                         dictionary_id.hex() if any(dictionary_id) else None)
+    
+    def _read_json_index(self, packed_data) -> PackIndex:
+        """Member table of packs written with the JSON header"""
+        header_size = struct.unpack('<I', bytes(packed_data[:4]))[0]
+        header = json.loads(bytes(packed_data[4:4 + header_size]).decode('utf-8'))
+        
+        members = [dict(info, stored_size=info.get('stored_size', info['size']),
+                        codec=info.get('codec', 'none'))
+                   for info in header['files']]
+        return PackIndex(members, 4 + header_size, header.get('dictionary_id'))
+    
+    def extract_member(self, packed_data: Union[bytes, memoryview], name: str,
+                       dictionary: Optional[bytes] = None,
+                       index: Optional[PackIndex] = None) -> Optional[bytes]:
+        """
+        Extract one file from a pack by offset without decoding the others
+        
+        Args:
+            packed_data: Packed segment data
+            name: Member file name
+            dictionary: Share dictionary (defaults to this packer's)
+            index: Previously read index of this pack
+        
+        Returns:
+            File data, or None if the pack has no such member
+        """
+        index = index or self.read_index(packed_data)
+        member = index.find(name)
+        if member is None:
+            return None
+        
+        start = index.data_start + member['offset']
+        return self.decode_member(bytes(packed_data[start:start + member['stored_size']]),
+                                  member, index, dictionary)
+    
+    def decode_member(self, stored: bytes, member: Dict[str, Any], index: PackIndex,
+                      dictionary: Optional[bytes] = None) -> bytes:
+        """Decode a member's stored bytes"""
+        if member['codec'] == 'none':
+            return stored
+        
+        dictionary = dictionary or self.dictionary
+        if index.dictionary_id:
+            if not dictionary or self.compression.dictionary_id(dictionary) != index.dictionary_id:
+                raise ValueError("Packed segment needs the share compression dictionary")
+        return self.compression.decompress(stored, member['codec'], dictionary)
+    
+    def unpack_segment(self, packed_data: bytes,
+                       dictionary: Optional[bytes] = None) -> List[Tuple[str, bytes]]:
         """
         Unpack a packed segment
         
         Args:
             packed_data: Packed segment data
+            dictionary: Share dictionary (defaults to this packer's)
         
         Returns:
             List of (filename, data) tuples
         """
-        # Read header size
-        header_size = struct.unpack('<I', packed_data[:4])[0]
+        index = self.read_index(packed_data)
+        view = memoryview(packed_data)
         
-        # Read header
-        header_json = packed_data[4:4+header_size]
-        header = json.loads(header_json.decode('utf-8'))
-        
-        # Extract files
         files = []
-        data_start = 4 + header_size
-        
-        for file_info in header['files']:
-            offset = data_start + file_info['offset']
-            size = file_info['size']
-            
-            file_data = packed_data[offset:offset+size]
-            files.append((file_info['name'], file_data))
+        for member in index.members:
+            start = index.data_start + member['offset']
+            stored = bytes(view[start:start + member['stored_size']])
+            files.append((member['name'], self.decode_member(stored, member, index, dictionary)))
         
         return files
     
@@ -165,27 +374,6 @@ class UnifiedPacking:
         Returns:
             List of file groups for packing
         """
-        # Sort files by size (descending) for better packing
-        sorted_files = sorted(files, key=lambda x: x[1], reverse=True)
-        
-        packs = []
-        current_pack = []
-        current_size = 0
-        
-        for filename, size in sorted_files:
-            if size >= self.min_pack_size:
-                continue
-            
-            if current_size + size <= self.segment_size - 256:
-                current_pack.append(filename)
-                current_size += size
-            else:
-                if current_pack:
-                    packs.append(current_pack)
-                current_pack = [filename]
-                current_size = size
-        
-        if current_pack:
-            packs.append(current_pack)
-        
-        return packs
\ No newline at end of file
+        packable = [f for f in files if f[1] < self.min_pack_size]
+        bins = self._bin_pack(packable, lambda f: self._member_cost(f[0], f[1]))
+        return [[filename for filename, _ in members] for members in bins]
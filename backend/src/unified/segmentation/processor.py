@@ -13,6 +13,8 @@ from dataclasses import dataclass, asdict
 import concurrent.futures
 import logging
 
+from .hashing import MerkleTree
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -280,23 +282,8 @@ class UnifiedSegmentProcessor:
         # Sort segments
         segments.sort(key=lambda s: s.segment_index)
         
-        # Build Merkle tree
-        hashes = [s.hash for s in segments]
-        
-        while len(hashes) > 1:
-            new_hashes = []
-            
-            for i in range(0, len(hashes), 2):
-                if i + 1 < len(hashes):
-                    combined = hashes[i] + hashes[i + 1]
-                else:
-                    combined = hashes[i] + hashes[i]  # Duplicate last if odd
-                
-                new_hashes.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            hashes = new_hashes
-        
-        return hashes[0]
+        # Binary tree over the raw segment digests
+        return MerkleTree.from_hex([s.hash for s in segments]).root.hex()
     
     def verify_segments(self, segments: List[Segment]) -> Tuple[bool, List[int]]:
         """
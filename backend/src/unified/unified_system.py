@@ -13,6 +13,8 @@ import json
 import struct
 import mmap
 import base64
+import secrets
+import string
 import threading
 from datetime import datetime
 from pathlib import Path
@@ -26,6 +28,12 @@ import sqlite3
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from unified.monitoring.pipeline_profiler import pipeline_profiler
+from unified.networking.connection_pool import StatProbeError
+from unified.segmentation.compression import UnifiedCompression
+from unified.segmentation.headers import UnifiedHeaders
+from unified.segmentation.packing import UnifiedPacking
+
 logger = logging.getLogger(__name__)
 
 # ============================================================================
@@ -71,6 +79,7 @@ class PackedSegment:
     segments: List[UnifiedSegmentInfo]
     total_size: int
     packed_data: bytes
+    message_id: Optional[str] = None
     
 # ============================================================================
 # DATABASE MANAGER
@@ -110,6 +119,33 @@ class UnifiedDatabaseManager:
             self.connection.execute("PRAGMA synchronous=NORMAL")
             self.connection.execute("PRAGMA cache_size=10000")
             
+    def unified_database(self, tables: Tuple[str, ...] = ('metrics', 'metric_rollups')):
+        """
+        UnifiedDatabase on the same database
+        
+        For components written against the core schema, such as the
+        monitoring rollups; the given core tables are created if missing.
+        """
+        from unified.core.database import UnifiedDatabase, DatabaseConfig, DatabaseType
+        from unified.core.schema import UnifiedSchema
+        
+        params = self.connection_params
+        if self.db_type == 'postgresql':
+            config = DatabaseConfig(
+                db_type=DatabaseType.POSTGRESQL,
+                pg_host=params.get('host', 'localhost'),
+                pg_port=params.get('port', 5432),
+                pg_database=params.get('database', 'usenetsync'),
+                pg_user=params.get('user', 'usenetsync'),
+                pg_password=params.get('password', 'usenetsync123')
+            )
+        else:
+            config = DatabaseConfig(sqlite_path=os.path.abspath(params.get('path', 'usenetsync.db')))
+            
+        db = UnifiedDatabase(config)
+        UnifiedSchema(db).create_tables(tables)
+        return db
+        
     def execute(self, query: str, params: tuple = None):
         """Execute query with proper parameter formatting"""
         with self._lock:
@@ -153,6 +189,35 @@ class UnifiedDatabaseManager:
                 self.connection.commit()
                 result = cursor.fetchone()
                 return result['file_id'] if 'file_id' in result else result['segment_id']
+                
+    def execute_batch(self, statements: List[Tuple[str, tuple]]):
+        """Execute (query, params) statements in a single transaction"""
+        if not statements:
+            return
+            
+        with self._lock:
+            cursor = self.connection.cursor()
+            
+            try:
+                if self.db_type == 'sqlite':
+                    cursor.execute("BEGIN")
+                    
+                for query, params in statements:
+                    if self.db_type == 'sqlite':
+                        query = query.replace('%s', '?')
+                    cursor.execute(query, params or ())
+                    
+                if self.db_type == 'sqlite':
+                    cursor.execute("COMMIT")
+                else:
+                    self.connection.commit()
+                    
+            except Exception:
+                if self.db_type == 'sqlite':
+                    cursor.execute("ROLLBACK")
+                else:
+                    self.connection.rollback()
+                raise
 
 # ============================================================================
 # UNIFIED INDEXING SYSTEM
@@ -432,13 +497,36 @@ class UnifiedSegmentPacker:
     
     TARGET_PACK_SIZE = 750 * 1024  # 750KB target for packed segments
     
-    def __init__(self, db_manager: UnifiedDatabaseManager):
+    def __init__(self, db_manager: UnifiedDatabaseManager, read_segment,
+                 packing: Optional[UnifiedPacking] = None,
+                 train_dictionary: bool = True):
+        """
+        Args:
+            db_manager: Database manager
+            read_segment: Returns the data of a segment row
+            packing: Writes the USPK packs the download side reads
+            train_dictionary: Train a folder dictionary for packed members
+                on the first upload that packs any
+        """
         self.db = db_manager
+        self.read_segment = read_segment
+        self.packing = packing or UnifiedPacking(self.TARGET_PACK_SIZE)
+        self.train_dictionary = train_dictionary
         self.packing_buffer = []
         self.buffer_size = 0
         
     def pack_segments(self, folder_id: str) -> List[PackedSegment]:
-        """Pack small segments together for efficient upload"""
+        """
+        Pack small segments together for efficient upload
+        
+        Packs left pending by an interrupted upload are returned first with
+        their original packed_segment_id and Message-ID; only small
+        segments not yet in a pack are packed anew, grouped best-fit
+        decreasing by the bytes they take in the pack.
+        
+        Members are compressed against the folder's dictionary, which is
+        kept in the folder metadata the share index is built from.
+        """
         # Get small segments
         small_segments = self.db.fetchall("""
             SELECT s.*, f.file_path
@@ -447,61 +535,136 @@ class UnifiedSegmentPacker:
             WHERE f.folder_id = %s 
             AND s.segment_size < %s
             AND s.upload_status = 'pending'
-            ORDER BY s.segment_size
+            AND s.packed_segment_id IS NULL
+            ORDER BY s.segment_id
         """, (folder_id, self.TARGET_PACK_SIZE // 2))
         
-        packed_segments = []
-        current_pack = []
-        current_size = 0
-        
+        files = []
         for segment in small_segments:
-            segment_dict = dict(segment)
+            segment = dict(segment)
+            name = UnifiedPacking.member_name(segment['file_path'], segment['segment_index'])
+            files.append((segment, name, self.read_segment(segment)))
             
-            if current_size + segment_dict['segment_size'] <= self.TARGET_PACK_SIZE:
-                current_pack.append(segment_dict)
-                current_size += segment_dict['segment_size']
-            else:
-                if current_pack:
-                    packed = self._create_packed_segment(current_pack)
-                    packed_segments.append(packed)
-                    
-                current_pack = [segment_dict]
-                current_size = segment_dict['segment_size']
-                
-        # Pack remaining
-        if current_pack:
-            packed = self._create_packed_segment(current_pack)
-            packed_segments.append(packed)
+        packing = UnifiedPacking(
+            self.packing.segment_size, self.packing.compression,
+            dictionary=self._folder_dictionary(folder_id, [f[1:] for f in files])
+        )
+        packed_segments = self._resume_packs(folder_id, packing)
+        
+        members = [(segment, name, data, *packing._encode_member(name, data))
+                   for segment, name, data in files]
+        groups = packing._bin_pack(
+            members, lambda m: packing._member_cost(m[1], len(m[3]))
+        )
+        for group in groups:
+            packed_segments.append(self._create_packed_segment(group, packing))
             
         logger.info(f"Created {len(packed_segments)} packed segments from "
                    f"{len(small_segments)} small segments")
         
         return packed_segments
         
-    def _create_packed_segment(self, segments: List[dict]) -> PackedSegment:
-        """Create a packed segment from multiple small segments"""
+    def _resume_packs(self, folder_id: str, packing: UnifiedPacking) -> List[PackedSegment]:
+        """Rebuild packs an interrupted upload created but did not finish"""
+        rows = self.db.fetchall("""
+            SELECT s.*, f.file_path, p.message_id AS pack_message_id
+            FROM segments s
+            JOIN files f ON s.file_id = f.file_id
+            JOIN packed_segments p ON s.packed_segment_id = p.packed_segment_id
+            WHERE f.folder_id = %s
+            AND p.upload_status = 'pending'
+            ORDER BY s.packed_segment_id, s.segment_size, s.segment_id
+        """, (folder_id,))
+        
+        packs = {}
+        for row in rows:
+            segment = dict(row)
+            message_id = segment.pop('pack_message_id')
+            if segment['packed_segment_id'] not in packs:
+                packs[segment['packed_segment_id']] = (message_id, [])
+            packs[segment['packed_segment_id']][1].append(segment)
+            
+        resumed = [
+            PackedSegment(
+                packed_id=packed_id,
+                segments=segments,
+                total_size=sum(s['segment_size'] for s in segments),
+                packed_data=self._pack_data(packed_id, segments, packing),
+                message_id=message_id
+            )
+            for packed_id, (message_id, segments) in packs.items()
+        ]
+        
+        if resumed:
+            logger.info(f"Resuming {len(resumed)} pending packed segments")
+            
+        return resumed
+        
+    def _pack_data(self, packed_id: str, segments: List[dict],
+                   packing: UnifiedPacking) -> bytes:
+        """USPK pack of the segments' data, one member per segment"""
+        files = [
+            (UnifiedPacking.member_name(seg['file_path'], seg['segment_index']),
+             self.read_segment(seg))
+            for seg in segments
+        ]
+        return packing.build_pack(files, packed_id).data
+        
+    def _folder_dictionary(self, folder_id: str,
+                           files: List[Tuple[str, bytes]]) -> Optional[bytes]:
+        """
+        Dictionary the folder's packs are compressed against
+        
+        Stored in the folder metadata under the keys the core index reads
+        (see UsenetWorkflow.store_compression_dictionary). Without one, a
+        dictionary is trained from the given small files and stored first;
+        folders without a metadata row are packed without a dictionary.
+        """
+        try:
+            row = self.db.fetchone(
+                "SELECT metadata FROM folders WHERE folder_id = %s", (folder_id,)
+            )
+        except Exception as e:
+            logger.debug(f"No folder metadata for {folder_id}: {e}")
+            return None
+            
+        if not row:
+            return None
+            
+        metadata = row['metadata'] or {}
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        if metadata.get('compression_dictionary'):
+            return base64.b64decode(metadata['compression_dictionary'])
+            
+        if not self.train_dictionary or not files:
+            return None
+            
+        dictionary = UnifiedPacking(
+            self.packing.segment_size, self.packing.compression
+        ).train_dictionary(files)
+        if not dictionary:
+            return None
+            
+        metadata['compression_dictionary'] = base64.b64encode(dictionary).decode('ascii')
+        metadata['compression_dictionary_id'] = UnifiedCompression.dictionary_id(dictionary)
+        self.db.execute(
+            "UPDATE folders SET metadata = %s WHERE folder_id = %s",
+            (json.dumps(metadata), folder_id)
+        )
+        return dictionary
+        
+    def _create_packed_segment(self, members: List[tuple],
+                               packing: UnifiedPacking) -> PackedSegment:
+        """Create a packed segment from (segment, name, data, stored, codec) members"""
+        segments = [member[0] for member in members]
         packed_id = hashlib.sha256(
             f"{time.time()}_{len(segments)}".encode()
         ).hexdigest()[:16]
         
-        # Create packed data structure
-        packed_data = {
-            'packed_id': packed_id,
-            'segment_count': len(segments),
-            'segments': []
-        }
-        
-        for seg in segments:
-            packed_data['segments'].append({
-                'segment_id': seg['segment_id'],
-                'file_id': seg['file_id'],
-                'segment_index': seg['segment_index'],
-                'segment_hash': seg['segment_hash'],
-                'segment_size': seg['segment_size']
-            })
-            
-        # Serialize to bytes
-        packed_bytes = json.dumps(packed_data).encode('utf-8')
+        packed_bytes = packing._create_packed_segment(
+            [member[1:] for member in members], packed_id
+        ).data
         
         # Update database to mark segments as packed
         segment_ids = [seg['segment_id'] for seg in segments]
@@ -523,12 +686,13 @@ class UnifiedSegmentPacker:
             VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
         """, (packed_id, total_size, file_count, 'yenc', len(packed_bytes), 'pending'))
         
+        # Membership is recorded with the pack so a restart can resume it
         for sid in segment_ids:
             self.db.execute("""
                 UPDATE segments 
-                SET packed_with = %s
+                SET packed_with = %s, packed_segment_id = %s
                 WHERE segment_id = %s
-            """, (packed_array, sid))
+            """, (packed_array, packed_id, sid))
             
         return PackedSegment(
             packed_id=packed_id,
@@ -541,22 +705,104 @@ class UnifiedSegmentPacker:
 # UNIFIED UPLOAD SYSTEM
 # ============================================================================
 
+class PostedStateBuffer:
+    """Collects posted-state DB writes and flushes them in batched transactions"""
+    
+    def __init__(self, db_manager, batch_size: int = 200, profiler=None):
+        self.db = db_manager
+        self.batch_size = batch_size
+        self.profiler = profiler or pipeline_profiler
+        self.pending = []
+        self.flushes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        
+    def add(self, query: str, params: tuple):
+        """Queue a write, flushing once the batch is full"""
+        with self._lock:
+            self.pending.append((query, params))
+            full = len(self.pending) >= self.batch_size
+            
+        if full:
+            self.flush()
+            
+    def flush(self):
+        """Write all queued statements in one transaction"""
+        # Flush lock keeps batches in the order they were queued
+        with self._flush_lock:
+            with self._lock:
+                statements, self.pending = self.pending, []
+                
+            if not statements:
+                return
+                
+            with self.profiler.stage('db'):
+                if hasattr(self.db, 'execute_batch'):
+                    self.db.execute_batch(statements)
+                else:
+                    for query, params in statements:
+                        self.db.execute(query, params)
+            self.flushes += 1
+
 class UnifiedUploadSystem:
     """Unified upload system with redundancy and packing"""
     
     def __init__(self, nntp_client, db_manager: UnifiedDatabaseManager,
-                 security_system=None):
+                 security_system=None, connection_pool=None,
+                 connections: int = 1, db_batch_size: int = 200,
+                 profiler=None, compression: Optional[UnifiedCompression] = None,
+                 train_dictionary: bool = True):
+        """
+        Args:
+            nntp_client: Client used when no connection pool is given
+            db_manager: Database manager
+            security_system: Optional encryption for segment data
+            connection_pool: Optional UnifiedConnectionPool for concurrent posting
+            connections: Default number of concurrent posts
+            db_batch_size: Posted-state writes per DB transaction
+            profiler: Per-stage timing (default: the shared pipeline profiler)
+            compression: Adaptive segment compression (default: UnifiedCompression())
+            train_dictionary: Compress packed small files against a
+                dictionary trained per folder and published in the index
+        """
         self.nntp = nntp_client
         self.db = db_manager
         self.security = security_system
-        self.packer = UnifiedSegmentPacker(db_manager)
+        self.pool = connection_pool
+        self.connections = connections
+        self.db_batch_size = db_batch_size
+        self.profiler = profiler or pipeline_profiler
+        self.compression = compression or UnifiedCompression()
+        self.newsgroup = "alt.binaries.test"
+        self.packer = UnifiedSegmentPacker(db_manager, self._get_segment_data,
+                                           train_dictionary=train_dictionary)
         self.stats = {}
+        self._state = None
+        self._stats_lock = threading.Lock()
         
     def upload_folder(self, folder_id: str, redundancy_level: int = 0,
-                     pack_small_files: bool = True) -> Dict[str, Any]:
-        """Upload all segments for a folder with redundancy"""
+                     pack_small_files: bool = True,
+                     connections: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Upload all segments for a folder with redundancy
+        
+        With a connection pool, posts are spread over up to `connections`
+        pooled connections at once. Segments are queued in file and
+        segment order; every DB write is keyed by segment_id, so posts
+        completing out of order never disturb per-file ordering.
+        Posted-state writes are flushed in batched transactions.
+        
+        Message-IDs are allocated and stored before the first POST, and
+        IDs left pending by an interrupted run are checked with STAT
+        first, so a restart only re-posts articles the server never got.
+        """
+        workers = max(1, connections or self.connections)
+        if workers > 1 and not self.pool:
+            logger.warning("Concurrent upload needs a connection pool, posting sequentially")
+            workers = 1
+            
         logger.info(f"Starting upload for folder {folder_id} "
-                   f"(redundancy: {redundancy_level})")
+                   f"(redundancy: {redundancy_level}, connections: {workers})")
         
         self.stats = {
             'segments_uploaded': 0,
@@ -564,29 +810,43 @@ class UnifiedUploadSystem:
             'packed_segments': 0,
             'bytes_uploaded': 0,
             'redundancy_copies': 0,
+            'segments_reconciled': 0,
+            'connections': workers,
             'start_time': time.time()
         }
         
-        # Pack small segments if requested
-        if pack_small_files:
-            packed = self.packer.pack_segments(folder_id)
-            for packed_segment in packed:
-                if self._upload_packed_segment(packed_segment, redundancy_level):
-                    self.stats['packed_segments'] += 1
-                    self.stats['bytes_uploaded'] += packed_segment.total_size
-                    
-        # Get regular segments
-        segments = self._get_pending_segments(folder_id)
+        self._state = PostedStateBuffer(self.db, self.db_batch_size, self.profiler)
         
-        for segment in segments:
-            success = self._upload_segment(segment, redundancy_level)
-            if success:
-                self.stats['segments_uploaded'] += 1
-                self.stats['bytes_uploaded'] += segment['segment_size']
-                self.stats['redundancy_copies'] += redundancy_level
-            else:
-                self.stats['segments_failed'] += 1
+        try:
+            # Skip articles that made it to the server before a crash
+            self.stats['segments_reconciled'] = self.reconcile_folder(folder_id)
+            
+            # Pack small segments if requested
+            packed = self.packer.pack_segments(folder_id) if pack_small_files else []
+            
+            # Get regular segments
+            segments = [dict(segment) for segment in self._get_pending_segments(folder_id)]
+            
+            self._preallocate_message_ids(packed, segments)
+            
+            jobs = [(self._post_packed_job, packed_segment) for packed_segment in packed]
+            jobs += [(self._post_segment_job, segment) for segment in segments]
                 
+            if workers == 1:
+                for job, item in jobs:
+                    job(item, redundancy_level)
+            else:
+                with ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix='upload') as executor:
+                    futures = [executor.submit(job, item, redundancy_level)
+                               for job, item in jobs]
+                    for future in as_completed(futures):
+                        future.result()
+        finally:
+            self._state.flush()
+            self.stats['db_transactions'] = self._state.flushes
+            self._state = None
+            
         self.stats['duration'] = time.time() - self.stats['start_time']
         
         logger.info(f"Upload complete: {self.stats['segments_uploaded']} segments, "
@@ -595,15 +855,182 @@ class UnifiedUploadSystem:
         
         return self.stats
         
+    def _post_segment_job(self, segment: dict, redundancy_level: int):
+        """Upload one segment and count the outcome"""
+        if self._upload_segment(segment, redundancy_level):
+            self._count(segments_uploaded=1, bytes_uploaded=segment['segment_size'],
+                        redundancy_copies=redundancy_level)
+        else:
+            self._count(segments_failed=1)
+            
+    def _post_packed_job(self, packed: PackedSegment, redundancy_level: int):
+        """Upload one packed segment and count the outcome"""
+        if self._upload_packed_segment(packed, redundancy_level):
+            self._count(packed_segments=1, bytes_uploaded=packed.total_size)
+            
+    def _count(self, **amounts):
+        """Thread-safe stats increment"""
+        with self._stats_lock:
+            for key, amount in amounts.items():
+                self.stats[key] += amount
+                
+    def _post(self, subject: str, data: bytes,
+              message_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """Post an article through the pool when available"""
+        with self.profiler.stage('network', len(data)):
+            return self._post_article(subject, data, message_id)
+            
+    def _post_article(self, subject: str, data: bytes,
+                      message_id: Optional[str]) -> Tuple[bool, Optional[str]]:
+        if self.pool:
+            return self.pool.post_data(subject, data, self.newsgroup, message_id)
+            
+        if message_id:
+            return self.nntp.post_data(
+                subject=subject,
+                data=data,
+                newsgroup=self.newsgroup,
+                message_id=message_id
+            )
+            
+        return self.nntp.post_data(
+            subject=subject,
+            data=data,
+            newsgroup=self.newsgroup
+        )
+        
+    def _allocate_message_id(self) -> str:
+        """Generate a Message-ID in the same format the posting client uses"""
+        alphabet = string.ascii_lowercase + string.digits
+        return f"<{''.join(secrets.choice(alphabet) for _ in range(16))}@ngPost.com>"
+        
+    def _preallocate_message_ids(self, packed: List[PackedSegment], segments: List[dict]):
+        """Assign Message-IDs in bulk and store them before anything is posted"""
+        for segment in segments:
+            if not segment.get('message_id'):
+                segment['message_id'] = self._allocate_message_id()
+                self._state.add("""
+                    UPDATE segments SET message_id = %s WHERE segment_id = %s
+                """, (segment['message_id'], segment['segment_id']))
+                
+        for packed_segment in packed:
+            # Resumed packs keep the ID reconcile_folder already checked
+            if not packed_segment.message_id:
+                packed_segment.message_id = self._allocate_message_id()
+                self._state.add("""
+                    UPDATE packed_segments SET message_id = %s WHERE packed_segment_id = %s
+                """, (packed_segment.message_id, packed_segment.packed_id))
+                
+        # IDs must be durable before the first POST
+        self._state.flush()
+        
+    def reconcile_folder(self, folder_id: str) -> int:
+        """
+        Confirm pre-allocated Message-IDs left pending by an interrupted upload
+        
+        Articles found with STAT are marked uploaded; the rest keep their
+        IDs and are posted again under the same Message-ID.
+        
+        Returns:
+            Number of segments marked uploaded
+        """
+        segments = self.db.fetchall("""
+            SELECT s.segment_id, s.message_id
+            FROM segments s
+            JOIN files f ON s.file_id = f.file_id
+            WHERE f.folder_id = %s
+            AND s.upload_status = 'pending'
+            AND s.message_id IS NOT NULL
+        """, (folder_id,))
+        
+        packs = self.db.fetchall("""
+            SELECT DISTINCT p.packed_segment_id, p.message_id
+            FROM packed_segments p
+            JOIN segments s ON s.packed_segment_id = p.packed_segment_id
+            JOIN files f ON s.file_id = f.file_id
+            WHERE f.folder_id = %s
+            AND p.upload_status = 'pending'
+            AND p.message_id IS NOT NULL
+        """, (folder_id,))
+        
+        if not segments and not packs:
+            return 0
+            
+        found = self._stat_articles(
+            [row['message_id'] for row in segments] + [row['message_id'] for row in packs]
+        )
+        reconciled = 0
+        
+        for row in segments:
+            if found.get(row['message_id']):
+                self._record("""
+                    UPDATE segments
+                    SET upload_status = 'uploaded', encrypted_location = %s,
+                        uploaded_at = CURRENT_TIMESTAMP
+                    WHERE segment_id = %s
+                """, (self._encrypt_location(row['message_id']), row['segment_id']))
+                reconciled += 1
+                
+        for row in packs:
+            if found.get(row['message_id']):
+                self._record("""
+                    UPDATE packed_segments
+                    SET upload_status = 'uploaded', uploaded_at = CURRENT_TIMESTAMP
+                    WHERE packed_segment_id = %s
+                """, (row['packed_segment_id'],))
+                self._record("""
+                    UPDATE segments SET upload_status = 'uploaded'
+                    WHERE packed_segment_id = %s
+                """, (row['packed_segment_id'],))
+                reconciled += 1
+                
+        if self._state:
+            self._state.flush()
+            
+        logger.info(f"Reconciled {reconciled} of {len(segments) + len(packs)} "
+                   f"pre-allocated articles for folder {folder_id}")
+        
+        return reconciled
+        
+    def _stat_articles(self, message_ids: List[str]) -> Dict[str, bool]:
+        """Check which Message-IDs exist on any server"""
+        if self.pool:
+            try:
+                results = self.pool.stat_articles(message_ids)
+            except StatProbeError as e:
+                # Unprobed IDs count as missing and are posted again
+                logger.warning(f"Reconcile: {e}")
+                results = e.availability
+            return {
+                message_id: any(server.get(message_id) for server in results.values())
+                for message_id in message_ids
+            }
+            
+        check = (getattr(self.nntp, 'check_article_exists', None) or
+                 getattr(self.nntp, 'check_message_exists'))
+        return {message_id: bool(check(message_id)) for message_id in message_ids}
+        
+    def _record(self, query: str, params: tuple):
+        """Queue a posted-state write, or run it now outside upload_folder"""
+        if self._state:
+            self._state.add(query, params)
+        else:
+            self.db.execute(query, params)
+        
     def _get_pending_segments(self, folder_id: str):
-        """Get segments pending upload"""
+        """Get segments pending upload in file and segment order"""
         return self.db.fetchall("""
-            SELECT s.* 
+            SELECT s.*, f.file_path,
+                   (SELECT MAX(t.segment_index) + 1 FROM segments t
+                    WHERE t.file_id = s.file_id) AS total_segments,
+                   (SELECT SUM(t.segment_size) FROM segments t
+                    WHERE t.file_id = s.file_id AND t.redundancy_level = 0) AS file_size
             FROM segments s
             JOIN files f ON s.file_id = f.file_id
             WHERE f.folder_id = %s 
             AND s.upload_status = 'pending'
             AND s.packed_with IS NULL
+            ORDER BY s.file_id, s.segment_index
         """, (folder_id,))
         
     def _upload_segment(self, segment: dict, redundancy_level: int) -> bool:
@@ -618,18 +1045,21 @@ class UnifiedUploadSystem:
             usenet_subject = self._generate_obfuscated_subject()
             
             # Get actual segment data (would read from file)
+            started = time.perf_counter_ns()
             segment_data = self._get_segment_data(segment)
+            self.profiler.record('read', started, len(segment_data))
+            
+            # Compress for the content and record the codec in a v2 header
+            segment_data = self._wrap_segment(segment, segment_data)
             
             # Encrypt if security system available
             if self.security:
-                segment_data = self.security.encrypt_data(segment_data)
+                with self.profiler.stage('encrypt', len(segment_data)):
+                    segment_data = self.security.encrypt_data(segment_data)
                 
-            # Upload main copy
-            success, response = self.nntp.post_data(
-                subject=usenet_subject,
-                data=segment_data,
-                newsgroup="alt.binaries.test"
-            )
+            # Upload main copy under its pre-allocated Message-ID
+            success, response = self._post(usenet_subject, segment_data,
+                                           segment.get('message_id'))
             
             if success:
                 # response is the message_id string directly
@@ -639,7 +1069,7 @@ class UnifiedUploadSystem:
                 encrypted_location = self._encrypt_location(message_id)
                 
                 # Update database
-                self.db.execute("""
+                self._record("""
                     UPDATE segments 
                     SET upload_status = %s, message_id = %s,
                         internal_subject = %s, usenet_subject = %s,
@@ -655,11 +1085,7 @@ class UnifiedUploadSystem:
                     # Modify data slightly to make unique
                     redundant_data = self._create_redundant_copy(segment_data, i)
                     
-                    r_success, r_response = self.nntp.post_data(
-                        subject=redundant_subject,
-                        data=redundant_data,
-                        newsgroup="alt.binaries.test"
-                    )
+                    r_success, r_response = self._post(redundant_subject, redundant_data)
                     
                     if r_success:
                         # Store redundancy info
@@ -672,7 +1098,7 @@ class UnifiedUploadSystem:
                 return True
             else:
                 # Update retry count
-                self.db.execute("""
+                self._record("""
                     UPDATE segments 
                     SET retry_count = retry_count + 1
                     WHERE segment_id = %s
@@ -689,18 +1115,20 @@ class UnifiedUploadSystem:
         try:
             usenet_subject = self._generate_obfuscated_subject()
             
-            success, response = self.nntp.post_data(
-                subject=usenet_subject,
-                data=packed.packed_data,
-                newsgroup="alt.binaries.test"
-            )
+            packed_data = packed.packed_data
+            if self.security:
+                with self.profiler.stage('encrypt', len(packed_data)):
+                    packed_data = self.security.encrypt_data(packed_data)
+                    
+            success, response = self._post(usenet_subject, packed_data,
+                                           packed.message_id)
             
             if success:
                 # response is the message_id string
                 message_id = response
                 
                 # Store message ID for packed segment
-                self.db.execute("""
+                self._record("""
                     UPDATE packed_segments 
                     SET message_id = %s, subject = %s, 
                         upload_status = 'uploaded', uploaded_at = CURRENT_TIMESTAMP
@@ -715,7 +1143,7 @@ class UnifiedUploadSystem:
                         seg_id = getattr(segment, 'segment_id', None)
                     
                     if seg_id:
-                        self.db.execute("""
+                        self._record("""
                             UPDATE segments 
                             SET packed_segment_id = %s, upload_status = 'uploaded'
                             WHERE segment_id = %s
@@ -723,12 +1151,8 @@ class UnifiedUploadSystem:
                 
                 # Upload redundancy copies
                 for i in range(redundancy_level):
-                    redundant_data = self._create_redundant_copy(packed.packed_data, i)
-                    self.nntp.post_data(
-                        subject=self._generate_obfuscated_subject(),
-                        data=redundant_data,
-                        newsgroup="alt.binaries.test"
-                    )
+                    redundant_data = self._create_redundant_copy(packed_data, i)
+                    self._post(self._generate_obfuscated_subject(), redundant_data)
                     
                 logger.info(f"Packed segment uploaded with message ID: {message_id}")
                 return True
@@ -753,6 +1177,19 @@ class UnifiedUploadSystem:
         # In production, would read from file using segment info
         return f"SEGMENT_DATA_{segment['segment_hash']}".encode()
         
+    def _wrap_segment(self, segment: dict, data: bytes) -> bytes:
+        """Segment header carrying the compression codec, then the payload"""
+        payload, codec = self.compression.compress_adaptive(data, segment.get('file_path'))
+        header = UnifiedHeaders.create_header(
+            segment['segment_index'],
+            segment['total_segments'],
+            str(segment['file_id']),
+            segment['file_size'],
+            metadata={'size': len(data)},
+            compression=codec
+        )
+        return header + payload
+        
     def _create_redundant_copy(self, data: bytes, copy_num: int) -> bytes:
         """Create unique redundant copy"""
         # Add metadata to make it unique
@@ -762,7 +1199,7 @@ class UnifiedUploadSystem:
     def _store_redundancy_info(self, segment_id: int, redundancy_level: int,
                               message_id: str, subject: str):
         """Store redundancy information"""
-        self.db.execute("""
+        self._record("""
             INSERT INTO segments 
             (file_id, segment_index, segment_hash, segment_size,
              redundancy_level, message_id, usenet_subject, upload_status)
@@ -809,10 +1246,12 @@ class UnifiedSystem:
         schema.connection = self.db_manager.connection
         schema.create_schema()
         
-    def initialize_upload(self, nntp_client, security_system=None):
-        """Initialize upload system with NNTP client"""
+    def initialize_upload(self, nntp_client, security_system=None,
+                          connection_pool=None, connections: int = 1):
+        """Initialize upload system with NNTP client or connection pool"""
         self.uploader = UnifiedUploadSystem(
-            nntp_client, self.db_manager, security_system
+            nntp_client, self.db_manager, security_system,
+            connection_pool=connection_pool, connections=connections
         )
         
     def index_and_upload(self, folder_path: str, redundancy: int = 1,
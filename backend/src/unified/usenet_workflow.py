@@ -7,21 +7,31 @@ import json
 import hashlib
 import base64
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 import uuid
 
+from .indexing.binary_index import UnifiedBinaryIndex, CoreIndexReader, PagedCoreIndex
+
 logger = logging.getLogger(__name__)
 
 class UsenetWorkflow:
     """Manages the complete Usenet workflow for sharing"""
     
-    def __init__(self, db, nntp_client=None, encryption=None):
+    def __init__(self, db, nntp_client=None, encryption=None, page_files: int = 50000):
+        """
+        Args:
+            db: Database
+            nntp_client: NNTP client for posting and fetching
+            encryption: UnifiedEncryption used for index pages
+            page_files: Files per core index page; larger shares are paged
+        """
         self.db = db
         self.nntp = nntp_client
         self.encryption = encryption
-        
-    def create_core_index(self, share_id: str, folder_id: str) -> Dict[str, Any]:
+        self.page_files = page_files
+    
+    def create_core_index(self, share_id: str, folder_id: Optional[str]) -> bytes:
         """
         Create core index for a share containing all metadata needed for download
         
@@ -30,9 +40,20 @@ class UsenetWorkflow:
         - File list with sizes and hashes
         - Segment information with message IDs
         - Encryption parameters
+        
+        Files and segments come from a single streaming query and are
+        written as a binary table index (see CoreIndexReader)
         """
         logger.info(f"Creating core index for share {share_id}")
         
+        meta, rows = self._core_index_source(share_id, folder_id)
+        index_data = UnifiedBinaryIndex().build_core_index(meta, rows)
+        
+        logger.info(f"Core index created: {len(index_data)} bytes")
+        return index_data
+    
+    def _core_index_source(self, share_id: str, folder_id: Optional[str]):
+        """Core index metadata and a path-ordered row stream"""
         # Get share information
         share = self.db.fetch_one(
             """SELECT share_id, folder_id, share_type, access_level, 
@@ -44,9 +65,11 @@ class UsenetWorkflow:
         if not share:
             raise ValueError(f"Share not found: {share_id}")
         
+        folder_id = folder_id or share['folder_id']
+        
         # Get folder information
         folder = self.db.fetch_one(
-            """SELECT folder_id, path, file_count, total_size, status
+            """SELECT folder_id, path, file_count, total_size, status, metadata
                FROM folders WHERE folder_id = ?""",
             (folder_id,)
         )
@@ -54,55 +77,9 @@ class UsenetWorkflow:
         if not folder:
             raise ValueError(f"Folder not found: {folder_id}")
         
-        # Get files in folder
-        files = self.db.fetch_all(
-            """SELECT file_id, name, size, hash, created_at
-               FROM files WHERE folder_id = ?
-               ORDER BY name""",
-            (folder_id,)
-        )
-        
-        # Get segments for each file (including packed segments)
-        file_segments = {}
-        
-        # First check if there are packed segments for this folder
-        packed_segments = self.db.fetch_all(
-            """SELECT ps.packed_segment_id, ps.message_id, ps.total_size
-               FROM packed_segments ps
-               WHERE ps.message_id IS NOT NULL
-               AND EXISTS (
-                   SELECT 1 FROM segments s
-                   JOIN files f ON s.file_id = f.file_id
-                   WHERE f.folder_id = ? AND s.packed_segment_id = ps.packed_segment_id
-               )""",
-            (folder_id,)
-        )
-        
-        if packed_segments:
-            # Use packed segments
-            for file in files:
-                # For packed segments, we'll reference the packed segment
-                file_segments[file['file_id']] = [{
-                    'segment_index': 0,
-                    'size': packed_segments[0]['total_size'] if packed_segments else 0,
-                    'hash': '',
-                    'message_id': packed_segments[0]['message_id'] if packed_segments else None
-                }]
-        else:
-            # Get individual segments
-            for file in files:
-                segments = self.db.fetch_all(
-                    """SELECT segment_id, segment_index, size, hash, 
-                              message_id, metadata
-                       FROM segments WHERE file_id = ?
-                       ORDER BY segment_index""",
-                    (file['file_id'],)
-                )
-                file_segments[file['file_id']] = segments
-        
-        # Build core index structure
-        core_index = {
-            "version": "1.0",
+        # Core index metadata
+        meta = {
+            "version": "2.0",
             "created_at": datetime.now().isoformat(),
             "share": {
                 "share_id": share_id,
@@ -116,7 +93,6 @@ class UsenetWorkflow:
                 "file_count": folder['file_count'],
                 "total_size": folder['total_size']
             },
-            "files": [],
             "encryption": {
                 "algorithm": "AES-256-GCM",
                 "key_derivation": "PBKDF2" if share['password_salt'] else None,
@@ -125,41 +101,223 @@ class UsenetWorkflow:
             }
         }
         
-        # Add file and segment information
-        for file in files:
-            file_entry = {
-                "file_id": file['file_id'],
-                "name": file['name'],
-                "size": file['size'],
-                "hash": file['hash'],
-                "segments": []
-            }
-            
-            # Add segment details
-            for segment in file_segments.get(file['file_id'], []):
-                segment_entry = {
-                    "index": segment['segment_index'],
-                    "size": segment['size'],
-                    "hash": segment['hash'],
-                    "message_id": segment['message_id']  # Usenet message ID
-                }
-                file_entry["segments"].append(segment_entry)
-            
-            core_index["files"].append(file_entry)
-        
         # For public shares, include the encryption key
         if share['access_level'] == 'public' and share['encryption_key']:
-            core_index["encryption"]["key"] = share['encryption_key']
+            meta["encryption"]["key"] = share['encryption_key']
+        
+        # Dictionary the folder's packed small files were compressed against;
+        # published once here rather than with every pack
+        folder_meta = folder['metadata'] or {}
+        if isinstance(folder_meta, str):
+            folder_meta = json.loads(folder_meta)
+        if folder_meta.get('compression_dictionary'):
+            meta["compression"] = {
+                "dictionary": folder_meta['compression_dictionary'],
+                "dictionary_id": folder_meta.get('compression_dictionary_id')
+            }
+        
+        # Files and their segments in one pass; packed files take the
+        # message ID of the packed segment carrying them
+        rows = self.db.stream_results(
+            """SELECT f.file_id, f.path, f.size, f.hash,
+                      s.segment_index, s.size AS segment_size, s.hash AS segment_hash,
+                      COALESCE(s.message_id, ps.message_id) AS message_id
+               FROM files f
+               LEFT JOIN segments s
+                      ON s.file_id = f.file_id AND COALESCE(s.redundancy_index, 0) = 0
+               LEFT JOIN packed_segments ps
+                      ON ps.packed_segment_id = s.packed_segment_id
+               WHERE f.folder_id = ?
+               ORDER BY f.path, f.file_id, s.segment_index""",
+            (folder_id,)
+        )
         
-        logger.info(f"Core index created with {len(files)} files")
-        return core_index
+        root = str(folder['path'] or '').rstrip('/\\')
+        
+        def relative(rows):
+            for row in rows:
+                path = str(row['path'])
+                if root and path.startswith(root):
+                    row['path'] = path[len(root):]
+                yield row
+        
+        return meta, relative(rows)
     
-    def encrypt_core_index(self, core_index: Dict[str, Any], 
+    def store_compression_dictionary(self, folder_id: str, dictionary: bytes):
+        """
+        Keep the packing dictionary with the folder so the core index of
+        every share of it carries the dictionary
+        """
+        from .segmentation.compression import UnifiedCompression
+        
+        self.db.execute(
+            """UPDATE folders
+               SET metadata = json_set(COALESCE(metadata, '{}'),
+                                       '$.compression_dictionary', ?,
+                                       '$.compression_dictionary_id', ?)
+               WHERE folder_id = ?""",
+            (base64.b64encode(dictionary).decode('ascii'),
+             UnifiedCompression.dictionary_id(dictionary), folder_id)
+        )
+    
+    @staticmethod
+    def compression_dictionary(index) -> Optional[bytes]:
+        """Share dictionary from a fetched core index, if packs use one"""
+        compression = index.get('compression')
+        if not compression or not compression.get('dictionary'):
+            return None
+        return base64.b64decode(compression['dictionary'])
+    
+    def publish_core_index(self, share_id: str, folder_id: Optional[str]) -> Optional[str]:
+        """
+        Create, encrypt and post the core index
+        Shares with more than page_files files are published as pages
+        
+        Returns:
+            Message ID of the core index (root page when paged)
+        """
+        folder = self.db.fetch_one(
+            """SELECT f.file_count FROM folders f
+               JOIN shares s ON s.folder_id = f.folder_id
+               WHERE s.share_id = ?""",
+            (share_id,)
+        )
+        
+        if folder and (folder['file_count'] or 0) > self.page_files:
+            return self.publish_paged_core_index(share_id, folder_id)['message_id']
+        
+        core_index = self.create_core_index(share_id, folder_id)
+        encrypted_index = self.encrypt_core_index(core_index, share_id)
+        return self.post_core_index_to_usenet(encrypted_index, share_id)
+    
+    def publish_paged_core_index(self, share_id: str, folder_id: Optional[str],
+                                 page_files: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Post the core index as independently fetchable pages
+        
+        Each page covers a directory subtree (a contiguous path range) and is
+        encrypted with its own key, derived from the share key for that share
+        and page number. The small root page lists every page's path range
+        and message ID, never a key, and is posted like a regular core index.
+        
+        Returns:
+            Root message ID, page count and file count
+        
+        Raises:
+            ValueError: If pages are encrypted and the share has no key
+        """
+        meta, rows = self._core_index_source(share_id, folder_id)
+        share_key = self._share_key(share_id) if self.encryption else None
+        if self.encryption and not share_key:
+            raise ValueError(f"Share {share_id} has no key to derive index page keys from")
+        
+        pages = []
+        for info, data in UnifiedBinaryIndex().iter_core_index_pages(rows, page_files or self.page_files):
+            body, key_info = self._encrypt_index_page(data, share_id, info['page'], share_key)
+            info['message_id'] = self._post_index_page(body, share_id, info['page'])
+            info.update(key_info)
+            pages.append(info)
+        
+        root = dict(meta, paged=True, pages=pages)
+        message_id = self.post_core_index_to_usenet(self.encrypt_core_index(root, share_id), share_id)
+        
+        logger.info(f"Posted paged core index: {len(pages)} pages, root {message_id}")
+        return {
+            'message_id': message_id,
+            'pages': len(pages),
+            'files': sum(page['files'] for page in pages)
+        }
+    
+    def _page_aad(self, share_id: str, page: int) -> bytes:
+        return f"{share_id}:index-page:{page}".encode('utf-8')
+    
+    def _share_key(self, share_id: str) -> Optional[bytes]:
+        """The share's secret key, as stored with the share"""
+        share = self.db.fetch_one(
+            "SELECT encryption_key FROM shares WHERE share_id = ?", (share_id,)
+        ) if self.db else None
+        if not share or not share['encryption_key']:
+            return None
+        
+        key = share['encryption_key']
+        return key.encode('utf-8') if isinstance(key, str) else bytes(key)
+    
+    def _page_key(self, encryption, share_key: bytes, share_id: str, page: int) -> bytes:
+        """Per-page key: HKDF(share key, share_id, page)"""
+        return encryption.derive_subkey(share_key, share_id.encode('utf-8'),
+                                        f"usenetsync-index-page:{page}".encode('utf-8'))
+    
+    def _encrypt_index_page(self, data: bytes, share_id: str, page: int,
+                            share_key: Optional[bytes] = None):
+        """Encrypt one index page under a key derived from the share key"""
+        if not self.encryption:
+            return base64.b64encode(data), {}
+        
+        key = self._page_key(self.encryption, share_key, share_id, page)
+        ciphertext, nonce, tag = self.encryption.encrypt(data, key, self._page_aad(share_id, page))
+        return base64.b64encode(nonce + tag + ciphertext), {'cipher': 'AES-256-GCM',
+                                                            'key_derivation': 'HKDF-SHA256'}
+    
+    def _decrypt_index_page(self, body: bytes, share_id: str, entry: Dict[str, Any],
+                            share_key: Optional[bytes] = None) -> bytes:
+        data = base64.b64decode(body)
+        if not entry.get('cipher'):
+            return data
+        if not share_key:
+            raise ValueError(f"Share key required to decrypt core index page {entry['page']}")
+        
+        encryption = self.encryption
+        if encryption is None:
+            from .security.encryption import UnifiedEncryption
+            encryption = self.encryption = UnifiedEncryption()
+        
+        nonce_size, tag_size = encryption.NONCE_SIZE, encryption.TAG_SIZE
+        return encryption.decrypt(
+            data[nonce_size + tag_size:],
+            self._page_key(encryption, share_key, share_id, entry['page']),
+            data[:nonce_size],
+            data[nonce_size:nonce_size + tag_size],
+            self._page_aad(share_id, entry['page'])
+        )
+    
+    def _post_index_page(self, body: bytes, share_id: str, page: int) -> str:
+        if not self.nntp:
+            return f"<index.{share_id}.p{page}@usenet.local>"
+        
+        return self.nntp.post_article(
+            subject=f"[USINDEX] {share_id[:8]} Core Index Page {page}",
+            body=body,
+            newsgroups=["alt.binaries.test"]
+        )
+    
+    def _fetch_index_page(self, share_id: str, entry: Dict[str, Any],
+                          share_key: Optional[bytes] = None) -> bytes:
+        """Fetch and decrypt a single index page"""
+        article = self.nntp.get_article(entry['message_id'])
+        if not article:
+            raise ValueError(f"Core index page {entry['page']} not found: {entry['message_id']}")
+        
+        if isinstance(article, dict):
+            article = article.get('body', b'')
+        if isinstance(article, str):
+            article = article.encode('utf-8')
+        
+        # Drop headers if the client returned the full article
+        for separator in (b'\r\n\r\n', b'\n\n'):
+            if separator in article:
+                article = article.split(separator, 1)[1]
+                break
+        
+        return self._decrypt_index_page(article, share_id, entry, share_key)
+    
+    def encrypt_core_index(self, core_index: Union[bytes, Dict[str, Any]], 
                           share_id: str) -> bytes:
         """Encrypt the core index for posting to Usenet"""
-        # Convert to JSON
-        index_json = json.dumps(core_index, indent=2)
-        index_bytes = index_json.encode('utf-8')
+        if isinstance(core_index, (bytes, bytearray)):
+            index_bytes = bytes(core_index)
+        else:
+            # Legacy JSON index
+            index_bytes = json.dumps(core_index, indent=2).encode('utf-8')
         
         # For now, use simple base64 encoding
         # In production, would use proper encryption
@@ -203,23 +361,30 @@ class UsenetWorkflow:
             )
             
             return message_id
-            
+        
         except Exception as e:
             logger.error(f"Failed to post core index: {e}")
             raise
     
-    def fetch_core_index_from_usenet(self, share_id: str) -> Optional[Dict[str, Any]]:
+    def fetch_core_index_from_usenet(self, share_id: str,
+                                     share_key: Optional[bytes] = None) -> Optional[Union[CoreIndexReader, PagedCoreIndex]]:
         """
         Fetch and decrypt core index from Usenet
         
         This is what end users do - they only have the share_id
+        Returns a lazy CoreIndexReader, a PagedCoreIndex that fetches pages
+        on demand, or a dict for legacy JSON indexes
+        
+        Pages of a paged index are decrypted with keys derived from
+        share_key; public shares carry their key in the root, otherwise
+        the key stored with the share is used when the database is at hand.
         """
         logger.info(f"Fetching core index for share {share_id}")
         
         if not self.nntp:
             logger.warning("No NNTP client, using database fallback")
             # Fallback: reconstruct from database
-            return self.create_core_index(share_id, None)
+            return CoreIndexReader(self.create_core_index(share_id, None))
         
         try:
             # First try to get the message ID from the database (if available)
@@ -275,6 +440,11 @@ class UsenetWorkflow:
                 # If not base64, it might be the raw JSON
                 decrypted = article_data
             
+            if CoreIndexReader.is_core_index(decrypted):
+                core_index = CoreIndexReader(decrypted)
+                logger.info(f"Retrieved core index with {len(core_index)} files")
+                return core_index
+            
             # Parse JSON
             core_index = None
             try:
@@ -308,13 +478,23 @@ class UsenetWorkflow:
                             logger.error(f"Could not parse core index from article")
                             return None
             
+            if core_index and core_index.get('paged'):
+                logger.info(f"Retrieved paged core index with {len(core_index['pages'])} pages")
+                if share_key is None:
+                    public_key = (core_index.get('encryption') or {}).get('key')
+                    share_key = public_key.encode('utf-8') if public_key else self._share_key(share_id)
+                return PagedCoreIndex(
+                    core_index,
+                    lambda entry: self._fetch_index_page(share_id, entry, share_key)
+                )
+            
             if core_index:
                 logger.info(f"Retrieved core index with {len(core_index.get('files', []))} files")
                 return core_index
             else:
                 logger.error("Failed to parse core index")
                 return None
-            
+        
         except Exception as e:
             logger.error(f"Failed to fetch core index: {e}")
             return None
@@ -384,20 +564,18 @@ class UsenetWorkflow:
                 
                 results["segments_uploaded"] += 1
                 logger.debug(f"Uploaded segment {segment['segment_index']} of {segment['name']}: {message_id}")
-                
+            
             except Exception as e:
                 logger.error(f"Failed to upload segment {segment['segment_id']}: {e}")
                 results["errors"].append(str(e))
         
         # Create and post core index
         try:
-            core_index = self.create_core_index(share_id, folder_id)
-            encrypted_index = self.encrypt_core_index(core_index, share_id)
-            message_id = self.post_core_index_to_usenet(encrypted_index, share_id)
+            message_id = self.publish_core_index(share_id, folder_id)
             results["core_index_message_id"] = message_id
             
             logger.info(f"Upload complete: {results['segments_uploaded']} segments, index: {message_id}")
-            
+        
         except Exception as e:
             logger.error(f"Failed to post core index: {e}")
             results["errors"].append(str(e))
@@ -476,7 +654,7 @@ class UsenetWorkflow:
                 # Save file (in production)
                 logger.info(f"Downloaded {file_info['name']}: {len(file_data)} bytes")
                 results["files_downloaded"] += 1
-                
+            
             except Exception as e:
                 logger.error(f"Failed to download {file_info['name']}: {e}")
                 results["errors"].append(str(e))
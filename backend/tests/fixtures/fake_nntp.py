@@ -0,0 +1,123 @@
+"""
+Local NNTP server for pool and posting benchmarks
+Speaks just enough NNTP (greeting, DATE, STAT, ARTICLE, BODY, POST, QUIT) on 127.0.0.1
+"""
+import socketserver
+import threading
+import time
+
+class FakeNNTPServer(socketserver.ThreadingTCPServer):
+    """In-memory NNTP server with a fixed per-command latency"""
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def __init__(self, latency: float = 0.0, max_connections: int = None):
+        self.latency = latency
+        self.max_connections = max_connections
+        self.articles = {}  # message_id -> article bytes, as posted before dot-stuffing
+        self.commands = {}  # verb -> count
+        self.active = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), FakeNNTPHandler)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+    
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+    
+    def count(self, verb: str) -> int:
+        with self.lock:
+            return self.commands.get(verb, 0)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.server_close()
+
+class FakeNNTPHandler(socketserver.StreamRequestHandler):
+    """One client connection"""
+    
+    def handle(self):
+        server = self.server
+        with server.lock:
+            if server.max_connections is not None and server.active >= server.max_connections:
+                self.wfile.write(b'502 too many connections\r\n')
+                return
+            server.active += 1
+        
+        try:
+            self.wfile.write(b'200 fake server ready\r\n')
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                if not self.dispatch(server, line.decode().strip()):
+                    return
+        finally:
+            with server.lock:
+                server.active -= 1
+    
+    def dispatch(self, server, command: str) -> bool:
+        verb, _, arg = command.partition(' ')
+        verb = verb.upper()
+        with server.lock:
+            server.commands[verb] = server.commands.get(verb, 0) + 1
+        
+        if server.latency:
+            time.sleep(server.latency)
+        
+        if verb == 'DATE':
+            self.wfile.write(b'111 20260101000000\r\n')
+        elif verb == 'STAT':
+            code = b'223 0 ' if arg in server.articles else b'430 no such article '
+            self.wfile.write(code + arg.encode() + b'\r\n')
+        elif verb in ('ARTICLE', 'BODY'):
+            article = server.articles.get(arg)
+            if article is None:
+                self.wfile.write(b'430 no such article\r\n')
+            elif verb == 'ARTICLE':
+                self.wfile.write(b'220 0 ' + arg.encode() + b'\r\n' + self.stuff(article) + b'.\r\n')
+            else:
+                body = article.split(b'\r\n\r\n', 1)[-1]
+                self.wfile.write(b'222 0 ' + arg.encode() + b'\r\n' + self.stuff(body) + b'.\r\n')
+        elif verb == 'POST':
+            self.wfile.write(b'340 send article\r\n')
+            self.receive_article(server)
+        elif verb == 'QUIT':
+            self.wfile.write(b'205 bye\r\n')
+            return False
+        else:
+            self.wfile.write(b'500 unknown command\r\n')
+        return True
+    
+    @staticmethod
+    def stuff(text: bytes) -> bytes:
+        lines = text.split(b'\r\n')
+        return b'\r\n'.join(b'.' + line if line.startswith(b'.') else line for line in lines)
+    
+    def receive_article(self, server):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if line in (b'.\r\n', b''):
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        
+        message_id = None
+        for line in lines:
+            if line.lower().startswith(b'message-id:'):
+                message_id = line.split(b':', 1)[1].strip().decode()
+                break
+            if line == b'\r\n':
+                break
+        
+        if message_id:
+            with server.lock:
+                server.articles[message_id] = b''.join(lines)
+            self.wfile.write(b'240 article posted\r\n')
+        else:
+            self.wfile.write(b'441 posting failed\r\n')
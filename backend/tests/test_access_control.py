@@ -0,0 +1,116 @@
+"""
+UsenetSync Access Control Tests
+Verified sessions skip key derivation until they expire or are revoked
+"""
+import base64
+import hashlib
+import json
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.security.access_control import UnifiedAccessControl
+from unified.security.encryption import UnifiedEncryption
+
+PASSWORD = 'correct horse battery staple'
+
+def _protected_share(path, encryption, expires_at=None):
+    db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(path)))
+    db.execute("""CREATE TABLE publications (
+        share_id TEXT PRIMARY KEY, folder_id TEXT, access_level TEXT,
+        password_hash TEXT, password_salt TEXT, encryption_key TEXT,
+        wrapped_keys TEXT, created_by TEXT, expires_at TEXT, metadata TEXT,
+        revoked BOOLEAN DEFAULT 0, revoked_at TEXT, revoke_reason TEXT)""")
+    
+    key_salt = encryption.generate_salt()
+    master_key = encryption.generate_key()
+    wrapped = encryption.wrap_key(master_key, encryption.derive_key_scrypt(PASSWORD, key_salt))
+    password_salt = secrets.token_bytes(16)
+    password_hash = hashlib.pbkdf2_hmac('sha256', PASSWORD.encode('utf-8'), password_salt, 100000)
+    db.insert('publications', {
+        'share_id': 'share1', 'folder_id': 'folder1', 'access_level': 'protected',
+        'password_hash': base64.b64encode(password_hash).decode('ascii'),
+        'password_salt': base64.b64encode(password_salt).decode('ascii'),
+        'encryption_key': base64.b64encode(wrapped).decode('ascii'),
+        'created_by': 'owner1', 'expires_at': expires_at,
+        'metadata': json.dumps({'key_salt': base64.b64encode(key_salt).decode('ascii')})
+    })
+    encryption.clear_key_cache()
+    return db, master_key
+
+class TestSessionKeyCache:
+    """verify_access caches derived keys per verified session"""
+    
+    def test_repeat_verification_skips_derivation(self, tmp_path):
+        """The second verification returns the same key in microseconds"""
+        encryption = UnifiedEncryption()
+        db, master_key = _protected_share(tmp_path / 'access.db', encryption)
+        access = UnifiedAccessControl(db, encryption, None)
+        
+        start = time.perf_counter()
+        assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        first = time.perf_counter() - start
+        encryption.clear_key_cache()
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        repeat = (time.perf_counter() - start) / 1000
+        
+        assert access.verify_access('share1', 'user1', 'wrong password') is None
+        assert repeat < 0.0005 and first > 50 * repeat
+        print(f"\n✅ verify_access: {first * 1000:.1f} ms -> {repeat * 1e6:.1f} µs cached")
+    
+    def test_cache_never_holds_password(self, tmp_path):
+        """Entries are keyed by an HMAC digest, not the credentials"""
+        encryption = UnifiedEncryption()
+        db, _ = _protected_share(tmp_path / 'access.db', encryption)
+        access = UnifiedAccessControl(db, encryption, None)
+        access.verify_access('share1', 'user1', PASSWORD)
+        
+        keys = list(access.sessions._entries) + list(encryption._key_cache)
+        assert keys and all(isinstance(k, bytes) and len(k) == 32 for k in keys)
+        assert all(PASSWORD.encode() not in k for k in keys)
+        assert hashlib.sha256(json.dumps(['share1', 'user1', PASSWORD]).encode()).digest() not in keys
+    
+    def test_revoke_and_expiry_invalidate(self, tmp_path):
+        """Revoking the share or reaching its expiry ends cached sessions"""
+        encryption = UnifiedEncryption()
+        expires = (datetime.now() + timedelta(seconds=1)).isoformat()
+        db, master_key = _protected_share(tmp_path / 'access.db', encryption, expires)
+        access = UnifiedAccessControl(db, encryption, None)
+        
+        assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        assert access.verify_access('share1', 'user2', PASSWORD) == master_key
+        assert access.invalidate_sessions('share1', 'user2') == 1
+        assert access.sessions.get_statistics()['sessions'] == 1
+        
+        time.sleep(1.1)
+        assert access.verify_access('share1', 'user1', PASSWORD) is None
+        
+        db.execute("UPDATE publications SET expires_at = NULL")
+        assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        access.revoke_share('share1', 'owner1', 'leaked')
+        assert access.sessions.get_statistics()['sessions'] == 0
+        assert access.verify_access('share1', 'user1', PASSWORD) is None
+    
+    def test_invalidation_during_verification_not_recached(self, tmp_path):
+        """A session invalidated while its key is derived is not cached"""
+        encryption = UnifiedEncryption()
+        db, master_key = _protected_share(tmp_path / 'access.db', encryption)
+        access = UnifiedAccessControl(db, encryption, None)
+        verify = access._verify_access
+        
+        def verify_then_invalidate(share_id, user_id, password):
+            result = verify(share_id, user_id, password)
+            access.invalidate_sessions('share1')
+            return result
+        
+        access._verify_access = verify_then_invalidate
+        assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        assert access.sessions.get_statistics()['sessions'] == 0
+        
+        access._verify_access = verify
+        assert access.verify_access('share1', 'user1', PASSWORD) == master_key
+        assert access.sessions.get_statistics()['sessions'] == 1
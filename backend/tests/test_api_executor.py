@@ -0,0 +1,79 @@
+"""
+UsenetSync API Executor Tests
+Blocking handler work runs off the event loop with bounded concurrency
+"""
+import asyncio
+import time
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from unified.api.executor import never_suspends
+from unified.api.server import UnifiedAPIServer
+
+def _server(**config):
+    server = UnifiedAPIServer(None, config)
+    
+    @server.app.get('/test/slow')
+    async def slow(seconds: float = 0.3):
+        time.sleep(seconds)
+        return {'slept': seconds}
+    
+    return server
+
+async def _timed(client, path):
+    started = time.monotonic()
+    response = await client.get(path)
+    return response, time.monotonic() - started
+
+class TestDatabaseExecutor:
+    """Handlers are driven on worker threads"""
+    
+    def test_only_non_suspending_handlers_offloaded(self):
+        """Coroutines that await stay on the loop"""
+        async def blocking():
+            return 1
+        
+        async def awaiting():
+            await asyncio.sleep(0)
+        
+        assert never_suspends(blocking)
+        assert not never_suspends(awaiting)
+        assert not never_suspends(lambda: None)
+    
+    def test_light_requests_stay_fast_under_heavy_load(self):
+        """Health checks answer while a burst of slow requests is running"""
+        server = _server(db_workers=4)
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+                heavy = [asyncio.ensure_future(client.get('/test/slow')) for _ in range(12)]
+                await asyncio.sleep(0.05)
+                light = [await _timed(client, '/health') for _ in range(5)]
+                return await asyncio.gather(*heavy), light
+        
+        heavy, light = asyncio.run(scenario())
+        
+        assert all(response.status_code == 200 for response in heavy)
+        assert all(response.json() == {'status': 'healthy'} for response, _ in light)
+        assert max(elapsed for _, elapsed in light) < 0.2
+        statistics = server.db_executor.get_statistics()
+        assert statistics['completed'] == 17 and statistics['route_limit'] == 2
+        assert statistics['queue_wait_ms']['p99'] >= 250
+    
+    def test_timeout_and_overload(self):
+        """Slow requests get 504; a full queue gets 503"""
+        server = _server(db_workers=1, db_queue_limit=1, request_timeout=0.1)
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+                return await asyncio.gather(client.get('/test/slow?seconds=0.3'),
+                                            client.get('/test/slow?seconds=0.3'))
+        
+        statuses = sorted(response.status_code for response in asyncio.run(scenario()))
+        assert statuses == [503, 504]
+        statistics = server.db_executor.get_statistics()
+        assert statistics['timeouts'] == 1 and statistics['rejected'] == 1
+        server.db_executor.shutdown()
@@ -0,0 +1,124 @@
+"""
+UsenetSync Connection Autotuner Tests
+AIMD adjustment of per-server connection counts and persistence of the optimum
+"""
+import time
+import pytest
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.networking.autotuner import UnifiedConnectionTuner
+from unified.networking.connection_pool import UnifiedConnectionPool
+from tests.fixtures.fake_nntp import FakeNNTPServer
+
+SERVER = 'news.example.com:119'
+
+def _tuner(db=None, **kwargs):
+    tuner = UnifiedConnectionTuner(db=db, window_seconds=0.02, min_window_ops=5, **kwargs)
+    tuner.register_server(SERVER, 20)
+    return tuner
+
+class FakeNNTPClient:
+    """Stand-in for pynntp's client"""
+    
+    def __init__(self, **kwargs):
+        pass
+    
+    def noop(self):
+        pass
+    
+    def quit(self):
+        pass
+
+def _window(tuner, bytes_count=1000, success=True, response_code=None, ops=5):
+    time.sleep(0.025)
+    for _ in range(ops):
+        tuner.record(SERVER, bytes_count, 0.01, success, response_code)
+
+class TestAIMD:
+    """Additive increase while throughput improves, multiplicative decrease on trouble"""
+    
+    def test_increases_while_throughput_improves(self):
+        """Every improving window adds one connection"""
+        tuner = _tuner()
+        assert tuner.get_limit(SERVER) == 4
+        for window in range(3):
+            _window(tuner, bytes_count=1000 * 2 ** window)
+        
+        assert tuner.get_limit(SERVER) == 7
+        assert tuner.get_statistics()[SERVER]['optimal_connections'] == 6
+    
+    def test_decreases_on_errors(self):
+        """4xx responses and timeouts back off; missing articles do not"""
+        tuner = _tuner(initial_connections=10)
+        _window(tuner, success=False, response_code='430')
+        assert tuner.get_limit(SERVER) == 11
+        
+        _window(tuner, success=False, response_code='400')
+        assert tuner.get_limit(SERVER) == 7
+        
+        _window(tuner, success=False, response_code=None)
+        assert tuner.get_limit(SERVER) == 4
+    
+    def test_pool_timeout_counts_as_error(self):
+        """A server that answers too slowly is backed off through the pool"""
+        with FakeNNTPServer(latency=0.2) as server:
+            server.articles['<a@test>'] = b'Subject: x\r\n\r\nbody\r\n'
+            tuner = UnifiedConnectionTuner(window_seconds=0, min_window_ops=3, initial_connections=4)
+            pool = UnifiedConnectionPool(
+                [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 4, 'timeout': 0.1}],
+                tuner=tuner
+            )
+            server_id = f'127.0.0.1:{server.port}'
+            for _ in range(3):
+                assert pool.retrieve_article('<a@test>') is None
+            time.sleep(0.25)  # Let the server finish the abandoned commands
+            pool.close()
+        
+        assert tuner.get_limit(server_id) == 2
+    
+    def test_advanced_pool_checkouts_drive_the_limit(self, monkeypatch):
+        """Released checkouts raise the limit, failing ones back it off"""
+        advanced_connection_pool = pytest.importorskip('optimization.advanced_connection_pool',
+                                                       exc_type=ImportError)
+        monkeypatch.setattr(advanced_connection_pool, 'NNTPClient', FakeNNTPClient)
+        monkeypatch.setattr(advanced_connection_pool, 'nntp', object(), raising=False)
+        manager = advanced_connection_pool.ConnectionPoolManager(UnifiedConnectionTuner(window_seconds=0, min_window_ops=5))
+        pool = manager.initialize_nntp_pool('news', {
+            'hostname': 'news.example.com', 'port': 119,
+            'username': 'user', 'password': 'secret', 'max_connections': 20
+        })
+        assert pool.connection_limit() == 4
+        
+        for _ in range(5):
+            with pool.get_connection():
+                pass
+        assert pool.connection_limit() == 5
+        
+        for _ in range(5):
+            with pytest.raises(ConnectionError):
+                with pool.get_connection():
+                    raise ConnectionError('connection reset')
+        assert pool.connection_limit() == 3
+        assert manager.get_statistics()['autotune'][SERVER]['limit'] == 3
+        manager.close_all()
+
+class TestPersistence:
+    """The learned optimum survives a restart through server_health"""
+    
+    def test_optimum_restored_from_server_health(self, tmp_path):
+        """A new tuner starts at the optimum the last one learned"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'tuning.db')))
+        UnifiedSchema(db).create_all_tables()
+        
+        tuner = _tuner(db)
+        for window in range(3):
+            _window(tuner, bytes_count=1000 * 2 ** window)
+        assert tuner.get_statistics()[SERVER]['optimal_connections'] == 6
+        
+        row = db.fetch_one("SELECT max_connections, current_connections FROM server_health "
+                           "WHERE server = ? AND port = ?", ('news.example.com', 119))
+        assert row['max_connections'] == 20 and row['current_connections'] == 7
+        
+        assert _tuner(db).get_limit(SERVER) == 6
+        db.close()
@@ -0,0 +1,195 @@
+"""
+UsenetSync Segment Compression Tests
+Adaptive codec selection, header-recorded codecs and share dictionaries
+"""
+import base64
+import json
+import os
+import struct
+import zlib
+import pytest
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.indexing.binary_index import CoreIndexReader
+from unified.segmentation.compression import UnifiedCompression, HAS_ZSTD
+from unified.segmentation.headers import UnifiedHeaders
+from unified.segmentation.packing import UnifiedPacking
+from unified.unified_system import UnifiedDatabaseManager, UnifiedUploadSystem
+from unified.download_system import UnifiedDownloadSystem
+from unified.usenet_workflow import UsenetWorkflow
+from tests.test_upload_system import SCHEMA
+
+SEGMENT = 768000
+
+class TestAdaptiveCompression:
+    """compress_adaptive picks a codec per segment"""
+    
+    def test_codec_follows_content(self):
+        """Text is compressed, random data and media are stored as-is"""
+        compression = UnifiedCompression()
+        text = (b'GET /index.html HTTP/1.1 200 ' * 40000)[:SEGMENT]
+        noise = os.urandom(SEGMENT)
+        jpeg = b'\xff\xd8\xff\xe0' + text[4:]
+        
+        payload, codec = compression.compress_adaptive(text)
+        assert codec == ('zstd' if HAS_ZSTD else 'zlib')
+        assert len(payload) < SEGMENT // 100
+        assert compression.compress_adaptive(noise) == (noise, 'none')
+        assert compression.compress_adaptive(jpeg)[1] == 'none'
+        assert compression.compress_adaptive(text, 'clip.mkv')[1] == 'none'
+    
+    def test_stratified_sample_sees_whole_segment(self):
+        """A compressible header does not hide an incompressible body"""
+        compression = UnifiedCompression()
+        data = b'\0' * 4096 + os.urandom(SEGMENT - 4096)
+        
+        assert compression.estimate_entropy(data) > 7.5
+        assert compression.select_codec(data) == 'none'
+    
+    def test_header_records_codec(self):
+        """The codec travels in the header; version 1 headers decode as stored"""
+        compression = UnifiedCompression()
+        data = b'segment payload ' * 5000
+        payload, codec = compression.compress_adaptive(data)
+        segment = UnifiedHeaders.create_header(0, 1, 'file1', len(data), compression=codec) + payload
+        
+        header = UnifiedHeaders.parse_header(segment)
+        assert header['compression'] == codec
+        assert compression.decompress(segment[header['header_size']:], header['compression']) == data
+        
+        legacy = json.dumps({'version': 1, 'segment_index': 0, 'total_segments': 1,
+                             'file_id': 'file1', 'file_size': len(data), 'metadata': {}}).encode()
+        header = UnifiedHeaders.parse_header(struct.pack('<4sHI', b'USEG', 1, len(legacy)) + legacy + data)
+        assert header['version'] == 1 and header['compression'] == 'none'
+        assert compression.decompress(zlib.compress(data)) == data
+    
+    def test_file_type_policy(self):
+        """Text extensions always get zstd, disk images lz4, overrides win"""
+        compression = UnifiedCompression()
+        # Moderately compressible: entropy between FAST_ENTROPY and SKIP_ENTROPY
+        data = bytes(b % 96 for b in os.urandom(SEGMENT))
+        
+        assert compression.select_codec(data) == 'lz4'
+        assert compression.select_codec(data, 'server.log') == 'zstd'
+        assert compression.select_codec(b'\0' * SEGMENT, 'disk.iso') == 'lz4'
+        assert UnifiedCompression(policy={'.log': 'store'}).select_codec(data, 'server.log') == 'none'
+    
+    @pytest.mark.skipif(not HAS_ZSTD, reason="zstandard not installed")
+    def test_level_follows_target_throughput(self):
+        """The zstd level drops below the target and rises far above it"""
+        text = (b'GET /index.html HTTP/1.1 200 ' * 40000)[:SEGMENT]
+        
+        slow = UnifiedCompression(zstd_level=9, target_mbps=1e9)
+        for _ in range(3):
+            assert slow.decompress(*slow.compress_adaptive(text)) == text
+        assert slow.zstd_level == 3
+        
+        fast = UnifiedCompression(zstd_level=1, target_mbps=0.001)
+        for _ in range(3):
+            fast.compress_adaptive(text)
+        assert fast.zstd_level == 5
+        assert UnifiedCompression(target_mbps=None).compress_adaptive(text)[1] == 'zstd'
+
+class TextSegments(UnifiedUploadSystem):
+    """Upload system reading compressible segment data"""
+    
+    def _get_segment_data(self, segment):
+        return f"segment {segment['segment_index']} of {segment['file_path']}\n".encode() * 20000
+
+class ArticleStore:
+    """Keeps posted articles and serves them base64-encoded"""
+    
+    def __init__(self):
+        self.articles = {}
+    
+    def post_data(self, subject, data, newsgroup, message_id=None):
+        self.articles[message_id] = data
+        return True, message_id
+    
+    def retrieve_article(self, message_id):
+        return True, base64.b64encode(self.articles[message_id])
+
+class TestSegmentPath:
+    """Uploaded segments carry the codec header and download decompressed"""
+    
+    def test_upload_to_download(self, tmp_path):
+        """Each segment is posted compressed behind a v2 header and restored"""
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'segments.db'))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute("INSERT INTO files VALUES (%s, %s, %s)", (1, 'folder1', 'access.log'))
+        for index in range(3):
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                       "VALUES (%s, %s, %s, %s)", (1, index, f"hash-{index}", 1000))
+        
+        store = ArticleStore()
+        uploader = TextSegments(store, db)
+        assert uploader.upload_folder('folder1', pack_small_files=False)['segments_uploaded'] == 3
+        
+        downloader = UnifiedDownloadSystem(store, db)
+        for row in db.fetchall("SELECT * FROM segments ORDER BY segment_index"):
+            article = store.articles[row['message_id']]
+            header = UnifiedHeaders.parse_header(article)
+            original = uploader._get_segment_data({**row, 'file_path': 'access.log'})
+            
+            assert header['compression'] == ('zstd' if HAS_ZSTD else 'zlib')
+            assert (header['segment_index'], header['total_segments']) == (row['segment_index'], 3)
+            assert len(article) < len(original) // 50
+            assert downloader._retrieve_segment(dict(row)) == original
+
+def _small_files(count):
+    files = []
+    for i in range(count):
+        body = json.dumps({
+            'id': i, 'type': 'config', 'name': f'service-{i % 97}',
+            'enabled': i % 3 == 0, 'replicas': i % 5, 'region': ['eu-west', 'us-east'][i % 2],
+            'labels': {'team': f'team-{i % 13}', 'tier': 'backend', 'owner': f'user{i * 7919 % 1000}'},
+            'endpoints': [f'https://api{j}.example.org/v{i % 4}/items/{i * j}' for j in range(3)]
+        }, indent=2).encode()
+        files.append((f'config/{i:05d}.json', body))
+    return files
+
+class TestDictionaryPacking:
+    """Small files compressed against a share dictionary"""
+    
+    @pytest.mark.skipif(not HAS_ZSTD, reason="zstandard not installed")
+    def test_dictionary_reduces_packs(self):
+        """Fewer, fuller packs that unpack only with the share dictionary"""
+        files = _small_files(20000)
+        plain = UnifiedPacking().pack_files(files)
+        
+        packer = UnifiedPacking()
+        dictionary = packer.train_dictionary(files)
+        packed = packer.pack_files(files)
+        
+        assert dictionary and len(dictionary) <= UnifiedCompression.DICTIONARY_SIZE
+        assert len(packed) * 3 <= len(plain)
+        print(f"\n✅ {len(files)} files: {len(plain)} packs -> {len(packed)} packs "
+              f"(+{len(dictionary)} byte dictionary)")
+        
+        reader = UnifiedPacking()
+        with pytest.raises(ValueError):
+            reader.unpack_segment(packed[1].data)
+        unpacked = [member for pack in packed
+                    for member in reader.unpack_segment(pack.data, dictionary)]
+        assert sorted(unpacked) == files
+    
+    def test_core_index_carries_dictionary(self, tmp_path):
+        """The dictionary is published once, in the share's core index"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'dict.db')))
+        UnifiedSchema(db).create_all_tables()
+        db.execute("INSERT INTO folders (folder_id, path, name, file_count, total_size) "
+                   "VALUES ('folder1', '/data', 'data', 0, 0)")
+        db.execute("INSERT INTO shares (share_id, folder_id, owner_id, share_type, access_type, "
+                   "access_level, metadata) VALUES ('share1', 'folder1', 'owner1', 'full', "
+                   "'public', 'public', '{}')")
+        
+        workflow = UsenetWorkflow(db)
+        workflow.store_compression_dictionary('folder1', b'\x37\xa4\x30\xec dictionary')
+        index = CoreIndexReader(workflow.create_core_index('share1', 'folder1'))
+        
+        assert UsenetWorkflow.compression_dictionary(index) == b'\x37\xa4\x30\xec dictionary'
+        assert index['compression']['dictionary_id'] == UnifiedCompression.dictionary_id(
+            b'\x37\xa4\x30\xec dictionary')
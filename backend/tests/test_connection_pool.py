@@ -0,0 +1,126 @@
+"""
+UsenetSync Connection Pool Tests
+Checkout cost and idle handling against a local NNTP server
+"""
+import time
+
+from unified.networking.connection_pool import UnifiedConnectionPool
+from unified.networking.yenc import UnifiedYenc
+from tests.fixtures.fake_nntp import FakeNNTPServer
+
+ARTICLES = 200
+RTT = 0.003
+
+class TestUnifiedConnectionPool:
+    """Idle-time based validation and the background reaper"""
+    
+    def _pool(self, server, **kwargs):
+        return UnifiedConnectionPool(
+            [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 4}],
+            **kwargs
+        )
+    
+    def _fetch_all(self, pool, message_ids):
+        start = time.perf_counter()
+        for message_id in message_ids:
+            assert pool.retrieve_article(message_id)
+        return (time.perf_counter() - start) / len(message_ids)
+    
+    def test_checkout_skips_round_trip(self):
+        """Recently used connections are handed out without a DATE"""
+        with FakeNNTPServer(latency=RTT) as server:
+            message_ids = [f"<bench{i}@test>" for i in range(ARTICLES)]
+            for message_id in message_ids:
+                server.articles[message_id] = b'Subject: x\r\n\r\nbody\r\n'
+            
+            # validate_after_idle=0 reproduces validating every checkout
+            old_pool = self._pool(server, validate_after_idle=0)
+            old_per_article = self._fetch_all(old_pool, message_ids)
+            old_pool.close()
+            old_dates = server.count('DATE')
+            
+            new_pool = self._pool(server)
+            new_per_article = self._fetch_all(new_pool, message_ids)
+            new_pool.close()
+            
+            assert old_dates >= ARTICLES - 1
+            assert server.count('DATE') == old_dates
+            assert old_per_article - new_per_article >= RTT * 0.8
+            print(f"\n✅ Per article: {old_per_article * 1000:.2f} ms -> "
+                  f"{new_per_article * 1000:.2f} ms (RTT {RTT * 1000:.1f} ms)")
+    
+    def test_idle_connection_validated(self):
+        """A connection idle past the threshold is checked before reuse"""
+        with FakeNNTPServer() as server:
+            server.articles['<a@test>'] = b'Subject: x\r\n\r\nbody\r\n'
+            pool = self._pool(server, validate_after_idle=0.05)
+            
+            assert pool.retrieve_article('<a@test>')
+            time.sleep(0.1)
+            assert pool.retrieve_article('<a@test>')
+            pool.close()
+            
+            assert server.count('DATE') == 1
+            assert pool.stats[f'127.0.0.1:{server.port}']['connections_validated'] == 1
+    
+    def test_reaper_keepalive_and_close(self):
+        """The reaper pings idle connections and closes expired ones"""
+        with FakeNNTPServer() as server:
+            server.articles['<a@test>'] = b'Subject: x\r\n\r\nbody\r\n'
+            server_id = f'127.0.0.1:{server.port}'
+            pool = self._pool(server, keepalive_interval=0.05, max_idle=0.3, reap_interval=0)
+            
+            assert pool.retrieve_article('<a@test>')
+            time.sleep(0.1)
+            pool.reap_idle()
+            assert server.count('DATE') == 1
+            assert len(pool.pools[server_id]) == 1
+            
+            time.sleep(0.35)
+            pool.reap_idle()
+            assert len(pool.pools[server_id]) == 0
+            assert pool.stats[server_id]['connections_reaped'] == 1
+            pool.close()
+    
+    def test_reaper_reads_idle_time_once(self):
+        """A connection crossing the threshold mid-reap is kept exactly once"""
+        with FakeNNTPServer() as server:
+            server.articles['<a@test>'] = b'Subject: x\r\n\r\nbody\r\n'
+            server_id = f'127.0.0.1:{server.port}'
+            pool = self._pool(server, keepalive_interval=0.05, max_idle=1, reap_interval=0)
+            
+            assert pool.retrieve_article('<a@test>')
+            conn = pool.pools[server_id][0]
+            readings = iter([0.04, 0.06, 0.08])
+            conn.idle_seconds = lambda: next(readings)
+            pool.reap_idle()
+            
+            assert list(pool.pools[server_id]) == [conn]
+            assert server.count('DATE') == 0
+            pool.close()
+
+# Every byte value, CR/LF pairs, lone dots and NUL at line starts
+BINARY_SEGMENT = bytes(range(256)) + b'\r\n.\r\n\x00.\n'
+
+class TestBinaryPosting:
+    """Posts through the pool reach the server byte for byte"""
+    
+    def test_binary_segment_round_trip(self):
+        """A binary segment posted and fetched back is unchanged"""
+        assert len(BINARY_SEGMENT) == 264
+        with FakeNNTPServer() as server:
+            pool = UnifiedConnectionPool(
+                [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 2}]
+            )
+            success, message_id = pool.post_data('segment 1', BINARY_SEGMENT,
+                                                 'alt.binaries.test', '<bin@test>')
+            assert success and message_id == '<bin@test>'
+            
+            stored = server.articles['<bin@test>'].split(b'\r\n\r\n', 1)[1]
+            assert b'\x00' not in stored
+            assert UnifiedYenc.unwrap_data(stored) == BINARY_SEGMENT
+            
+            body = pool.retrieve_body('<bin@test>')
+            pool.close()
+        
+        assert UnifiedYenc.unwrap_data(body) == BINARY_SEGMENT
@@ -0,0 +1,201 @@
+"""
+UsenetSync Core Index Tests
+Binary core index built from a streaming query and read lazily
+"""
+import base64
+import json
+import time
+import tracemalloc
+import pytest
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.indexing.binary_index import UnifiedBinaryIndex, CoreIndexReader, PagedCoreIndex
+from unified.security.encryption import UnifiedEncryption
+from unified.usenet_workflow import UsenetWorkflow
+
+LARGE_FILES = 200000
+
+def _rows(count):
+    for i in range(count):
+        for segment in range(2):
+            yield {
+                'file_id': f'file-{i}', 'path': f'd{i // 1000:04d}/f{i:07d}.bin',
+                'size': 1500, 'hash': f'{i:064x}', 'segment_index': segment,
+                'segment_size': 750, 'segment_hash': f'{segment:064x}',
+                'message_id': f'<{i}.{segment}@ngPost.com>'
+            }
+
+class MemoryNNTP:
+    """Posts articles into a dict and counts fetches"""
+    
+    def __init__(self):
+        self.articles = {}
+        self.fetched = []
+    
+    def post_article(self, subject, body, newsgroups):
+        message_id = f"<{len(self.articles)}@ngPost.com>"
+        self.articles[message_id] = body
+        return message_id
+    
+    def get_article(self, message_id):
+        self.fetched.append(message_id)
+        return self.articles.get(message_id)
+
+def _share_database(path, files):
+    db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(path)))
+    UnifiedSchema(db).create_all_tables()
+    db.execute("INSERT INTO folders (folder_id, path, name, file_count, total_size) "
+               "VALUES ('folder1', '/data/share', 'share', ?, 0)", (len(files),))
+    db.execute("INSERT INTO shares (share_id, folder_id, owner_id, share_type, access_type, "
+               "access_level, encryption_key, metadata) "
+               "VALUES ('share1', 'folder1', 'owner1', 'full', 'public', 'public', 'k3y', '{}')")
+    for number, path in enumerate(files):
+        file_id = f'f{number}'
+        db.execute("INSERT INTO files (file_id, folder_id, path, name, size, hash) "
+                   "VALUES (?, 'folder1', ?, ?, 1000, ?)",
+                   (file_id, f'/data/share/{path}', path.rsplit('/', 1)[-1], 'ab' * 32))
+        db.execute("INSERT INTO segments (segment_id, file_id, segment_index, size, hash, message_id) "
+                   "VALUES (?, ?, 0, 1000, 'h0', ?)",
+                   (f'{file_id}-0', file_id, f'<{file_id}.0@ngPost.com>'))
+    return db
+
+class TestCoreIndex:
+    """Table-based core index"""
+    
+    def test_workflow_round_trip(self, tmp_path):
+        """One streaming query produces an index that lists files, segments and packed IDs"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'index.db')))
+        UnifiedSchema(db).create_all_tables()
+        
+        db.execute("INSERT INTO folders (folder_id, path, name, file_count, total_size) "
+                   "VALUES ('folder1', '/data/share', 'share', 3, 4200)")
+        db.execute("INSERT INTO shares (share_id, folder_id, owner_id, share_type, access_type, access_level, encryption_key) "
+                   "VALUES ('share1', 'folder1', 'owner1', 'full', 'public', 'public', 'k3y')")
+        db.execute("INSERT INTO packed_segments (packed_segment_id, total_size, file_count, message_id) "
+                   "VALUES ('pack1', 200, 1, '<pack1@ngPost.com>')")
+        
+        files = [('f1', '/data/share/b/two.bin', 2000, 2),
+                 ('f2', '/data/share/a.txt', 200, 0),
+                 ('f3', '/data/share/b/c/three.bin', 2000, 0)]
+        for file_id, path, size, segments in files:
+            db.execute("INSERT INTO files (file_id, folder_id, path, name, size, hash) "
+                       "VALUES (?, 'folder1', ?, ?, ?, ?)",
+                       (file_id, path, path.rsplit('/', 1)[1], size, 'ab' * 32))
+            for index in range(segments):
+                db.execute("INSERT INTO segments (segment_id, file_id, segment_index, size, hash, message_id) "
+                           "VALUES (?, ?, ?, 1000, ?, ?)",
+                           (f'{file_id}-{index}', file_id, index, f'h{index}', f'<{file_id}.{index}@ngPost.com>'))
+        db.execute("INSERT INTO segments (segment_id, file_id, segment_index, size, hash, packed_segment_id) "
+                   "VALUES ('f2-0', 'f2', 0, 200, 'h0', 'pack1')")
+        
+        workflow = UsenetWorkflow(db)
+        data = workflow.create_core_index('share1', 'folder1')
+        index = CoreIndexReader(data)
+        
+        assert index['share']['access_level'] == 'public'
+        assert index['encryption']['key'] == 'k3y'
+        assert [f['path'] for f in index['files']] == ['a.txt', 'b/c/three.bin', 'b/two.bin']
+        
+        two = index.find('b/two.bin')
+        assert two['hash'] == 'ab' * 32
+        assert [s['message_id'] for s in index.segments(two['index'])] == [
+            '<f1.0@ngPost.com>', '<f1.1@ngPost.com>'
+        ]
+        assert index.find('a.txt') and index.segments(index.find('a.txt')['index'])[0]['message_id'] == '<pack1@ngPost.com>'
+        assert index.find('b/c/three.bin')['segment_count'] == 0
+        assert index.find('missing.bin') is None
+        assert [f['name'] for f in index.iter_prefix('b')] == ['three.bin', 'two.bin']
+        
+        # Posted form decodes back to a lazy reader
+        encrypted = workflow.encrypt_core_index(data, 'share1')
+        assert CoreIndexReader.is_core_index(base64.b64decode(encrypted))
+    
+    def test_open_large_index_is_lazy(self, tmp_path):
+        """Opening and looking up one file does not parse the tables"""
+        path = tmp_path / 'large.idx'
+        with open(path, 'wb') as f:
+            counts = UnifiedBinaryIndex().write_core_index({'version': '2.0'}, _rows(LARGE_FILES), f)
+        assert counts == {'files': LARGE_FILES, 'directories': LARGE_FILES // 1000,
+                          'segments': 2 * LARGE_FILES}
+        
+        tracemalloc.start()
+        start = time.perf_counter()
+        with CoreIndexReader.open(path) as index:
+            target = LARGE_FILES * 3 // 4
+            entry = index.find(f'd{target // 1000:04d}/f{target:07d}.bin')
+            segments = index.segments(entry['index'])
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            
+            assert entry['file_id'] == f'file-{target}'
+            assert entry['hash'] == f'{target:064x}'
+            assert [s['message_id'] for s in segments] == [f'<{target}.0@ngPost.com>',
+                                                           f'<{target}.1@ngPost.com>']
+        
+        assert elapsed < 0.05
+        assert peak < 256 * 1024
+        print(f"\n✅ {LARGE_FILES} files: open + find in {elapsed * 1000:.2f} ms, "
+              f"peak {peak / 1024:.0f} KiB")
+    
+    def test_paged_index_fetches_only_needed_pages(self, tmp_path):
+        """Large shares publish per-subtree pages that are fetched on demand"""
+        files = [f'{top}/{sub}/file{n}.bin' for top in ('alpha', 'beta', 'gamma')
+                 for sub in ('x', 'y') for n in range(3)]
+        db = _share_database(tmp_path / 'paged.db', files)
+        nntp = MemoryNNTP()
+        workflow = UsenetWorkflow(db, nntp, UnifiedEncryption(), page_files=5)
+        
+        root_id = workflow.publish_core_index('share1', 'folder1')
+        index = UsenetWorkflow(db, nntp).fetch_core_index_from_usenet('share1')
+        
+        assert isinstance(index, PagedCoreIndex)
+        assert len(index.entries) == 3
+        assert [entry['prefix'] for entry in index.entries] == ['alpha', 'beta', 'gamma']
+        assert nntp.fetched == [root_id]
+        
+        # The root lists no page keys; pages are encrypted under derived keys
+        assert all('key' not in entry for entry in index.entries)
+        assert b'beta' not in base64.b64decode(nntp.articles[index.entries[1]['message_id']])
+        
+        found = index.find('beta/y/file2.bin')
+        assert found['segments'][0]['message_id'] == '<f11.0@ngPost.com>'
+        assert nntp.fetched == [root_id, index.entries[1]['message_id']]
+        
+        assert [f['name'] for f in index.iter_prefix('gamma/x')] == ['file0.bin', 'file1.bin', 'file2.bin']
+        assert index.pages_loaded == 2
+        assert sorted(f['path'] for f in index['files']) == sorted(files)
+    
+    def test_index_page_bound_to_position(self, tmp_path):
+        """A page posted under another page number fails authentication"""
+        db = _share_database(tmp_path / 'swap.db', [f'd{n}/f.bin' for n in range(4)])
+        nntp = MemoryNNTP()
+        workflow = UsenetWorkflow(db, nntp, UnifiedEncryption(), page_files=1)
+        workflow.publish_paged_core_index('share1', 'folder1')
+        index = workflow.fetch_core_index_from_usenet('share1')
+        
+        first, second = index.entries[0], index.entries[1]
+        swapped = dict(second, message_id=first['message_id'])
+        with pytest.raises(Exception):
+            workflow._fetch_index_page('share1', swapped, b'k3y')
+    
+    def test_index_pages_need_share_key(self, tmp_path):
+        """Holding the root of a protected share does not open its pages"""
+        db = _share_database(tmp_path / 'protected.db', [f'd{n}/f.bin' for n in range(4)])
+        db.execute("UPDATE shares SET access_level = 'protected' WHERE share_id = 'share1'")
+        nntp = MemoryNNTP()
+        workflow = UsenetWorkflow(db, nntp, UnifiedEncryption(), page_files=2)
+        root_id = workflow.publish_paged_core_index('share1', 'folder1')['message_id']
+        
+        root = json.loads(base64.b64decode(nntp.articles[root_id]))
+        assert 'key' not in root['encryption']
+        assert all(set(page) >= {'cipher', 'key_derivation'} and 'key' not in page
+                   for page in root['pages'])
+        
+        wrong = workflow.fetch_core_index_from_usenet('share1', share_key=b'not the key')
+        with pytest.raises(Exception):
+            wrong.find('d0/f.bin')
+        
+        index = workflow.fetch_core_index_from_usenet('share1', share_key=b'k3y')
+        assert index.find('d3/f.bin')['segments'][0]['message_id'] == '<f3.0@ngPost.com>'
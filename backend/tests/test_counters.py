@@ -0,0 +1,106 @@
+"""
+UsenetSync Counter Tests
+Trigger-maintained row, state and window counts with drift repair, and
+live counts where there are no triggers
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.core.counters import UnifiedCounters
+
+def _database(tmp_path):
+    db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'counters.db')))
+    UnifiedSchema(db).create_all_tables()
+    counters = UnifiedCounters(db)
+    counters.install()
+    return db, counters
+
+def _queue(db, queue_id, state='queued', started_at=None, completed_at=None):
+    db.execute("INSERT INTO upload_queue (queue_id, entity_id, entity_type, state, started_at, completed_at) "
+               "VALUES (?, 'e1', 'file', ?, ?, ?)", (queue_id, state, started_at, completed_at))
+
+class TestCounters:
+    """Counters follow inserts, updates and deletes without scanning"""
+    
+    def test_states_follow_transitions(self, tmp_path):
+        """Per-state counts move with every state change"""
+        db, counters = _database(tmp_path)
+        for i in range(10):
+            _queue(db, f'q{i}')
+        db.execute("UPDATE upload_queue SET state = 'uploading' WHERE queue_id IN ('q0', 'q1', 'q2')")
+        db.execute("UPDATE upload_queue SET state = 'failed' WHERE queue_id = 'q0'")
+        db.execute("DELETE FROM upload_queue WHERE queue_id = 'q9'")
+        
+        assert counters.table_count('upload_queue') == 9
+        assert counters.value_counts('upload_queue') == {'queued': 6, 'uploading': 2, 'failed': 1}
+        assert counters.repair() == {}
+    
+    def test_windows_count_recent_events(self, tmp_path):
+        """Rate windows match a direct count of timestamps"""
+        db, counters = _database(tmp_path)
+        now = datetime.now().replace(microsecond=0)
+        for i in range(30):
+            _queue(db, f'q{i}', 'uploading', now - timedelta(minutes=4 * i))
+        db.execute("UPDATE upload_queue SET state = 'completed', completed_at = ? "
+                   "WHERE queue_id IN ('q0', 'q1')", (now,))
+        
+        hour = counters.window_count('upload_queue.started', now - timedelta(hours=1))
+        assert abs(hour - 15) <= 1
+        assert counters.window_count('upload_queue.finished', now - timedelta(hours=1), group='completed') == 2
+        assert counters.window_count('upload_queue.finished', now - timedelta(hours=1), group='failed') == 0
+    
+    def test_repair_fixes_drift(self, tmp_path):
+        """Counters damaged behind the triggers' back are recounted"""
+        db, counters = _database(tmp_path)
+        for i in range(5):
+            _queue(db, f'q{i}', started_at=datetime.now())
+        db.execute("UPDATE stat_counters SET value = 99 WHERE name = 'upload_queue'")
+        db.execute("DELETE FROM stat_windows")
+        
+        corrections = counters.repair()
+        assert corrections['upload_queue'] == -94
+        assert counters.table_count('upload_queue') == 5
+        assert round(counters.window_count('upload_queue.started', datetime.now() - timedelta(minutes=1))) == 5
+        assert counters.get_statistics()['corrections'] == len(corrections)
+    
+    def test_live_counts_match_triggers(self, tmp_path):
+        """Without triggers every read queries the base tables"""
+        db, counters = _database(tmp_path)
+        live = UnifiedCounters(db, live=True)
+        now = datetime.now().replace(microsecond=0)
+        for i in range(6):
+            _queue(db, f'q{i}', 'uploading', now - timedelta(minutes=i))
+        db.execute("UPDATE upload_queue SET state = 'completed', completed_at = ? "
+                   "WHERE queue_id IN ('q0', 'q1')", (now,))
+        db.execute("DELETE FROM stat_counters")
+        db.execute("DELETE FROM stat_windows")
+        
+        assert live.table_counts(['upload_queue', 'files']) == {'upload_queue': 6, 'files': 0}
+        assert live.value_counts('upload_queue') == {'uploading': 4, 'completed': 2}
+        assert live.get('upload_queue.state=completed') == 2
+        assert live.window_count('upload_queue.started', now - timedelta(seconds=150)) == 3
+        assert live.window_count('upload_queue.finished', now - timedelta(hours=1), group='completed') == 2
+        assert counters.table_count('upload_queue') == 0
+
+class TestStatusEndpoints:
+    """Status endpoints answer from counters"""
+    
+    def test_status_reads_counters(self, tmp_path):
+        """Queue and table statistics reflect the maintained counts"""
+        pytest.importorskip('httpx')
+        from fastapi.testclient import TestClient
+        from unified.api.server import UnifiedAPIServer
+        
+        db, counters = _database(tmp_path)
+        for i in range(4):
+            _queue(db, f'q{i}', 'uploading' if i else 'failed')
+        
+        server = UnifiedAPIServer(SimpleNamespace(db=db, counters=counters))
+        status = TestClient(server.app).get('/api/v1/status').json()
+        
+        assert status['queues']['upload'] == {'total': 4, 'pending': 0, 'active': 3,
+                                              'completed': 0, 'failed': 1}
+        assert status['database']['statistics']['folders'] == 0
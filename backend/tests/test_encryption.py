@@ -0,0 +1,117 @@
+"""
+UsenetSync Stream Encryption Tests
+Chunked AES-GCM streams: round trip, tamper detection and bounded memory
+"""
+import os
+import tracemalloc
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from unified.security.encryption import UnifiedEncryption
+
+CHUNK = 64 * 1024
+
+def _encrypt(encryption, key, data, chunk_size=CHUNK):
+    pieces = [data[i:i + 10000] for i in range(0, len(data), 10000)]
+    return list(encryption.encrypt_stream(pieces, key, b'segment-1', chunk_size))
+
+def _decrypt(encryption, key, records):
+    return b''.join(encryption.decrypt_stream(iter(records), key, b'segment-1'))
+
+class TestChunkedStream:
+    """encrypt_stream / decrypt_stream chunked format"""
+    
+    @pytest.mark.parametrize('workers', [1, 4])
+    @pytest.mark.parametrize('size', [0, 1, CHUNK, 5 * CHUNK + 17])
+    def test_round_trip(self, workers, size):
+        """Ciphertext split on any boundary decrypts to the input"""
+        encryption = UnifiedEncryption(workers=workers)
+        key = encryption.generate_key()
+        data = os.urandom(size)
+        records = _encrypt(encryption, key, data)
+        
+        assert len(records) == 1 + max(1, -(-size // CHUNK))
+        # Re-split the ciphertext on arbitrary boundaries
+        blob = b''.join(records)
+        assert _decrypt(encryption, key, [blob[i:i + 999] for i in range(0, len(blob), 999)]) == data
+        encryption.shutdown()
+    
+    def test_truncation_and_reordering_rejected(self):
+        """Dropped, swapped or appended chunks and a changed header fail"""
+        encryption = UnifiedEncryption()
+        key = encryption.generate_key()
+        header, *chunks = _encrypt(encryption, key, os.urandom(4 * CHUNK + 100))
+        
+        with pytest.raises(InvalidTag):
+            _decrypt(encryption, key, [header] + chunks[:-1])
+        with pytest.raises(InvalidTag):
+            _decrypt(encryption, key, [header, chunks[1], chunks[0]] + chunks[2:])
+        with pytest.raises(InvalidTag):
+            _decrypt(encryption, key, [header] + chunks + chunks[-1:])
+        with pytest.raises(InvalidTag):
+            _decrypt(encryption, key, [header[:-1] + b'\0'] + chunks)
+        with pytest.raises(InvalidTag):
+            b''.join(encryption.decrypt_stream(iter([header] + chunks), key, b'segment-2'))
+    
+    def test_memory_bounded_by_chunks(self):
+        """A 64 MiB stream never holds more than a few chunks"""
+        encryption = UnifiedEncryption(workers=2)
+        key = encryption.generate_key()
+        block = os.urandom(CHUNK)
+        
+        tracemalloc.start()
+        source = (block for _ in range(1024))
+        plaintext = encryption.decrypt_stream(encryption.encrypt_stream(source, key, chunk_size=CHUNK), key)
+        total = sum(len(chunk) for chunk in plaintext)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        encryption.shutdown()
+        
+        assert total == 1024 * CHUNK
+        assert peak < 32 * CHUNK
+
+class TestFileEncryption:
+    """encrypt_file / decrypt_file use the chunked format"""
+    
+    def test_file_round_trip(self, tmp_path):
+        """A multi-chunk file decrypts with progress reported to the end"""
+        encryption = UnifiedEncryption(workers=4)
+        key = encryption.generate_key()
+        data = os.urandom(3 * CHUNK + 5)
+        (tmp_path / 'plain').write_bytes(data)
+        progress = []
+        
+        header = encryption.encrypt_file(str(tmp_path / 'plain'), str(tmp_path / 'enc'), key,
+                                         chunk_size=CHUNK)
+        encryption.decrypt_file(str(tmp_path / 'enc'), str(tmp_path / 'out'), key,
+                                lambda done, total: progress.append((done, total)))
+        encryption.shutdown()
+        
+        assert (tmp_path / 'enc').read_bytes().startswith(header)
+        assert (tmp_path / 'enc').stat().st_size == len(header) + len(data) + 4 * 16
+        assert (tmp_path / 'out').read_bytes() == data
+        assert progress[-1][0] == progress[-1][1] == (tmp_path / 'enc').stat().st_size
+    
+    def test_tampered_file_writes_nothing(self, tmp_path):
+        """No plaintext reaches the output path unless the file authenticates"""
+        encryption = UnifiedEncryption()
+        key = encryption.generate_key()
+        (tmp_path / 'plain').write_bytes(os.urandom(2 * CHUNK))
+        encryption.encrypt_file(str(tmp_path / 'plain'), str(tmp_path / 'enc'), key, chunk_size=CHUNK)
+        encrypted = (tmp_path / 'enc').read_bytes()
+        (tmp_path / 'enc').write_bytes(encrypted[:-1])
+        
+        with pytest.raises(InvalidTag):
+            encryption.decrypt_file(str(tmp_path / 'enc'), str(tmp_path / 'out'), key)
+        assert sorted(os.listdir(tmp_path)) == ['enc', 'plain']
+    
+    def test_single_tag_files_still_decrypt(self, tmp_path):
+        """Files from the older nonce + ciphertext + tag layout are accepted"""
+        encryption = UnifiedEncryption()
+        key = encryption.generate_key()
+        data = os.urandom(CHUNK + 3)
+        ciphertext, nonce, tag = encryption.encrypt(data, key)
+        (tmp_path / 'enc').write_bytes(nonce + ciphertext + tag)
+        
+        encryption.decrypt_file(str(tmp_path / 'enc'), str(tmp_path / 'out'), key)
+        assert (tmp_path / 'out').read_bytes() == data
@@ -0,0 +1,140 @@
+"""
+UsenetSync Merkle Verification Tests
+Binary Merkle trees, per-segment proofs and verification during download
+"""
+import base64
+import hashlib
+import json
+import math
+import os
+import pytest
+
+from unified.segmentation.hashing import MerkleTree, UnifiedHashing
+from unified.download.verifier import SegmentVerifier, UnifiedVerifier
+from unified.unified_system import UnifiedDatabaseManager, UnifiedUploadSystem
+from unified.download_system import UnifiedDownloadSystem
+
+class TestMerkleTree:
+    """Trees over raw digests with inclusion proofs"""
+    
+    @pytest.mark.parametrize('count', [1, 2, 3, 7, 8, 33])
+    def test_every_proof_verifies(self, count):
+        """Each segment proves against the root alone; others are rejected"""
+        segments = [os.urandom(100) for _ in range(count)]
+        tree = MerkleTree.from_segments(segments)
+        
+        for index, data in enumerate(segments):
+            proof = tree.proof(index)
+            leaf = hashlib.sha256(data).digest()
+            assert len(proof) <= math.ceil(math.log2(count))
+            assert MerkleTree.verify_proof(leaf, index, count, proof, tree.root)
+            assert not MerkleTree.verify_proof(hashlib.sha256(data + b'x').digest(),
+                                               index, count, proof, tree.root)
+            if count > 1:
+                assert not MerkleTree.verify_proof(leaf, (index + 1) % count, count, proof, tree.root)
+    
+    def test_stored_tree_round_trip(self):
+        """The stored form reloads, and a tampered copy is refused"""
+        tree = MerkleTree.from_segments([os.urandom(64) for _ in range(20)])
+        stored = tree.to_bytes()
+        
+        assert MerkleTree.from_bytes(stored).proof(13) == tree.proof(13)
+        tampered = bytearray(stored)
+        tampered[-1] ^= 1
+        with pytest.raises(ValueError):
+            MerkleTree.from_bytes(bytes(tampered))
+    
+    def test_hex_roots(self):
+        """Binary roots are published as hex; legacy roots still verify"""
+        segments = [{'segment_index': i, 'data': os.urandom(50)} for i in range(5)]
+        hashes = [hashlib.sha256(s['data']).hexdigest() for s in segments]
+        verifier = UnifiedVerifier()
+        
+        assert verifier.verify_merkle_tree(segments, UnifiedHashing.calculate_binary_merkle_root(hashes))
+        assert verifier.verify_merkle_tree(segments, UnifiedHashing.calculate_merkle_root(hashes))
+        assert not verifier.verify_merkle_tree(segments, '00' * 32)
+
+class TestSegmentVerifier:
+    """Segments checked one at a time as they arrive"""
+    
+    def test_corrupt_segment_detected_on_arrival(self):
+        """The bad segment fails immediately; its replacement completes the file"""
+        segments = [os.urandom(1000) for _ in range(6)]
+        hashes = [hashlib.sha256(s).hexdigest() for s in segments]
+        root = UnifiedHashing.calculate_binary_merkle_root(hashes)
+        verifier = SegmentVerifier(hashes, root, file_hash=hashlib.sha256(b''.join(segments)).hexdigest())
+        
+        assert verifier.verify_segment(0, segments[0])
+        assert not verifier.verify_segment(1, segments[1][:-1] + b'\0')
+        for index in range(1, 6):
+            assert verifier.verify_segment(index, segments[index])
+        assert verifier.failures == 1 and verifier.finish()
+    
+    def test_proofs_without_segment_hashes(self):
+        """Only the root is trusted; each segment carries its proof"""
+        segments = [os.urandom(500) for _ in range(9)]
+        tree = MerkleTree.from_segments(segments)
+        verifier = SegmentVerifier(root_hash=tree.root.hex(), segment_count=9)
+        
+        for index in reversed(range(9)):
+            assert verifier.verify_segment(index, segments[index], tree.proof(index))
+        assert not verifier.verify_segment(4, segments[3], tree.proof(4))
+        assert verifier.finish()
+    
+    def test_hashes_must_match_root(self):
+        """Index hashes that do not add up to the root are refused"""
+        hashes = [hashlib.sha256(bytes([i])).hexdigest() for i in range(4)]
+        with pytest.raises(ValueError):
+            SegmentVerifier(hashes, UnifiedHashing.calculate_binary_merkle_root(hashes[::-1]))
+
+class ArticleStore:
+    """Serves base64 articles and records which were fetched"""
+    
+    def __init__(self):
+        self.articles = {}
+        self.fetched = []
+    
+    def retrieve_article(self, message_id):
+        self.fetched.append(message_id)
+        if message_id not in self.articles:
+            return False, None
+        return True, base64.b64encode(self.articles[message_id])
+
+class TestVerifiedDownload:
+    """Corrupt articles are re-fetched while the download runs"""
+    
+    def test_corrupt_article_refetched_from_redundancy(self, tmp_path):
+        """The damaged segment is replaced by its redundancy copy"""
+        segments = [os.urandom(4096) for _ in range(5)]
+        hashes = [hashlib.sha256(s).hexdigest() for s in segments]
+        
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'download.db'))
+        db.connect()
+        db.execute("CREATE TABLE shares (share_id TEXT, folder_id TEXT, share_type TEXT, "
+                   "access_string TEXT, encrypted_index TEXT, active BOOLEAN)")
+        db.execute("CREATE TABLE segments (segment_id INTEGER PRIMARY KEY, file_id INTEGER, "
+                   "segment_index INTEGER, segment_hash TEXT, message_id TEXT, "
+                   "packed_segment_id TEXT, redundancy_level INTEGER DEFAULT 0)")
+        
+        store = ArticleStore()
+        for index, data in enumerate(segments):
+            store.articles[f'<{index}@test>'] = data
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, message_id) "
+                       "VALUES (1, %s, %s, %s)", (index, hashes[index], f'<{index}@test>'))
+        store.articles['<2@test>'] = segments[2][:100] + b'\0' + segments[2][101:]
+        store.articles['<2r@test>'] = UnifiedUploadSystem(None, None)._create_redundant_copy(segments[2], 0)
+        db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, message_id, "
+                   "redundancy_level) VALUES (1, 2, %s, '<2r@test>', 1)", (hashes[2],))
+        
+        index = {'files': [{'file_id': 1, 'file_path': 'data/blob.bin', 'file_size': 5 * 4096,
+                            'file_hash': hashlib.sha256(b''.join(segments)).hexdigest(),
+                            'merkle_root': UnifiedHashing.calculate_binary_merkle_root(hashes),
+                            'segment_count': 5}]}
+        db.execute("INSERT INTO shares VALUES ('share1', 'folder1', 'PUBLIC', 'x', %s, 1)",
+                   (json.dumps(index),))
+        
+        stats = UnifiedDownloadSystem(store, db).download_share('share1', str(tmp_path / 'out'))
+        
+        assert stats['completed_files'] == 1 and stats['segments_refetched'] == 1
+        assert store.fetched.count('<2r@test>') == 1
+        assert (tmp_path / 'out' / 'data' / 'blob.bin').read_bytes() == b''.join(segments)
@@ -0,0 +1,149 @@
+"""
+UsenetSync Metric Rollup Tests
+Raw points downsample into mergeable 1-minute, 1-hour and 1-day rollups
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.monitoring.timeseries import UnifiedTimeSeries, QuantileSketch
+from unified.monitoring_system import MonitoringSystem
+
+def _database(tmp_path):
+    db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'rollups.db')))
+    UnifiedSchema(db).create_all_tables()
+    return db
+
+class TestQuantileSketch:
+    """Percentiles stay within the relative accuracy after merging"""
+    
+    def test_percentiles_and_merge(self):
+        """Merged sketches answer like one sketch of all values"""
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3, 1) for _ in range(20000)] + [0.0] * 100
+        whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i, value in enumerate(values):
+            whole.add(value)
+            (left if i % 2 else right).add(value)
+        left.merge(QuantileSketch.from_json(right.to_json()))
+        
+        ordered = sorted(values)
+        for q in (0.5, 0.95, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            assert abs(whole.quantile(q) - exact) <= 0.011 * exact
+            assert left.quantile(q) == whole.quantile(q)
+        assert whole.quantile(0.001) == 0.0
+
+class TestTimeSeries:
+    """Rollups persist, merge across flushes and expire"""
+    
+    def test_long_range_reads_hourly_rows(self, tmp_path):
+        """A 30-day query reads hourly rollups with exact counts and extremes"""
+        db = _database(tmp_path)
+        series = UnifiedTimeSeries(db)
+        now = time.time()
+        for second in range(0, 3 * 86400, 30):
+            series.add('system.cpu_usage', second % 100, now - second)
+        series.flush()
+        
+        start = now - 30 * 86400
+        assert series.choose_resolution(start, now) == 3600
+        buckets = series.query('system.cpu_usage', start, now)
+        assert 72 <= len(buckets) <= 74
+        assert all(bucket['resolution'] == 3600 for bucket in buckets)
+        assert sum(bucket['count'] for bucket in buckets) == 3 * 86400 // 30
+        
+        summary = series.summary('system.cpu_usage', start)
+        assert summary['min'] == 0 and summary['max'] == 90
+        assert abs(summary['avg'] - 45) < 0.01 and abs(summary['p50'] - 40) <= 0.4
+    
+    def test_flushes_merge_and_retention_prunes(self, tmp_path):
+        """Points for a stored bucket are merged, old buckets pruned"""
+        db = _database(tmp_path)
+        series = UnifiedTimeSeries(db, retention={60: 3600}, raw_retention=3600)
+        bucket = int(time.time() // 86400) * 86400
+        series.add('throughput.mbps', 10, bucket + 1)
+        series.flush()
+        series.add('throughput.mbps', 30, bucket + 2)
+        assert series.query('throughput.mbps', bucket, bucket + 60, resolution=60)[0]['count'] == 2
+        series.flush()
+        
+        minute = series.query('throughput.mbps', bucket, bucket + 60, resolution=60)[0]
+        assert (minute['count'], minute['min'], minute['max'], minute['avg']) == (2, 10, 30, 20)
+        
+        series.prune(now=bucket + 7200)
+        assert series.query('throughput.mbps', bucket, bucket + 60, resolution=60) == []
+        assert series.query('throughput.mbps', bucket, bucket + 60, resolution=86400)[0]['count'] == 2
+
+class TestMonitoringSystem:
+    """Statistics fall back to rollups once raw points are gone"""
+    
+    def test_stats_beyond_raw_points(self):
+        """Counts stay right when the raw store has wrapped"""
+        monitor = MonitoringSystem(max_points=10)
+        for i in range(25):
+            monitor.record_operation('upload', 1.0 + i % 5, success=True)
+        
+        assert len(monitor.get_metric_values('operation.upload.duration', 300)) == 10
+        assert monitor.get_metric_stats('operation.upload.duration', 300)['count'] == 25
+        assert monitor.get_dashboard_data()['operation_stats']['upload']['success'] == 25
+        assert monitor.get_metric_range('operation.upload.duration',
+                                        monitor.metrics_store['operation.upload.duration'][0].timestamp
+                                        )['resolution'] == 0
+    
+    def test_legacy_system_database_keeps_rollups(self, tmp_path):
+        """Rollups written through the legacy manager's database survive a restart"""
+        from unified.unified_system import UnifiedDatabaseManager
+        
+        manager = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'legacy.db'))
+        manager.connect()
+        monitor = MonitoringSystem(db=manager.unified_database())
+        for i in range(10):
+            monitor.record_metric('operation.upload.duration', float(i))
+        monitor.stop()
+        
+        restarted = MonitoringSystem(db=manager.unified_database())
+        history = restarted.get_metric_range('operation.upload.duration',
+                                             datetime.now() - timedelta(days=30))
+        assert history['resolution'] == 3600
+        assert sum(point['count'] for point in history['points']) == 10
+
+class TestMetricEndpoints:
+    """Monitoring endpoints chart long ranges from rollups"""
+    
+    def test_values_and_stats_read_rollups(self, tmp_path):
+        """A 30-day request reads hourly buckets instead of one current value"""
+        httpx = pytest.importorskip('httpx')
+        from unified.api.server import UnifiedAPIServer
+        
+        db = _database(tmp_path)
+        monitor = MonitoringSystem(db=db)
+        now = time.time()
+        for second in range(0, 3 * 86400, 60):
+            monitor.timeseries.add('system.memory_percent', 50.0, now - 86400 - second)
+        monitor.timeseries.flush()
+        server = UnifiedAPIServer(SimpleNamespace(db=db, monitoring=monitor))
+        
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+                start = (datetime.now() - timedelta(days=30)).isoformat()
+                values = await client.get('/api/v1/monitoring/metrics/memory_usage/values',
+                                          params={'start_time': start, 'limit': 100})
+                stats = await client.get('/api/v1/monitoring/metrics/memory_usage/stats',
+                                         params={'period_hours': 720})
+                return values.json(), stats.json()
+        
+        values, stats = asyncio.run(scenario())
+        
+        assert values['metadata']['resolution_seconds'] == 3600
+        assert 72 <= len(values['values']) <= 74
+        assert all(point['value'] == 50.0 for point in values['values'])
+        assert stats['statistics']['data_points'] >= 72
+        assert stats['statistics']['average'] == 50.0
@@ -0,0 +1,77 @@
+"""
+UsenetSync Monitoring Collection Tests
+Expensive metrics are sampled less often, and collection backs off while nobody is viewing
+"""
+import time
+from datetime import datetime, timedelta
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.monitoring_system import MonitoringSystem, COLLECTION_INTERVALS
+from unified.monitoring.metrics_collector import UnifiedMetricsCollector
+
+class TestAdaptiveCollection:
+    """Metric groups follow their own, viewer-dependent schedules"""
+    
+    def test_groups_sampled_on_their_own_schedule(self):
+        """The socket scan runs once while process metrics run every second"""
+        monitor = MonitoringSystem()
+        monitor.start(prometheus_port=0)
+        time.sleep(2.2)
+        monitor.stop()
+        
+        samples = monitor.get_collection_status()['samples']
+        assert samples['process'] >= 2
+        assert samples['io'] == 1 and samples['connections'] == 1
+    
+    def test_backs_off_while_idle_and_recovers_on_view(self):
+        """Idle intervals stretch; a viewer gets a fresh sample at once"""
+        monitor = MonitoringSystem(idle_after=60, idle_factor=10)
+        monitor._last_viewed -= 120
+        monitor._collect_system_metrics()
+        
+        status = monitor.get_collection_status()
+        assert status['idle']
+        assert status['intervals']['connections'] == COLLECTION_INTERVALS['connections'] * 10
+        assert monitor._next_sample['process'] - time.monotonic() > 5
+        
+        assert monitor.get_system_status()['memory_mb'] > 0
+        assert monitor.get_collection_status() == {
+            'idle': False,
+            'intervals': COLLECTION_INTERVALS,
+            'samples': {'process': 2, 'io': 1, 'connections': 1}
+        }
+
+class TestMetricsCollector:
+    """System metrics are collected without blocking or repeating"""
+    
+    def test_collection_is_non_blocking_and_debounced(self):
+        """Back-to-back collections return the same sample immediately"""
+        collector = UnifiedMetricsCollector(min_interval=5)
+        started = time.monotonic()
+        first = collector.collect_system_metrics()
+        second = collector.collect_system_metrics()
+        
+        assert time.monotonic() - started < 0.5
+        assert second is first
+        assert len(collector.metrics_history['cpu']) == 1
+    
+    def test_rows_stored_rolled_up_and_pruned(self, tmp_path):
+        """Collected samples land in metrics and rollups; stale raw rows go"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'metrics.db')))
+        UnifiedSchema(db).create_all_tables()
+        db.insert('metrics', {'metric_name': 'host.cpu_percent', 'metric_type': 'gauge',
+                              'value': 5.0, 'timestamp': datetime.now() - timedelta(days=3)})
+        
+        collector = UnifiedMetricsCollector(db)
+        collector.collect_system_metrics()
+        collector.timeseries.flush()
+        
+        rows = db.fetch_all("SELECT metric_name, metric_type FROM metrics")
+        assert sorted(row['metric_name'] for row in rows) == [
+            'host.cpu_percent', 'host.disk_percent', 'host.memory_percent',
+            'host.network_recv_rate', 'host.network_send_rate'
+        ]
+        assert {row['metric_type'] for row in rows} == {'gauge'}
+        assert db.fetch_one("SELECT COUNT(*) AS n FROM metric_rollups")['n'] > 0
+        assert collector.get_metric_range('host.cpu_percent', datetime.now() - timedelta(hours=1))
@@ -0,0 +1,290 @@
+"""
+UsenetSync Packing Tests
+Bin-packed small files, random-access members and selective download
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.main import DBManagerWrapper
+from unified.segmentation.packing import UnifiedPacking
+from unified.unified_system import UnifiedDatabaseManager, UnifiedUploadSystem
+from unified.download_system import UnifiedDownloadSystem
+from tests.test_upload_system import SCHEMA
+
+SEGMENT = 768000
+
+def _mixed_files(count, seed=7):
+    rng = random.Random(seed)
+    sizes = [rng.randint(100, 5000) if rng.random() < 0.7 else rng.randint(50000, 300000)
+             for _ in range(count)]
+    return [(f'docs/{i:05d}.bin', os.urandom(size)) for i, size in enumerate(sizes)]
+
+class TestBinPacking:
+    """pack_files fills segments and members are addressable by offset"""
+    
+    def test_packs_filled_near_capacity(self):
+        """Best-fit decreasing needs close to the minimum number of packs"""
+        files = _mixed_files(2000)
+        packs = UnifiedPacking().pack_files(files)
+        
+        total = sum(len(data) for _, data in files)
+        assert len(packs) <= total / SEGMENT * 1.01 + 1
+        assert all(pack.total_size <= SEGMENT for pack in packs)
+        assert sorted(m for pack in packs for m in UnifiedPacking().unpack_segment(pack.data)) == files
+    
+    def test_extract_single_member(self):
+        """One member decodes from the header and its own bytes only"""
+        files = _mixed_files(300)
+        packer = UnifiedPacking()
+        pack = max(packer.pack_files(files), key=lambda p: len(p.files))
+        
+        index = packer.read_index(pack.data)
+        name = index.members[len(index) // 2]['name']
+        start, end = index.byte_range(name)
+        
+        # Blank every other member's bytes: extraction must not need them
+        sparse = bytearray(len(pack.data))
+        sparse[:index.data_start] = pack.data[:index.data_start]
+        sparse[start:end] = pack.data[start:end]
+        
+        assert packer.extract_member(bytes(sparse), name) == dict(files)[name]
+        assert packer.extract_member(pack.data, 'docs/missing.bin') is None
+    
+    def test_json_header_packs_still_unpack(self):
+        """Packs written with the JSON header decode and extract"""
+        header = json.dumps({'version': 1, 'file_count': 2, 'files': [
+            {'name': 'a.txt', 'offset': 0, 'size': 3},
+            {'name': 'b.txt', 'offset': 3, 'size': 5}
+        ]}).encode()
+        legacy = struct.pack('<I', len(header)) + header + b'abcHELLO'
+        packer = UnifiedPacking()
+        
+        assert packer.unpack_segment(legacy) == [('a.txt', b'abc'), ('b.txt', b'HELLO')]
+        assert packer.extract_member(legacy, 'b.txt') == b'HELLO'
+
+class ArticleStore:
+    """Serves base64 articles and records which were fetched"""
+    
+    def __init__(self):
+        self.articles = {}
+        self.fetched = []
+    
+    def post_data(self, subject, data, newsgroup, message_id=None):
+        self.articles[message_id] = data
+        return True, message_id
+    
+    def retrieve_article(self, message_id):
+        self.fetched.append(message_id)
+        if message_id not in self.articles:
+            return False, None
+        return True, base64.b64encode(self.articles[message_id])
+
+class TestSelectiveDownload:
+    """Downloading one file reads only the pack that carries it"""
+    
+    def test_single_file_from_packed_share(self, tmp_path):
+        """One article fetched, one member decoded and verified, one file written"""
+        files = [(f'cfg/{i:05d}.json', json.dumps({'id': i, 'pad': 'x' * (i % 400)}).encode())
+                 for i in range(5000)]
+        packs = UnifiedPacking(segment_size=64000).pack_files(files)
+        assert len(packs) >= 20
+        
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'download.db'))
+        db.connect()
+        db.execute("CREATE TABLE shares (share_id TEXT, folder_id TEXT, share_type TEXT, "
+                   "access_string TEXT, encrypted_index TEXT, active BOOLEAN)")
+        db.execute("CREATE TABLE segments (segment_id INTEGER PRIMARY KEY, file_id INTEGER, "
+                   "segment_index INTEGER, segment_hash TEXT, message_id TEXT, "
+                   "packed_segment_id TEXT, redundancy_level INTEGER DEFAULT 0)")
+        db.execute("CREATE TABLE packed_segments (packed_segment_id TEXT, message_id TEXT)")
+        
+        store = ArticleStore()
+        ids = {name: number for number, (name, _) in enumerate(files)}
+        for pack in packs:
+            message_id = f'<{pack.packed_id}@test>'
+            store.articles[message_id] = pack.data
+            db.execute("INSERT INTO packed_segments VALUES (%s, %s)", (pack.packed_id, message_id))
+            for member in pack.files:
+                digest = hashlib.sha256(dict(files)[member['name']]).hexdigest()
+                db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, packed_segment_id) "
+                           "VALUES (%s, 0, %s, %s)", (ids[member['name']], digest, pack.packed_id))
+        
+        index = {'files': [{'file_id': ids[name], 'file_path': name, 'file_size': len(data),
+                            'file_hash': hashlib.sha256(data).hexdigest(), 'segment_count': 1}
+                           for name, data in files]}
+        db.execute("INSERT INTO shares VALUES ('share1', 'folder1', 'PUBLIC', 'x', %s, 1)",
+                   (json.dumps(index),))
+        
+        target = 'cfg/03217.json'
+        downloader = UnifiedDownloadSystem(store, db)
+        stats = downloader.download_share('share1', str(tmp_path / 'out'), selected_files=[target])
+        
+        assert stats['completed_files'] == 1 and stats['articles_fetched'] == 1
+        assert len(store.fetched) == 1
+        written = [p for p in (tmp_path / 'out').rglob('*') if p.is_file()]
+        assert written == [tmp_path / 'out' / target]
+        assert written[0].read_bytes() == dict(files)[target]
+
+class StoredSegments(UnifiedUploadSystem):
+    """Upload system reading segment data from a dict"""
+    
+    def __init__(self, contents, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contents = contents
+    
+    def _get_segment_data(self, segment):
+        return self.contents[(segment['file_path'], segment['segment_index'])]
+
+class TestUploadedPacks:
+    """Packs posted by upload_folder are read by the downloader"""
+    
+    def test_upload_then_selective_download(self, tmp_path):
+        """Small files and a large file's packed tail come back byte-exact"""
+        rng = random.Random(3)
+        contents = {(f'notes/{i:03d}.txt', 0): f'note {i} '.encode() * rng.randint(10, 500)
+                    for i in range(40)}
+        for index, size in enumerate((400000, 400000, 1500)):
+            contents[('video.bin', index)] = os.urandom(size)
+        
+        paths = sorted({path for path, _ in contents})
+        file_ids = {path: number for number, path in enumerate(paths, 1)}
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'roundtrip.db'))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute("CREATE TABLE shares (share_id TEXT, folder_id TEXT, share_type TEXT, "
+                   "access_string TEXT, encrypted_index TEXT, active BOOLEAN)")
+        for path in paths:
+            db.execute("INSERT INTO files VALUES (%s, %s, %s)", (file_ids[path], 'folder1', path))
+        for (path, index), data in contents.items():
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                       "VALUES (%s, %s, %s, %s)",
+                       (file_ids[path], index, hashlib.sha256(data).hexdigest(), len(data)))
+        
+        files = {path: b''.join(data for (p, _), data in sorted(contents.items()) if p == path)
+                 for path in paths}
+        index = {'files': [{'file_id': file_ids[path], 'file_path': path, 'file_size': len(data),
+                            'file_hash': hashlib.sha256(data).hexdigest(),
+                            'segment_count': sum(1 for p, _ in contents if p == path)}
+                           for path, data in files.items()]}
+        db.execute("INSERT INTO shares VALUES ('share1', 'folder1', 'PUBLIC', 'x', %s, 1)",
+                   (json.dumps(index),))
+        
+        store = ArticleStore()
+        stats = StoredSegments(contents, store, db).upload_folder('folder1')
+        assert (stats['packed_segments'], stats['segments_uploaded']) == (1, 2)
+        
+        wanted = ['notes/007.txt', 'video.bin']
+        downloader = UnifiedDownloadSystem(store, db)
+        stats = downloader.download_share('share1', str(tmp_path / 'some'), selected_files=wanted)
+        
+        # Two video segments, and one pack carrying the note and the video's tail
+        assert stats['completed_files'] == 2 and stats['articles_fetched'] == 3
+        written = sorted(p for p in (tmp_path / 'some').rglob('*') if p.is_file())
+        assert written == [tmp_path / 'some' / path for path in wanted]
+        assert all(p.read_bytes() == files[name] for p, name in zip(written, wanted))
+        
+        stats = downloader.download_share('share1', str(tmp_path / 'all'))
+        assert stats['completed_files'] == len(files)
+        assert all((tmp_path / 'all' / path).read_bytes() == data for path, data in files.items())
+    
+    def _segments_db(self, path, sizes):
+        db = UnifiedDatabaseManager('sqlite', path=str(path))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        contents = {}
+        for number, size in enumerate(sizes, 1):
+            contents[(f'small/{number:04d}.bin', 0)] = os.urandom(size)
+            db.execute("INSERT INTO files VALUES (%s, %s, %s)",
+                       (number, 'folder1', f'small/{number:04d}.bin'))
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                       "VALUES (%s, 0, %s, %s)", (number, f'hash-{number}', size))
+        return db, contents
+    
+    def test_upload_packs_best_fit_within_target(self, tmp_path):
+        """Upload packs are filled best-fit and never exceed the target with headers"""
+        # Raw sizes add up to exactly the target; entries and names do not fit
+        half = SEGMENT // 2 - 10
+        db, contents = self._segments_db(tmp_path / 'exact.db', [half, half])
+        packs = StoredSegments(contents, None, db).packer.pack_segments('folder1')
+        assert len(packs) == 2
+        
+        rng = random.Random(5)
+        sizes = [rng.randint(1000, SEGMENT // 2 - 1) for _ in range(60)]
+        db, contents = self._segments_db(tmp_path / 'mixed.db', sizes)
+        packs = StoredSegments(contents, None, db).packer.pack_segments('folder1')
+        
+        assert all(len(pack.packed_data) <= SEGMENT for pack in packs)
+        assert len(packs) <= sum(sizes) / SEGMENT * 1.02 + 1
+        assert sum(len(pack.segments) for pack in packs) == len(sizes)
+    
+    def test_packs_compressed_against_folder_dictionary(self, tmp_path):
+        """The first packing upload trains a dictionary, stores it and uses it"""
+        contents = {(f'cfg/{i:04d}.json', 0): json.dumps(
+                        {'id': i, 'name': f'item {i}', 'enabled': i % 2 == 0,
+                         'tags': ['alpha', 'beta', 'gamma'][:i % 3 + 1]}).encode()
+                    for i in range(1000)}
+        paths = sorted(path for path, _ in contents)
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'dictionary.db'))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute("CREATE TABLE folders (folder_id TEXT, metadata TEXT)")
+        db.execute("CREATE TABLE shares (share_id TEXT, folder_id TEXT, share_type TEXT, "
+                   "access_string TEXT, encrypted_index TEXT, active BOOLEAN)")
+        db.execute("INSERT INTO folders VALUES ('folder1', NULL)")
+        for number, path in enumerate(paths, 1):
+            data = contents[(path, 0)]
+            db.execute("INSERT INTO files VALUES (%s, %s, %s)", (number, 'folder1', path))
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                       "VALUES (%s, 0, %s, %s)", (number, hashlib.sha256(data).hexdigest(), len(data)))
+        
+        store = ArticleStore()
+        assert StoredSegments(contents, store, db).upload_folder('folder1')['packed_segments'] == 1
+        
+        metadata = json.loads(db.fetchone("SELECT metadata FROM folders")['metadata'])
+        index = UnifiedPacking().read_index(next(iter(store.articles.values())))
+        assert index.dictionary_id == metadata['compression_dictionary_id']
+        assert {member['codec'] for member in index.members} == {'zstd-dict'}
+        
+        share_index = {
+            'files': [{'file_id': number, 'file_path': path, 'file_size': len(contents[(path, 0)]),
+                       'file_hash': hashlib.sha256(contents[(path, 0)]).hexdigest(),
+                       'segment_count': 1} for number, path in enumerate(paths, 1)],
+            'compression': {'dictionary': metadata['compression_dictionary']}
+        }
+        db.execute("INSERT INTO shares VALUES ('share1', 'folder1', 'PUBLIC', 'x', %s, 1)",
+                   (json.dumps(share_index),))
+        stats = UnifiedDownloadSystem(store, db).download_share(
+            'share1', str(tmp_path / 'out'), selected_files=['cfg/0042.json'])
+        assert stats['completed_files'] == 1
+        assert (tmp_path / 'out' / 'cfg/0042.json').read_bytes() == contents[('cfg/0042.json', 0)]
+    
+    def test_packing_through_system_database(self, tmp_path):
+        """Packs are built and resumed through the wrapper main.py hands the uploader"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'system.db')))
+        UnifiedSchema(db).create_all_tables()
+        db.insert('folders', {'folder_id': 'folder1', 'path': '/data', 'name': 'data'})
+        paths = [f'notes/{number:02d}.txt' for number in range(20)]
+        for number, path in enumerate(paths):
+            db.insert('files', {'file_id': f'file{number}', 'folder_id': 'folder1',
+                                'path': path, 'name': path[6:], 'size': 100})
+            db.insert('segments', {'segment_id': f'seg{number}', 'file_id': f'file{number}',
+                                   'segment_index': 0, 'size': 100, 'hash': f'hash-{number}'})
+        
+        packer = UnifiedUploadSystem(None, DBManagerWrapper(db)).packer
+        packs = packer.pack_segments('folder1')
+        assert len(packs) == 1
+        assert sorted(m['name'] for m in UnifiedPacking().read_index(packs[0].packed_data).members) == paths
+        
+        # Not yet posted: the next upload resumes the same pack
+        assert [pack.packed_id for pack in packer.pack_segments('folder1')] == [packs[0].packed_id]
+        rows = db.fetch_all("SELECT packed_segment_id FROM segments")
+        assert {row['packed_segment_id'] for row in rows} == {packs[0].packed_id}
@@ -0,0 +1,122 @@
+"""
+UsenetSync Pipeline Profiler Tests
+Per-stage timing of the segment pipeline with negligible overhead
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+from unified.monitoring.pipeline_profiler import PipelineProfiler, pipeline_profiler
+from unified.unified_system import UnifiedDatabaseManager, UnifiedUploadSystem
+from tests.test_upload_system import SCHEMA
+
+class SlowClient:
+    """NNTP stand-in whose posts take a few milliseconds"""
+    
+    def __init__(self):
+        self.posted = 0
+    
+    def post_data(self, subject, data, newsgroup, message_id=None):
+        time.sleep(0.003)
+        self.posted += 1
+        return True, message_id or f"<{self.posted}@test>"
+
+class TestPipelineProfiler:
+    """Thread-local totals add up to per-stage statistics"""
+    
+    def test_threads_flush_into_stage_statistics(self):
+        """Counts, bytes and percentiles combine across threads"""
+        profiler = PipelineProfiler(flush_interval=0.01)
+        
+        def work():
+            for i in range(200):
+                with profiler.stage('encrypt', 1000):
+                    pass
+                started = time.perf_counter_ns() - (2_000_000 if i % 10 else 20_000_000)
+                profiler.record('network', started, 1000)
+        
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        statistics = profiler.get_statistics()
+        network = statistics['stages']['network']
+        assert network['operations'] == 800 and network['bytes'] == 800_000
+        assert 1.9 < network['latency_ms']['p50'] < 2.1
+        assert 19 < network['latency_ms']['p99'] < 21
+        assert statistics['stages']['encrypt']['operations'] == 800
+        assert statistics['bottleneck'] == 'network'
+        assert list(statistics['stages']) == ['encrypt', 'network']
+        assert statistics['threads'] == 0
+    
+    def test_overhead_is_negligible(self):
+        """A record costs well under 1% of a millisecond-scale stage"""
+        profiler = PipelineProfiler()
+        calls = 20000
+        started = time.perf_counter()
+        for _ in range(calls):
+            profiler.record('yenc', time.perf_counter_ns(), 768000)
+        per_call = (time.perf_counter() - started) / calls
+        
+        assert per_call < 10e-6
+        assert profiler.get_statistics()['stages']['yenc']['operations'] == calls
+    
+    def test_codecs_do_not_load_the_monitoring_stack(self):
+        """Compression and yEnc import the profiler without psutil or the collector"""
+        code = ("import sys, unified.segmentation.compression, unified.networking.yenc; "
+                "print(sorted(m for m in ('psutil', 'unified.monitoring.metrics_collector', "
+                "'unified.monitoring.dashboard', 'unified.monitoring.alert_manager') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+        
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == '[]'
+
+class TestUploadStages:
+    """upload_folder reports where its time goes"""
+    
+    def test_upload_records_read_network_and_db(self, tmp_path):
+        """Network dominates an upload to a slow server"""
+        db = UnifiedDatabaseManager('sqlite', path=str(tmp_path / 'stages.db'))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        db.execute("INSERT INTO files VALUES (%s, %s, %s)", (1, 'folder1', 'file1.bin'))
+        for index in range(20):
+            db.execute("INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                       "VALUES (%s, %s, %s, %s)", (1, index, f"hash-{index}", 1000))
+        
+        profiler = PipelineProfiler()
+        uploader = UnifiedUploadSystem(SlowClient(), db, profiler=profiler)
+        assert uploader.upload_folder('folder1', pack_small_files=False)['segments_uploaded'] == 20
+        
+        statistics = profiler.get_statistics()
+        assert statistics['stages']['read']['operations'] == 20
+        assert statistics['stages']['network']['operations'] == 20
+        assert statistics['stages']['db']['operations'] >= 1
+        assert statistics['bottleneck'] == 'network'
+
+class TestEndpoints:
+    """Stage statistics are served as JSON and Prometheus text"""
+    
+    def test_api_and_metrics(self):
+        """Both endpoints reflect the shared profiler"""
+        pytest.importorskip('httpx')
+        from fastapi.testclient import TestClient
+        from unified.api.server import UnifiedAPIServer
+        
+        pipeline_profiler.reset()
+        pipeline_profiler.record('compress', time.perf_counter_ns() - 1_000_000, 4096)
+        client = TestClient(UnifiedAPIServer(None).app)
+        
+        stages = client.get('/api/v1/monitoring/pipeline').json()['stages']
+        assert stages['compress']['operations'] == 1 and stages['compress']['bytes'] == 4096
+        
+        metrics = client.get('/metrics')
+        assert metrics.headers['content-type'].startswith('text/plain')
+        assert 'usenetsync_pipeline_stage_bytes_total{stage="compress"} 4096' in metrics.text
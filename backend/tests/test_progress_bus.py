@@ -0,0 +1,85 @@
+"""
+UsenetSync Progress Bus Tests
+Coalesced progress deltas and push delivery to API clients
+"""
+import threading
+import time
+import pytest
+
+from unified.monitoring.progress_bus import ProgressBus
+
+class TestProgressBus:
+    """Workers publish, subscribers receive merged deltas"""
+    
+    def test_updates_coalesce_per_operation(self):
+        """Many publishes between flushes arrive as one merged delta"""
+        bus = ProgressBus()
+        subscription = bus.subscribe()
+        
+        bus.publish('upload_1', type='upload', status='uploading', total=500)
+        for current in range(1, 501):
+            bus.publish('upload_1', current=current)
+        bus.publish('download_1', type='download', status='queued')
+        
+        batch = subscription.drain()
+        assert set(batch) == {'upload_1', 'download_1'}
+        assert batch['upload_1']['current'] == 500 and batch['upload_1']['progress'] == 100.0
+        assert batch['upload_1']['status'] == 'uploading'
+        assert subscription.drain() == {}
+        assert bus.get_statistics()['coalesced'] == 500
+    
+    def test_filters_and_retention(self):
+        """Subscribers see only their operations; finished ones expire"""
+        bus = ProgressBus(retention=0.05)
+        uploads = bus.subscribe(kinds=['upload'])
+        one = bus.subscribe(ids=['download_2'])
+        
+        bus.publish('upload_1', type='upload', status='uploading')
+        bus.publish('download_2', type='download', status='downloading')
+        bus.finish('upload_1')
+        
+        assert set(uploads.drain()) == {'upload_1'}
+        assert set(one.drain()) == {'download_2'}
+        assert bus.get('upload_1')['status'] == 'completed'
+        
+        time.sleep(0.1)
+        assert set(bus.snapshot()) == {'download_2'}
+        uploads.close()
+        assert bus.get_statistics()['subscribers'] == 1
+
+class TestProgressPush:
+    """API clients subscribe instead of polling"""
+    
+    def test_websocket_receives_capped_deltas(self):
+        """A fast worker reaches the client as a few deltas ending in its final state"""
+        pytest.importorskip('httpx')
+        from fastapi.testclient import TestClient
+        from unified.api.server import UnifiedAPIServer
+        
+        server = UnifiedAPIServer(None)
+        bus = server.progress_bus
+        bus.publish('upload_1', type='upload', status='uploading', current=0, total=1000)
+        
+        def worker():
+            for current in range(1, 1001):
+                bus.publish('upload_1', current=current)
+                time.sleep(0.0002)
+            bus.finish('upload_1')
+        
+        with TestClient(server.app).websocket_connect('/ws/progress?type=upload&max_rate=10') as ws:
+            snapshot = ws.receive_json()
+            assert snapshot['event'] == 'snapshot' and snapshot['operations']['upload_1']['current'] == 0
+            
+            thread = threading.Thread(target=worker)
+            thread.start()
+            messages = []
+            while not messages or messages[-1]['operations'].get('upload_1', {}).get('status') != 'completed':
+                messages.append(ws.receive_json())
+            thread.join()
+        
+        assert messages[-1]['operations']['upload_1']['progress'] == 100.0
+        assert len(messages) < 50
+        assert bus.get_statistics()['published'] == 1002
+        
+        response = TestClient(server.app).get('/api/v1/progress/upload_1').json()
+        assert response['source'] == 'memory' and response['status'] == 'completed'
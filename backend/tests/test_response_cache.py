@@ -0,0 +1,77 @@
+"""
+UsenetSync Response Cache Tests
+ETags follow table writes; unchanged data is served without queries
+"""
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('httpx')
+
+from fastapi.testclient import TestClient
+from unified.core.database import UnifiedDatabase, DatabaseConfig
+from unified.core.schema import UnifiedSchema
+from unified.api.server import UnifiedAPIServer
+
+def _client(tmp_path):
+    db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'cache.db')))
+    UnifiedSchema(db).create_all_tables()
+    db.execute("INSERT INTO folders (folder_id, path, name) VALUES ('f1', '/data/one', 'one')")
+    server = UnifiedAPIServer(SimpleNamespace(db=db))
+    return TestClient(server.app), db, server.response_cache
+
+def _selects(db):
+    return db._monitor['queries'].get('SELECT', 0)
+
+class TestWriteVersions:
+    """The database stamps tables as statements write them"""
+    
+    def test_versions_follow_writes(self, tmp_path):
+        """Only writes to the named tables (or untracked writes) change the stamp"""
+        db = UnifiedDatabase(DatabaseConfig(sqlite_path=str(tmp_path / 'versions.db')))
+        db.execute("CREATE TABLE folders (folder_id TEXT)")
+        db.execute("CREATE TABLE logs (line TEXT)")
+        stamp = db.write_version(('folders',))
+        
+        db.execute("INSERT INTO logs VALUES ('x')")
+        db.fetch_all("SELECT * FROM folders")
+        assert db.write_version(('folders',)) == stamp
+        
+        db.execute("insert or replace into folders values ('a')")
+        assert db.write_version(('folders',)) != stamp
+        stamp = db.write_version(('folders',))
+        
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM folders")
+        assert db.write_version(('folders',)) != stamp
+
+class TestConditionalRequests:
+    """Folder listings revalidate against the write versions"""
+    
+    def test_unchanged_listing_is_not_modified(self, tmp_path):
+        """A repeat request with the ETag gets 304 and runs no query"""
+        client, db, cache = _client(tmp_path)
+        
+        first = client.get('/api/v1/folders')
+        etag = first.headers['etag']
+        assert first.status_code == 200 and first.json()['total'] == 1
+        
+        queries = _selects(db)
+        again = client.get('/api/v1/folders', headers={'If-None-Match': etag})
+        assert again.status_code == 304 and again.headers['etag'] == etag
+        
+        replay = client.get('/api/v1/folders')
+        assert replay.json() == first.json() and replay.headers['etag'] == etag
+        assert _selects(db) == queries
+        assert cache.get_statistics()['not_modified'] == 1 and cache.get_statistics()['hits'] == 1
+    
+    def test_write_invalidates(self, tmp_path):
+        """A new folder changes the ETag and the listing"""
+        client, db, _ = _client(tmp_path)
+        etag = client.get('/api/v1/folders').headers['etag']
+        
+        db.execute("INSERT INTO folders (folder_id, path, name) VALUES ('f2', '/data/two', 'two')")
+        response = client.get('/api/v1/folders', headers={'If-None-Match': etag})
+        
+        assert response.status_code == 200 and response.headers['etag'] != etag
+        assert response.json()['total'] == 2
+        assert client.get('/api/v1/folders?status=active').headers['etag'] != response.headers['etag']
@@ -0,0 +1,78 @@
+"""
+UsenetSync Article Routing Tests
+Learned server ranking and hedged retrieval against two local NNTP servers
+"""
+import time
+
+from unified.networking.connection_pool import UnifiedConnectionPool
+from unified.networking.routing import UnifiedArticleRouter
+from tests.fixtures.fake_nntp import FakeNNTPServer
+
+ARTICLE = b'Subject: x\r\n\r\nbody\r\n'
+
+def _pool(router, *servers):
+    return UnifiedConnectionPool(
+        [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 2}
+         for server in servers],
+        router=router
+    )
+
+class TestArticleRouter:
+    """Ranking follows hit rate per age bucket, hedging the p95 latency"""
+    
+    def test_ranking_by_age_bucket(self):
+        """Recent articles go to the fast server, old ones to the deep one"""
+        with FakeNNTPServer(latency=0.001) as fast, FakeNNTPServer(latency=0.01) as deep:
+            fast_id, deep_id = f'127.0.0.1:{fast.port}', f'127.0.0.1:{deep.port}'
+            for i in range(10):
+                fast.articles[f'<new{i}@test>'] = ARTICLE
+                deep.articles[f'<new{i}@test>'] = ARTICLE
+                deep.articles[f'<old{i}@test>'] = ARTICLE
+            
+            router = UnifiedArticleRouter()
+            pool = _pool(router, fast, deep)
+            for i in range(10):
+                assert pool.retrieve_article(f'<new{i}@test>', article_age_days=3)
+                assert pool.retrieve_article(f'<old{i}@test>', article_age_days=500)
+            pool.close()
+        
+        assert router.rank_servers([fast_id, deep_id], article_age_days=2) == [fast_id, deep_id]
+        assert router.rank_servers([fast_id, deep_id], article_age_days=600) == [deep_id, fast_id]
+        assert router.estimated_retention_days(fast_id) == 7
+        assert router.estimated_retention_days(deep_id) == 1000
+    
+    def test_hedge_delay_is_p95(self):
+        """No hedging until enough samples, then the p95 latency"""
+        router = UnifiedArticleRouter(min_hedge_samples=20)
+        for ms in range(1, 20):
+            router.record('a:119', True, ms / 1000)
+        assert router.hedge_delay('a:119') is None
+        
+        for ms in range(20, 101):
+            router.record('a:119', True, ms / 1000)
+        assert router.hedge_delay('a:119') == 0.095
+    
+    def test_hedged_request_beats_slow_server(self):
+        """A server slower than its p95 is overtaken by the hedge"""
+        with FakeNNTPServer(latency=0.3) as slow, FakeNNTPServer() as fast:
+            slow_id = f'127.0.0.1:{slow.port}'
+            for server in (slow, fast):
+                server.articles['<a@test>'] = ARTICLE
+            
+            # The slow server used to be quick: ranked first, hedged after ~10 ms
+            router = UnifiedArticleRouter()
+            for _ in range(20):
+                router.record(slow_id, True, 0.01)
+            pool = _pool(router, slow, fast)
+            assert router.rank_servers(list(pool.pools))[0] == slow_id
+            
+            started = time.perf_counter()
+            assert pool.retrieve_article('<a@test>')
+            elapsed = time.perf_counter() - started
+            
+            time.sleep(0.35)  # Let the overtaken request finish
+            pool.close()
+            
+            assert elapsed < 0.15
+            assert pool.stats[slow_id]['hedged_requests'] == 1
+            assert fast.count('ARTICLE') == 1
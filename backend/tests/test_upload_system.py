@@ -0,0 +1,161 @@
+"""
+UsenetSync Concurrent Upload Tests
+Posting throughput across pooled connections against a local NNTP server
+"""
+import pytest
+
+from unified.unified_system import (
+    UnifiedDatabaseManager, UnifiedUploadSystem, PostedStateBuffer
+)
+from unified.networking.connection_pool import UnifiedConnectionPool
+from tests.fixtures.fake_nntp import FakeNNTPServer
+
+FILES = 4
+SEGMENTS_PER_FILE = 40
+RTT = 0.01
+
+SCHEMA = [
+    """CREATE TABLE files (
+        file_id INTEGER PRIMARY KEY, folder_id TEXT, file_path TEXT)""",
+    """CREATE TABLE segments (
+        segment_id INTEGER PRIMARY KEY, file_id INTEGER, segment_index INTEGER,
+        segment_hash TEXT, segment_size INTEGER, packed_with TEXT, packed_segment_id TEXT,
+        upload_status TEXT DEFAULT 'pending', message_id TEXT,
+        internal_subject TEXT, usenet_subject TEXT, encrypted_location TEXT,
+        uploaded_at TIMESTAMP, retry_count INTEGER DEFAULT 0,
+        redundancy_level INTEGER DEFAULT 0)""",
+    """CREATE TABLE packed_segments (
+        packed_segment_id TEXT PRIMARY KEY, total_size INTEGER, file_count INTEGER,
+        compression_type TEXT, compressed_size INTEGER, message_id TEXT, subject TEXT,
+        upload_status TEXT, created_at TIMESTAMP, uploaded_at TIMESTAMP)"""
+]
+
+class TestConcurrentUpload:
+    """upload_folder spreads posts over N pooled connections"""
+    
+    def _database(self, path, folder_id, segment_size=1000):
+        db = UnifiedDatabaseManager('sqlite', path=str(path))
+        db.connect()
+        for statement in SCHEMA:
+            db.execute(statement)
+        for file_id in range(1, FILES + 1):
+            db.execute("INSERT INTO files VALUES (%s, %s, %s)",
+                       (file_id, folder_id, f"file{file_id}.bin"))
+            for index in range(SEGMENTS_PER_FILE):
+                db.execute(
+                    "INSERT INTO segments (file_id, segment_index, segment_hash, segment_size) "
+                    "VALUES (%s, %s, %s, %s)",
+                    (file_id, index, f"hash-{file_id}-{index}", segment_size)
+                )
+        return db
+    
+    def _upload(self, tmp_path, server, connections):
+        db = self._database(tmp_path / f"upload{connections}.db", 'folder1')
+        pool = UnifiedConnectionPool(
+            [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 8}]
+        )
+        uploader = UnifiedUploadSystem(None, db, connection_pool=pool, db_batch_size=50)
+        stats = uploader.upload_folder('folder1', pack_small_files=False,
+                                       connections=connections)
+        pool.close()
+        return db, stats
+    
+    def test_throughput_scales_with_connections(self, tmp_path):
+        """Four connections post close to four times as fast as one"""
+        with FakeNNTPServer(latency=RTT) as server:
+            _, single = self._upload(tmp_path, server, 1)
+            _, quad = self._upload(tmp_path, server, 4)
+        
+        total = FILES * SEGMENTS_PER_FILE
+        assert single['segments_uploaded'] == total
+        assert quad['segments_uploaded'] == total
+        
+        speedup = single['duration'] / quad['duration']
+        assert speedup >= 3.2
+        print(f"\n✅ 1 connection {single['duration']:.2f}s, "
+              f"4 connections {quad['duration']:.2f}s ({speedup:.2f}x)")
+    
+    def test_posted_state_batched_and_ordered(self, tmp_path):
+        """Every segment keeps its own index and message ID, written in few transactions"""
+        with FakeNNTPServer() as server:
+            db, stats = self._upload(tmp_path, server, 4)
+            posted = set(server.articles)
+        
+        rows = db.fetchall("SELECT file_id, segment_index, message_id, upload_status "
+                           "FROM segments ORDER BY file_id, segment_index")
+        
+        assert [(r['file_id'], r['segment_index']) for r in rows] == [
+            (f, i) for f in range(1, FILES + 1) for i in range(SEGMENTS_PER_FILE)
+        ]
+        assert all(r['upload_status'] == 'uploaded' for r in rows)
+        assert {r['message_id'] for r in rows} == posted
+        # One batch of ID allocations and one of posted states per 50 segments
+        assert stats['db_transactions'] == pytest.approx(2 * len(rows) / 50, abs=2)
+    
+    def test_restart_skips_articles_already_posted(self, tmp_path):
+        """Pre-allocated IDs found with STAT are not posted again"""
+        with FakeNNTPServer() as server:
+            db = self._database(tmp_path / "restart.db", 'folder1')
+            pool = UnifiedConnectionPool(
+                [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 8}]
+            )
+            uploader = UnifiedUploadSystem(None, db, connection_pool=pool)
+            uploader.packer.read_segment = lambda segment: segment['segment_hash'].encode().ljust(5000)
+            
+            # Crash after IDs were stored and half the articles reached the server
+            uploader._state = PostedStateBuffer(db)
+            segments = [dict(s) for s in uploader._get_pending_segments('folder1')]
+            uploader._preallocate_message_ids([], segments)
+            uploader._state = None
+            posted_before = segments[::2]
+            for segment in posted_before:
+                server.articles[segment['message_id']] = b'body\r\n'
+            
+            stats = uploader.upload_folder('folder1', pack_small_files=False, connections=4)
+            pool.close()
+            
+            assert stats['segments_reconciled'] == len(posted_before)
+            assert stats['segments_uploaded'] == len(segments) - len(posted_before)
+            assert server.count('POST') == len(segments) - len(posted_before)
+        
+        rows = db.fetchall("SELECT segment_id, message_id, upload_status FROM segments")
+        assert all(r['upload_status'] == 'uploaded' for r in rows)
+        assert {r['segment_id']: r['message_id'] for r in rows} == {
+            s['segment_id']: s['message_id'] for s in segments
+        }
+    
+    def test_restart_resumes_packed_segments(self, tmp_path):
+        """Packs keep their rows and Message-IDs across a crash"""
+        with FakeNNTPServer() as server:
+            # 160 segments of 5 KB fill one 750 KB pack and start a second
+            db = self._database(tmp_path / "packed.db", 'folder1', segment_size=5000)
+            pool = UnifiedConnectionPool(
+                [{'host': '127.0.0.1', 'port': server.port, 'max_connections': 8}]
+            )
+            uploader = UnifiedUploadSystem(None, db, connection_pool=pool)
+            uploader.packer.read_segment = lambda segment: segment['segment_hash'].encode().ljust(5000)
+            
+            # Crash after the packs and their IDs were stored and the first was posted
+            uploader._state = PostedStateBuffer(db)
+            packed = uploader.packer.pack_segments('folder1')
+            uploader._preallocate_message_ids(packed, [])
+            uploader._state = None
+            assert len(packed) == 2
+            server.articles[packed[0].message_id] = b'body\r\n'
+            
+            stats = uploader.upload_folder('folder1', connections=4)
+            pool.close()
+            
+            assert stats['segments_reconciled'] == 1
+            assert stats['packed_segments'] == 1
+            assert server.count('POST') == 1
+            assert packed[1].message_id in server.articles
+        
+        packs = db.fetchall("SELECT packed_segment_id, message_id, upload_status FROM packed_segments")
+        assert {p['packed_segment_id']: p['message_id'] for p in packs} == {
+            p.packed_id: p.message_id for p in packed
+        }
+        assert all(p['upload_status'] == 'uploaded' for p in packs)
+        rows = db.fetchall("SELECT packed_segment_id, upload_status FROM segments")
+        assert all(r['upload_status'] == 'uploaded' for r in rows)
+        assert {r['packed_segment_id'] for r in rows} == {p.packed_id for p in packed}
@@ -0,0 +1,203 @@
+"""
+UsenetSync Versioned Index Tests
+Re-indexing by segment delta, and version records that do not depend on worker count
+"""
+import itertools
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from database.enhanced_database_manager import DatabaseConfig
+from database.production_db_wrapper import ProductionDatabaseManager
+from indexing.versioned_core_index_system import VersionedCoreIndexSystem
+
+SEGMENT_SIZE = 1000
+
+class SubjectSecurity:
+    """Security stand-in with deterministic subjects and no folder keys"""
+    
+    def generate_folder_keys(self, folder_id):
+        return {}
+    
+    def save_folder_keys(self, folder_id, keys):
+        pass
+    
+    def generate_subject_pair(self, folder_id, version, segment_index):
+        return SimpleNamespace(usenet_subject=f'{folder_id}-{version}-{segment_index}',
+                               internal_subject=f'internal-{version}-{segment_index}')
+
+_writes = itertools.count()
+
+def _write(path, data):
+    path.write_bytes(data)
+    # Move the mtime so metadata-based change detection notices every write
+    stamp = time.time() + next(_writes)
+    os.utime(path, (stamp, stamp))
+
+def _indexer(path, workers=2):
+    db = ProductionDatabaseManager(DatabaseConfig(path=str(path)))
+    return VersionedCoreIndexSystem(db, SubjectSecurity(), {
+        'processing': {'segment_size': SEGMENT_SIZE, 'worker_threads': workers}
+    })
+
+def _close(indexer):
+    indexer.shutdown()
+    indexer.db.close()
+
+@pytest.fixture
+def indexer(tmp_path):
+    system = _indexer(tmp_path / 'index.db')
+    yield system
+    _close(system)
+
+def _rows(indexer, file_path):
+    with indexer.db.pool.get_connection() as conn:
+        return [dict(row) for row in conn.execute(
+            "SELECT * FROM files WHERE file_path = ? ORDER BY version", (file_path,)
+        ).fetchall()]
+
+def _mark_uploaded(indexer, file_id):
+    with indexer.db.pool.get_connection() as conn:
+        conn.execute("UPDATE segments SET state = 'uploaded', message_id = '<' || id || '@test>' "
+                     "WHERE file_id = ?", (file_id,))
+
+class TestDeltaReindex:
+    """Only changed segments get new rows; deletions are recorded once"""
+    
+    @pytest.fixture
+    def folder(self, tmp_path, indexer):
+        folder = tmp_path / 'share'
+        folder.mkdir()
+        _write(folder / 'a.bin', bytes(range(250)) * 14)  # 4 segments
+        _write(folder / 'b.bin', b'b' * 2000)
+        assert indexer.index_folder(str(folder), 'folder1')['files_processed'] == 2
+        _mark_uploaded(indexer, _rows(indexer, 'a.bin')[0]['id'])
+        return folder
+    
+    def _modify(self, folder):
+        data = bytearray((folder / 'a.bin').read_bytes())
+        data[1500] ^= 0xFF
+        _write(folder / 'a.bin', bytes(data))
+    
+    def test_modify_reuses_unchanged_segments(self, indexer, folder):
+        """One changed segment is re-created, the others keep their articles"""
+        self._modify(folder)
+        result = indexer.re_index_folder(str(folder), 'folder1')
+        
+        assert result['changes'] == {'added': 0, 'modified': 1, 'deleted': 0}
+        assert (result['segments_created'], result['segments_reused']) == (1, 3)
+        
+        old, new = _rows(indexer, 'a.bin')
+        old_segments = {s['segment_index']: s for s in indexer.db.get_file_segments(old['id'])}
+        new_segments = {s['segment_index']: s for s in indexer.db.get_file_segments(new['id'])}
+        assert new['version'] == 2 and sorted(new_segments) == [0, 1, 2, 3]
+        for index in (0, 2, 3):
+            assert new_segments[index]['message_id'] == old_segments[index]['message_id']
+            assert new_segments[index]['state'] == 'uploaded'
+        assert new_segments[1]['state'] == 'pending' and not new_segments[1]['message_id']
+        
+        assert indexer.re_index_folder(str(folder), 'folder1')['changes']['modified'] == 0
+    
+    def test_delete(self, indexer, folder):
+        """A deleted file is reported once"""
+        (folder / 'b.bin').unlink()
+        assert indexer.re_index_folder(str(folder), 'folder1')['changes']['deleted'] == 1
+        assert _rows(indexer, 'b.bin')[-1]['state'] == 'deleted'
+        
+        assert indexer.re_index_folder(str(folder), 'folder1')['changes']['deleted'] == 0
+    
+    def test_modify_then_delete(self, indexer, folder):
+        """Deleting a modified file marks its latest version"""
+        self._modify(folder)
+        indexer.re_index_folder(str(folder), 'folder1')
+        (folder / 'a.bin').unlink()
+        assert indexer.re_index_folder(str(folder), 'folder1')['changes']['deleted'] == 1
+        
+        assert [row['state'] for row in _rows(indexer, 'a.bin')] == ['indexed', 'deleted']
+        assert indexer.re_index_folder(str(folder), 'folder1')['changes'] == {
+            'added': 0, 'modified': 0, 'deleted': 0
+        }
+
+def _version_records(indexer):
+    with indexer.db.pool.get_connection() as conn:
+        files = [tuple(row) for row in conn.execute(
+            "SELECT id, file_path, file_hash, file_size, version, segment_count, state "
+            "FROM files ORDER BY id").fetchall()]
+        segments = [tuple(row) for row in conn.execute(
+            "SELECT id, file_id, segment_index, segment_hash, segment_size, offset, subject_hash "
+            "FROM segments ORDER BY id").fetchall()]
+        versions = [tuple(row) for row in conn.execute(
+            "SELECT version, change_summary FROM folder_versions ORDER BY version").fetchall()]
+    return files, segments, versions
+
+class TestDeterministicIndexing:
+    """Hashing runs in parallel, records are written in path order"""
+    
+    def _tree(self, root):
+        for number in range(24):
+            directory = root / f'd{number % 3}'
+            directory.mkdir(parents=True, exist_ok=True)
+            _write(directory / f'f{number:02d}.bin', bytes([number]) * (500 + 700 * number))
+    
+    def _index_and_change(self, root, indexer):
+        indexer.index_folder(str(root), 'folder1')
+        _write(root / 'd0' / 'f03.bin', b'changed' * 400)
+        (root / 'd1' / 'f04.bin').unlink()
+        _write(root / 'd2' / 'new.bin', b'new' * 900)
+        indexer.re_index_folder(str(root), 'folder1')
+        return _version_records(indexer)
+    
+    def test_one_and_many_workers_agree(self, tmp_path):
+        """1 worker and 8 workers produce identical version records"""
+        self._tree(tmp_path / 'one')
+        self._tree(tmp_path / 'many')
+        
+        single = _indexer(tmp_path / 'one.db', workers=1)
+        parallel = _indexer(tmp_path / 'many.db', workers=8)
+        try:
+            records = self._index_and_change(tmp_path / 'one', single)
+            assert self._index_and_change(tmp_path / 'many', parallel) == records
+        finally:
+            _close(single)
+            _close(parallel)
+        
+        files, segments, versions = records
+        assert len(files) == 26 and len(versions) == 2
+        assert [f[1] for f in files[:24]] == sorted(f[1] for f in files[:24])
+    
+    def test_concurrent_folders_keep_their_own_stats(self, tmp_path, indexer):
+        """Statistics of one indexing call are not overwritten by another"""
+        for name, count in (('small', 3), ('large', 12)):
+            (tmp_path / name).mkdir()
+            for number in range(count):
+                _write(tmp_path / name / f'f{number}.bin', b'x' * 2500)
+        
+        results = {}
+        def run(name):
+            results[name] = indexer.index_folder(str(tmp_path / name), name)
+        threads = [threading.Thread(target=run, args=(name,)) for name in ('small', 'large')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results['small']['files_processed'] == 3
+        assert results['large']['files_processed'] == 12
+        assert results['large']['segments_created'] == 36
+    
+    def test_folder_claimed_across_instances(self, tmp_path, indexer):
+        """A second index system cannot claim a folder the first is indexing"""
+        other = _indexer(tmp_path / 'other.db')
+        try:
+            with indexer._folder_guard('folder1') as first:
+                with other._folder_guard('folder1') as second:
+                    assert first and not second
+                with other._folder_guard('folder2') as different:
+                    assert different
+            with other._folder_guard('folder1') as released:
+                assert released
+        finally:
+            _close(other)